@@ -14,6 +14,8 @@ def _fmt(v: float, p=5):
 class BalanceManager:
     def __init__(self, trader):
         self.trader = trader
+        # jaettu wallet_state.WalletStateService (None jos omistajaa ei tunneta -> vanha per-mint polku)
+        self.wallet = getattr(trader, "wallet", None)
 
     async def get_sol(self) -> float:
         return await self.trader.get_sol_balance()
@@ -23,8 +25,10 @@ class BalanceManager:
         return await self.trader.get_token_balance_atoms(user_pk, mint)
 
     async def get_wsol_atoms(self, owner_pubkey: str) -> int:
+        if self.wallet and owner_pubkey == self.wallet.owner:
+            return await self.wallet.token_atoms(WSOL_MINT)
         # lue omistetut token-tilit WSOL-mintille
-        async with await self.trader._sol_client() as c:
+        async with self.trader._sol_client("getTokenAccountsByOwner") as c:
             resp = await c.get_token_accounts_by_owner(Pubkey.from_string(owner_pubkey),
                               TokenAccountOpts(mint=WSOL_MINT))
             total = 0
@@ -34,6 +38,8 @@ class BalanceManager:
             return total
 
     async def snapshot(self, positions: Dict[str, Any]) -> Dict[str, Any]:
+        if self.wallet:
+            return self._from_wallet(await self.wallet.snapshot(), positions)
         owner = str(self.trader.kp.pubkey()) if self.trader.kp else os.getenv("TRADER_PUBLIC_KEY","")
         sol_total = await self.trader.get_sol_balance()
         # spendable = total - fee-reserve (sama funktio kuin treiderissä)
@@ -56,3 +62,18 @@ class BalanceManager:
             "wsol_display": _fmt(wsol, 5),
             "tokens": balances
         }
+
+    def _from_wallet(self, snap, positions: Dict[str, Any]) -> Dict[str, Any]:
+        """Sama raportti yhdestä wallet-snapshotista (1 RPC-kierros per-mint kutsujen sijaan)"""
+        sol_total = snap.sol
+        spendable = max(0, snap.lamports - int(0.01 * 1e9)) / 1e9
+        wsol = snap.atoms(WSOL_MINT) / 1e9
+        return {
+            "sol_total": sol_total,
+            "sol_total_display": _fmt(sol_total, 5),
+            "sol_spendable": spendable,
+            "sol_spendable_display": _fmt(spendable, 5),
+            "wsol": wsol,
+            "wsol_display": _fmt(wsol, 5),
+            "tokens": {mint: snap.largest_atoms(mint) for mint in positions.keys()},
+        }
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+CandidateIndex - inkrementaalinen top-K indeksi DiscoveryEnginen kandidaateille
+Korvaa koko dictin sorttauksen jokaisella best_candidates/_trim_candidates -kutsulla
+"""
+
+import heapq
+import itertools
+from bisect import bisect_left, insort
+from typing import Dict, Iterator, List, Optional, Tuple
+
+_Key = Tuple[float, int, str]  # (-score, seq, mint) -> nouseva järjestys = paras ensin
+
+
+class _SortedKeyList:
+    """
+    Kevyt lohkotettu järjestetty lista (sortedcontainers-tyylinen)
+
+    Lohkojen maksimit pidetään erillisessä listassa -> bisect O(log n),
+    lisäys/poisto siirtää vain yhden lohkon alkioita.
+    """
+
+    LOAD = 256
+
+    def __init__(self):
+        self._lists: List[List[_Key]] = []
+        self._maxes: List[_Key] = []
+        self._len = 0
+
+    def add(self, key: _Key) -> None:
+        if not self._maxes:
+            self._lists.append([key])
+            self._maxes.append(key)
+        else:
+            pos = bisect_left(self._maxes, key)
+            if pos == len(self._maxes):
+                pos -= 1
+                self._lists[pos].append(key)
+                self._maxes[pos] = key
+            else:
+                insort(self._lists[pos], key)
+            self._split(pos)
+        self._len += 1
+
+    def _split(self, pos: int) -> None:
+        lst = self._lists[pos]
+        if len(lst) > 2 * self.LOAD:
+            half = lst[self.LOAD:]
+            del lst[self.LOAD:]
+            self._maxes[pos] = lst[-1]
+            self._lists.insert(pos + 1, half)
+            self._maxes.insert(pos + 1, half[-1])
+
+    def remove(self, key: _Key) -> None:
+        pos = bisect_left(self._maxes, key)
+        if pos == len(self._maxes):
+            raise ValueError(key)
+        lst = self._lists[pos]
+        idx = bisect_left(lst, key)
+        if idx >= len(lst) or lst[idx] != key:
+            raise ValueError(key)
+        del lst[idx]
+        self._len -= 1
+        if lst:
+            self._maxes[pos] = lst[-1]
+        else:
+            del self._lists[pos]
+            del self._maxes[pos]
+
+    def last(self) -> Optional[_Key]:
+        return self._lists[-1][-1] if self._lists else None
+
+    def __iter__(self) -> Iterator[_Key]:
+        for lst in self._lists:
+            yield from lst
+
+    def __len__(self) -> int:
+        return self._len
+
+
+class CandidateIndex:
+    """
+    Pisteen mukaan järjestetty indeksi + aikaleiman mukainen vanhenemiskeko
+
+    - upsert/remove: O(log n)
+    - top(k, min_score): O(log n + k), ei täyttä skannausta
+    - expire(cutoff): poistaa vain vanhentuneet (laiska keko, stale-rivit ohitetaan)
+    """
+
+    def __init__(self):
+        self._sorted = _SortedKeyList()
+        self._keys: Dict[str, _Key] = {}
+        self._expiry: Dict[str, Tuple[float, int]] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = itertools.count()
+
+    def upsert(self, mint: str, score: float, ts: Optional[float] = None) -> None:
+        """Lisää tai päivitä mintin piste ja vanhenemisen perusaikaleima"""
+        seq = next(self._seq)
+        old = self._keys.get(mint)
+        if old is not None:
+            if old[0] == -float(score):
+                seq = old[1]  # sama piste -> säilytä paikka
+            else:
+                self._sorted.remove(old)
+        key = (-float(score), seq, mint)
+        if old is None or old != key:
+            self._sorted.add(key)
+            self._keys[mint] = key
+
+        if ts is None:
+            self._expiry.pop(mint, None)
+        elif self._expiry.get(mint, (None,))[0] != ts:
+            self._expiry[mint] = (ts, seq)
+            heapq.heappush(self._heap, (ts, seq, mint))
+            self._maybe_compact_heap()
+
+    def remove(self, mint: str) -> bool:
+        key = self._keys.pop(mint, None)
+        self._expiry.pop(mint, None)
+        if key is None:
+            return False
+        self._sorted.remove(key)
+        return True
+
+    def top(self, k: int, min_score: Optional[float] = None) -> List[str]:
+        """k parasta mintiä (score >= min_score), paras ensin"""
+        out: List[str] = []
+        if k <= 0:
+            return out
+        for neg_score, _, mint in self._sorted:
+            if min_score is not None and -neg_score < min_score:
+                break
+            out.append(mint)
+            if len(out) >= k:
+                break
+        return out
+
+    def lowest(self) -> Optional[str]:
+        """Heikoimman pisteen mint (evictio kapasiteetin täyttyessä)"""
+        key = self._sorted.last()
+        return key[2] if key else None
+
+    def expire(self, cutoff_ts: float) -> List[str]:
+        """Poista ja palauta mintit joiden perusaikaleima <= cutoff_ts"""
+        expired: List[str] = []
+        while self._heap and self._heap[0][0] <= cutoff_ts:
+            ts, seq, mint = heapq.heappop(self._heap)
+            if self._expiry.get(mint) != (ts, seq):
+                continue  # vanhentunut keko-rivi (päivitetty tai poistettu)
+            self.remove(mint)
+            expired.append(mint)
+        return expired
+
+    def _maybe_compact_heap(self) -> None:
+        if len(self._heap) > 2 * len(self._expiry) + 64:
+            self._heap = [(ts, seq, mint) for mint, (ts, seq) in self._expiry.items()]
+            heapq.heapify(self._heap)
+
+    def __contains__(self, mint: str) -> bool:
+        return mint in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
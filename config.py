@@ -49,6 +49,23 @@ class FreshPassCfg:
     min_trades: int = 0
     sources: tuple[str, ...] = ("helius_transactions",)
 
+@dataclass
+class EnrichCacheCfg:
+    enabled: bool = True
+    max_entries: int = 20000
+    mint_active_ttl_sec: float = 30.0   # authority vielä aktiivinen -> tarkista uudelleen
+    lp_ttl_sec: float = 30.0
+    distribution_ttl_sec: float = 15.0
+    flow_ttl_sec: float = 5.0
+    negative_ttl_sec: float = 3.0       # epäonnistuneet haut
+
+@dataclass
+class TradeWindowCfg:
+    windows_sec: tuple[int, ...] = (30, 180, 300)  # liukuvat trade-ikkunat
+    max_entries_per_mint: int = 2000    # per-mint ikkunajonon yläraja
+    max_mints: int = 5000               # seurattujen mintien yläraja
+    idle_ttl_sec: float = 600.0         # mint poistetaan kun ei tradeja tähän aikaan
+
 @dataclass
 class DiscoveryCfg:
     min_liq_usd: float = 0.0  # Poistettu raja kokonaan
@@ -58,6 +75,8 @@ class DiscoveryCfg:
     max_top10_share: float = 1.0  # Poistettu raja kokonaan
     max_top10_share_fresh: float = 1.0  # Poistettu raja kokonaan
     max_queue: int = 2000
+    max_candidates: int = 20000  # indeksoitujen kandidaattien yläraja (heikoimmat karsitaan)
+    scorer_workers: int = 4  # rinnakkaiset scorer-workerit (per-mint järjestys säilyy shardauksella)
     fresh_window_sec: int = 90
     trade_min_unique_buyers: int = 0  # Poistettu raja kokonaan
     trade_min_trades: int = 0  # Poistettu raja kokonaan
@@ -72,6 +91,8 @@ class DiscoveryCfg:
     birdeye_min_holders: int = 200
     sources: SourcesCfg = field(default_factory=SourcesCfg)
     fresh_pass: FreshPassCfg = field(default_factory=FreshPassCfg)
+    enrich_cache: EnrichCacheCfg = field(default_factory=EnrichCacheCfg)
+    trade_windows: TradeWindowCfg = field(default_factory=TradeWindowCfg)
     helius_programs: list = field(default_factory=lambda: [
         "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"   # SPL Token (InitializeMint*)
     ])
@@ -180,12 +201,16 @@ def load_config(path: str = "config.yaml") -> AppCfg:
     discovery_data = data.get("discovery", {})
     sources_data = discovery_data.pop("sources", {})  # Poista sources discovery_datasta
     fresh_pass_data = discovery_data.pop("fresh_pass", {})  # Poista fresh_pass discovery_datasta
+    enrich_cache_data = discovery_data.pop("enrich_cache", {})  # Poista enrich_cache discovery_datasta
+    trade_windows_data = discovery_data.pop("trade_windows", {})  # Poista trade_windows discovery_datasta
     
     cfg = AppCfg(
         discovery=DiscoveryCfg(
             **_filter_fields(DiscoveryCfg, discovery_data),
             sources=SourcesCfg(**_filter_fields(SourcesCfg, sources_data)),
-            fresh_pass=FreshPassCfg(**_filter_fields(FreshPassCfg, fresh_pass_data))
+            fresh_pass=FreshPassCfg(**_filter_fields(FreshPassCfg, fresh_pass_data)),
+            enrich_cache=EnrichCacheCfg(**_filter_fields(EnrichCacheCfg, enrich_cache_data)),
+            trade_windows=TradeWindowCfg(**_filter_fields(TradeWindowCfg, trade_windows_data)),
         ),
         risk=RiskCfg(**_filter_fields(RiskCfg, data.get("risk"))),
         trading=TradingCfg(**_filter_fields(TradingCfg, data.get("trading"))),
@@ -204,6 +229,8 @@ def load_config(path: str = "config.yaml") -> AppCfg:
     cfg.discovery.min_score_cap_delta = _env_float("DISCOVERY_MIN_SCORE_CAP_DELTA", cfg.discovery.min_score_cap_delta)
     cfg.discovery.max_top10_share = _env_float("DISCOVERY_MAX_TOP10_SHARE", cfg.discovery.max_top10_share)
     cfg.discovery.max_top10_share_fresh = _env_float("DISCOVERY_MAX_TOP10_SHARE_FRESH", cfg.discovery.max_top10_share_fresh)
+    cfg.discovery.max_candidates = _env_int("DISCOVERY_MAX_CANDIDATES", cfg.discovery.max_candidates)
+    cfg.discovery.scorer_workers = _env_int("DISCOVERY_SCORER_WORKERS", cfg.discovery.scorer_workers)
     cfg.discovery.candidate_ttl_sec = _env_int("DISCOVERY_CANDIDATE_TTL_SEC", cfg.discovery.candidate_ttl_sec) if os.getenv("DISCOVERY_CANDIDATE_TTL_SEC") else cfg.discovery.candidate_ttl_sec
     cfg.runtime.test_max_cycles = _env_int("TEST_MAX_CYCLES", cfg.runtime.test_max_cycles) if os.getenv("TEST_MAX_CYCLES") else cfg.runtime.test_max_cycles
     cfg.runtime.test_max_runtime_sec = _env_float("TEST_MAX_RUNTIME", cfg.runtime.test_max_runtime_sec) if os.getenv("TEST_MAX_RUNTIME") else cfg.runtime.test_max_runtime_sec
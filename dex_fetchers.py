@@ -1,12 +1,12 @@
 from __future__ import annotations
 
+import asyncio
 import os
 import time
-import asyncio
-from typing import Any, Dict, Optional
-import aiohttp
+from typing import Any, Dict, Iterable, Optional
 
 from helius_token_scanner_bot import DexInfo
+from http_pool import get_http_client
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -53,26 +53,10 @@ async def _get_json(
     timeout_sec: float = 8.0,
     tries: int = 4,
 ) -> Dict[str, Any]:
-    last_exc: Exception | None = None
-    backoff = 0.5
-    for _ in range(max(1, tries)):
-        try:
-            timeout = aiohttp.ClientTimeout(total=timeout_sec)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.get(url, headers=headers) as response:
-                    if response.status >= 400:
-                        raise aiohttp.ClientResponseError(
-                            response.request_info,
-                            response.history,
-                            status=response.status,
-                            message=await response.text(),
-                        )
-                    return await response.json(content_type=None)
-        except Exception as exc:
-            last_exc = exc
-            await asyncio.sleep(backoff)
-            backoff = min(3.0, backoff * 2)
-    return {"__error__": str(last_exc) if last_exc else "unknown"}
+    try:
+        return await get_http_client().get_json(url, headers=headers, timeout=timeout_sec, tries=tries)
+    except Exception as exc:
+        return {"__error__": str(exc) or type(exc).__name__}
 
 
 async def fetch_birdeye_price(mint: str) -> Optional[float]:
@@ -517,6 +501,42 @@ async def fetch_from_dexscreener(mint: str) -> DexInfo:
 		return DexInfo(status="error", reason=f"dexscreener_parse:{e}")
 
 
+DEXSCREENER_BATCH_MAX = 30  # /tokens/{a,b,...} hyväksyy enintään 30 osoitetta
+
+
+async def fetch_dexscreener_prices(mints: Iterable[str]) -> Dict[str, Dict[str, float]]:
+    """
+    Monen mintin hinta / likviditeetti / 24h volyymi DexScreeneriltä (/tokens/{a,b,...}, 30 per pyyntö).
+    Palauttaa mint -> {"price_usd", "liq_usd", "vol_h24"} suurimman likviditeetin Solana-parista;
+    puuttuvat / epäonnistuneet mintit jäävät pois (kutsuja käyttää per-mint fallbackia).
+    """
+    wanted = list(dict.fromkeys(m for m in mints if m))
+    chunks = [wanted[i:i + DEXSCREENER_BATCH_MAX] for i in range(0, len(wanted), DEXSCREENER_BATCH_MAX)]
+    responses = await asyncio.gather(
+        *(_get_json(f"{DEXSCREENER_BASE}/tokens/{','.join(chunk)}", timeout_sec=6.0, tries=2) for chunk in chunks)
+    )
+    wanted_set = set(wanted)
+    out: Dict[str, Dict[str, float]] = {}
+    for data in responses:
+        pairs = data.get("pairs") if isinstance(data, dict) else None
+        for pair in pairs if isinstance(pairs, list) else []:
+            if not isinstance(pair, dict) or str(pair.get("chainId") or "solana").lower() != "solana":
+                continue
+            mint = str((pair.get("baseToken") or {}).get("address") or "")
+            price = _safe_float(pair.get("priceUsd"))
+            if mint not in wanted_set or price is None:
+                continue
+            liq = _safe_float((pair.get("liquidity") or {}).get("usd")) or 0.0
+            best = out.get(mint)
+            if best is None or liq > best["liq_usd"]:
+                out[mint] = {
+                    "price_usd": price,
+                    "liq_usd": liq,
+                    "vol_h24": _safe_float((pair.get("volume") or {}).get("h24")) or 0.0,
+                }
+    return out
+
+
 async def fetch_from_jupiter(mint: str) -> DexInfo:
 	"""Use Jupiter quote API as a signal that token is tradable and extract market info if available."""
 	# Attempt a small exact-in quote to SOL; amount is in base units. Use 1e6 which works for many tokens.
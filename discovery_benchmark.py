@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Discovery Benchmark - DiscoveryEnginen kuormitusmittaus vakaalla JSON-skeemalla
+
+Ajaa DiscoveryEnginea MockFirehoseSourcella ja säädettävällä StubSolanaRPC-viiveellä ja mittaa
+todellisen pisteytetyn läpiviennin, jono->pisteytys -latenssin kvantiilit, jonosyvyyden ajan yli,
+pudotukset, RSS-kasvun ja CPU-ajan per ehdokas. Raportit ovat vertailukelpoisia committien välillä
+(compare_reports + regressiokynnykset).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import platform
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from discovery_engine import DiscoveryEngine
+from rpc_interfaces import SolanaRPC
+from rpc_stub import StubFastRPC, StubSolanaRPC
+from sources.mock_firehose import MockFirehoseSource
+from windowed_stats import WINDOW_15M, WindowedQuantiles
+
+try:
+    import psutil  # type: ignore
+except Exception:  # pragma: no cover
+    psutil = None  # type: ignore
+
+SCHEMA = "discovery-bench/1"
+
+# Regressiokynnykset: metriikka -> (suunta, sallittu suhteellinen muutos)
+# "higher" = isompi on parempi, "lower" = pienempi on parempi
+DEFAULT_THRESHOLDS: Dict[str, tuple] = {
+    "throughput_scored_per_sec": ("higher", 0.10),
+    "latency_ms.p50": ("lower", 0.25),
+    "latency_ms.p99": ("lower", 0.25),
+    "cpu_ms_per_candidate": ("lower", 0.20),
+    "drop_ratio": ("lower", 0.0),
+    "rss_mb.growth": ("lower", 0.50),
+}
+# Absoluuttinen lattia, jonka alle menevät muutokset ovat kohinaa (samoissa yksiköissä kuin metriikka)
+_NOISE_FLOOR = {"latency_ms.p50": 0.5, "latency_ms.p99": 1.0, "cpu_ms_per_candidate": 0.01, "drop_ratio": 0.001, "rss_mb.growth": 10.0}
+
+
+@dataclass
+class BenchConfig:
+    """Yhden benchmark-ajon asetukset (tallentuu raporttiin sellaisenaan)"""
+    name: str = "default"
+    rate: int = 1000                 # ehdokasta / s
+    duration_sec: float = 10.0
+    warmup_sec: float = 1.0          # ei mitata (lämmittää välimuistit ja workerit)
+    burst: int = 25
+    jitter_ms: int = 2
+    min_liq_usd: float = 3000.0
+    max_queue: int = 10000
+    rpc_latency_ms: float = 5.0
+    rpc_jitter_ms: float = 1.0
+    rpc_error_rate: float = 0.0
+    batching: bool = False
+    batch_window_ms: float = 10.0
+    sample_interval_sec: float = 0.1
+    seed: Optional[int] = 1
+
+
+@dataclass
+class _Snapshot:
+    t: float
+    generated: int
+    dropped: int
+    counts: Dict[str, int]
+    cpu: float
+    rss_mb: float
+
+
+@dataclass
+class _Samples:
+    queue_depth: List[List[float]] = field(default_factory=list)   # [t, syvyys]
+    rss_mb: List[float] = field(default_factory=list)
+
+
+def _rss_mb() -> float:
+    if psutil is not None:
+        return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 if sys.platform != "darwin" else peak / (1024 * 1024)
+    except Exception:
+        return 0.0
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _queue_depth(eng: DiscoveryEngine) -> int:
+    return eng.candidate_queue.qsize() + sum(q.qsize() for q in eng._worker_queues)
+
+
+def _snapshot(src: MockFirehoseSource, eng: DiscoveryEngine) -> _Snapshot:
+    return _Snapshot(
+        t=time.perf_counter(),
+        generated=src._candidates_generated,
+        dropped=src._candidates_dropped,
+        counts=dict(eng.pipeline_counts),
+        cpu=time.process_time(),
+        rss_mb=_rss_mb(),
+    )
+
+
+def _build_rpc(cfg: BenchConfig) -> SolanaRPC:
+    transport = StubSolanaRPC(
+        base_latency_ms=max(1.0, cfg.rpc_latency_ms),
+        jitter_ms=cfg.rpc_jitter_ms,
+        error_rate=cfg.rpc_error_rate,
+    )
+    return SolanaRPC(
+        "stub://bench",
+        batching=True,
+        transport=transport,
+        # ilman eräytystä: yksi pyyntö per round-trip
+        window_ms=cfg.batch_window_ms if cfg.batching else 0.0,
+        max_batch=100 if cfg.batching else 1,
+        fallback=StubFastRPC(latency_ms=cfg.rpc_latency_ms, jitter_ms=cfg.rpc_jitter_ms),
+    )
+
+
+async def run_benchmark(cfg: BenchConfig) -> Dict[str, Any]:
+    """Aja yksi benchmark ja palauta raportti (SCHEMA)"""
+    import random
+
+    if cfg.seed is not None:
+        random.seed(cfg.seed)
+
+    rpc = _build_rpc(cfg)
+    src = MockFirehoseSource(rate_per_sec=cfg.rate, burst=cfg.burst, jitter_ms=cfg.jitter_ms)
+    eng = DiscoveryEngine(
+        rpc_endpoint="stub://bench",
+        market_sources=[src],
+        min_liq_usd=cfg.min_liq_usd,
+        rpc_client=rpc,
+        max_queue=cfg.max_queue,
+    )
+    samples = _Samples()
+
+    await eng.start()
+    try:
+        await asyncio.sleep(cfg.warmup_sec)
+        # lämmittelyn latenssit pois: tyhjä sketsi mittausjakson alkuun
+        eng.latency_stats = WindowedQuantiles(window_sec=WINDOW_15M, bucket_sec=30.0, relative_accuracy=0.005)
+        start = _snapshot(src, eng)
+        deadline = start.t + cfg.duration_sec
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            samples.queue_depth.append([round(now - start.t, 3), _queue_depth(eng)])
+            samples.rss_mb.append(_rss_mb())
+            await asyncio.sleep(min(cfg.sample_interval_sec, deadline - now))
+        end = _snapshot(src, eng)
+        final_depth = _queue_depth(eng)
+        latency = eng.latency_stats.quantiles((0.5, 0.9, 0.99, 1.0))
+        latency_samples = eng.latency_stats.count()
+    finally:
+        src.stop()
+        await eng.stop()
+        await eng.wait_closed()
+        batch_stats = rpc.get_batch_stats()
+        await rpc.close()
+
+    elapsed = max(1e-9, end.t - start.t)
+    delta = {k: end.counts[k] - start.counts[k] for k in end.counts}
+    generated = end.generated - start.generated
+    dropped = end.dropped - start.dropped
+    cpu_sec = end.cpu - start.cpu
+    depths = [d for _, d in samples.queue_depth] or [final_depth]
+    offered = generated + dropped
+
+    def _ms(v: Optional[float]) -> Optional[float]:
+        return round(v * 1000.0, 3) if v is not None else None
+
+    return {
+        "schema": SCHEMA,
+        "name": cfg.name,
+        "config": asdict(cfg),
+        "env": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "git_commit": _git_commit(),
+        },
+        "metrics": {
+            "elapsed_sec": round(elapsed, 3),
+            "offered": offered,
+            "enqueued": generated,
+            "dropped": dropped,
+            "drop_ratio": round(dropped / offered, 6) if offered else 0.0,
+            "received": delta["received"],
+            "scored": delta["scored"],
+            "rejected": delta["rejected"],
+            "errors": delta["errors"],
+            "throughput_received_per_sec": round(delta["received"] / elapsed, 2),
+            "throughput_scored_per_sec": round(delta["scored"] / elapsed, 2),
+            "latency_ms": {
+                "samples": latency_samples,
+                "p50": _ms(latency[0.5]),
+                "p90": _ms(latency[0.9]),
+                "p99": _ms(latency[0.99]),
+                "max": _ms(latency[1.0]),
+            },
+            "queue_depth": {
+                "max": max(depths),
+                "mean": round(sum(depths) / len(depths), 2),
+                "final": final_depth,
+                "series": samples.queue_depth,
+            },
+            "rss_mb": {
+                "start": round(start.rss_mb, 2),
+                "end": round(end.rss_mb, 2),
+                "peak": round(max(samples.rss_mb + [end.rss_mb]), 2),
+                "growth": round(end.rss_mb - start.rss_mb, 2),
+            },
+            "cpu_sec": round(cpu_sec, 4),
+            "cpu_ms_per_candidate": round(cpu_sec * 1000.0 / delta["received"], 4) if delta["received"] else None,
+            "rpc": batch_stats or None,
+        },
+        "timestamp": time.time(),
+    }
+
+
+def _get(report: Dict[str, Any], path: str) -> Optional[float]:
+    node: Any = report.get("metrics", {})
+    for part in path.split("."):
+        if not isinstance(node, dict):
+            return None
+        node = node.get(part)
+    return node if isinstance(node, (int, float)) else None
+
+
+def compare_reports(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    thresholds: Optional[Dict[str, tuple]] = None,
+) -> Dict[str, Any]:
+    """
+    Vertaa kahta raporttia; palauttaa {"regressions": [...], "deltas": {...}}
+
+    Regressio = metriikka muuttui huonompaan suuntaan yli kynnyksen (suhteellinen) ja yli kohinalattian.
+    """
+    thresholds = thresholds or DEFAULT_THRESHOLDS
+    deltas: Dict[str, Dict[str, Any]] = {}
+    regressions: List[Dict[str, Any]] = []
+    for path, (direction, tolerance) in thresholds.items():
+        base, cur = _get(baseline, path), _get(current, path)
+        if base is None or cur is None:
+            continue
+        change = (cur - base) / abs(base) if base else (0.0 if cur == base else float("inf"))
+        entry = {"baseline": base, "current": cur, "change": round(change, 4) if change != float("inf") else None}
+        deltas[path] = entry
+        worse = cur < base if direction == "higher" else cur > base
+        if worse and abs(cur - base) > _NOISE_FLOOR.get(path, 0.0) and abs(change) > tolerance:
+            regressions.append({"metric": path, "tolerance": tolerance, **entry})
+    strip = lambda cfg: {k: v for k, v in (cfg or {}).items() if k != "name"}
+    if strip(baseline.get("config")) != strip(current.get("config")):
+        deltas["_config_mismatch"] = {"baseline": baseline.get("config"), "current": current.get("config")}
+    return {"regressions": regressions, "deltas": deltas}
@@ -8,13 +8,18 @@ import logging
 import time
 import random
 import contextlib
-from collections import deque
+import zlib
 from dataclasses import dataclass, field
 from datetime import datetime
 from typing import List, Dict, Optional, Any, Awaitable, Protocol
 from zoneinfo import ZoneInfo
 from config import load_config
 from metrics import metrics, init_metrics
+from rpc_cache import CachedSolanaRPC
+from candidate_index import CandidateIndex
+from trade_window import TradeWindowStore
+from windowed_stats import WindowedCounter, WindowedQuantiles, WINDOW_15M, WINDOW_30M, WINDOW_60M
+from stage_trace import StageTrace, finish as finish_trace, mark as mark_stage
 
 # RPC interfaces
 try:
@@ -97,6 +102,9 @@ class TokenCandidate:
     
     # Extra metadata
     extra: Dict[str, Any] = field(default_factory=dict)
+    
+    # Vaiheleimat kehyksestä kauppaan (stage_trace.py)
+    trace: Optional[StageTrace] = field(default=None, repr=False, compare=False)
 
 class MarketSource(Protocol):
     """Protokolla markkinoiden data lähteille"""
@@ -128,6 +136,8 @@ class DiscoveryEngine:
         min_liq_usd: float = None,
         rpc_client: Optional[SolanaRPC] = None,
         rpc=None,  # uusi alias taaksepäin yhteensopivuudelle
+        trade_windows: Optional[TradeWindowStore] = None,
+        max_queue: Optional[int] = None,
         **_
     ):
         """
@@ -138,6 +148,8 @@ class DiscoveryEngine:
             market_sources: Lista markkinoiden data lähteistä
             min_liq_usd: Minimilikviditeetti USD (jos None, käytetään konfiguraatiota)
             rpc_client: RPC client (jos None, luodaan uusi)
+            trade_windows: Jaettu trade-ikkunavarasto (jos None, otetaan lähteeltä tai luodaan uusi)
+            max_queue: Ehdokasjonon maksimikoko (jos None, käytetään konfiguraatiota)
         """
         self.rpc_endpoint = rpc_endpoint
         self.market_sources = list(market_sources or [])
@@ -145,6 +157,7 @@ class DiscoveryEngine:
         # Lue konfiguraatio
         self.config = load_config()
         self.min_liq_usd = min_liq_usd if min_liq_usd is not None else self.config.discovery.min_liq_usd
+        self.max_queue = int(max_queue if max_queue is not None else self.config.discovery.max_queue)
         
         # Uudet säätimet tuoreille tokeneille
         self.min_liq_fresh_usd = float(getattr(self.config.discovery, "min_liq_fresh_usd", 1200.0))
@@ -158,7 +171,13 @@ class DiscoveryEngine:
         self.trade_min_unique_buyers = int(getattr(self.config.discovery, "trade_min_unique_buyers", 3))
         self.trade_min_trades = int(getattr(self.config.discovery, "trade_min_trades", 5))
         self.candidate_ttl_sec = float(getattr(self.config.discovery, "candidate_ttl_sec", 600))
-        self._trade_stats = {}  # mint -> {"buys":int,"sells":int,"unique_buyers":set(),"first_ts":float,"last_ts":float}
+        if trade_windows is None:
+            # Jaa sama varasto lähteen kanssa (PumpPortal WS kirjaa tradet suoraan)
+            trade_windows = next((getattr(s, "trade_windows") for s in self.market_sources
+                                  if isinstance(getattr(s, "trade_windows", None), TradeWindowStore)), None)
+        if trade_windows is None:
+            trade_windows = TradeWindowStore.from_config(getattr(self.config.discovery, "trade_windows", None))
+        self.trade_windows = trade_windows
         
         # Fresh-pass asetukset
         self.fresh_pass_cfg = getattr(self.config.discovery, "fresh_pass", None)
@@ -179,14 +198,28 @@ class DiscoveryEngine:
         if self.rpc_client is None and rpc_endpoint:
             self.rpc_client = SolanaRPC(rpc_endpoint)
         
+        # Kenttätietoinen TTL/LRU-välimuisti rikastuksen edessä
+        cache_cfg = getattr(self.config.discovery, "enrich_cache", None)
+        if self.rpc_client is not None and cache_cfg is not None and getattr(cache_cfg, "enabled", False):
+            self.rpc_client = CachedSolanaRPC(
+                self.rpc_client,
+                max_entries=cache_cfg.max_entries,
+                mint_active_ttl=cache_cfg.mint_active_ttl_sec,
+                lp_ttl=cache_cfg.lp_ttl_sec,
+                distribution_ttl=cache_cfg.distribution_ttl_sec,
+                flow_ttl=cache_cfg.flow_ttl_sec,
+                negative_ttl=cache_cfg.negative_ttl_sec,
+            )
+        
         # Eventit ja sentinel
         self._stop_event = asyncio.Event()
         self._closed_event = asyncio.Event()
         self._sentinel = object()  # herättää jonon pysäytyksessä
         
         # Sisäinen tila
-        self.candidate_queue: asyncio.Queue[TokenCandidate] = asyncio.Queue(maxsize=self.config.discovery.max_queue)
+        self.candidate_queue: asyncio.Queue[TokenCandidate] = asyncio.Queue(maxsize=self.max_queue)
         self.processed_candidates: Dict[str, TokenCandidate] = {}
+        self._candidate_index = CandidateIndex()  # score-järjestys + vanhenemiskeko processed_candidatesille
         self.running = False
         
         # Deduplikointi
@@ -206,17 +239,28 @@ class DiscoveryEngine:
         self.ws_seen_count: Dict[str, int] = {}
         
         # Dynaaminen score-kynnys
-        self.score_history = deque(maxlen=100)  # Liukuva ikkuna 15 min (100 * 9s)
+        # Todelliset aikaikkunat (ei tapahtumatahdista riippuvat dequet): scoret 15 min, hylkäyssyyt 30 min
+        self.score_stats = WindowedQuantiles(window_sec=WINDOW_60M, bucket_sec=30.0, relative_accuracy=0.005)
         self.last_score_update = 0
-        self.filter_reason_history = deque(maxlen=200)  # 30 min ikkuna hylkäyssyyille
+        self.filter_stats = WindowedCounter(window_sec=WINDOW_60M, bucket_sec=30.0)  # hylkäyssyyt + "passed"
+        # Putken läpivienti: lähteet merkitsevät "enqueued"-vaiheen (stage_trace) -> jonosta pisteytykseen -latenssi
+        self.pipeline_counts = {"received": 0, "rejected": 0, "scored": 0, "errors": 0}
+        self.latency_stats = WindowedQuantiles(window_sec=WINDOW_15M, bucket_sec=30.0, relative_accuracy=0.005)
         
         # Tehtävät
         self.source_tasks: List[asyncio.Task] = []
         self.scorer_task: Optional[asyncio.Task] = None
         
+        # Scorer worker -pooli: jakelija shardaa mintin hashin mukaan -> sama mint aina samalle workerille
+        self.scorer_workers = max(1, int(getattr(self.config.discovery, "scorer_workers", 4) or 1))
+        self.scorer_worker_tasks: List[asyncio.Task] = []
+        self._worker_queues: List[asyncio.Queue] = []
+        self._worker_stats: List[Dict[str, float]] = []
+        self._workers_started_at: float = 0.0
+        
         # Pisteytys parametrit
         self.score_threshold = self.config.discovery.score_threshold
-        self.max_candidates = 100
+        self.max_candidates = int(getattr(self.config.discovery, "max_candidates", 20000))
         self.last_effective_score = None
         
         logger.info(
@@ -233,17 +277,7 @@ class DiscoveryEngine:
 
     def update_trade_stats(self, mint: str, buyer: str|None, side: str|None, ts: float):
         """Päivitä trade-tilastot mintille"""
-        st = self._trade_stats.get(mint)
-        if not st:
-            st = {"buys":0,"sells":0,"unique_buyers":set(),"first_ts":ts,"last_ts":ts}
-            self._trade_stats[mint] = st
-        if side == "buy": 
-            st["buys"] += 1
-        if side == "sell": 
-            st["sells"] += 1
-        if buyer: 
-            st["unique_buyers"].add(buyer)
-        st["last_ts"] = ts
+        self.trade_windows.record(mint, side, buyer, ts)
 
     def _is_ws_fresh_source(self, c) -> bool:
         """Tarkista onko lähde fresh-pass kelpoinen"""
@@ -260,14 +294,11 @@ class DiscoveryEngine:
             return 1e9
 
     def _ws_trade_stats(self, c):
-        """Hae trade-tilastot mintille"""
-        st = self._trade_stats.get(c.mint) if c and getattr(c,"mint",None) else None
-        if not st:
+        """Hae trade-tilastot mintille (pisin liukuva ikkuna)"""
+        if not (c and getattr(c, "mint", None)):
             return 0,0,0
-        buyers = len(st.get("unique_buyers") or set())
-        buys   = int(st.get("buys") or 0)
-        sells  = int(st.get("sells") or 0)
-        return buyers, buys, sells
+        st = self.trade_windows.window(c.mint, self.trade_windows.windows_sec[-1])
+        return st.unique_buyers, st.buys, st.sells
 
     async def start(self) -> None:
         """Käynnistä lähteet ja scorer-loop. Ei blokkaa."""
@@ -299,6 +330,16 @@ class DiscoveryEngine:
             for src in (self.market_sources or [])
         ]
 
+        # Scorer-workerit (per-shard jonot) + jakelija-loop
+        shard_maxsize = max(1, self.max_queue // self.scorer_workers)
+        self._worker_queues = [asyncio.Queue(maxsize=shard_maxsize) for _ in range(self.scorer_workers)]
+        self._worker_stats = [{"processed": 0, "busy_sec": 0.0} for _ in range(self.scorer_workers)]
+        self._workers_started_at = time.perf_counter()
+        self.scorer_worker_tasks = [
+            asyncio.create_task(self._scorer_worker(i, q), name=f"scorer_worker:{i}")
+            for i, q in enumerate(self._worker_queues)
+        ]
+
         # Scorer-loop
         self.scorer_task = asyncio.create_task(self._scorer_loop(), name="scorer_loop")
 
@@ -331,6 +372,12 @@ class DiscoveryEngine:
             with contextlib.suppress(asyncio.CancelledError):
                 await self.scorer_task
 
+        # peruuta scorer-workerit
+        for t in self.scorer_worker_tasks:
+            t.cancel()
+        if self.scorer_worker_tasks:
+            await asyncio.gather(*self.scorer_worker_tasks, return_exceptions=True)
+
         self._closed_event.set()
 
     async def run_analysis_cycle(
@@ -382,6 +429,15 @@ class DiscoveryEngine:
             # viimeinen varmistus: sammuta väkisin
             if self.scorer_task and not self.scorer_task.done():
                 self.scorer_task.cancel()
+            for t in self.scorer_worker_tasks:
+                if not t.done():
+                    t.cancel()
+
+    def _has_pending_work(self) -> bool:
+        """Onko pää- tai worker-jonoissa vielä käsittelemättömiä ehdokkaita"""
+        if not self.candidate_queue.empty():
+            return True
+        return any(not q.empty() for q in self._worker_queues)
 
     async def run_until_idle(self, idle_seconds: float = 0.5, max_wait: float = 3.0) -> None:
         """
@@ -391,7 +447,7 @@ class DiscoveryEngine:
         start = asyncio.get_event_loop().time()
         last_seen = start
         while (asyncio.get_event_loop().time() - start) < max_wait:
-            if self.candidate_queue.empty():
+            if not self._has_pending_work():
                 if (asyncio.get_event_loop().time() - last_seen) >= idle_seconds:
                     return
                 await asyncio.sleep(0.05)
@@ -415,6 +471,7 @@ class DiscoveryEngine:
                             break
                         
                         # Lisää queueen
+                        mark_stage(token, "enqueued")
                         try:
                             await self.candidate_queue.put(token)
                             logger.debug(f"Token lisätty queueen: {token.symbol}")
@@ -458,9 +515,15 @@ class DiscoveryEngine:
             except Exception as e:
                 logger.warning(f"Virhe sammutettaessa lähdettä: {e}")
 
+    def _shard_for(self, mint: Optional[str]) -> int:
+        """Valitse worker-shard mintille (stabiili crc32 -> per-mint järjestys säilyy)"""
+        if self.scorer_workers <= 1 or not mint:
+            return 0
+        return zlib.crc32(str(mint).encode("utf-8")) % self.scorer_workers
+
     async def _scorer_loop(self) -> None:
-        """Pääscorer loop - käsittelee tokenit queue:sta"""
-        logger.info("🎯 Scorer loop käynnistetty")
+        """Jakelija-loop - ottaa tokenit queue:sta ja reitittää ne scorer-workereille"""
+        logger.info("🎯 Scorer loop käynnistetty (%d workeria)", self.scorer_workers)
         
         try:
             while not self._stop_event.is_set():
@@ -490,18 +553,12 @@ class DiscoveryEngine:
                             logger.info("🛑 Sentinel saatu, pysäytetään scorer loop")
                             break
                         
-                        # Käsittele trade-päivitys
-                        if isinstance(token, dict) and token.get("type") == "trade_update":
-                            self.update_trade_stats(
-                                token["mint"], 
-                                token.get("buyer"), 
-                                token.get("side"), 
-                                token.get("ts", time.time())
-                            )
-                            continue
-                        
-                        # Käsittele token
-                        await self._process_candidate(token)
+                        # Reititä mintin mukaan: trade-päivitykset ja ehdokkaat samalle workerille
+                        if isinstance(token, dict):
+                            mint = token.get("mint")
+                        else:
+                            mint = getattr(token, "mint", None)
+                        await self._worker_queues[self._shard_for(mint)].put(token)
                     
                 except asyncio.CancelledError:
                     logger.info("🛑 Scorer loop peruutettu")
@@ -515,34 +572,100 @@ class DiscoveryEngine:
             logger.info("🎯 Scorer loop päättynyt")
             self._closed_event.set()
 
+    async def _scorer_worker(self, idx: int, queue: asyncio.Queue) -> None:
+        """Yksi scorer-worker: käsittelee oman shardinsa jonon järjestyksessä"""
+        stats = self._worker_stats[idx]
+        while True:
+            token = await queue.get()
+            t0 = time.perf_counter()
+            try:
+                # Käsittele trade-päivitys
+                if isinstance(token, dict) and token.get("type") == "trade_update":
+                    if token.get("trade_windows") is self.trade_windows:
+                        continue  # lähde kirjasi jo jaettuun varastoon
+                    self.update_trade_stats(
+                        token["mint"], 
+                        token.get("buyer"), 
+                        token.get("side"), 
+                        token.get("ts", time.time())
+                    )
+                    continue
+                # Lähteen taustalla ratkaisema metadata (symbol/name) jo käsitellylle ehdokkaalle
+                if isinstance(token, dict) and token.get("type") == "metadata_update":
+                    self._apply_metadata_update(token)
+                    continue
+                
+                # Käsittele token
+                await self._process_candidate(token)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Virhe scorer workerissa {idx}: {e}")
+            finally:
+                stats["busy_sec"] += time.perf_counter() - t0
+                stats["processed"] += 1
+
+    def _apply_metadata_update(self, update: Dict[str, Any]) -> None:
+        """Päivitä käsitellyn ehdokkaan metadata; hylätyt/tuntemattomat mintit ohitetaan"""
+        candidate = self.processed_candidates.get(update.get("mint"))
+        if candidate is None:
+            return
+        for key in ("symbol", "name", "decimals"):
+            if update.get(key) is not None:
+                setattr(candidate, key, update[key])
+        extra = candidate.extra if isinstance(candidate.extra, dict) else {}
+        extra["metadata"] = update.get("metadata") or {}
+        extra.pop("metadata_pending", None)
+        candidate.extra = extra
+        candidate.last_updated = datetime.now(HELSINKI_TZ)
+        logger.debug("Metadata päivitetty: %s -> %s", candidate.mint[:8], candidate.symbol)
+
+    def _worker_utilization(self) -> List[Dict[str, Any]]:
+        """Per-worker käyttöaste (busy-aika / elinaika) ja jonon pituus"""
+        elapsed = max(1e-9, time.perf_counter() - self._workers_started_at) if self._workers_started_at else 0.0
+        result = []
+        for i, st in enumerate(self._worker_stats):
+            result.append({
+                "worker": i,
+                "processed": int(st["processed"]),
+                "busy_sec": round(st["busy_sec"], 4),
+                "utilization": round(min(1.0, st["busy_sec"] / elapsed), 4) if elapsed else 0.0,
+                "queue_size": self._worker_queues[i].qsize() if i < len(self._worker_queues) else 0,
+            })
+        return result
+
     async def _process_candidate(self, candidate: TokenCandidate) -> None:
         """Käsittele yksi token ehdokas"""
         start_time = time.time()
+        counts = self.pipeline_counts
+        counts["received"] += 1
+        mark_stage(candidate, "dequeued")
+        outcome = "error"
         try:
             # Deduplikointi
             if candidate.mint in self.processed_candidates:
                 existing = self.processed_candidates[candidate.mint]
                 if existing.last_updated > candidate.first_seen:
+                    counts["rejected"] += 1
+                    outcome = "duplicate"
                     return  # Vanhempi versio, ohita
             
             # Pikafiltteri
             if not self._fast_filter(candidate):
                 logger.debug(f"Token hylätty pikafiltterissä: {candidate.symbol}")
+                counts["rejected"] += 1
+                outcome = "filtered_out"
                 return
+            self.filter_stats.add("passed")
+            mark_stage(candidate, "filtered")
             
             # Rikasoi data RPC:stä
             await self._enrich_quick(candidate)
+            mark_stage(candidate, "enriched")
             
             # Laske pisteytys
             self._score(candidate)
             
-            # Tallenna
-            self.processed_candidates[candidate.mint] = candidate
-            
-            # Pidä vain parhaat
-            if len(self.processed_candidates) > self.max_candidates:
-                self._trim_candidates()
-            
             # Metrics
             from metrics import metrics as global_metrics
             if global_metrics:
@@ -551,8 +674,8 @@ class DiscoveryEngine:
                 global_metrics.queue_depth.set(self.candidate_queue.qsize())
                 global_metrics.score_hist.observe(candidate.overall_score)
             
-            # Päivitä score-historia dynaamista kynnystä varten
-            self.score_history.append(candidate.overall_score)
+            # Päivitä score-ikkuna dynaamista kynnystä varten
+            self.score_stats.add(candidate.overall_score)
             
             # Deduplikointi ja lähde-yhdistely
             mint = getattr(candidate, 'mint', 'unknown')
@@ -590,10 +713,24 @@ class DiscoveryEngine:
             # Spread & slippage tarkistus
             self._check_spread_slippage(candidate)
             
+            # Tallenna ja indeksoi kerran lopullisella pisteellä (bonukset/rangaistukset); karsinta voi pudottaa tämän
+            self.processed_candidates[candidate.mint] = candidate
+            self._index_candidate(candidate)
+            
+            counts["scored"] += 1
+            outcome = "scored"
+            trace = mark_stage(candidate, "scored")
+            queued_to_scored = trace.between("enqueued", "scored") if trace is not None else None
+            if queued_to_scored is not None:
+                self.latency_stats.add(queued_to_scored)
+            
             logger.info(f"✅ Token käsitelty: {candidate.symbol} (Score: {candidate.overall_score:.3f}, Sources: {self.candidate_sources[mint]})")
             
         except Exception as e:
+            counts["errors"] += 1
             logger.error(f"Virhe käsiteltäessä tokenia {candidate.symbol}: {e}")
+        finally:
+            finish_trace(candidate, outcome, score=round(candidate.overall_score, 4))
 
     def _age_minutes(self, candidate: TokenCandidate) -> float:
         """
@@ -643,24 +780,21 @@ class DiscoveryEngine:
         base = self.base_score_threshold
         cap = self.min_score_cap_delta
         
-        # Jos ei tarpeeksi dataa, käytä baseline
-        if len(self.score_history) < 10:
+        # Jos ei tarpeeksi dataa 15 min ikkunassa, käytä baseline
+        if self.score_stats.count(WINDOW_15M) < 10:
             q80 = base
         else:
-            # Laske 80% kvantiili
-            scores = list(self.score_history)
-            scores.sort()
-            n = len(scores)
-            q80_index = int(0.8 * n)
-            q80 = scores[q80_index] if q80_index < n else scores[-1]
+            q80 = self.score_stats.quantile(0.8, window_sec=WINDOW_15M)
         
         # Kynnyskatto: effective = max(base, min(q80, base + cap))
         effective = max(base, min(q80, base + cap))
         
         # Automaattinen pohjakynnys: jos rug_controls_missing > 30% 30 min ikkunassa
-        if len(self.filter_reason_history) >= 50:  # Vähintään 50 hylkäystä
-            rug_missing_count = sum(1 for reason in self.filter_reason_history if reason == "rug_controls_missing")
-            rug_missing_ratio = rug_missing_count / len(self.filter_reason_history)
+        reasons = self.filter_stats.counts(WINDOW_30M)
+        reasons.pop("passed", None)  # läpäisyt eivät ole hylkäyksiä
+        rejected_total = sum(reasons.values())
+        if rejected_total >= 50:  # Vähintään 50 hylkäystä
+            rug_missing_ratio = reasons.get("rug_controls_missing", 0) / rejected_total
             
             if rug_missing_ratio > 0.30:  # > 30%
                 # Nosta pohjakynnystä 0.05
@@ -668,6 +802,11 @@ class DiscoveryEngine:
                 effective = max(effective, base)
                 logger.warning(f"🚨 Automaattinen pohjakynnys nostettu: {base:.2f} (rug_missing: {rug_missing_ratio:.1%})")
         
+        # Spam-suhde: ainoa spam_ratio-gaugen kirjoittaja (määritelmä ja ikkuna spam_ratio():ssa)
+        spam_ratio = self.spam_ratio()
+        if metrics and spam_ratio is not None:
+            metrics.spam_ratio.set(spam_ratio)
+        
         # Päivitä metriikka
         if metrics:
             metrics.min_score_effective.set(effective)
@@ -780,7 +919,7 @@ class DiscoveryEngine:
             if global_metrics:
                 global_metrics.candidates_filtered.inc()
                 global_metrics.candidates_filtered_reason.labels(reason="low_liq").inc()
-            self.filter_reason_history.append("low_liq")
+            self.filter_stats.add("low_liq")
             return False
 
         # RUG-controls: hae riskikonfiguraatio
@@ -800,7 +939,7 @@ class DiscoveryEngine:
             if global_metrics:
                 global_metrics.candidates_filtered.inc()
                 global_metrics.candidates_filtered_reason.labels(reason="rug_controls_missing").inc()
-            self.filter_reason_history.append("rug_controls_missing")
+            self.filter_stats.add("rug_controls_missing")
             return False
         
         # Tuoreille tokenille: älä hylkää authority/LP-syystä heti; jatka pisteytykseen
@@ -816,7 +955,7 @@ class DiscoveryEngine:
             if global_metrics:
                 global_metrics.candidates_filtered.inc()
                 global_metrics.candidates_filtered_reason.labels(reason="concentrated_holders").inc()
-            self.filter_reason_history.append("concentrated_holders")
+            self.filter_stats.add("concentrated_holders")
             return False
         
         logger.debug(f"✅ {candidate.symbol}: Pikafiltterit läpäisty (fresh={fresh})")
@@ -1025,19 +1164,29 @@ class DiscoveryEngine:
         Hae mint/LP/holder/flow -tiedot RPC-apuista
         """
         try:
-            # RPC-kutsut käyttäen RPC interfaces
-            mint_info = await self.rpc_client.get_mint_info(candidate.mint)
-            lp_info = await self.rpc_client.get_lp_info(candidate.mint)
-            distribution = await self.rpc_client.get_holder_distribution(candidate.mint, top_n=10)
-            flow_stats = await self.rpc_client.get_flow_stats(candidate.mint, window_sec=300)
+            # RPC-kutsut käyttäen RPC interfaces - neljä hakua rinnakkain
+            results = await asyncio.gather(
+                self.rpc_client.get_mint_info(candidate.mint),
+                self.rpc_client.get_lp_info(candidate.mint),
+                self.rpc_client.get_holder_distribution(candidate.mint, top_n=10),
+                self.rpc_client.get_flow_stats(candidate.mint, window_sec=300),
+                return_exceptions=True,
+            )
+            for res in results:
+                if isinstance(res, BaseException):
+                    raise res
+            mint_info, lp_info, distribution, flow_stats = results
             
             # Päivitä candidate tiedot
             candidate.mint_authority_renounced = mint_info.renounced_mint
             candidate.freeze_authority_renounced = mint_info.renounced_freeze
             candidate.decimals = mint_info.decimals
             
-            candidate.lp_locked = lp_info.locked_or_burned
-            candidate.liquidity_usd = lp_info.liquidity_usd
+            # None = lähde ei tiedä -> älä ylikirjoita (esim. hint/DEX-arvoa)
+            if lp_info.locked_or_burned is not None:
+                candidate.lp_locked = lp_info.locked_or_burned
+            if lp_info.liquidity_usd is not None:
+                candidate.liquidity_usd = lp_info.liquidity_usd
             
             candidate.top10_holder_share = distribution.top_share
             
@@ -1069,12 +1218,12 @@ class DiscoveryEngine:
                 if hint.get("liq_hint"):
                     candidate.liquidity_usd = float(hint["liq_hint"])
                 # kokeile per-mint trade-tilastoja
-                st = self._trade_stats.get(candidate.mint)
-                if st:
+                if candidate.mint in self.trade_windows:
                     # voit johdatella pseudo-liq arviota trade-määrän perusteella (esim. buys*X) tai vain tallentaa pisteytykseen
-                    candidate.extra["trade_buys_30s"] = st["buys"]
-                    candidate.extra["trade_sells_30s"] = st["sells"]
-                    candidate.extra["trade_unique_buyers_30s"] = len(st["unique_buyers"])
+                    st = self.trade_windows.window(candidate.mint, self.trade_windows.windows_sec[0])
+                    candidate.extra["trade_buys_30s"] = st.buys
+                    candidate.extra["trade_sells_30s"] = st.sells
+                    candidate.extra["trade_unique_buyers_30s"] = st.unique_buyers
             
             # Fallback values
             candidate.mint_authority_renounced = True
@@ -1197,22 +1346,52 @@ class DiscoveryEngine:
                     f"rug={candidate.rug_risk_score:.2f}, activity_bonus={activity_bonus:.2f}, "
                     f"momentum_bonus={momentum_bonus:.2f}, overall={candidate.overall_score:.3f}")
 
-    def _trim_candidates(self) -> None:
-        """Pidä vain parhaat kandidatit"""
-        if len(self.processed_candidates) <= self.max_candidates:
-            return
+    def _candidate_base_ts(self, candidate: TokenCandidate) -> Optional[float]:
+        """Aikaleima josta TTL lasketaan (on-chain ts > last_updated > first_seen > ensihavainto)"""
+        extra = getattr(candidate, "extra", None) or {}
+        ts = extra.get("first_pool_ts") or extra.get("first_trade_ts")
+
+        if ts is None:
+            last_updated = getattr(candidate, "last_updated", None)
+            if isinstance(last_updated, datetime):
+                ts = last_updated.timestamp()
 
-        # Järjestä score mukaan ja pidä parhaat
-        sorted_candidates = sorted(
-            self.processed_candidates.items(),
-            key=lambda x: x[1].overall_score,
-            reverse=True
+        if ts is None:
+            first_seen = getattr(candidate, "first_seen", None)
+            if isinstance(first_seen, datetime):
+                ts = first_seen.timestamp()
+
+        if ts is None:
+            ts = self.candidate_first_seen.get(getattr(candidate, "mint", None))
+
+        try:
+            return float(ts) if ts is not None else None
+        except (TypeError, ValueError):
+            return None
+
+    def _index_candidate(self, candidate: TokenCandidate) -> None:
+        """Päivitä kandidaatti indeksiin (O(log n)) ja karsi heikoimmat yli max_candidates"""
+        self._candidate_index.upsert(
+            candidate.mint,
+            float(candidate.overall_score or 0.0),
+            self._candidate_base_ts(candidate),
         )
+        if len(self._candidate_index) > self.max_candidates:
+            self._trim_candidates()
 
-        # Pidä vain parhaat
-        self.processed_candidates = dict(sorted_candidates[:self.max_candidates])
+    def _trim_candidates(self) -> None:
+        """Pidä vain parhaat kandidatit (poistaa heikoimmat indeksin lopusta)"""
+        removed = 0
+        while len(self._candidate_index) > self.max_candidates:
+            mint = self._candidate_index.lowest()
+            if mint is None:
+                break
+            self._candidate_index.remove(mint)
+            self.processed_candidates.pop(mint, None)
+            removed += 1
 
-        logger.debug(f"Trimmed candidates: {len(self.processed_candidates)} remaining")
+        if removed:
+            logger.debug(f"Trimmed candidates: {len(self.processed_candidates)} remaining")
 
     def _purge_stale_candidates(self) -> None:
         """Poista liian vanhat kandidatit, jotta sama setti ei jää ikuisesti listalle."""
@@ -1220,49 +1399,21 @@ class DiscoveryEngine:
         if not ttl:
             return
 
-        now = time.time()
-        removed = 0
-        for mint, candidate in list(self.processed_candidates.items()):
-            ts = None
-            extra = getattr(candidate, "extra", None) or {}
-            ts = extra.get("first_pool_ts") or extra.get("first_trade_ts")
-
-            if ts is None:
-                last_updated = getattr(candidate, "last_updated", None)
-                if isinstance(last_updated, datetime):
-                    ts = last_updated.timestamp()
-
-            if ts is None:
-                first_seen = getattr(candidate, "first_seen", None)
-                if isinstance(first_seen, datetime):
-                    ts = first_seen.timestamp()
-
-            if ts is None:
-                ts = self.candidate_first_seen.get(mint)
-
-            try:
-                ts_val = float(ts) if ts is not None else None
-            except (TypeError, ValueError):
-                ts_val = None
-
-            if ts_val is None:
-                continue
-
-            if now - ts_val >= ttl:
-                removed += 1
-                self.processed_candidates.pop(mint, None)
-                self.candidate_sources.pop(mint, None)
-                self.candidate_first_seen.pop(mint, None)
-                self._trade_stats.pop(mint, None)
-                self.dev_wallet_activity.pop(mint, None)
-                self.lp_lock_timing.pop(mint, None)
-                self.buyer_acceleration.pop(mint, None)
-                self.ws_seen_recently.pop(mint, None)
-                self.ws_seen_initial.pop(mint, None)
-                self.ws_seen_count.pop(mint, None)
-
-        if removed:
-            logger.info("🧹 Poistettiin %d vanhaa kandidaattia (ttl=%.0fs)", removed, ttl)
+        expired = self._candidate_index.expire(time.time() - float(ttl))
+        for mint in expired:
+            self.processed_candidates.pop(mint, None)
+            self.candidate_sources.pop(mint, None)
+            self.candidate_first_seen.pop(mint, None)
+            self.trade_windows.pop(mint)
+            self.dev_wallet_activity.pop(mint, None)
+            self.lp_lock_timing.pop(mint, None)
+            self.buyer_acceleration.pop(mint, None)
+            self.ws_seen_recently.pop(mint, None)
+            self.ws_seen_initial.pop(mint, None)
+            self.ws_seen_count.pop(mint, None)
+
+        if expired:
+            logger.info("🧹 Poistettiin %d vanhaa kandidaattia (ttl=%.0fs)", len(expired), ttl)
 
     def best_candidates(self, k: int = 10, min_score: float = None) -> List[TokenCandidate]:
         """
@@ -1282,27 +1433,20 @@ class DiscoveryEngine:
         if min_score is None:
             min_score = self._calculate_dynamic_score_threshold()
         
-        # Filtteröi minimipisteen mukaan
-        filtered = [
-            candidate for candidate in self.processed_candidates.values()
-            if candidate.overall_score >= min_score
+        # Top-k suoraan pistejärjestetystä indeksistä (ei täyttä skannausta)
+        result = [
+            self.processed_candidates[mint]
+            for mint in self._candidate_index.top(k, min_score)
+            if mint in self.processed_candidates
         ]
+        for candidate in result:
+            mark_stage(candidate, "published")  # vain ensimmäinen julkaisu leimataan
         
         # Laske ultra-fresh määrä
-        ultra_fresh_count = sum(1 for c in filtered if self._is_ultra_fresh(c))
+        ultra_fresh_count = sum(1 for c in result if self._is_ultra_fresh(c))
         if ultra_fresh_count > 0:
             logger.info(f"✅ Löydettiin {ultra_fresh_count} ultra-fresh kandidattia")
         
-        # Järjestä score mukaan
-        sorted_candidates = sorted(
-            filtered,
-            key=lambda x: x.overall_score,
-            reverse=True
-        )
-        
-        # Palauta top-k
-        result = sorted_candidates[:k]
-        
         logger.info(f"Palautettu {len(result)} kandidattia (min_score={min_score})")
         return result
 
@@ -1314,7 +1458,34 @@ class DiscoveryEngine:
             "processed_candidates": len(self.processed_candidates),
             "active_sources": len([t for t in self.source_tasks if not t.done()]),
             "score_threshold": self.score_threshold,
-            "min_liquidity_usd": self.min_liq_usd
+            "min_liquidity_usd": self.min_liq_usd,
+            "scorer_workers": self._worker_utilization(),
+            "pipeline": dict(self.pipeline_counts),
+            "enrich_cache": self.rpc_client.get_cache_stats() if isinstance(self.rpc_client, CachedSolanaRPC) else None,
+            "window_stats": self.window_stats(),
+            "trade_windows": self.trade_windows.get_stats(),
+        }
+
+    def spam_ratio(self, window_sec: float = WINDOW_15M) -> Optional[float]:
+        """Hylättyjen osuus pikafiltterin läpi kulkeneista aikaikkunassa (None jos ei dataa)"""
+        counts = self.filter_stats.counts(window_sec)
+        total = sum(counts.values())
+        if total <= 0:
+            return None
+        return (total - counts.get("passed", 0)) / total
+
+    def window_stats(self, window_sec: float = WINDOW_15M) -> Dict[str, Any]:
+        """Score-kvantiilit ja hylkäyssyiden osuudet aikaikkunassa"""
+        qs = self.score_stats.quantiles((0.5, 0.8, 0.95), window_sec=window_sec)
+        reasons = self.filter_stats.counts(window_sec)
+        total = sum(reasons.values())
+        return {
+            "window_sec": window_sec,
+            "scores": self.score_stats.count(window_sec),
+            "score_q50": qs[0.5],
+            "score_q80": qs[0.8],
+            "score_q95": qs[0.95],
+            "filter_ratios": {k: v / total for k, v in reasons.items()} if total else {},
         }
 
 # Test function
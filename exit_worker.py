@@ -1,13 +1,79 @@
 import asyncio, time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+
+WSOL_MINT = "So11111111111111111111111111111111111111112"
+
+exit_eval_latency_metric = Histogram(
+    "exit_eval_latency_seconds",
+    "Exit evaluation latency from trigger (poll start / trade frame) to decision",
+    ["trigger"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+exit_decisions_metric = Counter(
+    "exit_decisions_total",
+    "Exit decisions per reason (hold = no exit)",
+    ["reason"],
+)
+
+PriceBatchFn = Callable[[Iterable[str]], Awaitable[Dict[str, Dict[str, float]]]]
+
+
+@dataclass
+class MarketState:
+    """Mintin viimeisin markkinatila (hinta per kokonainen token, USD)"""
+    price_usd: Optional[float] = None
+    liq_usd: Optional[float] = None
+    vol_h24: Optional[float] = None
+    updated_at: float = 0.0  # time.monotonic()
+    source: str = ""
+
 
 class ExitWorker:
-    def __init__(self, bot, trader, positions, dex_fetcher, interval=30):
+    """
+    Avointen positioiden exit-päätökset
+
+    - pollaus (interval) hakee kaikkien avointen minttien hinnat/likviditeetin yhdellä batch-haulla
+      (dex_fetchers.fetch_dexscreener_prices) ja arvioi positiot rinnakkain (concurrency-raja)
+    - on_trade(): PumpPortal-kauppa pidetylle mintille -> arvio heti (bonding curve -hinta tapahtumasta),
+      pollaus jää fallbackiksi
+    - saman mintin arviot eivät mene päällekkäin; kesken tullut kauppa arvioidaan uudelleen heti perään
+    - päätöksen latenssi (laukaisusta päätökseen) kirjataan histogrammiin ja suljetun position tietoihin
+    - epäonnistunut myynti -> mintille eksponentiaalinen backoff (sell_backoff_sec .. sell_backoff_max_sec);
+      per-mint DEX-fallback (myös tyhjä/virhe) välimuistissa fallback_ttl_sec
+    """
+
+    def __init__(self, bot, trader, positions, dex_fetcher, interval=30, *, concurrency=8,
+                 price_batch: Optional[PriceBatchFn] = None, trade_feed=None, event_refresh_sec=2.0,
+                 sell_backoff_sec=15.0, sell_backoff_max_sec=300.0, fallback_ttl_sec=60.0):
         self.bot = bot
         self.trader = trader
         self.positions = positions
         self.dex_fetcher = dex_fetcher
         self.interval = interval
         self.running = False
+        if price_batch is None:
+            from dex_fetchers import fetch_dexscreener_prices
+            price_batch = fetch_dexscreener_prices
+        self.price_batch = price_batch
+        self.trade_feed = trade_feed  # sources.pumpportal_trade_feed.PumpPortalTradeFeed (valinnainen)
+        self.event_refresh_sec = float(event_refresh_sec)
+        self.sell_backoff_sec = float(sell_backoff_sec)
+        self.sell_backoff_max_sec = float(sell_backoff_max_sec)
+        self.fallback_ttl_sec = float(fallback_ttl_sec)
+        self._sell_failures: Dict[str, Tuple[int, float]] = {}  # mint -> (peräkkäiset epäonnistumiset, retry monotonic)
+        self._fallback_at: Dict[str, float] = {}  # mint -> viimeisin per-mint DEX-haku (monotonic)
+        self._sem = asyncio.Semaphore(max(1, int(concurrency)))
+        self._market: Dict[str, MarketState] = {}
+        self._sol_usd: Optional[float] = None
+        self._open: set = set()
+        self._busy: set = set()
+        self._dirty: Dict[str, float] = {}  # mint -> laukaisuhetki (perf_counter) kesken olleelle kaupalle
+        self._tasks: set = set()
+        self.stats = {"polls": 0, "evaluations": 0, "trade_triggers": 0, "coalesced": 0, "exits": 0,
+                      "fallback_quotes": 0, "fallback_fetches": 0, "sell_failures": 0, "sell_backoff_skips": 0}
 
     async def price_usd_now(self, mint: str, qty_atoms: int) -> float:
         # Jupiter quote token -> USDC (ExactIn)
@@ -17,55 +83,242 @@ class ExitWorker:
             return usdc_atoms / 1e6  # USDC 6 decimals
         return 0.0
 
+    async def held_atoms(self, mint: str, recorded: int) -> int:
+        # Myyntikoko on-chain saldosta (jaettu wallet-snapshot, ei omaa RPC-kutsua per positio)
+        wallet = getattr(self.trader, "wallet", None)
+        if wallet is None:
+            return recorded
+        try:
+            held = await wallet.token_atoms(mint, largest=True)
+        except Exception:
+            return recorded
+        return min(recorded, held) if recorded > 0 else held
+
+    async def refresh_market(self, mints: Iterable[str]) -> None:
+        """Hinnat / likviditeetti / volyymi kaikille minteille (+ SOL/USD curve-hintoja varten) batch-hauilla"""
+        mints = list(mints)
+        try:
+            data = await self.price_batch([*mints, WSOL_MINT])
+        except Exception as e:
+            self.bot._log_exception("exit_worker_price_batch_failed", e)
+            return
+        now = time.monotonic()
+        sol = data.get(WSOL_MINT)
+        if sol and sol.get("price_usd"):
+            self._sol_usd = float(sol["price_usd"])
+        for mint in mints:
+            row = data.get(mint)
+            if row:
+                self._market[mint] = MarketState(row.get("price_usd"), row.get("liq_usd"), row.get("vol_h24"), now, "batch")
+
     async def once(self):
-        pos = self.positions.get_all()
-        for mint, p in pos.items():
-            if p.get("status") != "open":
-                continue
-
-            qty_atoms = int(p.get("qty_atoms", 0))
-            entry_px = float(p.get("entry_price_usd", 0.0))
-            entry_vol = float(p.get("entry_volume", 0.0))
-            entry_liq = float(p.get("entry_liquidity", 0.0))
-            held = time.time() - float(p.get("entry_time", 0.0))
-
-            # Hinta nyt (USD per atom → per token)
-            # koska quote antaa "usd for whole qty": tee yksikköhinta
-            usdc_for_all = await self.price_usd_now(mint, qty_atoms)
-            px_now = (usdc_for_all / max(qty_atoms,1)) if qty_atoms>0 else 0.0
-            change = (px_now/entry_px - 1.0) if entry_px>0 else 0.0
-
-            # Tuore DEX-data
-            dex = await self.dex_fetcher.fetch(mint, timeout=8.0)
-            liq = float(((dex.get("dexscreener") or {}).get("bestLiqUsd") or dex.get("liq_usd") or entry_liq or 0.0))
-            vol = float(((dex.get("dexscreener") or {}).get("bestVol24h") or dex.get("vol_h24") or entry_vol or 0.0))
-
-            reason = None
-            if change >= 1.0:              reason = "TP_100pct"
-            elif change <= -0.30:          reason = "SL_30pct"
-            elif held >= 48*3600:          reason = "TIME_48h"
-            elif vol < entry_vol * 0.2:    reason = "VOL_20pct"
-            elif liq < entry_liq * 0.5:    reason = "LIQ_50pct"
-            elif vol < 1000.0:             reason = "LOW_VOL_<1k"
-
-            if not reason:
-                continue
-
-            # MYY
-            sell_res = await self.trader.sell_token_for_base(mint, qty_atoms)
-            if sell_res.get("ok"):
-                proceeds = await self.price_usd_now(mint, 1) * qty_atoms  # likimääräinen USD (vaihtoehtoisesti lue USDC saldoero)
-                pnl = proceeds - (entry_px * qty_atoms)
-                self.positions.close_position(mint, {"exit_reason": reason, "exit_sig": sell_res.get("sig"), "pnl_usd": pnl})
-                self.bot._send_telegram(f"🔴 *SELL* `{mint}` reason={reason} pnl=${pnl:,.2f} sig=`{sell_res.get('sig')}`", parse_mode="Markdown")
-            else:
-                self.bot._send_telegram(f"⚠️ *SELL FAIL* `{mint}` reason={sell_res.get('reason')}", parse_mode="Markdown")
+        started = time.perf_counter()
+        self.stats["polls"] += 1
+        open_pos = {m: p for m, p in self.positions.get_all().items() if p.get("status") == "open"}
+        self._sync_open(open_pos)
+        if not open_pos:
+            return
+        await self.refresh_market(open_pos)
+        await asyncio.gather(*(self._evaluate_guarded(mint, "poll", started) for mint in open_pos))
+
+    async def on_trade(self, ev: Dict[str, Any], received_at: Optional[float] = None) -> None:
+        """PumpPortal-kauppatapahtuma: pidetyn mintin arvio käynnistetään heti (ei odoteta pollausta)"""
+        received_at = time.perf_counter() if received_at is None else received_at
+        mint = ev.get("mint")
+        if not mint or mint not in self._open:
+            return
+        self.stats["trade_triggers"] += 1
+        self._apply_trade_price(mint, ev)
+        if mint in self._busy:
+            self._dirty.setdefault(mint, received_at)
+            self.stats["coalesced"] += 1
+            return
+        self._spawn(self._evaluate_guarded(mint, "trade", received_at))
+
+    def exit_reason(self, change: float, held: float, vol: float, liq: float, entry_vol: float, entry_liq: float) -> Optional[str]:
+        if change >= 1.0:              return "TP_100pct"
+        elif change <= -0.30:          return "SL_30pct"
+        elif held >= 48*3600:          return "TIME_48h"
+        elif vol < entry_vol * 0.2:    return "VOL_20pct"
+        elif liq < entry_liq * 0.5:    return "LIQ_50pct"
+        elif vol < 1000.0:             return "LOW_VOL_<1k"
+        return None
+
+    async def evaluate(self, mint: str, trigger: str, t0: float) -> Optional[str]:
+        """Arvioi yksi positio; palauttaa exit-syyn (myyty tai yritetty) tai None"""
+        p = self.positions.get(mint)
+        if p.get("status") != "open":
+            return None
+        self.stats["evaluations"] += 1
+        qty_atoms = await self.held_atoms(mint, int(p.get("qty_atoms", 0)))
+        if qty_atoms <= 0:
+            return None  # ei on-chain saldoa: ReconcileWorker sulkee position
+        entry_px = float(p.get("entry_price_usd", 0.0))
+        entry_vol = float(p.get("entry_volume", 0.0))
+        entry_liq = float(p.get("entry_liquidity", 0.0))
+        held = time.time() - float(p.get("entry_time", 0.0))
+
+        state = self._market.get(mint)
+        if trigger == "trade" and state is not None and state.source != "trade" \
+                and time.monotonic() - state.updated_at > self.event_refresh_sec:
+            await self.refresh_market([mint])  # tapahtumassa ei ollut hintaa -> tuore batch-hinta tälle mintille
+            state = self._market.get(mint)
+        if state is None or state.liq_usd is None:
+            state = await self._fallback_market(mint, state)  # välimuistissa fallback_ttl_sec
+
+        # Hinta nyt (USD per atom, kuten entry_price_usd)
+        px_now = await self._price_per_atom(mint, qty_atoms, state)
+        change = (px_now/entry_px - 1.0) if entry_px>0 else 0.0
+        liq = float(state.liq_usd or entry_liq or 0.0)
+        vol = float(state.vol_h24 or entry_vol or 0.0)
+
+        reason = self.exit_reason(change, held, vol, liq, entry_vol, entry_liq)
+        latency = time.perf_counter() - t0
+        exit_eval_latency_metric.labels(trigger=trigger).observe(latency)
+        exit_decisions_metric.labels(reason=reason or "hold").inc()
+        if not reason:
+            return None
+
+        # MYY (ei uutta yritystä backoffin aikana -> ei myynti-/Telegram-tulvaa jokaisesta kaupasta)
+        failure = self._sell_failures.get(mint)
+        if failure is not None and time.monotonic() < failure[1]:
+            self.stats["sell_backoff_skips"] += 1
+            return reason
+        self.stats["exits"] += 1
+        sell_res = await self.trader.sell_token_for_base(mint, qty_atoms)
+        if sell_res.get("ok"):
+            self._sell_failures.pop(mint, None)
+            proceeds = px_now * qty_atoms  # likimääräinen USD päätöshetken hinnalla
+            pnl = proceeds - (entry_px * qty_atoms)
+            self.positions.close_position(mint, {
+                "exit_reason": reason, "exit_sig": sell_res.get("sig"), "pnl_usd": pnl,
+                "exit_trigger": trigger, "exit_eval_ms": round(latency * 1000.0, 2),
+            })
+            self._open.discard(mint)
+            self.bot._send_telegram(f"🔴 *SELL* `{mint}` reason={reason} pnl=${pnl:,.2f} sig=`{sell_res.get('sig')}`", parse_mode="Markdown")
+        else:
+            count = (failure[0] if failure else 0) + 1
+            delay = min(self.sell_backoff_max_sec, self.sell_backoff_sec * 2 ** (count - 1))
+            self._sell_failures[mint] = (count, time.monotonic() + delay)
+            self.stats["sell_failures"] += 1
+            self.bot._send_telegram(f"⚠️ *SELL FAIL* `{mint}` reason={sell_res.get('reason')} retry_in={delay:.0f}s", parse_mode="Markdown")
+        return reason
 
     async def run(self):
         self.running = True
+        if self.trade_feed is not None:
+            self._spawn(self.trade_feed.run())
         while self.running:
             try:
                 await self.once()
             except Exception as e:
                 self.bot._log_exception("exit_worker_once_failed", e)
             await asyncio.sleep(self.interval)
+
+    async def close(self):
+        self.running = False
+        if self.trade_feed is not None:
+            self.trade_feed.stop()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        out = {**self.stats, "open": len(self._open), "in_flight": len(self._busy)}
+        if self.trade_feed is not None:
+            out["trade_feed"] = self.trade_feed.get_stats()
+        return out
+
+    # --- sisäiset ---
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _sync_open(self, open_pos: Dict[str, Any]) -> None:
+        self._open = set(open_pos)
+        for cache in (self._market, self._sell_failures, self._fallback_at):
+            for mint in [m for m in cache if m not in self._open]:
+                del cache[mint]
+        if self.trade_feed is not None:
+            self.trade_feed.sync(self._open)
+
+    async def _evaluate_guarded(self, mint: str, trigger: str, t0: float) -> None:
+        if mint in self._busy:
+            return  # toinen arvio käynnissä (pollaus ohittaa, kauppa merkitty dirtyksi)
+        self._busy.add(mint)
+        try:
+            while True:
+                async with self._sem:
+                    try:
+                        await self.evaluate(mint, trigger, t0)
+                    except Exception as e:
+                        self.bot._log_exception("exit_worker_evaluate_failed", e)
+                t0 = self._dirty.pop(mint, None)
+                if t0 is None or mint not in self._open:
+                    return
+                trigger = "trade"
+        finally:
+            self._busy.discard(mint)
+            self._dirty.pop(mint, None)
+
+    def _apply_trade_price(self, mint: str, ev: Dict[str, Any]) -> None:
+        """Bonding curve -hinta tapahtumasta (vSol / vTokens * SOL/USD); likviditeetti/volyymi pollauksesta"""
+        try:
+            v_sol = float(ev.get("vSolInBondingCurve") or 0.0)
+            v_tokens = float(ev.get("vTokensInBondingCurve") or 0.0)
+        except (TypeError, ValueError):
+            return
+        if v_sol <= 0 or v_tokens <= 0 or not self._sol_usd:
+            return
+        prev = self._market.get(mint) or MarketState()
+        self._market[mint] = MarketState(v_sol / v_tokens * self._sol_usd, prev.liq_usd, prev.vol_h24, time.monotonic(), "trade")
+
+    async def _fallback_market(self, mint: str, state: Optional[MarketState]) -> MarketState:
+        # Batch ei kattanut mintiä -> per-mint DEX-haku kuten ennen, korkeintaan kerran fallback_ttl_sec:ssä
+        # (myös tyhjä tulos / virhe), ettei jokainen kauppatapahtuma käynnistä täyttä hedged-hakua
+        now = time.monotonic()
+        last = self._fallback_at.get(mint)
+        if last is not None and now - last < self.fallback_ttl_sec:
+            return state or MarketState(updated_at=now, source="fallback")
+        self._fallback_at[mint] = now
+        self.stats["fallback_fetches"] += 1
+        try:
+            dex = await self.dex_fetcher.fetch(mint, timeout=8.0)
+        except Exception as e:
+            self.bot._log_exception("exit_worker_fallback_failed", e)
+            dex = {}
+        best = (dex.get("dexscreener") or {})
+        liq = best.get("bestLiqUsd") or dex.get("liq_usd")
+        vol = best.get("bestVol24h") or dex.get("vol_h24")
+        merged = MarketState(
+            state.price_usd if state else None,
+            float(liq) if liq is not None else None,
+            float(vol) if vol is not None else None,
+            time.monotonic(),
+            state.source if state else "fallback",
+        )
+        self._market[mint] = merged
+        return merged
+
+    async def _price_per_atom(self, mint: str, qty_atoms: int, state: MarketState) -> float:
+        decimals = await self._decimals(mint)
+        if state.price_usd and decimals is not None:
+            return state.price_usd / (10 ** decimals)
+        # ei batch-hintaa / desimaaleja -> Jupiter quote koko määrälle
+        self.stats["fallback_quotes"] += 1
+        usdc_for_all = await self.price_usd_now(mint, qty_atoms)
+        return (usdc_for_all / max(qty_atoms,1)) if qty_atoms>0 else 0.0
+
+    async def _decimals(self, mint: str) -> Optional[int]:
+        p = self.positions.get(mint)
+        if p.get("decimals") is not None:
+            return int(p["decimals"])
+        wallet = getattr(self.trader, "wallet", None)
+        if wallet is None:
+            return None
+        try:
+            return (await wallet.snapshot()).decimals(mint)
+        except Exception:
+            return None
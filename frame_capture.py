@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Frame Capture - raakakehysten ja REST-vastausten tallennus segmenttitiedostoihin sekä deterministinen toisto
+
+Tallennus (CaptureRecorder) kirjoittaa jokaisen vastaanotetun WS-kehyksen, lähetetyn tilausviestin ja
+http_poolin JSON-vastauksen monotonisella aikaleimalla JsonlSinkin kautta (taustakirjoitus, rotaatio + gzip).
+Toisto (CaptureReplayer) syöttää kehykset oikeille lähdeluokille HeliusWsHubin kautta 1x/Nx/max-nopeudella
+ja palvelee REST-kutsut tallenteesta (ReplayHttpClient).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import aiohttp
+
+from http_pool import HttpClient, set_http_client, set_response_recorder
+from jsonl_sink import JsonlSink
+
+log = logging.getLogger(__name__)
+
+CAPTURE_FILE = "capture.jsonl"
+
+# Tietuetyypit ("k")
+KIND_META = "meta"
+KIND_WS_IN = "ws_in"
+KIND_WS_OUT = "ws_out"
+KIND_HTTP = "http"
+
+_SEGMENT_RE = re.compile(r"^" + re.escape(CAPTURE_FILE) + r"(?:\.(\d{8}-\d{6})(?:\.(\d+))?)?(?:\.gz)?$")
+
+# Tallenteet jaetaan -> salaisuudet (Helius ?api-key=, RPC-tunnukset) eivät saa päätyä tiedostoon
+_SECRET_PARAM_RE = re.compile(r"(?:^|[-_])(?:api[-_]?key|key|(?:access[-_])?token|secret|auth|password|pass)$", re.IGNORECASE)
+REDACTED = "REDACTED"
+
+
+def redact_url(url: Any) -> Any:
+    """Poista URL:sta käyttäjätunnukset ja peitä salaisuuksilta näyttävät query-parametrit (idempotentti)"""
+    if not isinstance(url, str) or ("?" not in url and "@" not in url):
+        return url
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    netloc = parts.netloc.rsplit("@", 1)[-1]
+    query = parts.query
+    if query:
+        pairs = parse_qsl(query, keep_blank_values=True)
+        query = urlencode([(k, REDACTED if _SECRET_PARAM_RE.search(k) else v) for k, v in pairs], safe="/:,")
+    return urlunsplit((parts.scheme, netloc, parts.path, query, parts.fragment))
+
+
+def redact_params(params: Any) -> Any:
+    if not isinstance(params, dict):
+        return params
+    return {k: REDACTED if isinstance(k, str) and _SECRET_PARAM_RE.search(k) else v for k, v in params.items()}
+
+
+def _canonical(obj: Any) -> str:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def http_key(method: str, url: str, params: Any = None, body: Any = None) -> str:
+    """Pyynnön avain toistoon: JSON-RPC:n "id" ei kuulu avaimeen (laskuri vaihtelee ajosta toiseen)"""
+    if isinstance(body, dict) and "id" in body:
+        body = {k: v for k, v in body.items() if k != "id"}
+    # sama peittäminen kuin tallennuksessa -> toiston haku osuu tallennettuun avaimeen
+    return f"{method.upper()} {redact_url(url)} {_canonical(redact_params(params))} {_canonical(body)}"
+
+
+class CaptureRecorder:
+    """
+    Kevyt tallennin: record_*() ei blokkaa eikä dekoodaa mitään, kirjoitus tapahtuu JsonlSinkin taustatehtävässä
+
+    - tietue: {"t": sekunnit session alusta (monotoninen), "k": tyyppi, "c": kanava (URL), ...}
+    - URL:t ja query-parametrit peitetään (redact_url / redact_params): api-key ja tunnukset eivät päädy tallenteeseen
+    - segmentit: capture.jsonl kierrätetään segment_mb välein nimelle capture.jsonl.<aikaleima>[.gz]
+    - täysi jono pudottaa tietueita (JsonlSinkin max_backlog) -> tallennus ei koskaan hidasta bottia
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        *,
+        segment_mb: float = 64.0,
+        compress: bool = True,
+        max_backlog: int = 200_000,
+        flush_interval_sec: float = 0.5,
+    ):
+        self.directory = directory
+        self.sink = JsonlSink(
+            os.path.join(directory, CAPTURE_FILE),
+            flush_interval_sec=flush_interval_sec,
+            max_batch=5000,
+            max_backlog=max_backlog,
+            rotate_bytes=int(segment_mb * 1024 * 1024),
+            compress=compress,
+            name="capture",
+        )
+        self._t0 = time.monotonic()
+        self.sink.write({"t": 0.0, "k": KIND_META, "wall": time.time(), "version": 1})
+
+    def _t(self) -> float:
+        return round(time.monotonic() - self._t0, 6)
+
+    def record_ws_in(self, channel: str, raw: Any) -> None:
+        if isinstance(raw, (bytes, bytearray)):
+            raw = bytes(raw).decode("utf-8", errors="replace")
+        self.sink.write({"t": self._t(), "k": KIND_WS_IN, "c": redact_url(channel), "d": raw})
+
+    def record_ws_out(self, channel: str, message: dict) -> None:
+        self.sink.write({"t": self._t(), "k": KIND_WS_OUT, "c": redact_url(channel), "d": message})
+
+    def record_http(self, method: str, url: str, params: Any, body: Any, response: Any) -> None:
+        self.sink.write({"t": self._t(), "k": KIND_HTTP, "c": redact_url(url), "m": method.upper(),
+                         "p": redact_params(params), "b": body, "d": response})
+
+    async def close(self) -> None:
+        await self.sink.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return self.sink.get_stats()
+
+
+# Prosessin aktiivinen tallennin (None = tallennus pois)
+_active: Optional[CaptureRecorder] = None
+
+
+def active_recorder() -> Optional[CaptureRecorder]:
+    return _active
+
+
+def start_capture(directory: str, **kw: Any) -> CaptureRecorder:
+    """Käynnistä tallennus: HeliusWsHub ja http_pool kirjaavat aktiiviseen tallentimeen"""
+    global _active
+    if _active is None:
+        _active = CaptureRecorder(directory, **kw)
+        set_response_recorder(_active)
+        log.info("🎥 Frame capture käynnissä: %s", directory)
+    return _active
+
+
+async def stop_capture() -> None:
+    global _active
+    recorder, _active = _active, None
+    set_response_recorder(None)
+    if recorder is not None:
+        await recorder.close()
+
+
+# --- toisto ---
+
+def capture_segments(directory: str) -> List[str]:
+    """Segmenttitiedostot kirjoitusjärjestyksessä (kierrätetyt aikaleiman mukaan, aktiivinen viimeisenä)"""
+    found: List[Tuple[Tuple[int, str, int], str]] = []
+    for name in os.listdir(directory):
+        m = _SEGMENT_RE.match(name)
+        if m is None:
+            continue
+        stamp, n = m.group(1), m.group(2)
+        key = (1, "", 0) if stamp is None else (0, stamp, int(n or 0))
+        found.append((key, os.path.join(directory, name)))
+    return [path for _, path in sorted(found)]
+
+
+def iter_capture(directory: str) -> Iterator[dict]:
+    """Lue tallenteen tietueet järjestyksessä (gzip-segmentit puretaan lennossa, rikkinäiset rivit ohitetaan)"""
+    for path in capture_segments(directory):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+class ReplayHttpClient(HttpClient):
+    """
+    http_pool-yhteensopiva client, joka palvelee get_json/post_json-kutsut tallenteesta
+
+    Sama pyyntö palautetaan tallennusjärjestyksessä (FIFO); kun vastaukset loppuvat, viimeinen toistetaan.
+    Puuttuva pyyntö nostaa aiohttp.ClientConnectionError:n kuten verkkovirhe.
+    """
+
+    def __init__(self, responses: Dict[str, List[Any]]):
+        super().__init__()
+        self._responses: Dict[str, Deque[Any]] = {k: deque(v) for k, v in responses.items()}
+        self.replay_stats = {"hits": 0, "misses": 0}
+
+    async def request_json(self, method: str, url: str, *, tries=None, timeout=None, **kwargs: Any) -> Any:
+        body = kwargs.get("json")
+        queue = self._responses.get(http_key(method, url, kwargs.get("params"), body))
+        if not queue:
+            self.replay_stats["misses"] += 1
+            raise aiohttp.ClientConnectionError(f"not in capture: {method} {url}")
+        self.replay_stats["hits"] += 1
+        response = queue.popleft() if len(queue) > 1 else queue[0]
+        if isinstance(body, dict) and "id" in body and isinstance(response, dict) and "id" in response:
+            response = {**response, "id": body["id"]}
+        await asyncio.sleep(0)
+        return response
+
+
+class _ReplayConnection:
+    """websockets.connect-yhteensopiva yhteys, joka toistaa yhden URL:n tallennetut kehykset"""
+
+    def __init__(self, replayer: "CaptureReplayer", url: str):
+        self.replayer = replayer
+        self.url = url
+        self._granted: set = set()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def send(self, raw: str) -> None:
+        msg = json.loads(raw)
+        method = msg.get("method", "")
+        if not method.endswith("Subscribe"):
+            return
+        server_id = self.replayer._server_ids.get((self.url, method, _canonical(msg.get("params"))))
+        if server_id is None:
+            # ei tallenteessa: anna tuore id, kanavalle ei tule kehyksiä
+            server_id = -len(self._granted) - 1
+        self._granted.add(server_id)
+        self.replayer._control.setdefault(self.url, asyncio.Queue()).put_nowait(
+            json.dumps({"jsonrpc": "2.0", "id": msg.get("id"), "result": server_id})
+        )
+
+    def __aiter__(self):
+        return self._frames()
+
+    async def _frames(self):
+        control = self.replayer._control.setdefault(self.url, asyncio.Queue())
+        # odota tilaukset ennen kehyksiä, jotta reititys on deterministinen
+        needed = self.replayer._needed_ids.get(self.url, set())
+        deadline = time.monotonic() + self.replayer.subscribe_wait_sec
+        while not needed <= self._granted and time.monotonic() < deadline:
+            while not control.empty():
+                yield control.get_nowait()
+            await asyncio.sleep(0.01)
+        while not control.empty():
+            yield control.get_nowait()
+        async for raw in self.replayer._paced(self.url):
+            while not control.empty():
+                yield control.get_nowait()
+            yield raw
+        self.replayer._finished_urls.add(self.url)
+        self.replayer._maybe_finish()
+        # tallenne loppui: pidä yhteys auki (ei reconnectia), välitä enää ohjausviestit
+        while True:
+            yield await control.get()
+
+
+class CaptureReplayer:
+    """
+    Tallenteen toisto
+
+    - speed=1.0 alkuperäinen tahti, speed=N N-kertainen, speed<=0 niin nopeasti kuin mahdollista
+    - connect(): HeliusWsHubin connect-korvike -> oikeat lähdeluokat tilaavat ja saavat tallennetut kehykset
+    - http_client(): ReplayHttpClient tallennetuilla vastauksilla
+    - install(): rekisteröi toistohubit ja ReplayHttpClientin jaetuiksi instansseiksi
+    - wait_finished(): odota kunnes kaikki tallennetut kehykset on syötetty
+    """
+
+    def __init__(self, directory: str, *, speed: float = 1.0, subscribe_wait_sec: float = 1.0, max_backlog: int = 100):
+        self.directory = directory
+        self.speed = float(speed)
+        self.subscribe_wait_sec = subscribe_wait_sec
+        self.max_backlog = max_backlog
+        self._hubs: Dict[str, Any] = {}
+        self._server_ids: Dict[Tuple[str, str, str], int] = {}
+        self._needed_ids: Dict[str, set] = defaultdict(set)
+        self._http: Dict[str, List[Any]] = defaultdict(list)
+        self._ws_urls: List[str] = []
+        self._control: Dict[str, asyncio.Queue] = {}
+        self._finished_urls: set = set()
+        self._finished: Optional[asyncio.Event] = None
+        self._started_at: Optional[float] = None
+        self._t_first: Optional[float] = None
+        self.stats = {"ws_frames": 0, "http_responses": 0, "replayed_frames": 0}
+        self._index()
+
+    def _index(self) -> None:
+        """Ensimmäinen läpikäynti: tilaus -> server-id -kartta ja REST-vastaukset (kehykset luetaan toistossa virtana)"""
+        pending: Dict[Tuple[str, Any], Tuple[str, str]] = {}
+        for rec in iter_capture(self.directory):
+            kind = rec.get("k")
+            url = rec.get("c")
+            if kind == KIND_WS_OUT:
+                msg = rec.get("d") or {}
+                if str(msg.get("method", "")).endswith("Subscribe"):
+                    pending[(url, msg.get("id"))] = (msg["method"], _canonical(msg.get("params")))
+            elif kind == KIND_WS_IN:
+                if url not in self._ws_urls:
+                    self._ws_urls.append(url)
+                raw = rec.get("d") or ""
+                if "Notification" in raw:
+                    self.stats["ws_frames"] += 1
+                    if self._t_first is None:
+                        self._t_first = rec.get("t", 0.0)
+                    continue
+                try:
+                    msg = json.loads(raw)
+                except ValueError:
+                    continue
+                sub = pending.pop((url, msg.get("id")), None) if isinstance(msg, dict) else None
+                if sub is not None and isinstance(msg.get("result"), int):
+                    self._server_ids[(url, sub[0], sub[1])] = msg["result"]
+                    self._needed_ids[url].add(msg["result"])
+            elif kind == KIND_HTTP:
+                self._http[http_key(rec.get("m", "GET"), url, rec.get("p"), rec.get("b"))].append(rec.get("d"))
+                self.stats["http_responses"] += 1
+
+    @property
+    def ws_urls(self) -> List[str]:
+        return list(self._ws_urls)
+
+    def subscribed_programs(self, url: str) -> List[str]:
+        """Tallenteen logsSubscribe-tilausten ohjelmat (mentions) URL:lle"""
+        programs: List[str] = []
+        for (sub_url, method, params), _ in self._server_ids.items():
+            if sub_url != url or method != "logsSubscribe":
+                continue
+            for pid in (json.loads(params) or [{}])[0].get("mentions", []):
+                if pid not in programs:
+                    programs.append(pid)
+        return programs
+
+    def connect(self, url: str, **_kw: Any) -> _ReplayConnection:
+        return _ReplayConnection(self, url)
+
+    def http_client(self) -> ReplayHttpClient:
+        return ReplayHttpClient(self._http)
+
+    def install(self) -> ReplayHttpClient:
+        """Ohjaa get_helius_hub()/get_http_client() tallenteeseen: lähteet ja botit toimivat muuttamattomina"""
+        from helius_ws_hub import HeliusWsHub, register_helius_hub
+
+        for url in self._ws_urls:
+            hub = self._hubs[url] = HeliusWsHub(url, connect=self.connect, reconnect_initial_sec=0.0)
+            register_helius_hub(hub)
+        client = self.http_client()
+        set_http_client(client)
+        return client
+
+    async def wait_finished(self, timeout: Optional[float] = None) -> bool:
+        if not self._ws_urls:
+            return True
+        self._ensure_event()
+        try:
+            await asyncio.wait_for(self._finished.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _ensure_event(self) -> None:
+        if self._finished is None:
+            self._finished = asyncio.Event()
+
+    def _maybe_finish(self) -> None:
+        self._ensure_event()
+        if set(self._ws_urls) <= self._finished_urls:
+            self._finished.set()
+
+    async def _paced(self, url: str):
+        """URL:n notifikaatiokehykset tallennetussa tahdissa (yhteinen kello kaikille URL:eille)"""
+        if self._started_at is None:
+            self._started_at = time.monotonic()
+        t_first = self._t_first or 0.0
+        for rec in iter_capture(self.directory):
+            if rec.get("k") != KIND_WS_IN or rec.get("c") != url:
+                continue
+            raw = rec.get("d") or ""
+            if "Notification" not in raw:
+                continue
+            if self.speed > 0:
+                due = self._started_at + (rec.get("t", 0.0) - t_first) / self.speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                # max-nopeus ilman pudotuksia: odota kunnes tilaajien jonoissa on tilaa
+                hub = self._hubs.get(url)
+                while hub is not None and hub.backlog() >= self.max_backlog:
+                    await asyncio.sleep(0.001)
+                await asyncio.sleep(0)
+            self.stats["replayed_frames"] += 1
+            yield raw
@@ -7,10 +7,10 @@ import logging
 import math
 import os
 import time
+import zlib
 from datetime import datetime, timezone
 from dataclasses import dataclass, field
 from typing import Any, Awaitable, Callable, Optional, Dict, List, Tuple
-import aiohttp
 from collections import defaultdict
 from position_manager import PositionManager
 from balance_manager import BalanceManager
@@ -19,6 +19,13 @@ from balance_manager import BalanceManager
 # TelegramBot removed - using simple notification system
 from scanner_config import ScannerConfig
 from circuit_breaker import CircuitBreaker, CircuitBreakerConfig
+from frame_capture import active_recorder, start_capture, stop_capture
+from helius_ws_hub import SlotGap, get_helius_hub
+from http_pool import close_http_client, get_http_client, init_http_client
+from jsonl_sink import JsonlSink, get_sink
+from stage_trace import StageTrace, close_stage_trace, configure_stage_trace, finish as finish_trace, mark as mark_stage
+from ws_prefilter import TOKEN_MINT_MARKERS, FramePrefilter
+from windowed_stats import WINDOW_15M, WindowedCounter, WindowedQuantiles
 from prometheus_client import Counter, Histogram, Gauge
 
 # Trading removed - scanner only
@@ -40,11 +47,29 @@ tokens_processed_metric = Counter(
 dex_fetch_duration_metric = Histogram(
     "scanner_dex_fetch_duration_seconds",
     "Duration of DEX information fetch calls",
+    ["mode"],
+)
+dex_fetch_winner_metric = Counter(
+    "scanner_dex_fetch_winner_total",
+    "DEX info fetches answered per provider",
+    ["provider", "mode"],
 )
 queue_size_metric = Gauge(
     "scanner_queue_size",
     "Current depth of the token event queue",
 )
+stage_queue_wait_metric = Histogram(
+    "scanner_stage_queue_wait_seconds",
+    "Time an event waited in a consumer stage queue",
+    ["stage"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30),
+)
+stage_processing_metric = Histogram(
+    "scanner_stage_processing_seconds",
+    "Time spent processing an event in a consumer stage",
+    ["stage"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30),
+)
 memory_usage_metric = Gauge(
     "scanner_memory_usage_entries",
     "Internal scanner structure sizes",
@@ -68,6 +93,7 @@ class NewTokenEvent:
     name: str = ""
     signature: str | None = None
     source: str = "helius_logs"
+    trace: Optional[StageTrace] = field(default=None, repr=False, compare=False)
 
 
 @dataclass
@@ -117,8 +143,14 @@ class DexInfoFetcher:
     """
     Fallback-ketju DEX-infon hakemiseksi. Järjestys: Birdeye -> DexScreener -> Jupiter -> CoinGecko -> Solscan.
     Tarjoajat injektoidaan, jotta testaus onnistuu ilman verkkoa. Jokaisella tarjoajalla on oma breaker.
+
+    hedge=True: tarjoajat ajetaan limittäin. Seuraava käynnistetään kun edellinen ylittää oman p90-latenssinsa
+    (tai epäonnistuu), ensimmäinen riittävä vastaus voittaa ja häviäjät perutaan. Järjestys mukautuu
+    liukuvista onnistumisprosenteista ja latensseista (WINDOW_15M).
     """
 
+    ORDER = ("birdeye", "dexscreener", "jupiter", "coingecko", "solscan")
+
     def __init__(
         self,
         *,
@@ -129,6 +161,10 @@ class DexInfoFetcher:
         solscan: Callable[..., Any] | None = None,
         breaker_config: CircuitBreakerConfig | None = None,
         buyers30m_provider: Optional[Callable[[str], asyncio.Future]] = None,
+        hedge: bool = False,
+        hedge_default_delay: float = 1.0,
+        hedge_min_delay: float = 0.1,
+        hedge_min_samples: int = 5,
     ) -> None:
         async def _na(mint: str) -> DexInfo:
             return DexInfo(status="not_found", reason="provider_not_configured")
@@ -155,7 +191,22 @@ class DexInfoFetcher:
             "jupiter": _Source("jupiter", jupiter or _na, cfg),
             "solscan": _Source("solscan", solscan or _na, cfg),
         }
+        # Konfiguroimattomat (_na) eivät kerrytä tilastoja eivätkä nouse järjestyksen kärkeen
+        self._configured = {
+            name for name, fn in (("birdeye", birdeye), ("dexscreener", dexscreener), ("jupiter", jupiter),
+                                  ("coingecko", coingecko), ("solscan", solscan)) if fn is not None
+        }
         self._buyers_provider = buyers30m_provider
+        self.hedge = hedge
+        self.hedge_default_delay = hedge_default_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self._latency = {name: WindowedQuantiles(window_sec=WINDOW_15M) for name in self.ORDER}
+        self._outcomes = WindowedCounter(window_sec=WINDOW_15M)
+
+    @property
+    def mode(self) -> str:
+        return "hedged" if self.hedge else "sequential"
 
     async def _call_provider(
         self,
@@ -169,6 +220,7 @@ class DexInfoFetcher:
         if not breaker.allow_request():
             reason_chain.append(f"{name}=circuit_open")
             return None
+        started = time.monotonic()
         try:
             result = await asyncio.wait_for(fn(mint), timeout=timeout)
         except asyncio.TimeoutError:
@@ -180,8 +232,120 @@ class DexInfoFetcher:
             reason_chain.append(f"{name}=error:{exc}")
             return None
         breaker.record_success()
+        # Latenssi vain onnistuneista vastauksista: heti epäonnistuva tarjoaja ei saa ~0 s latenssia
+        if result is not None and result.status == "ok" and name in self._configured:
+            self._latency[name].add(time.monotonic() - started)
         return result
 
+    def _accept(self, name: str, r: Optional[DexInfo], reason_chain: list[str]) -> bool:
+        """Onko vastaus riittävä; kirjaa onnistumisen/epäonnistumisen ja syyn reason_chainiin"""
+        ok = False
+        if r and r.status == "ok":
+            metadata = r.metadata or {}
+            # Jos Birdeye ei anna likviditeettiä tai volyymiä, kokeile seuraavia lähteitä
+            if name == "birdeye" and metadata.get("liquidity_usd", 0) == 0 and metadata.get("volume_24h_usd", 0) == 0:
+                reason_chain.append("birdeye=insufficient_data")
+            else:
+                r.reason = r.reason or f"{name}_ok"
+                ok = True
+        elif r and r.reason:
+            reason_chain.append(f"{name}={r.reason}")
+        if name in self._configured:
+            self._outcomes.add((name, "ok" if ok else "fail"))
+        return ok
+
+    def _success_rate(self, name: str) -> Optional[float]:
+        ok = self._outcomes.count((name, "ok"))
+        total = ok + self._outcomes.count((name, "fail"))
+        return (ok / total) if total >= self.hedge_min_samples else None
+
+    def _hedge_delay(self, name: str, timeout: float) -> float:
+        """Odotusaika ennen seuraavan tarjoajan käynnistystä: tarjoajan p90-latenssi"""
+        lat = self._latency[name]
+        p90 = lat.quantile(0.9) if lat.count() >= self.hedge_min_samples else None
+        delay = self.hedge_default_delay if p90 is None else p90
+        return max(self.hedge_min_delay, min(delay, timeout))
+
+    def provider_order(self) -> list[str]:
+        """
+        Tarjoajat odotetun onnistumisajan mukaan (p50-latenssi / onnistumisprosentti).
+        Tarjoajat joilla ei vielä ole tarpeeksi näytteitä pysyvät oletusjärjestyksessä kärjessä;
+        konfiguroimattomat aina viimeisinä.
+        """
+        def cost(item: tuple[int, str]) -> tuple[int, float, int]:
+            idx, name = item
+            if name not in self._configured:
+                return (1, 0.0, idx)
+            rate = self._success_rate(name)
+            if rate is None:
+                return (0, 0.0, idx)
+            if rate == 0.0:
+                return (0, float("inf"), idx)  # ei onnistumisia -> ei latenssinäytteitä, konfiguroiduista viimeiseksi
+            p50 = self._latency[name].quantile(0.5)
+            return (0, 0.0 if p50 is None else p50 / max(rate, 0.05), idx)
+
+        return [name for _, name in sorted(enumerate(self.ORDER), key=cost)]
+
+    def get_provider_stats(self) -> dict[str, dict[str, Any]]:
+        return {
+            name: {
+                "success_rate": self._success_rate(name),
+                "p50_sec": self._latency[name].quantile(0.5),
+                "p90_sec": self._latency[name].quantile(0.9),
+                "breaker": self._breakers[name].state,
+            }
+            for name in self.ORDER
+        }
+
+    async def _fetch_hedged(self, mint: str, timeout: float, reason_chain: list[str]) -> Optional[DexInfo]:
+        order = self.provider_order()
+        rank = {name: i for i, name in enumerate(order)}
+        loop = asyncio.get_running_loop()
+        pending: dict[asyncio.Task, str] = {}
+        next_idx = 0
+        last_name = ""
+        last_start = 0.0
+
+        def _launch() -> None:
+            nonlocal next_idx, last_name, last_start
+            name = order[next_idx]
+            next_idx += 1
+            task = asyncio.create_task(
+                self._call_provider(name, self._providers[name], mint, timeout, reason_chain),
+                name=f"dex_fetch_{name}",
+            )
+            pending[task] = name
+            last_name, last_start = name, loop.time()
+
+        try:
+            while pending or next_idx < len(order):
+                if not pending:
+                    _launch()
+                wait_for: Optional[float] = None
+                if next_idx < len(order):
+                    wait_for = max(0.0, last_start + self._hedge_delay(last_name, timeout) - loop.time())
+                done, _ = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Hedge: edellinen ylitti p90-latenssinsa
+                    _launch()
+                    continue
+                failed = False
+                for task in sorted(done, key=lambda t: rank[pending[t]]):
+                    name = pending.pop(task)
+                    r = task.result()
+                    if self._accept(name, r, reason_chain):
+                        dex_fetch_winner_metric.labels(provider=name, mode="hedged").inc()
+                        return r
+                    failed = True
+                if failed and next_idx < len(order):
+                    _launch()
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
     async def fetch(self, mint: str, *, timeout: float = 10.0) -> DexInfo:
         reason_chain: list[str] = []
         success_info: Optional[DexInfo] = None
@@ -190,52 +354,17 @@ class DexInfoFetcher:
             provider = self._providers[name]
             return await self._call_provider(name, provider, mint, timeout, reason_chain)
 
-        # 1) Birdeye
-        r = await _attempt("birdeye")
-        if r and r.status == "ok":
-            # Tarkista onko Birdeye-data riittävää
-            metadata = r.metadata or {}
-            liquidity = metadata.get("liquidity_usd", 0)
-            volume = metadata.get("volume_24h_usd", 0)
-            
-            # Jos Birdeye ei anna likviditeettiä tai volyymiä, kokeile DexScreener:ia
-            if liquidity == 0 and volume == 0:
-                reason_chain.append(f"birdeye=insufficient_data")
-                # Jatka DexScreener:iin
-            else:
-                r.reason = r.reason or "birdeye_ok"
-                success_info = r
-        elif r and r.reason:
-            reason_chain.append(f"birdeye={r.reason}")
+        if self.hedge:
+            success_info = await self._fetch_hedged(mint, timeout, reason_chain)
+        else:
+            # 1) Birdeye, 2) DexScreener (DS 404 ei ole kovaportti), 3) Jupiter, 4) CoinGecko
+            for name in ("birdeye", "dexscreener", "jupiter", "coingecko"):
+                r = await _attempt(name)
+                if self._accept(name, r, reason_chain):
+                    dex_fetch_winner_metric.labels(provider=name, mode="sequential").inc()
+                    success_info = r
+                    break
 
-        # 2) DexScreener
-        if success_info is None:
-            r = await _attempt("dexscreener")
-            if r and r.status == "ok":
-                r.reason = r.reason or "dexscreener_ok"
-                success_info = r
-            elif r and r.reason:
-                reason_chain.append(f"dexscreener={r.reason}")
-                # DS 404 ei ole kovaportti - jatka muihin lähteisiin
-
-        # 3) Jupiter
-        if success_info is None:
-            r = await _attempt("jupiter")
-            if r and r.status == "ok":
-                r.reason = r.reason or "jupiter_ok"
-                success_info = r
-            elif r and r.reason:
-                reason_chain.append(f"jupiter={r.reason}")
-
-        # 4) CoinGecko
-        if success_info is None:
-            r = await _attempt("coingecko")
-            if r and r.status == "ok":
-                r.reason = r.reason or "coingecko_ok"
-                success_info = r
-            elif r and r.reason:
-                reason_chain.append(f"coingecko={r.reason}")
-        
         # 4.5) CoinGecko Enrichment (if we have basic data)
         if success_info and COINGECKO_ENRICHMENT_AVAILABLE:
             try:
@@ -279,13 +408,11 @@ class DexInfoFetcher:
                 logger.error(f"CoinGecko enrichment error for {mint}: {e}")
 
         # 5) Solscan
-        if success_info is None:
+        if success_info is None and not self.hedge:
             r = await _attempt("solscan")
-            if r and r.status == "ok":
-                r.reason = r.reason or "solscan_ok"
+            if self._accept("solscan", r, reason_chain):
+                dex_fetch_winner_metric.labels(provider="solscan", mode="sequential").inc()
                 success_info = r
-            elif r and r.reason:
-                reason_chain.append(f"solscan={r.reason}")
 
         if success_info:
             if self._buyers_provider:
@@ -360,14 +487,32 @@ class HeliusTokenScannerBot:
                 failure_threshold=self._config.breaker_failure_threshold,
                 timeout=self._config.breaker_timeout,
             )
-            self.dex_fetcher = DexInfoFetcher(breaker_config=breaker_cfg)
+            self.dex_fetcher = DexInfoFetcher(
+                breaker_config=breaker_cfg,
+                hedge=self._config.dex_hedge,
+                hedge_default_delay=self._config.dex_hedge_default_delay,
+            )
         self._stop = asyncio.Event()
         self._queue: asyncio.Queue[NewTokenEvent | object] = asyncio.Queue(maxsize=queue_maxsize)
         self._producer_task: asyncio.Task | None = None
         self._consumer_task: asyncio.Task | None = None
         self._sentinel: object = object()
+        # Kuluttaja-pooli: _consume_queue jakaa eventit mintin hashin mukaan -> per-mint järjestys säilyy,
+        # julkaisun sivuvaikutukset (TG, trade, sell-check) omassa kaistassaan
+        self._consumer_workers = max(1, int(self._config.consumer_workers or 1))
+        self._publish_workers = max(1, int(self._config.publish_workers or 1))
+        self._score_queues: list[asyncio.Queue] = []
+        self._publish_queues: list[asyncio.Queue] = []
+        self._worker_stats: dict[str, list[dict[str, float]]] = {}
         self._rpc_get_tx = rpc_get_tx
         self._retry_tasks: dict[str, asyncio.Task] = {}
+        # JSONL-lokit: erissä kirjoittava taustasink (ei levy-I/O:ta event loopissa)
+        self._events_sink = self._open_sink(self._config.events_log_path)
+        self._rejects_sink = self._open_sink(self._config.rejects_log_path)
+        # WS-kehysten esisuodatin (None = dekoodaa kaikki kehykset)
+        self._frame_filter: FramePrefilter | None = (
+            FramePrefilter("helius_scanner", TOKEN_MINT_MARKERS) if self._config.ws_prefilter else None
+        )
         self._max_retry_attempts = self._config.max_retry_attempts
         self._retry_initial_delay = self._config.retry_initial_delay
         self._retry_backoff = self._config.retry_backoff
@@ -380,7 +525,8 @@ class HeliusTokenScannerBot:
         self.trade_cfg = None
         self._last_trade_ts: dict = {}
         self._open_positions: dict = {}  # Track open positions: {mint: {entry_price, entry_time, entry_volume, entry_liquidity}}
-        self._positions_file = "open_positions.json"  # File to persist positions
+        # Vanhan järjestelmän positiot omassa journalissaan (ei enää koko tiedoston uudelleenkirjoitusta per muutos)
+        self._legacy_positions = PositionManager(path=os.getenv("LEGACY_POSITIONS_PATH", "legacy_positions.json"))
         self._wallet_report_task: asyncio.Task | None = None
         
         # New position and balance management
@@ -403,6 +549,7 @@ class HeliusTokenScannerBot:
         self._liquidity_history: dict[str, list[tuple[float, float]]] = {}
         self._blacklisted_until: dict[str, float] = {}
         self._cleanup_task: asyncio.Task | None = None
+        self._http_acquired = False  # init_http_client()-viite start():sta
         
         # Symbol retry worker
         self._symbol_retry_queue: asyncio.Queue[str] = asyncio.Queue()
@@ -447,6 +594,15 @@ class HeliusTokenScannerBot:
     async def start(self) -> None:
         if self._producer_task or self._consumer_task:
             return
+        # Tallennus käyntiin ennen WS-tilauksia, jotta toisto saa tilausvahvistukset
+        if self._config.capture_dir:
+            start_capture(self._config.capture_dir, segment_mb=self._config.capture_segment_mb)
+        if self._config.trace_sample_rate > 0:
+            configure_stage_trace(self._config.trace_sample_rate, self._config.trace_log_path)
+        # Jaettu HTTP-pooli REST-providereille; vapautetaan stop()/graceful_shutdown()-kutsussa
+        if not self._http_acquired:
+            await init_http_client()
+            self._http_acquired = True
         # Kuluttaja start INFO-tasolla – korjaus
         self._ensure_consumer_started()
         # Tuottaja voidaan käynnistää myöhemmin testeissä; jos WS:ää ei ole, ohita
@@ -509,6 +665,12 @@ class HeliusTokenScannerBot:
             *[t for t in tasks_to_wait if t],
             return_exceptions=True,
         )
+        await self._release_http_client()
+
+    async def _release_http_client(self) -> None:
+        if self._http_acquired:
+            self._http_acquired = False
+            await close_http_client()
 
     async def _lookback_sweep(self):
         """Lookback sweep for missed tokens"""
@@ -786,11 +948,27 @@ class HeliusTokenScannerBot:
                 *[t for t in tasks if t],
                 return_exceptions=True,
             )
+        finally:
+            # Lopullinen flush: kaikki puskuroidut JSONL-rivit levylle ennen sulkemista
+            for sink in (self._events_sink, self._rejects_sink):
+                try:
+                    await sink.close()
+                except Exception as e:
+                    logger.warning("JSONL sink %s close failed: %s", sink.name, e)
+            for store in (self.positions, self._legacy_positions):
+                try:
+                    await store.close()
+                except Exception as e:
+                    logger.warning("Position journal %s close failed: %s", store.path, e)
+            await self._release_http_client()
+            await stop_capture()
+            await close_stage_trace()
 
     # Testiystävällinen injektointi
     async def enqueue(self, event: NewTokenEvent) -> None:
         # Varmista että kuluttaja on käynnissä, vaikka start() olisi jäänyt kutsumatta
         self._ensure_consumer_started()
+        mark_stage(event, "enqueued")
         await self._queue.put(event)
 
     def _ensure_consumer_started(self) -> None:
@@ -800,80 +978,60 @@ class HeliusTokenScannerBot:
 
     # --- Internal ---
     async def _producer_loop(self) -> None:  # pragma: no cover - tuotantopolku
-        backoff = 1.0
-        while not self._stop.is_set():
-            try:
-                # Lisää ping_interval ja ping_timeout WebSocket yhteysasetuksiin
-                async with websockets.connect(
-                    self.ws_url, 
-                    ping_interval=20,  # Ping 20s välein
-                    ping_timeout=10,   # 10s timeout pingille
-                    close_timeout=10   # 10s timeout sulkemiselle
-                ) as ws:  # type: ignore
-                    # Tilaa program-logs mainituille ohjelmille
-                    for program_id in self.programs:
-                        sub = {
-                            "jsonrpc": "2.0",
-                            "id": 1,
-                            "method": "logsSubscribe",
-                            "params": [{"mentions": [program_id]}, {"commitment": "confirmed"}],
-                        }
-                        await ws.send(json.dumps(sub))
-                        logger.info("✅ Helius WS: tilaus lähetetty: %s", program_id[:8] + "…")
-
-                    backoff = 1.0  # reset backoff kun yhteys auki
-                    last_ping = time.time()
-                    
-                    while not self._stop.is_set():
-                        try:
-                            # Käytä asyncio.wait_for timeoutin kanssa
-                            msg = await asyncio.wait_for(ws.recv(), timeout=30.0)
-                        except asyncio.TimeoutError:
-                            # Lähetä ping jos ei ole saatu viestiä 30s
-                            if time.time() - last_ping > 30:
-                                try:
-                                    await ws.ping()
-                                    last_ping = time.time()
-                                    logger.debug("📡 Helius WS: ping lähetetty")
-                                except Exception as ping_e:
-                                    logger.warning("⚠️ Helius WS: ping epäonnistui: %s", ping_e)
-                                    break
-                            continue
-                        except websockets.exceptions.ConnectionClosed:
-                            logger.info("🔌 Helius WS: yhteys suljettu")
-                            break
-                            
-                        try:
-                            data = json.loads(msg)
-                        except Exception:
-                            continue
-                        params = data.get("params", {})
-                        # Subscription confirmation
-                        if "result" in data and isinstance(data["result"], str):
-                            logger.info("✅ Helius WS: subscription confirmed: %s", data["result"][:8] + "…")
-                            continue
-                        value = (params.get("result") or {}).get("value") if isinstance(params, dict) else None
-                        if not value:
-                            continue
-                        logs = value.get("logs") or []
-                        sig = value.get("signature")
-                        mint = await self._try_extract_mint(logs, sig)
-                        if not mint:
-                            continue
-                        # Varmista että kuluttaja käy
-                        self._ensure_consumer_started()
-                        ev = NewTokenEvent(mint=mint, symbol=f"TOKEN_{mint[:6]}", name=f"New Token {mint[:4]}", signature=sig)
-                        with contextlib.suppress(asyncio.QueueFull):
-                            self._queue.put_nowait(ev)
-            except asyncio.CancelledError:
-                raise
-            except Exception as e:
-                # Hiljennä melua: INFO ja progressiivinen backoff 15→30→60s
-                logger.info("Helius WS hiccup: %s", e)
-                await asyncio.sleep(min(60.0, max(15.0, backoff)))
-                backoff = min(60.0, max(15.0, backoff * 2.0))
+        # Jaettu Helius-hub: yksi WS-yhteys, heartbeat ja reconnect + uudelleentilaus hubissa
+        sub = get_helius_hub(self.ws_url).subscribe_logs(
+            self.programs, name="scanner", prefilter=self._frame_filter
+        )
+        logger.info("✅ Helius hub: logsSubscribe %d ohjelmalle", len(self.programs))
+        try:
+            while not self._stop.is_set():
+                item = await sub.get()
+                if item is None:
+                    break
+                if isinstance(item, SlotGap):
+                    logger.warning("⚠️ Helius WS: slotit %d-%d ohitettu reconnectissa", item.first_slot, item.last_slot)
+                    continue
+                value = item.value
+                if not isinstance(value, dict):
+                    continue
+                logs = value.get("logs") or []
+                sig = value.get("signature")
+                mint = await self._try_extract_mint(logs, sig)
+                if not mint:
+                    continue
+                # Varmista että kuluttaja käy
+                self._ensure_consumer_started()
+                ev = NewTokenEvent(mint=mint, symbol=f"TOKEN_{mint[:6]}", name=f"New Token {mint[:4]}", signature=sig)
+                mark_stage(ev, "frame_received", item.received_at or None)
+                mark_stage(ev, "filtered")  # mint poimittu lokeista
+                mark_stage(ev, "enqueued")
+                with contextlib.suppress(asyncio.QueueFull):
+                    self._queue.put_nowait(ev)
+        finally:
+            sub.close()
+
+    def _shard_for(self, mint: Optional[str], n: int) -> int:
+        """Valitse shard mintille (stabiili crc32 -> per-mint järjestys säilyy)"""
+        if n <= 1 or not mint:
+            return 0
+        return zlib.crc32(str(mint).encode("utf-8")) % n
 
     async def _consume_queue(self) -> None:
+        """Jakelija: ottaa eventit jonosta ja reitittää ne pisteytys-workereille mintin mukaan"""
+        self._score_queues = [asyncio.Queue(maxsize=self._queue.maxsize) for _ in range(self._consumer_workers)]
+        self._publish_queues = [asyncio.Queue(maxsize=self._queue.maxsize) for _ in range(self._publish_workers)]
+        self._worker_stats = {
+            "score": [{"processed": 0, "busy_sec": 0.0} for _ in self._score_queues],
+            "publish": [{"processed": 0, "busy_sec": 0.0} for _ in self._publish_queues],
+        }
+        score_tasks = [
+            asyncio.create_task(self._stage_worker("score", i, q, self._score_event), name=f"helius_score:{i}")
+            for i, q in enumerate(self._score_queues)
+        ]
+        publish_tasks = [
+            asyncio.create_task(self._stage_worker("publish", i, q, self._publish_summary), name=f"helius_publish:{i}")
+            for i, q in enumerate(self._publish_queues)
+        ]
         try:
             while not self._stop.is_set():
                 item = await self._queue.get()
@@ -882,104 +1040,164 @@ class HeliusTokenScannerBot:
                     break
                 if not isinstance(item, NewTokenEvent):
                     continue
+                shard = self._shard_for(item.mint, len(self._score_queues))
+                await self._score_queues[shard].put((item, time.perf_counter()))
+
+            # Tyhjennä kaistat järjestyksessä: ensin pisteytys (voi tuottaa julkaisuja), sitten julkaisu
+            for q in self._score_queues:
+                await q.put(self._sentinel)
+            await asyncio.gather(*score_tasks, return_exceptions=True)
+            for q in self._publish_queues:
+                await q.put(self._sentinel)
+            await asyncio.gather(*publish_tasks, return_exceptions=True)
+        except Exception as e:
+            logger.error("💥 consumer task kaatui: %s", e)
+        finally:
+            for t in (*score_tasks, *publish_tasks):
+                if not t.done():
+                    t.cancel()
+            await asyncio.gather(*score_tasks, *publish_tasks, return_exceptions=True)
 
-                dex_status = "pending"
-                dex_reason = "unknown"  # turvallinen alustaminen – korjaus
-                dex_name: str | None = None
-                pair: str | None = None
-                try:
-                    start_fetch = time.perf_counter()
-                    info = await self.dex_fetcher.fetch(
-                        item.mint,
-                        timeout=self._retry_fetch_timeout,
-                    )
-                    dex_fetch_duration_metric.observe(time.perf_counter() - start_fetch)
-                    dex_status = info.status or "pending"
-                    dex_reason = info.reason or ""
-                    dex_name = info.dex_name
-                    pair = info.pair_address
-                    alt_pairs = info.alt_pairs or []
-                    metadata = info.metadata or {}
-                    liquidity_val = self._extract_liquidity(metadata)
-                    
-                        
-                except Exception as e:
-                    dex_status = "error"
-                    dex_reason = f"fetch_failed:{e}"
-                    alt_pairs = []
-                    metadata = {}
-                    liquidity_val = None
-
-                rug_alert = False
-                if liquidity_val is not None:
-                    rug_alert = self._check_liquidity_drop(item.mint, liquidity_val)
-
-                blacklisted = self._is_blacklisted(item.mint) or rug_alert
-
-                # Summary-loki ei kaadu vaikka reason olisi tyhjä
-                summary = {
-                    "evt": "summary",
-                    "mint": item.mint,
-                    "symbol": item.symbol,
-                    "dex_status": dex_status,
-                    "dex_reason": dex_reason or "",
-                    "dex": dex_name or "",
-                    "pair": pair or "",
-                    "source": item.source,
-                    "alt_pairs": alt_pairs,
-                    "metadata": metadata,
-                }
-                if liquidity_val is not None:
-                    summary["liquidity_usd"] = liquidity_val
-                if rug_alert:
-                    summary["rug_alert"] = True
-                    summary["dex_reason"] = (summary["dex_reason"] + ";rug_alert") if summary["dex_reason"] else "rug_alert"
-                    summary["blacklisted_until"] = self._blacklisted_until.get(item.mint)
-                    logger.warning(
-                        "🚨 RUG ALERT: %s (liquidity drop detected)", item.mint[:8]
-                    )
-                elif blacklisted:
-                    summary["blacklisted_until"] = self._blacklisted_until.get(item.mint)
-
-                decision, score, decision_notes = self._decide_candidate(
-                    summary,
-                    rug_alert=rug_alert,
-                    blacklisted=blacklisted,
-                )
-                summary["score"] = score
-                summary["decision"] = decision
-                summary["decision_notes"] = decision_notes
+    async def _stage_worker(
+        self,
+        stage: str,
+        idx: int,
+        queue: asyncio.Queue,
+        handler: Callable[[Any], Awaitable[None]],
+    ) -> None:
+        """Yksi kaistan worker: käsittelee oman shardinsa jonon järjestyksessä"""
+        stats = self._worker_stats[stage][idx]
+        while True:
+            entry = await queue.get()
+            if entry is self._sentinel:
+                return
+            payload, enqueued_at = entry
+            t0 = time.perf_counter()
+            stage_queue_wait_metric.labels(stage=stage).observe(t0 - enqueued_at)
+            try:
+                await handler(payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Virhe %s-workerissa %d: %s", stage, idx, e)
+            finally:
+                elapsed = time.perf_counter() - t0
+                stage_processing_metric.labels(stage=stage).observe(elapsed)
+                stats["busy_sec"] += elapsed
+                stats["processed"] += 1
+
+    async def _publish_summary(self, summary: dict) -> None:
+        trace = mark_stage(summary.pop("_trace", None), "published")
+        await self._send_telegram_notification(summary)
+        # Try auto-trade after sending notification
+        await self._maybe_auto_trade(summary, trace=trace)
+        finish_trace(trace, "published", mint=summary.get("mint"))
+
+        # Check if we should sell any existing positions
+        await self._check_and_sell_positions(summary)
+
+    async def _score_event(self, item: NewTokenEvent) -> None:
+        mark_stage(item, "dequeued")
+        dex_status = "pending"
+        dex_reason = "unknown"  # turvallinen alustaminen – korjaus
+        dex_name: str | None = None
+        pair: str | None = None
+        try:
+            start_fetch = time.perf_counter()
+            info = await self.dex_fetcher.fetch(
+                item.mint,
+                timeout=self._retry_fetch_timeout,
+            )
+            dex_fetch_duration_metric.labels(mode=getattr(self.dex_fetcher, "mode", "sequential")).observe(
+                time.perf_counter() - start_fetch
+            )
+            dex_status = info.status or "pending"
+            dex_reason = info.reason or ""
+            dex_name = info.dex_name
+            pair = info.pair_address
+            alt_pairs = info.alt_pairs or []
+            metadata = info.metadata or {}
+            liquidity_val = self._extract_liquidity(metadata)
+            
+                
+        except Exception as e:
+            dex_status = "error"
+            dex_reason = f"fetch_failed:{e}"
+            alt_pairs = []
+            metadata = {}
+            liquidity_val = None
+        mark_stage(item, "enriched")
+
+        rug_alert = False
+        if liquidity_val is not None:
+            rug_alert = self._check_liquidity_drop(item.mint, liquidity_val)
+
+        blacklisted = self._is_blacklisted(item.mint) or rug_alert
+
+        # Summary-loki ei kaadu vaikka reason olisi tyhjä
+        summary = {
+            "evt": "summary",
+            "mint": item.mint,
+            "symbol": item.symbol,
+            "dex_status": dex_status,
+            "dex_reason": dex_reason or "",
+            "dex": dex_name or "",
+            "pair": pair or "",
+            "source": item.source,
+            "alt_pairs": alt_pairs,
+            "metadata": metadata,
+        }
+        if liquidity_val is not None:
+            summary["liquidity_usd"] = liquidity_val
+        if rug_alert:
+            summary["rug_alert"] = True
+            summary["dex_reason"] = (summary["dex_reason"] + ";rug_alert") if summary["dex_reason"] else "rug_alert"
+            summary["blacklisted_until"] = self._blacklisted_until.get(item.mint)
+            logger.warning(
+                "🚨 RUG ALERT: %s (liquidity drop detected)", item.mint[:8]
+            )
+        elif blacklisted:
+            summary["blacklisted_until"] = self._blacklisted_until.get(item.mint)
 
-                logger.info(json.dumps(summary, ensure_ascii=False))
+        decision, score, decision_notes = self._decide_candidate(
+            summary,
+            rug_alert=rug_alert,
+            blacklisted=blacklisted,
+        )
+        summary["score"] = score
+        summary["decision"] = decision
+        summary["decision_notes"] = decision_notes
 
-                notes = self._build_notes(
-                    summary,
-                    rug_alert=rug_alert,
-                    blacklisted=blacklisted,
-                    extra_notes=decision_notes,
-                )
+        logger.info(json.dumps(summary, ensure_ascii=False))
 
-                if decision == "publish":
-                    await self._send_telegram_notification(summary)
-                    # Try auto-trade after sending notification
-                    await self._maybe_auto_trade(summary)
-                    
-                    # Check if we should sell any existing positions
-                    await self._check_and_sell_positions(summary)
-                else:
-                    self._append_reject(summary)
-                    if not blacklisted and summary.get("dex_status") != "ok":
-                        self._schedule_retry(item, summary)
+        notes = self._build_notes(
+            summary,
+            rug_alert=rug_alert,
+            blacklisted=blacklisted,
+            extra_notes=decision_notes,
+        )
 
-                self._write_jsonl_entry(
-                    summary,
-                    decision=decision,
-                    score=score,
-                    notes=notes,
-                )
-                tokens_processed_metric.inc()
-        except Exception as e:
-            logger.error("💥 consumer task kaatui: %s", e)
+        mark_stage(item, "scored")
+        if decision == "publish":
+            # Sivuvaikutukset julkaisukaistaan -> hidas TG/trade ei pysäytä pisteytystä
+            if item.trace is not None:
+                summary["_trace"] = item.trace
+            await self._publish_queues[self._shard_for(item.mint, len(self._publish_queues))].put(
+                (summary, time.perf_counter())
+            )
+        else:
+            self._append_reject(summary)
+            if not blacklisted and summary.get("dex_status") != "ok":
+                self._schedule_retry(item, summary)
+            finish_trace(item, decision)
+
+        self._write_jsonl_entry(
+            summary,
+            decision=decision,
+            score=score,
+            notes=notes,
+        )
+        tokens_processed_metric.inc()
 
     async def _send_telegram_notification(self, summary: dict) -> None:
         """Lähetä Telegram-ilmoitus uudesta tokenista"""
@@ -1157,7 +1375,9 @@ class HeliusTokenScannerBot:
                 try:
                     start_fetch = time.perf_counter()
                     info = await self.dex_fetcher.fetch(event.mint, timeout=self._retry_fetch_timeout)
-                    dex_fetch_duration_metric.observe(time.perf_counter() - start_fetch)
+                    dex_fetch_duration_metric.labels(mode=getattr(self.dex_fetcher, "mode", "sequential")).observe(
+                        time.perf_counter() - start_fetch
+                    )
                     status = info.status or "pending"
                     reason = info.reason or ""
                     dex_name = info.dex_name or ""
@@ -1252,12 +1472,20 @@ class HeliusTokenScannerBot:
                 )
             self._retry_tasks.pop(event.mint, None)
 
+    def _open_sink(self, path: str) -> JsonlSink:
+        cfg = self._config
+        return get_sink(
+            path,
+            flush_interval_sec=cfg.jsonl_flush_interval,
+            max_backlog=cfg.jsonl_max_backlog,
+            fsync=cfg.jsonl_fsync,
+            rotate_bytes=int(cfg.jsonl_rotate_mb * 1024 * 1024),
+            rotate_interval_sec=cfg.jsonl_rotate_hours * 3600.0,
+            compress=cfg.jsonl_compress,
+        )
+
     def _append_reject(self, row: dict) -> None:
-        try:
-            with open("dex_rejects.jsonl", "a", encoding="utf-8") as f:
-                f.write(json.dumps(row, ensure_ascii=False) + "\n")
-        except Exception:
-            pass
+        self._rejects_sink.write(row)
 
     def _extract_liquidity(self, metadata: dict[str, Any]) -> float | None:
         if not metadata:
@@ -1385,8 +1613,7 @@ class HeliusTokenScannerBot:
             entry["score"] = entry.get("score") or score
             entry["dex"]["buyers30m"] = buyers30
 
-            with open("token_events.jsonl", "a", encoding="utf-8") as f:
-                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._events_sink.write(entry)
         except Exception:
             logger.debug("JSONL write failed", exc_info=True)
 
@@ -1444,7 +1671,31 @@ class HeliusTokenScannerBot:
         return {
             "status": "healthy" if not self._stop.is_set() else "stopped",
             "queue_size": self._queue.qsize(),
+            "workers": {
+                stage: [
+                    {"worker": i, "processed": int(st["processed"]), "busy_sec": round(st["busy_sec"], 4)}
+                    for i, st in enumerate(stats)
+                ]
+                for stage, stats in self._worker_stats.items()
+            },
             "active_retries": len(self._retry_tasks),
+            "ws_prefilter": self._frame_filter.get_stats() if self._frame_filter else None,
+            "capture": active_recorder().get_stats() if active_recorder() else None,
+            "tx_broadcast": (
+                self.trader.broadcaster.get_stats()
+                if getattr(getattr(self, "trader", None), "broadcaster", None) else None
+            ),
+            "rpc_router": (
+                self.trader.router.get_status()
+                if getattr(getattr(self, "trader", None), "router", None) else None
+            ),
+            "wallet_state": (
+                self.trader.wallet.get_stats()
+                if getattr(getattr(self, "trader", None), "wallet", None) else None
+            ),
+            "jsonl_sinks": {
+                sink.name: sink.get_stats() for sink in (self._events_sink, self._rejects_sink)
+            },
             "memory_usage": {
                 "liquidity_history": len(self._liquidity_history),
                 "blacklisted": len(self._blacklisted_until),
@@ -2251,121 +2502,119 @@ class HeliusTokenScannerBot:
     async def _scan_pump_fun_tokens(self) -> None:
         """Skannaa uusia tokeneita Pump.fun:sta"""
         try:
-            async with aiohttp.ClientSession() as session:
-                # Pump.fun API endpoint uusille tokeneille
-                url = "https://frontend-api.pump.fun/coins"
-                
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        coins = data.get("coins", [])
-                        
-                        # Suodata uusimmat tokeneita (alle 1 tunti vanhoja)
-                        current_time = int(time.time())
-                        recent_coins = []
-                        
-                        for coin in coins:
-                            if isinstance(coin, dict):
-                                created_timestamp = coin.get("created_timestamp")
-                                if created_timestamp:
-                                    try:
-                                        created_time = int(created_timestamp)
-                                        age_minutes = (current_time - created_time) / 60
-                                        if age_minutes <= 60:  # Alle 1 tunti vanha
-                                            recent_coins.append(coin)
-                                    except (ValueError, TypeError):
-                                        continue
-                        
-                        logger.info(f"Found {len(recent_coins)} recent Pump.fun tokens")
-                        
-                        # Analysoi jokainen token
-                        for coin in recent_coins[:5]:  # Rajoita 5:een
-                            try:
-                                mint = coin.get("mint")
-                                symbol = coin.get("symbol")
-                                name = coin.get("name")
+            # Pump.fun API endpoint uusille tokeneille
+            url = "https://frontend-api.pump.fun/coins"
+            
+            async with get_http_client().request("GET", url, timeout=10.0) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    coins = data.get("coins", [])
+                    
+                    # Suodata uusimmat tokeneita (alle 1 tunti vanhoja)
+                    current_time = int(time.time())
+                    recent_coins = []
+                    
+                    for coin in coins:
+                        if isinstance(coin, dict):
+                            created_timestamp = coin.get("created_timestamp")
+                            if created_timestamp:
+                                try:
+                                    created_time = int(created_timestamp)
+                                    age_minutes = (current_time - created_time) / 60
+                                    if age_minutes <= 60:  # Alle 1 tunti vanha
+                                        recent_coins.append(coin)
+                                except (ValueError, TypeError):
+                                    continue
+                    
+                    logger.info(f"Found {len(recent_coins)} recent Pump.fun tokens")
+                    
+                    # Analysoi jokainen token
+                    for coin in recent_coins[:5]:  # Rajoita 5:een
+                        try:
+                            mint = coin.get("mint")
+                            symbol = coin.get("symbol")
+                            name = coin.get("name")
+                            
+                            if mint and symbol and not symbol.upper().startswith("TOKEN_"):
+                                # Varmista että kuluttaja käy
+                                self._ensure_consumer_started()
+                                ev = NewTokenEvent(
+                                    mint=mint, 
+                                    symbol=symbol, 
+                                    name=name or f"Token {symbol}", 
+                                    signature=None
+                                )
+                                with contextlib.suppress(asyncio.QueueFull):
+                                    self._queue.put_nowait(ev)
+                                logger.info(f"Added Pump.fun token: {symbol} ({mint[:8]}...)")
                                 
-                                if mint and symbol and not symbol.upper().startswith("TOKEN_"):
-                                    # Varmista että kuluttaja käy
-                                    self._ensure_consumer_started()
-                                    ev = NewTokenEvent(
-                                        mint=mint, 
-                                        symbol=symbol, 
-                                        name=name or f"Token {symbol}", 
-                                        signature=None
-                                    )
-                                    with contextlib.suppress(asyncio.QueueFull):
-                                        self._queue.put_nowait(ev)
-                                    logger.info(f"Added Pump.fun token: {symbol} ({mint[:8]}...)")
-                                    
-                            except Exception as e:
-                                logger.debug(f"Error processing Pump.fun token: {e}")
-                    else:
-                        # Liikaa melua tuotannossa → INFO + progressiivinen backoff
-                        logger.info(f"Pump.fun unavailable (HTTP {response.status}), will retry with backoff")
-                        
+                        except Exception as e:
+                            logger.debug(f"Error processing Pump.fun token: {e}")
+                else:
+                    # Liikaa melua tuotannossa → INFO + progressiivinen backoff
+                    logger.info(f"Pump.fun unavailable (HTTP {response.status}), will retry with backoff")
+                    
         except Exception as e:
             logger.error(f"Error scanning Pump.fun tokens: {e}")
 
     async def _scan_dexscreener_tokens(self) -> None:
         """Skannaa tokeneita DexScreener:sta"""
         try:
-            async with aiohttp.ClientSession() as session:
-                # Hae uusimpia tokeneita DexScreener:sta käyttäen search endpoint:ia
-                url = "https://api.dexscreener.com/latest/dex/search?q=solana"
-                
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        pairs = data.get("pairs", [])
-                        
-                        # Suodata Solana-pareja jotka ovat uusia (alle 1 tunti vanhoja)
-                        current_time = int(time.time())
-                        recent_pairs = []
-                        
-                        for pair in pairs:
-                            if isinstance(pair, dict):
-                                chain_id = pair.get("chainId")
-                                if chain_id == "solana":
-                                    # Tarkista onko pari uusi
-                                    pair_created_at = pair.get("pairCreatedAt")
-                                    if pair_created_at:
-                                        try:
-                                            created_time = int(pair_created_at) / 1000  # Convert from milliseconds
-                                            age_minutes = (current_time - created_time) / 60
-                                            if age_minutes <= 60:  # Alle 1 tunti vanha
-                                                recent_pairs.append(pair)
-                                        except (ValueError, TypeError):
-                                            continue
-                        
-                        logger.info(f"Found {len(recent_pairs)} recent Solana pairs from DexScreener")
-                        
-                        # Analysoi jokainen pari
-                        for pair in recent_pairs[:5]:  # Rajoita 5:een
-                            try:
-                                base_token = pair.get("baseToken", {})
-                                mint = base_token.get("address")
-                                symbol = base_token.get("symbol")
-                                name = base_token.get("name")
+            # Hae uusimpia tokeneita DexScreener:sta käyttäen search endpoint:ia
+            url = "https://api.dexscreener.com/latest/dex/search?q=solana"
+            
+            async with get_http_client().request("GET", url, timeout=10.0) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    pairs = data.get("pairs", [])
+                    
+                    # Suodata Solana-pareja jotka ovat uusia (alle 1 tunti vanhoja)
+                    current_time = int(time.time())
+                    recent_pairs = []
+                    
+                    for pair in pairs:
+                        if isinstance(pair, dict):
+                            chain_id = pair.get("chainId")
+                            if chain_id == "solana":
+                                # Tarkista onko pari uusi
+                                pair_created_at = pair.get("pairCreatedAt")
+                                if pair_created_at:
+                                    try:
+                                        created_time = int(pair_created_at) / 1000  # Convert from milliseconds
+                                        age_minutes = (current_time - created_time) / 60
+                                        if age_minutes <= 60:  # Alle 1 tunti vanha
+                                            recent_pairs.append(pair)
+                                    except (ValueError, TypeError):
+                                        continue
+                    
+                    logger.info(f"Found {len(recent_pairs)} recent Solana pairs from DexScreener")
+                    
+                    # Analysoi jokainen pari
+                    for pair in recent_pairs[:5]:  # Rajoita 5:een
+                        try:
+                            base_token = pair.get("baseToken", {})
+                            mint = base_token.get("address")
+                            symbol = base_token.get("symbol")
+                            name = base_token.get("name")
+                            
+                            if mint and symbol and not symbol.upper().startswith("TOKEN_"):
+                                # Varmista että kuluttaja käy
+                                self._ensure_consumer_started()
+                                ev = NewTokenEvent(
+                                    mint=mint, 
+                                    symbol=symbol, 
+                                    name=name or f"Token {symbol}", 
+                                    signature=None
+                                )
+                                with contextlib.suppress(asyncio.QueueFull):
+                                    self._queue.put_nowait(ev)
+                                logger.info(f"Added DexScreener token: {symbol} ({mint[:8]}...)")
                                 
-                                if mint and symbol and not symbol.upper().startswith("TOKEN_"):
-                                    # Varmista että kuluttaja käy
-                                    self._ensure_consumer_started()
-                                    ev = NewTokenEvent(
-                                        mint=mint, 
-                                        symbol=symbol, 
-                                        name=name or f"Token {symbol}", 
-                                        signature=None
-                                    )
-                                    with contextlib.suppress(asyncio.QueueFull):
-                                        self._queue.put_nowait(ev)
-                                    logger.info(f"Added DexScreener token: {symbol} ({mint[:8]}...)")
-                                    
-                            except Exception as e:
-                                logger.debug(f"Error processing DexScreener pair: {e}")
-                    else:
-                        logger.warning(f"Failed to fetch DexScreener tokens: HTTP {response.status}")
-                        
+                        except Exception as e:
+                            logger.debug(f"Error processing DexScreener pair: {e}")
+                else:
+                    logger.warning(f"Failed to fetch DexScreener tokens: HTTP {response.status}")
+                    
         except Exception as e:
             logger.error(f"Error scanning DexScreener tokens: {e}")
 
@@ -2572,7 +2821,7 @@ class HeliusTokenScannerBot:
         except Exception as e:
             logger.error(f"Failed to send wallet report: {e}")
     
-    async def _maybe_auto_trade(self, enriched: dict) -> None:
+    async def _maybe_auto_trade(self, enriched: dict, trace: Optional[StageTrace] = None) -> None:
         if not getattr(self, "trader", None) or not getattr(self, "trade_cfg", None):
             return
         cfg = self.trade_cfg
@@ -2614,9 +2863,11 @@ class HeliusTokenScannerBot:
         # BUY
         try:
             logger.info("🔄 auto_trade_try %s score=%s liq=$%.0f util=%.2f", mint[:8], score, liq, util)
+            mark_stage(trace, "trade_submitted")
             res = await self.trader.buy_token_for_usd(mint, token_price, sol_price)
             
             if res.get("ok"):
+                mark_stage(trace, "trade_confirmed")  # buy_token_for_usd odottaa confirmed-tilan
                 self._last_trade_ts[mint] = now
                 sig = res.get("sig", "")
                 logger.info("✅ auto_trade_buy_ok mint=%s sig=%s", mint[:8], sig)
@@ -2647,7 +2898,7 @@ class HeliusTokenScannerBot:
                         "entry_liquidity": liq,
                         "entry_symbol": symbol
                     }
-                    self._save_positions()  # Save to disk
+                    self._save_position(mint)  # Journal to disk
                 
                 # Send detailed Telegram notification
                 if self.telegram_bot and self.telegram_bot.enabled:
@@ -2767,7 +3018,7 @@ class HeliusTokenScannerBot:
                 
                 # Remove from tracking
                 del self._open_positions[mint]
-                self._save_positions()  # Save to disk
+                self._save_position(mint)  # Journal to disk
                 
                 # Send Telegram notification
                 if self.telegram_bot and self.telegram_bot.enabled:
@@ -2832,30 +3083,46 @@ class HeliusTokenScannerBot:
             await self._sell_position(mint, reason)
 
     def _load_positions(self) -> None:
-        """Load positions from file on startup"""
+        """Load positions from the journal on startup (migrating pre-journal legacy entries once)"""
         try:
-            if os.path.exists(self._positions_file):
-                with open(self._positions_file, 'r') as f:
-                    data = json.load(f)
-                    # Convert string keys back to float where needed
-                    for mint, position in data.items():
-                        position["entry_price"] = float(position["entry_price"])
-                        position["entry_time"] = float(position["entry_time"])
-                        position["entry_volume"] = float(position["entry_volume"])
-                        position["entry_liquidity"] = float(position["entry_liquidity"])
-                    self._open_positions = data
-                    logger.info(f"📂 Loaded {len(self._open_positions)} positions from {self._positions_file}")
+            if not self._legacy_positions.get_all():
+                self._migrate_legacy_positions()
+            data = {}
+            for mint, stored in self._legacy_positions.get_all().items():
+                position = dict(stored)  # journalin dictit ovat jaettuja (copy-on-write): ei muokata paikallaan
+                for key in ("entry_price", "entry_time", "entry_volume", "entry_liquidity"):
+                    position[key] = float(position[key])
+                data[mint] = position
+            self._open_positions = data
+            if data:
+                logger.info(f"📂 Loaded {len(self._open_positions)} positions from {self._legacy_positions.path}")
         except Exception as e:
             logger.error(f"Failed to load positions: {e}")
             self._open_positions = {}
 
-    def _save_positions(self) -> None:
-        """Save positions to file"""
+    def _migrate_legacy_positions(self) -> None:
+        """Move legacy-format entries (no status) from the old shared open_positions file into the legacy journal"""
+        legacy = {
+            mint: position
+            for mint, position in self.positions.get_all().items()
+            if isinstance(position, dict) and "status" not in position
+            and "entry_price" in position and "entry_time" in position
+        }
+        for mint, position in legacy.items():
+            self._legacy_positions.add_position(mint, position)
+            self.positions.remove_position(mint)  # kerran: myytyä positiota ei tuoda uudelleen
+        if legacy:
+            logger.info(f"📦 Migrated {len(legacy)} legacy positions from {self.positions.path} to {self._legacy_positions.path}")
+
+    def _save_position(self, mint: str) -> None:
+        """Journal one position change (add or removal) instead of rewriting the whole file"""
         try:
-            with open(self._positions_file, 'w') as f:
-                json.dump(self._open_positions, f, indent=2)
+            if mint in self._open_positions:
+                self._legacy_positions.add_position(mint, self._open_positions[mint])
+            else:
+                self._legacy_positions.remove_position(mint)
         except Exception as e:
-            logger.error(f"Failed to save positions: {e}")
+            logger.error(f"Failed to save position {mint}: {e}")
 
     async def _force_sell_all_positions(self) -> None:
         """Force sell all positions on startup to get cash back"""
@@ -2885,7 +3152,7 @@ class HeliusTokenScannerBot:
                     
                     # Remove from tracking
                     del self._open_positions[mint]
-                    self._save_positions()
+                    self._save_position(mint)
                     
                     # Send Telegram notification
                     if self.telegram_bot and self.telegram_bot.enabled:
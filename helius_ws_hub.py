@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Helius WS Hub - yksi jaettu Helius WebSocket -yhteys prosessin kaikille tilaajille
+Identtiset tilaukset (method + params) yhdistetään yhdeksi kanavaksi, jokainen notifikaatio dekoodataan kerran
+ja jaetaan tilaajien rajattuihin jonoihin. Heartbeat, reconnect + uudelleentilaus ja slot-aukkojen raportointi.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import itertools
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Union
+
+from prometheus_client import Counter, Gauge
+
+from frame_capture import active_recorder
+from ws_prefilter import FramePrefilter
+
+try:
+    import websockets  # type: ignore
+except Exception:  # pragma: no cover
+    websockets = None  # type: ignore
+
+log = logging.getLogger(__name__)
+
+hub_frames_metric = Counter(
+    "helius_hub_frames_total",
+    "Frames received by the Helius WS hub per outcome",
+    ["outcome"],
+)
+hub_delivered_metric = Counter(
+    "helius_hub_delivered_total",
+    "Notifications delivered to a hub subscriber",
+    ["subscriber"],
+)
+hub_dropped_metric = Counter(
+    "helius_hub_dropped_total",
+    "Notifications dropped because a subscriber queue was full",
+    ["subscriber"],
+)
+hub_reconnects_metric = Counter(
+    "helius_hub_reconnects_total",
+    "Helius WS hub reconnects",
+)
+hub_slot_gap_metric = Counter(
+    "helius_hub_slot_gap_slots_total",
+    "Slots missed across Helius WS hub reconnects",
+)
+hub_channels_metric = Gauge(
+    "helius_hub_channels",
+    "Distinct subscriptions held on the Helius WS hub connection",
+)
+
+_SUBSCRIPTION_RE = re.compile(r'"subscription"\s*:\s*(\d+)')
+_SLOT_RE = re.compile(r'"slot"\s*:\s*(\d+)')
+
+
+@dataclass
+class HubNotification:
+    """Yksi dekoodattu notifikaatio (params.result)"""
+    method: str
+    slot: Optional[int]
+    value: Any
+    received_at: float = 0.0  # perf_counter kehyksen saapuessa (stage_trace: frame_received)
+
+
+@dataclass
+class SlotGap:
+    """Reconnectin aikana ohitetut slotit [first_slot, last_slot] -> tilaaja voi täydentää (backfill)"""
+    first_slot: int
+    last_slot: int
+
+    @property
+    def slots(self) -> int:
+        return self.last_slot - self.first_slot + 1
+
+
+HubItem = Union[HubNotification, SlotGap]
+
+
+@dataclass
+class _Channel:
+    method: str
+    params: list
+    subscribers: Set["HubSubscription"] = field(default_factory=set)
+    server_id: Optional[int] = None
+
+
+class HubSubscription:
+    """Tilaajan kahva: rajattu jono (täynnä -> vanhin pudotetaan), valinnainen esisuodatin"""
+
+    def __init__(self, hub: "HeliusWsHub", name: str, maxsize: int, prefilter: Optional[FramePrefilter]):
+        self.hub = hub
+        self.name = name
+        self.prefilter = prefilter
+        self.keys: List[str] = []
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, int(maxsize)))
+        self._closed = False
+        self.stats = {"delivered": 0, "dropped": 0}
+
+    async def get(self) -> Optional[HubItem]:
+        """Seuraava notifikaatio tai SlotGap; None kun tilaus on suljettu"""
+        if self._closed and self._queue.empty():
+            return None
+        return await self._queue.get()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> HubItem:
+        item = await self.get()
+        if item is None:
+            raise StopAsyncIteration
+        return item
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self.hub._remove(self)
+        self._deliver(None)  # herätä odottava get()
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def _admit(self, raw: str) -> bool:
+        return self.prefilter is None or self.prefilter.admit(raw)
+
+    def _deliver(self, item: Optional[HubItem]) -> None:
+        if self._queue.full():
+            with contextlib.suppress(asyncio.QueueEmpty):
+                self._queue.get_nowait()
+            self.stats["dropped"] += 1
+            hub_dropped_metric.labels(subscriber=self.name).inc()
+        self._queue.put_nowait(item)
+        if item is not None:
+            self.stats["delivered"] += 1
+            hub_delivered_metric.labels(subscriber=self.name).inc()
+
+
+class HeliusWsHub:
+    """
+    Jaettu Helius WS -yhteys
+
+    - subscribe_logs(mentions, name=...) palauttaa HubSubscriptionin; sama (method, params) tilataan palvelimelta vain kerran
+    - notifikaatio reititetään subscription-id:n perusteella; tilaajien esisuodattimet katsovat raakakehyksen
+      ja kehys dekoodataan vain jos joku tilaaja sen haluaa (ja silloin vain kerran)
+    - yhteys avataan ensimmäisestä tilauksesta; katkossa reconnect backoffilla ja kaikki kanavat tilataan uudelleen
+    - reconnectin jälkeen ensimmäisen notifikaation slotista lasketaan aukko -> SlotGap kaikille tilaajille
+    """
+
+    def __init__(
+        self,
+        ws_url: str,
+        *,
+        ping_interval: float = 20.0,
+        ping_timeout: float = 10.0,
+        reconnect_initial_sec: float = 1.0,
+        reconnect_max_sec: float = 30.0,
+        connect: Optional[Callable[..., Any]] = None,
+    ):
+        self.ws_url = ws_url
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.reconnect_initial_sec = reconnect_initial_sec
+        self.reconnect_max_sec = reconnect_max_sec
+        self._connect = connect or (websockets.connect if websockets else None)
+        self._channels: Dict[str, _Channel] = {}
+        self._by_server_id: Dict[int, _Channel] = {}
+        self._pending_requests: Dict[int, _Channel] = {}
+        self._req_ids = itertools.count(1)
+        self._ws = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self._recorder = None
+        self._last_slot = 0
+        self._gap_from: Optional[int] = None
+        self.stats = {"connects": 0, "frames": 0, "decoded": 0, "skipped": 0, "control": 0, "unrouted": 0, "slot_gaps": 0}
+
+    # --- julkinen API ---
+
+    def subscribe_logs(
+        self,
+        mentions: Union[str, Iterable[str]],
+        *,
+        name: str,
+        commitment: str = "confirmed",
+        prefilter: Optional[FramePrefilter] = None,
+        maxsize: int = 1000,
+    ) -> HubSubscription:
+        """logsSubscribe yhdelle tai useammalle ohjelmalle (yksi kanava per ohjelma, jaettu muiden kanssa)"""
+        programs = [mentions] if isinstance(mentions, str) else list(mentions)
+        sub = HubSubscription(self, name, maxsize, prefilter)
+        for program_id in programs:
+            self._attach(sub, "logsSubscribe", [{"mentions": [program_id]}, {"commitment": commitment}])
+        self._ensure_running()
+        return sub
+
+    def subscribe(
+        self,
+        method: str,
+        params: list,
+        *,
+        name: str,
+        prefilter: Optional[FramePrefilter] = None,
+        maxsize: int = 1000,
+    ) -> HubSubscription:
+        """Yleinen *Subscribe-tilaus (esim. accountSubscribe)"""
+        sub = HubSubscription(self, name, maxsize, prefilter)
+        self._attach(sub, method, params)
+        self._ensure_running()
+        return sub
+
+    async def close(self) -> None:
+        self._closed = True
+        for channel in list(self._channels.values()):
+            for sub in list(channel.subscribers):
+                sub.close()
+        task, self._task = self._task, None
+        if task and not task.done():
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    def backlog(self) -> int:
+        """Täysimmän tilaajajonon pituus (toiston vastapaine)"""
+        return max((sub.qsize() for ch in self._channels.values() for sub in ch.subscribers), default=0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        subscribers: Dict[str, Dict[str, int]] = {}
+        for channel in self._channels.values():
+            for sub in channel.subscribers:
+                subscribers[sub.name] = {**sub.stats, "queue": sub.qsize()}
+        return {
+            **self.stats,
+            "connected": self._ws is not None,
+            "channels": len(self._channels),
+            "last_slot": self._last_slot,
+            "subscribers": subscribers,
+        }
+
+    # --- kanavat ---
+
+    @staticmethod
+    def _key(method: str, params: list) -> str:
+        return method + ":" + json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+    def _attach(self, sub: HubSubscription, method: str, params: list) -> None:
+        key = self._key(method, params)
+        channel = self._channels.get(key)
+        if channel is None:
+            channel = self._channels[key] = _Channel(method=method, params=params)
+            hub_channels_metric.set(len(self._channels))
+            if self._ws is not None:
+                asyncio.get_running_loop().create_task(self._send_subscribe(self._ws, channel))
+        channel.subscribers.add(sub)
+        sub.keys.append(key)
+
+    def _remove(self, sub: HubSubscription) -> None:
+        for key in sub.keys:
+            channel = self._channels.get(key)
+            if channel is None:
+                continue
+            channel.subscribers.discard(sub)
+            if channel.subscribers:
+                continue
+            # viimeinen tilaaja poistui -> peru palvelimen tilaus
+            self._channels.pop(key, None)
+            hub_channels_metric.set(len(self._channels))
+            if channel.server_id is not None:
+                self._by_server_id.pop(channel.server_id, None)
+                if self._ws is not None and not self._closed:
+                    unsub = channel.method.replace("Subscribe", "Unsubscribe")
+                    with contextlib.suppress(RuntimeError):
+                        asyncio.get_running_loop().create_task(
+                            self._send(self._ws, {"jsonrpc": "2.0", "id": next(self._req_ids), "method": unsub, "params": [channel.server_id]})
+                        )
+
+    # --- yhteys ---
+
+    def _ensure_running(self) -> None:
+        if self._closed or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="helius_ws_hub")
+
+    async def _run(self) -> None:
+        backoff = self.reconnect_initial_sec
+        while not self._closed:
+            try:
+                async with self._connect(
+                    self.ws_url,
+                    ping_interval=self.ping_interval,
+                    ping_timeout=self.ping_timeout,
+                    close_timeout=10,
+                ) as ws:
+                    self._on_connected(ws)
+                    for channel in list(self._channels.values()):
+                        await self._send_subscribe(ws, channel)
+                    backoff = self.reconnect_initial_sec
+                    async for raw in ws:
+                        self._on_frame(raw)
+                log.info("Helius WS hub: yhteys suljettu")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.info("Helius WS hub: yhteysvirhe: %s", e)
+            finally:
+                self._ws = None
+            if self._closed:
+                break
+            hub_reconnects_metric.inc()
+            await asyncio.sleep(backoff)
+            backoff = min(self.reconnect_max_sec, max(backoff * 2.0, 0.1))
+
+    def _on_connected(self, ws) -> None:
+        self._ws = ws
+        self._recorder = active_recorder()
+        self._by_server_id.clear()
+        self._pending_requests.clear()
+        for channel in self._channels.values():
+            channel.server_id = None
+        self.stats["connects"] += 1
+        if self.stats["connects"] > 1 and self._last_slot:
+            self._gap_from = self._last_slot
+        log.info("✅ Helius WS hub: yhdistetty (%d kanavaa)", len(self._channels))
+
+    async def _send(self, ws, message: dict) -> None:
+        if self._recorder is not None:
+            self._recorder.record_ws_out(self.ws_url, message)
+        try:
+            await ws.send(json.dumps(message))
+        except Exception as e:
+            log.debug("Helius WS hub: lähetys epäonnistui: %s", e)
+
+    async def _send_subscribe(self, ws, channel: _Channel) -> None:
+        req_id = next(self._req_ids)
+        self._pending_requests[req_id] = channel
+        await self._send(ws, {"jsonrpc": "2.0", "id": req_id, "method": channel.method, "params": channel.params})
+
+    # --- kehykset ---
+
+    def _on_frame(self, raw: Union[str, bytes]) -> None:
+        received_at = time.perf_counter()
+        if isinstance(raw, (bytes, bytearray)):
+            raw = bytes(raw).decode("utf-8", errors="replace")
+        if self._recorder is not None:
+            self._recorder.record_ws_in(self.ws_url, raw)
+        self.stats["frames"] += 1
+        if "Notification" not in raw:
+            self._on_control(raw)
+            return
+        m = _SLOT_RE.search(raw)
+        if m is not None:
+            self._note_slot(int(m.group(1)))
+        idx = raw.rfind('"subscription"')
+        m = _SUBSCRIPTION_RE.search(raw, idx) if idx >= 0 else None
+        channel = self._by_server_id.get(int(m.group(1))) if m is not None else None
+        if channel is None:
+            self._count("unrouted")
+            return
+        targets = [sub for sub in channel.subscribers if sub._admit(raw)]
+        if not targets:
+            self._count("skipped")
+            return
+        try:
+            message = json.loads(raw)
+            result = message["params"]["result"]
+        except (ValueError, KeyError, TypeError):
+            self._count("unrouted")
+            return
+        self._count("decoded")
+        if isinstance(result, dict) and "value" in result:
+            slot = (result.get("context") or {}).get("slot")
+            value = result.get("value")
+        else:
+            slot, value = None, result
+        note = HubNotification(method=message.get("method", ""), slot=slot, value=value, received_at=received_at)
+        for sub in targets:
+            sub._deliver(note)
+
+    def _on_control(self, raw: str) -> None:
+        self._count("control")
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            return
+        if not isinstance(message, dict):
+            return
+        channel = self._pending_requests.pop(message.get("id"), None)
+        if channel is None:
+            return
+        if "error" in message:
+            log.warning("Helius WS hub: tilaus %s hylättiin: %s", channel.method, message["error"])
+            return
+        server_id = message.get("result")
+        if isinstance(server_id, int) and not isinstance(server_id, bool):
+            channel.server_id = server_id
+            self._by_server_id[server_id] = channel
+            log.info("✅ Helius WS hub: %s vahvistettu (id=%s, tilaajia %d)", channel.method, server_id, len(channel.subscribers))
+
+    def _note_slot(self, slot: int) -> None:
+        if self._gap_from is not None:
+            gap_from, self._gap_from = self._gap_from, None
+            if slot > gap_from + 1:
+                gap = SlotGap(first_slot=gap_from + 1, last_slot=slot - 1)
+                self.stats["slot_gaps"] += 1
+                hub_slot_gap_metric.inc(gap.slots)
+                log.warning("Helius WS hub: reconnect ohitti slotit %d-%d (%d)", gap.first_slot, gap.last_slot, gap.slots)
+                notified: Set[HubSubscription] = set()
+                for channel in self._channels.values():
+                    for sub in channel.subscribers - notified:
+                        sub._deliver(gap)
+                        notified.add(sub)
+        if slot > self._last_slot:
+            self._last_slot = slot
+
+    def _count(self, outcome: str) -> None:
+        self.stats[outcome] += 1
+        hub_frames_metric.labels(outcome=outcome).inc()
+
+
+# Prosessin jaetut hubit URL:n mukaan
+_hubs: Dict[str, HeliusWsHub] = {}
+
+
+def get_helius_hub(ws_url: str) -> HeliusWsHub:
+    """Palauta URL:n jaettu hubi (luodaan ensimmäisellä kutsulla)"""
+    hub = _hubs.get(ws_url)
+    if hub is None or hub._closed:
+        hub = _hubs[ws_url] = HeliusWsHub(ws_url)
+    return hub
+
+
+def register_helius_hub(hub: HeliusWsHub) -> None:
+    """Aseta hubi URL:n jaetuksi instanssiksi (esim. frame_capture-toisto)"""
+    _hubs[hub.ws_url] = hub
+
+
+async def close_helius_hubs() -> None:
+    """Sulje kaikki hubit (sammutus)"""
+    for hub in list(_hubs.values()):
+        try:
+            await hub.close()
+        except Exception as e:
+            log.warning("Helius WS hub close failed: %s", e)
+    _hubs.clear()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+HTTP Pool - sovelluksenlaajuinen jaettu aiohttp-client REST-providereille
+Yksi ClientSession + TCPConnector: keep-alive yhteydet per host, DNS-välimuisti, per-host rinnakkaisuusraja
+ja yhtenäinen timeout/retry-politiikka -> ei uutta TCP+TLS-kättelyä jokaisella pyynnöllä
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+from prometheus_client import Counter, Gauge, Histogram
+
+log = logging.getLogger(__name__)
+
+http_request_duration_metric = Histogram(
+    "http_client_request_duration_seconds",
+    "Duration of pooled HTTP requests per host",
+    ["host"],
+    buckets=(0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10),
+)
+http_inflight_metric = Gauge(
+    "http_client_inflight_requests",
+    "Pooled HTTP requests currently in flight per host",
+    ["host"],
+)
+http_requests_metric = Counter(
+    "http_client_requests_total",
+    "Pooled HTTP requests per host and outcome",
+    ["host", "outcome"],
+)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+@dataclass
+class HttpPoolConfig:
+    """Poolin asetukset (oletukset envistä HTTP_POOL_*)"""
+    limit_total: int = 100
+    limit_per_host: int = 20
+    dns_ttl_sec: int = 300
+    keepalive_timeout_sec: float = 30.0
+    timeout_sec: float = 10.0
+    connect_timeout_sec: float = 5.0
+    tries: int = 2
+    backoff_initial_sec: float = 0.5
+    backoff_max_sec: float = 3.0
+    host_limits: Dict[str, int] = field(default_factory=dict)  # esim. {"api.dexscreener.com": 4}
+
+    @classmethod
+    def from_env(cls) -> "HttpPoolConfig":
+        return cls(
+            limit_total=_env_int("HTTP_POOL_LIMIT_TOTAL", cls.limit_total),
+            limit_per_host=_env_int("HTTP_POOL_LIMIT_PER_HOST", cls.limit_per_host),
+            dns_ttl_sec=_env_int("HTTP_POOL_DNS_TTL_SEC", cls.dns_ttl_sec),
+            keepalive_timeout_sec=_env_float("HTTP_POOL_KEEPALIVE_SEC", cls.keepalive_timeout_sec),
+            timeout_sec=_env_float("HTTP_POOL_TIMEOUT_SEC", cls.timeout_sec),
+            connect_timeout_sec=_env_float("HTTP_POOL_CONNECT_TIMEOUT_SEC", cls.connect_timeout_sec),
+            tries=_env_int("HTTP_POOL_TRIES", cls.tries),
+        )
+
+
+@dataclass
+class _HostStats:
+    requests: int = 0
+    errors: int = 0
+    inflight: int = 0
+    total_latency: float = 0.0
+
+
+class HttpClient:
+    """
+    Jaettu HTTP-client kaikille REST-providereille
+
+    - session() luo ClientSessionin laiskasti käynnissä olevaan event looppiin (uusi loop -> uusi sessio)
+    - request() on async context manager: per-host semafori, latenssi- ja in-flight-metriikat
+    - get_json()/post_json(): yhtenäinen retry (verkko-/timeout-virheet, 429 ja 5xx) eksponentiaalisella backoffilla;
+      muut 4xx nostetaan heti aiohttp.ClientResponseError:na
+    """
+
+    def __init__(self, config: Optional[HttpPoolConfig] = None):
+        self.config = config or HttpPoolConfig()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._host_sems: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, _HostStats] = {}
+
+    # --- elinkaari ---
+
+    async def start(self) -> None:
+        await self.session()
+
+    async def close(self) -> None:
+        session, self._session = self._session, None
+        self._loop = None
+        self._host_sems.clear()
+        if session and not session.closed:
+            await session.close()
+
+    async def session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            cfg = self.config
+            connector = aiohttp.TCPConnector(
+                limit=cfg.limit_total,
+                limit_per_host=cfg.limit_per_host,
+                ttl_dns_cache=cfg.dns_ttl_sec,
+                keepalive_timeout=cfg.keepalive_timeout_sec,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=cfg.timeout_sec, connect=cfg.connect_timeout_sec),
+            )
+            self._loop = loop
+            self._host_sems.clear()  # semaforit sidottu vanhaan looppiin
+        return self._session
+
+    # --- pyynnöt ---
+
+    def _sem(self, host: str) -> asyncio.Semaphore:
+        sem = self._host_sems.get(host)
+        if sem is None:
+            limit = self.config.host_limits.get(host, self.config.limit_per_host)
+            sem = self._host_sems[host] = asyncio.Semaphore(max(1, limit))
+        return sem
+
+    @contextlib.asynccontextmanager
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        """Yksi pyyntö poolin kautta (ei retrytä); vastaus luetaan context managerin sisällä"""
+        host = urlsplit(url).hostname or "unknown"
+        stats = self._stats.setdefault(host, _HostStats())
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout, connect=self.config.connect_timeout_sec)
+        session = await self.session()
+        async with self._sem(host):
+            stats.inflight += 1
+            http_inflight_metric.labels(host=host).inc()
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                async with session.request(method, url, **kwargs) as response:
+                    outcome = str(response.status)
+                    yield response
+            finally:
+                elapsed = time.perf_counter() - started
+                stats.inflight -= 1
+                stats.requests += 1
+                stats.total_latency += elapsed
+                if outcome == "error" or int(outcome) >= 400:
+                    stats.errors += 1
+                http_inflight_metric.labels(host=host).dec()
+                http_request_duration_metric.labels(host=host).observe(elapsed)
+                http_requests_metric.labels(host=host, outcome=outcome).inc()
+
+    async def request_json(
+        self,
+        method: str,
+        url: str,
+        *,
+        tries: Optional[int] = None,
+        timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """Pyyntö + JSON-vastaus yhtenäisellä retry-politiikalla; viimeisin virhe nostetaan"""
+        attempts = max(1, tries if tries is not None else self.config.tries)
+        backoff = self.config.backoff_initial_sec
+        for attempt in range(attempts):
+            try:
+                async with self.request(method, url, timeout=timeout, **kwargs) as response:
+                    if response.status >= 400:
+                        raise aiohttp.ClientResponseError(
+                            response.request_info,
+                            response.history,
+                            status=response.status,
+                            message=await response.text(),
+                        )
+                    data = await response.json(content_type=None)
+                    if _recorder is not None:
+                        _recorder.record_http(method, url, kwargs.get("params"), kwargs.get("json"), data)
+                    return data
+            except aiohttp.ClientResponseError as exc:
+                if exc.status not in RETRY_STATUSES or attempt == attempts - 1:
+                    raise
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == attempts - 1:
+                    raise
+            await asyncio.sleep(backoff)
+            backoff = min(self.config.backoff_max_sec, backoff * 2)
+
+    async def get_json(self, url: str, **kwargs: Any) -> Any:
+        return await self.request_json("GET", url, **kwargs)
+
+    async def post_json(self, url: str, **kwargs: Any) -> Any:
+        return await self.request_json("POST", url, **kwargs)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            host: {
+                "requests": s.requests,
+                "errors": s.errors,
+                "inflight": s.inflight,
+                "avg_latency_sec": (s.total_latency / s.requests) if s.requests else 0.0,
+            }
+            for host, s in self._stats.items()
+        }
+
+
+# Globaalisti käytettävä instanssi
+_client: Optional[HttpClient] = None
+# init_http_client()-viitteet (botit + käynnistysskripti), close_http_client() vähentää
+_owners = 0
+# Vastausten tallennin (frame_capture.CaptureRecorder), None = pois
+_recorder: Optional[Any] = None
+
+
+def get_http_client() -> HttpClient:
+    """Palauta jaettu client (luodaan laiskasti env-asetuksilla)"""
+    global _client
+    if _client is None:
+        _client = HttpClient(HttpPoolConfig.from_env())
+    return _client
+
+
+async def init_http_client(config: Optional[HttpPoolConfig] = None) -> HttpClient:
+    """
+    Ota jaettu client käyttöön botin käynnistyksessä (viitelaskettu)
+
+    Jokainen init vaatii oman close_http_client()-kutsun; sessio suljetaan vasta viimeisen käyttäjän
+    sulkiessa. config vaihtaa clientin vain, jos kukaan muu ei vielä omista sitä.
+    """
+    global _client, _owners
+    if config is not None and _owners == 0 and _client is not None:
+        await _client.close()
+        _client = None
+    client = _client or HttpClient(config or HttpPoolConfig.from_env())
+    _client = client
+    await client.start()
+    _owners += 1
+    return client
+
+
+def set_http_client(client: Optional[HttpClient]) -> Optional[HttpClient]:
+    """Vaihda jaettu client (esim. tallenteen toisto); palauttaa edellisen"""
+    global _client
+    previous, _client = _client, client
+    return previous
+
+
+def set_response_recorder(recorder: Optional[Any]) -> None:
+    """Kirjaa onnistuneet JSON-vastaukset tallentimeen (record_http); None lopettaa"""
+    global _recorder
+    _recorder = recorder
+
+
+async def close_http_client() -> None:
+    """Vapauta init_http_client()-viite; viimeinen vapautus sulkee jaetun clientin"""
+    global _client, _owners
+    if _owners > 1:
+        _owners -= 1
+        return
+    _owners = 0
+    client, _client = _client, None
+    if client is not None:
+        await client.close()
@@ -18,6 +18,11 @@ from collections import deque
 from dotenv import load_dotenv
 from telegram_bot_integration import TelegramBot
 from config import load_config
+from windowed_stats import WindowedQuantiles, WINDOW_60M
+from trade_window import TradeWindowStore, WINDOW_30S, WINDOW_3M
+from http_pool import close_http_client, init_http_client
+from jsonl_sink import get_sink
+from stage_trace import close_stage_trace, configure_stage_trace, finish as finish_trace, mark as mark_stage, trace_of
 
 # PumpPortal Trading Client import
 try:
@@ -1610,10 +1615,17 @@ class HybridTradingBot:
         self.hot_candidates_history = getattr(self, 'hot_candidates_history', deque(maxlen=1000))
         self.recent_hot_candidates = getattr(self, 'recent_hot_candidates', deque(maxlen=100))
         self.hot_candidate_count_history = deque(maxlen=200)
-        self.cycle_durations = []
+        self.cycle_durations = WindowedQuantiles(window_sec=WINDOW_60M, bucket_sec=60.0)  # p95 todellisessa 60 min ikkunassa
         self.daily_pnl_history = []
         self.max_drawdown_today = 0.0
         self.live_trading_enabled = False
+        # Syklien analyysit yhteen vuorokausittain rotatoituvaan JSONL-tiedostoon taustakirjoittajan kautta
+        self._analysis_sink = get_sink(
+            os.getenv("HYBRID_ANALYSIS_PATH", "hybrid_trading_analysis.jsonl"),
+            json_default=self._json_default,
+            rotate_interval_sec=24 * 3600.0,
+            compress=True,
+        )
 
         # Telegram viestien dedupe
         self._last_summary_signature = None
@@ -1623,6 +1635,7 @@ class HybridTradingBot:
         self._de_started = False
         self.discovery_engine = None
         self._cfg = None  # cachetaan config
+        self._http_acquired = False
         
         # Trading client
         self._trade_client = None
@@ -1635,7 +1648,12 @@ class HybridTradingBot:
         self._sniper_positions: Dict[str, Dict[str, Any]] = {}
         self._sniper_candidates: Dict[str, Any] = {}
         self._sniper_attempt_log: Dict[str, float] = {}
-        self._ws_trade_metrics: Dict[str, Dict[str, Any]] = {}
+        # Liukuvat trade-ikkunat: PumpPortal WS kirjaa, sniper ja DiscoveryEngine lukevat samaa varastoa
+        try:
+            trade_window_cfg = getattr(load_config().discovery, "trade_windows", None)
+        except Exception:
+            trade_window_cfg = None
+        self.trade_windows = TradeWindowStore.from_config(trade_window_cfg)
 
         # Performance tracking
         self.performance_metrics = {
@@ -1738,6 +1756,8 @@ class HybridTradingBot:
                         sources.append(PumpPortalWSNewTokensSource(
                             on_new_token=self._on_new_token_from_ws,
                             on_trade=self._on_trade_from_ws,
+                            trade_windows=self.trade_windows,
+                            candidate_score=self._trade_subscription_score,
                         ))
                         logger.info("✅ PumpPortal WS new-token source lisätty")
                     except Exception as e:
@@ -1788,8 +1808,13 @@ class HybridTradingBot:
             rpc_endpoint=endpoints[0],
             market_sources=sources,
             min_liq_usd=cfg.discovery.min_liq_usd,
-            rpc_client=rpc
+            rpc_client=rpc,
+            trade_windows=self.trade_windows,
         )
+        configure_stage_trace()  # STAGE_TRACE_SAMPLE_RATE / STAGE_TRACE_LOG
+        if not self._http_acquired:
+            await init_http_client()  # jaettu REST-pooli, vapautetaan stop():ssa
+            self._http_acquired = True
         await self.discovery_engine.start()
         self._de_started = True
         logger.info(f"✅ DiscoveryEngine käynnissä: {len(sources)} lähdettä")
@@ -2200,6 +2225,16 @@ class HybridTradingBot:
                 logger.info("✅ DiscoveryEngine pysäytetty siististi")
             except Exception as e:
                 logger.warning(f"⚠️ Virhe pysäytettäessä DiscoveryEngine: {e}")
+
+        if getattr(self, "_http_acquired", False):
+            self._http_acquired = False
+            await close_http_client()
+
+        try:
+            await self._analysis_sink.close()
+            await close_stage_trace()
+        except Exception as e:
+            logger.warning(f"⚠️ Virhe analyysilokin sulkemisessa: {e}")
         
         logger.info("✅ HybridTradingBot pysäytetty")
     
@@ -2298,7 +2333,7 @@ class HybridTradingBot:
                 mint = getattr(candidate, 'mint', 'unknown')
                 source_name = getattr(candidate, 'source', None) or ((getattr(candidate, 'extra', {}) or {}).get('source') if getattr(candidate, 'extra', None) else None)
                 if source_name == 'pumpportal_ws':
-                    metrics = self._ws_trade_metrics.get(mint)
+                    metrics = self._trade_window_metrics(mint)
                     if metrics:
                         self._apply_trade_metrics(candidate, metrics)
                     if not self._is_viable_ws_candidate(candidate):
@@ -2417,23 +2452,8 @@ class HybridTradingBot:
             else:
                 hot_per_hour = 0
             
-            if len(self.cycle_durations) > 0:
-                sorted_durations = sorted(self.cycle_durations)
-                p95_index = int(0.95 * len(sorted_durations))
-                p95_cycle = sorted_durations[p95_index] if p95_index < len(sorted_durations) else sorted_durations[-1]
-            else:
-                p95_cycle = 0
-            
-            spam_ratio = 0
-            try:
-                from metrics import metrics as global_metrics
-                if global_metrics:
-                    filtered_total = global_metrics.candidates_filtered._value._value
-                    in_total = sum(global_metrics.candidates_in._metrics.values())
-                    if in_total > 0:
-                        spam_ratio = filtered_total / in_total
-            except:
-                pass
+            p95_cycle = self._p95_cycle_duration() or 0
+            spam_ratio = self._spam_ratio() or 0
             
             stats_data['burn_in_status'] = {
                 'hot_per_hour': hot_per_hour,
@@ -2460,11 +2480,8 @@ class HybridTradingBot:
                 maxlen=self.hot_candidate_count_history.maxlen,
             )
             
-            # Cycle durations
-            self.cycle_durations.append(cycle_duration)
-            # Pidä vain viimeiset 100 sykliä
-            if len(self.cycle_durations) > 100:
-                self.cycle_durations = self.cycle_durations[-100:]
+            # Cycle durations (aikaikkunoitu kvantiiliskissi, O(1) lisäys)
+            self.cycle_durations.add(cycle_duration)
             
             # Laske metriikat
             try:
@@ -2478,23 +2495,11 @@ class HybridTradingBot:
                         metrics.hot_candidates_per_hour.set(hot_per_hour)
                     
                     # P95 cycle duration
-                    if len(self.cycle_durations) > 0:
-                        sorted_durations = sorted(self.cycle_durations)
-                        p95_index = int(0.95 * len(sorted_durations))
-                        p95_duration = sorted_durations[p95_index] if p95_index < len(sorted_durations) else sorted_durations[-1]
+                    p95_duration = self._p95_cycle_duration()
+                    if p95_duration is not None:
                         metrics.cycle_p95_duration.set(p95_duration)
                     
-                    # Spam ratio (filtered/total)
-                    try:
-                        from metrics import metrics as global_metrics
-                        if global_metrics:
-                            filtered_total = global_metrics.candidates_filtered._value._value
-                            in_total = sum(global_metrics.candidates_in._metrics.values())
-                            if in_total > 0:
-                                spam_ratio = filtered_total / in_total
-                                metrics.spam_ratio.set(spam_ratio)
-                    except:
-                        pass
+                    # spam_ratio-gaugen kirjoittaa DiscoveryEngine (yksi ikkuna ja määritelmä)
             except Exception:
                 pass
             
@@ -2504,6 +2509,15 @@ class HybridTradingBot:
         except Exception as e:
             logger.error(f"Virhe päivittäessä burn-in metriikoita: {e}")
     
+    def _p95_cycle_duration(self) -> Optional[float]:
+        """P95 syklin kesto viimeisen tunnin ajalta (None jos ei dataa)"""
+        return self.cycle_durations.quantile(0.95)
+
+    def _spam_ratio(self) -> Optional[float]:
+        """Hylättyjen osuus pikafiltterin läpi kulkeneista (DiscoveryEngine.spam_ratio, None jos ei dataa)"""
+        spam_ratio = getattr(self.discovery_engine, "spam_ratio", None)
+        return spam_ratio() if callable(spam_ratio) else None
+
     def _check_burn_in_criteria(self):
         """Tarkista burn-in hyväksymiskriteerit"""
         try:
@@ -2521,30 +2535,20 @@ class HybridTradingBot:
                     logger.info(f"✅ Burn-in: Hot candidates/h = {hot_per_hour:.1f} >= 2.0 (kriteeri täyttyy)")
             
             # P95 cycle < 3s
-            if len(self.cycle_durations) > 0:
-                sorted_durations = sorted(self.cycle_durations)
-                p95_index = int(0.95 * len(sorted_durations))
-                p95_duration = sorted_durations[p95_index] if p95_index < len(sorted_durations) else sorted_durations[-1]
-                
+            p95_duration = self._p95_cycle_duration()
+            if p95_duration is not None:
                 if p95_duration > 3.0:
                     logger.warning(f"⚠️ Burn-in: P95 cycle = {p95_duration:.2f}s > 3.0s (kriteeri ei täyty)")
                 else:
                     logger.info(f"✅ Burn-in: P95 cycle = {p95_duration:.2f}s <= 3.0s (kriteeri täyttyy)")
             
             # Spam ratio < 80%
-            try:
-                from metrics import metrics as global_metrics
-                if global_metrics:
-                    filtered_total = global_metrics.candidates_filtered._value._value
-                    in_total = sum(global_metrics.candidates_in._metrics.values())
-                    if in_total > 0:
-                        spam_ratio = filtered_total / in_total
-                        if spam_ratio > 0.8:
-                            logger.warning(f"⚠️ Burn-in: Spam ratio = {spam_ratio:.1%} > 80% (kriteeri ei täyty)")
-                        else:
-                            logger.info(f"✅ Burn-in: Spam ratio = {spam_ratio:.1%} <= 80% (kriteeri täyttyy)")
-            except:
-                pass
+            spam_ratio = self._spam_ratio()
+            if spam_ratio is not None:
+                if spam_ratio > 0.8:
+                    logger.warning(f"⚠️ Burn-in: Spam ratio = {spam_ratio:.1%} > 80% (kriteeri ei täyty)")
+                else:
+                    logger.info(f"✅ Burn-in: Spam ratio = {spam_ratio:.1%} <= 80% (kriteeri täyttyy)")
                 
         except Exception as e:
             logger.error(f"Virhe tarkistettaessa burn-in kriteereitä: {e}")
@@ -2835,7 +2839,7 @@ class HybridTradingBot:
 
             self._sniper_candidates[mint] = candidate
 
-            metrics = self._ws_trade_metrics.get(mint)
+            metrics = self._trade_window_metrics(mint)
             if metrics:
                 self._apply_trade_metrics(candidate, metrics)
 
@@ -2977,7 +2981,10 @@ class HybridTradingBot:
 
             symbol = getattr(candidate, "symbol", None) or (candidate.get("symbol") if isinstance(candidate, dict) else mint[:6])
 
+            trace = trace_of(candidate)
             if trading_cfg.paper_trade:
+                mark_stage(trace, "trade_submitted")
+                finish_trace(candidate, "paper_buy", amount_sol=amount_sol)
                 logger.info(f"[PAPER-SNIPER] BUY mint={mint} amount_sol={amount_sol:.4f} ({symbol})")
                 try:
                     if metrics:
@@ -3005,8 +3012,10 @@ class HybridTradingBot:
                         slippage=trading_cfg.slippage,
                         priority_fee=trading_cfg.priority_fee,
                         pool=trading_cfg.pool,
+                        trace=trace,
                     )
             except Exception as e:
+                finish_trace(candidate, "buy_failed")
                 logger.error(f"Sniper buy failed mint={mint}: {e}")
                 try:
                     if metrics:
@@ -3015,6 +3024,7 @@ class HybridTradingBot:
                     pass
                 return False
 
+            finish_trace(candidate, "buy", amount_sol=amount_sol, sig=str(sig))
             logger.info(f"[SNIPER] BUY OK mint={mint} sig={sig}")
             if getattr(self, "telegram", None):
                 await self._safe_send_telegram(
@@ -3135,6 +3145,7 @@ class HybridTradingBot:
         window_sells = metrics.get('window_sells', 0)
         window_buyers = metrics.get('window_unique_buyers', 0)
         acceleration = metrics.get('acceleration', 0.0)
+        recent = metrics.get('recent_30s') or {}
 
         _set('buys_5m', window_buys)
         _set('sells_5m', window_sells)
@@ -3150,69 +3161,32 @@ class HybridTradingBot:
 
         if extra is not None:
             extra['buyer_acceleration'] = acceleration
-            extra['trade_buys_30s'] = window_buys
-            extra['trade_sells_30s'] = window_sells
-            extra['trade_unique_buyers_30s'] = window_buyers
-
-    def _record_trade_metrics(self, mint: str, trade: dict) -> Dict[str, Any]:
-        ts = float(trade.get('ts') or time.time())
-        side = str(trade.get('side') or trade.get('type') or '').lower()
-        trader = trade.get('trader') or trade.get('buyer') or trade.get('wallet') or trade.get('account')
-
-        metrics = self._ws_trade_metrics.setdefault(mint, {
-            'first_ts': ts,
-            'trades': deque(),
-            'total_buys': 0,
-            'total_sells': 0,
-            'buyers_total': set(),
-            'sellers_total': set(),
-            'window_buys': 0,
-            'window_sells': 0,
-            'window_unique_buyers': 0,
-            'acceleration': 0.0,
-        })
-
-        metrics['trades'].append((ts, side, trader))
-        metrics['last_ts'] = ts
-
-        if side == 'buy':
-            metrics['total_buys'] += 1
-            if trader:
-                metrics['buyers_total'].add(trader)
-        elif side == 'sell':
-            metrics['total_sells'] += 1
-            if trader:
-                metrics['sellers_total'].add(trader)
-
-        # Pidä viimeiset 3 minuuttia
-        window = metrics['trades']
-        cutoff = ts - 180.0
-        while window and window[0][0] < cutoff:
-            window.popleft()
-
-        window_buys = 0
-        window_sells = 0
-        window_buyers = set()
-        min_ts = ts
-        max_ts = ts
-        for entry_ts, entry_side, entry_trader in window:
-            min_ts = min(min_ts, entry_ts)
-            max_ts = max(max_ts, entry_ts)
-            if entry_side == 'buy':
-                window_buys += 1
-                if entry_trader:
-                    window_buyers.add(entry_trader)
-            elif entry_side == 'sell':
-                window_sells += 1
-
-        metrics['window_buys'] = window_buys
-        metrics['window_sells'] = window_sells
-        metrics['window_unique_buyers'] = len(window_buyers)
-
-        duration_min = max((max_ts - min_ts) / 60.0, 0.5)
-        metrics['acceleration'] = metrics['window_unique_buyers'] / duration_min if duration_min > 0 else metrics['window_unique_buyers']
-
-        return metrics
+            extra['trade_buys_30s'] = recent.get('buys', window_buys)
+            extra['trade_sells_30s'] = recent.get('sells', window_sells)
+            extra['trade_unique_buyers_30s'] = recent.get('unique_buyers', window_buyers)
+
+    def _trade_window_metrics(self, mint: str, now: Optional[float] = None) -> Dict[str, Any]:
+        """3 min ja 30 s trade-ikkunat jaetusta varastosta (PumpPortal WS kirjaa tradet)"""
+        entry = self.trade_windows.get(mint)
+        if entry is None:
+            return {}
+        window = self.trade_windows.window(mint, WINDOW_3M, now=now)
+        recent = self.trade_windows.window(mint, WINDOW_30S, now=now)
+        return {
+            'first_ts': entry.first_ts,
+            'last_ts': entry.last_ts,
+            'total_buys': entry.total_buys,
+            'total_sells': entry.total_sells,
+            'window_buys': window.buys,
+            'window_sells': window.sells,
+            'window_unique_buyers': window.unique_buyers,
+            'acceleration': window.acceleration,
+            'recent_30s': {
+                'buys': recent.buys,
+                'sells': recent.sells,
+                'unique_buyers': recent.unique_buyers,
+            },
+        }
 
     def _determine_sniper_size(self, candidate: 'TokenCandidate', trading_cfg) -> Optional[float]:
         liq = float(getattr(candidate, "liquidity_usd", 0.0) or 0.0)
@@ -3283,6 +3257,16 @@ class HybridTradingBot:
             "last_price": None,
         }
 
+    def _trade_subscription_score(self, mint: str) -> Optional[float]:
+        """PumpPortal trade-tilauksen prioriteetti: sniperin mintit aina pidetään, muuten DE:n score; None = ei enää ehdokas"""
+        if mint in self._sniper_positions or mint in self._sniper_candidates:
+            return float("inf")
+        engine = self.discovery_engine
+        if engine is None:
+            return 0.0
+        candidate = engine.processed_candidates.get(mint)
+        return float(candidate.overall_score) if candidate is not None else None
+
     async def _on_trade_from_ws(self, trade: dict) -> None:
         try:
             mint = trade.get("mint")
@@ -3304,7 +3288,7 @@ class HybridTradingBot:
             logger.warning(f"Sniper trade callback error: {e}")
 
     async def _process_sniper_trade_event(self, mint: str, trade: dict, trading_cfg) -> None:
-        metrics = self._record_trade_metrics(mint, trade)
+        metrics = self._trade_window_metrics(mint, now=float(trade.get('ts') or time.time()))
 
         candidate = self._sniper_candidates.get(mint)
         if candidate:
@@ -4134,18 +4118,11 @@ class HybridTradingBot:
         self.portfolio['total_pnl'] = total_value - 10000  # Alkuperäinen $10,000
     
     def _save_analysis_to_file(self, analysis_result: Dict):
-        """Tallenna analyysi tiedostoon"""
-        try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"hybrid_trading_analysis_{timestamp}.json"
-            
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(analysis_result, f, indent=2, ensure_ascii=False, default=self._json_default)
-            
-            logger.info(f"💾 Hybrid analyysi tulos tallennettu: {filename}")
-            
-        except Exception as e:
-            logger.error(f"Virhe analyysin tallentamisessa: {e}")
+        """Tallenna analyysi JSONL-sinkkiin (kirjoitus taustalla, ei blokkaa looppia)"""
+        if self._analysis_sink.write(analysis_result):
+            logger.info(f"💾 Hybrid analyysi tulos jonossa: {self._analysis_sink.path}")
+        else:
+            logger.error("Virhe analyysin tallentamisessa: rivi pudotettiin")
 
     @staticmethod
     def _json_default(obj):
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+JSONL Sink - taustakirjoittaja JSONL-lokeille (token_events, dex_rejects, analyysit)
+write() ei koskaan blokkaa event looppia: rivit puskuroidaan ja kirjoitetaan erissä säikeessä
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import shutil
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from prometheus_client import Counter, Gauge
+
+log = logging.getLogger(__name__)
+
+sink_backlog_metric = Gauge(
+    "jsonl_sink_backlog_records",
+    "Records waiting to be written by a JSONL sink",
+    ["sink"],
+)
+sink_dropped_metric = Counter(
+    "jsonl_sink_dropped_total",
+    "Records dropped by a JSONL sink (backlog full or unserialisable)",
+    ["sink"],
+)
+sink_written_metric = Counter(
+    "jsonl_sink_written_total",
+    "Records written by a JSONL sink",
+    ["sink"],
+)
+
+FSYNC_POLICIES = ("never", "batch", "close")
+
+
+class JsonlSink:
+    """
+    Erissä kirjoittava JSONL-tiedosto rotaatiolla
+
+    - write(record): serialisoi heti (kutsujan tilannekuva), lisää puskuriin; täysi puskuri -> rivi pudotetaan
+    - taustatehtävä kirjoittaa flush_interval_sec välein tai kun puskurissa on max_batch riviä
+    - fsync: "never" | "batch" (jokaisen erän jälkeen) | "close" (rotaatiossa ja sulkiessa)
+    - rotaatio kun tiedosto ylittää rotate_bytes tai on ollut auki rotate_interval_sec;
+      suljettu segmentti nimetään path.YYYYmmdd-HHMMSS ja pakataan gzipillä jos compress=True
+    - close() kirjoittaa kaiken jäljellä olevan (graceful shutdown); sen jälkeen write() käynnistää uuden kirjoittajan
+    - kirjoittaja sidotaan write()-kutsun event looppiin; jos looppi vaihtuu (testit), sidotaan uudelleen
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        flush_interval_sec: float = 1.0,
+        max_batch: int = 1000,
+        max_backlog: int = 100_000,
+        fsync: str = "never",
+        rotate_bytes: int = 0,
+        rotate_interval_sec: float = 0.0,
+        compress: bool = False,
+        json_default: Optional[Callable[[Any], Any]] = None,
+        name: Optional[str] = None,
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.path = path
+        self.name = name or os.path.basename(path)
+        self.flush_interval_sec = max(0.01, float(flush_interval_sec))
+        self.max_batch = max(1, int(max_batch))
+        self.max_backlog = max(1, int(max_backlog))
+        self.fsync = fsync
+        self.rotate_bytes = int(rotate_bytes or 0)
+        self.rotate_interval_sec = float(rotate_interval_sec or 0.0)
+        self.compress = compress
+        self.json_default = json_default
+        self._buf: Deque[str] = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._stopping = False
+        self._fh = None
+        self._opened_at = 0.0
+        self.stats = {"written": 0, "dropped": 0, "batches": 0, "rotations": 0, "errors": 0}
+
+    # --- julkinen API ---
+
+    def write(self, record: Any) -> bool:
+        """Lisää rivi puskuriin (ei blokkaa). False jos rivi pudotettiin."""
+        try:
+            line = json.dumps(record, ensure_ascii=False, default=self.json_default)
+        except (TypeError, ValueError):
+            self._drop()
+            log.debug("JsonlSink %s: unserialisable record dropped", self.name, exc_info=True)
+            return False
+        if len(self._buf) >= self.max_backlog:
+            self._drop()
+            return False
+        self._buf.append(line)
+        sink_backlog_metric.labels(sink=self.name).set(len(self._buf))
+        self._ensure_started()
+        if len(self._buf) >= self.max_batch and self._wakeup is not None:
+            try:
+                if asyncio.get_running_loop() is self._loop:
+                    self._wakeup.set()
+            except RuntimeError:
+                pass  # toisesta säikeestä: kirjoittaja herää flush-välillä
+        return True
+
+    async def flush(self) -> None:
+        """Kirjoita puskuri heti"""
+        await self._drain()
+
+    async def close(self) -> None:
+        """Pysäytä taustatehtävä, kirjoita kaikki jäljellä oleva ja sulje tiedosto"""
+        task, self._task = self._task, None
+        if task and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            # ei cancel(): kesken oleva erä (to_thread) kirjoitetaan loppuun eikä katoa
+            self._stopping = True
+            self._wakeup.set()
+            try:
+                await task
+            finally:
+                self._stopping = False
+        await self._drain()
+        if self._fh is not None:
+            fh, self._fh = self._fh, None
+            await asyncio.to_thread(self._close_file, fh)
+        self._loop = None
+        self._wakeup = None
+        self._write_lock = None
+
+    @property
+    def backlog(self) -> int:
+        return len(self._buf)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "backlog": len(self._buf)}
+
+    # --- sisäiset ---
+
+    def _drop(self) -> None:
+        self.stats["dropped"] += 1
+        sink_dropped_metric.labels(sink=self.name).inc()
+
+    def _bind_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._write_lock = asyncio.Lock()
+            self._task = None
+
+    def _ensure_started(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # ei loopia: rivit odottavat seuraavaa flushia/closea
+        self._bind_loop(loop)
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run(), name=f"jsonl_sink:{self.name}")
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            # asyncio.timeout eikä wait_for: wait_for (3.11) nielee peruutuksen, jos herätys osuu samaan kierrokseen
+            try:
+                async with asyncio.timeout(self.flush_interval_sec):
+                    await self._wakeup.wait()
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self._drain()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["errors"] += 1
+                log.warning("JsonlSink %s write failed: %s", self.name, e)
+
+    async def _drain(self) -> None:
+        self._bind_loop(asyncio.get_running_loop())
+        async with self._write_lock:
+            while self._buf:
+                batch: List[str] = []
+                while self._buf and len(batch) < self.max_batch:
+                    batch.append(self._buf.popleft())
+                try:
+                    await asyncio.to_thread(self._write_batch, batch)
+                except Exception:
+                    self.stats["dropped"] += len(batch)
+                    sink_dropped_metric.labels(sink=self.name).inc(len(batch))
+                    sink_backlog_metric.labels(sink=self.name).set(len(self._buf))
+                    raise
+                self.stats["written"] += len(batch)
+                self.stats["batches"] += 1
+                sink_written_metric.labels(sink=self.name).inc(len(batch))
+                sink_backlog_metric.labels(sink=self.name).set(len(self._buf))
+
+    # --- säikeessä ajettavat ---
+
+    def _write_batch(self, batch: List[str]) -> None:
+        if self._fh is not None and self._should_rotate():
+            self._rotate()
+        if self._fh is None:
+            parent = os.path.dirname(self.path)
+            if parent:
+                os.makedirs(parent, exist_ok=True)
+            self._fh = open(self.path, "a", encoding="utf-8")
+            self._opened_at = time.time()
+        self._fh.write("\n".join(batch) + "\n")
+        self._fh.flush()
+        if self.fsync == "batch":
+            os.fsync(self._fh.fileno())
+
+    def _should_rotate(self) -> bool:
+        if self.rotate_bytes and self._fh.tell() >= self.rotate_bytes:
+            return True
+        return bool(self.rotate_interval_sec) and (time.time() - self._opened_at) >= self.rotate_interval_sec
+
+    def _close_file(self, fh) -> None:
+        fh.flush()
+        if self.fsync != "never":
+            os.fsync(fh.fileno())
+        fh.close()
+
+    def _rotate(self) -> None:
+        fh, self._fh = self._fh, None
+        self._close_file(fh)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        target = f"{self.path}.{stamp}"
+        n = 1
+        while os.path.exists(target) or os.path.exists(target + ".gz"):
+            target = f"{self.path}.{stamp}.{n}"
+            n += 1
+        os.replace(self.path, target)
+        self.stats["rotations"] += 1
+        if self.compress:
+            with open(target, "rb") as src, gzip.open(target + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(target)
+
+
+# Prosessin jaetut sinkit polun mukaan -> sama tiedosto, yksi kirjoittaja
+_sinks: Dict[str, JsonlSink] = {}
+
+
+def get_sink(path: str, **kw: Any) -> JsonlSink:
+    """Palauta polun jaettu sink (luodaan ensimmäisellä kutsulla annetuilla asetuksilla)"""
+    key = os.path.abspath(path)
+    sink = _sinks.get(key)
+    if sink is None:
+        sink = _sinks[key] = JsonlSink(path, **kw)
+    return sink
+
+
+async def close_all_sinks() -> None:
+    """Lopullinen flush kaikille sinkeille (graceful shutdown)"""
+    for sink in list(_sinks.values()):
+        try:
+            await sink.close()
+        except Exception as e:
+            log.warning("JsonlSink %s close failed: %s", sink.name, e)
@@ -34,6 +34,12 @@ class Metrics:
         self.source_health = Gauge(f"{ns}_source_health", "Lähde health (1=ok, 0=down)", ["source"], registry=self.registry)
         self.fresh_pass_total = Counter(f"{ns}_fresh_pass_total", "Fresh-pass läpimenot WS-kandille", registry=self.registry)
         
+        # RPC enrichment -välimuisti (kind = mint_info/lp_info/distribution/flow_stats)
+        self.rpc_cache_hits = Counter(f"{ns}_rpc_cache_hits_total", "Rikastusvälimuistin osumat", ["kind"], registry=self.registry)
+        self.rpc_cache_misses = Counter(f"{ns}_rpc_cache_misses_total", "Rikastusvälimuistin hudit", ["kind"], registry=self.registry)
+        self.rpc_cache_evictions = Counter(f"{ns}_rpc_cache_evictions_total", "Rikastusvälimuistin LRU-poistot", ["kind"], registry=self.registry)
+        self.rpc_cache_negative_hits = Counter(f"{ns}_rpc_cache_negative_hits_total", "Negatiivisen välimuistin osumat (epäonnistunut haku)", ["kind"], registry=self.registry)
+        
         # Trading metriikat
         self.trades_sent = Counter(f"{ns}_trades_sent_total", "Lähetetyt kaupat (live/paper)", ["mode"], registry=self.registry)
         self.trades_failed = Counter(f"{ns}_trades_failed_total", "Epäonnistuneet kaupat", ["stage"], registry=self.registry)
@@ -56,6 +62,11 @@ class Metrics:
         self.rpc_latency = Histogram(f"{ns}_rpc_latency_sec", "RPC-kutsun kesto (s)", buckets=(0.05,0.1,0.2,0.5,1,2,5), registry=self.registry)
         self.cycle_duration = Histogram(f"{ns}_cycle_duration_sec", "Trading-syklin kesto (s)", buckets=(0.1,0.5,1,2,3,5,10), registry=self.registry)
 
+        # Token->kauppa -polun vaiheet (stage_trace.py): aika edellisestä vaiheesta ja ensimmäisestä vaiheesta
+        stage_buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+        self.stage_latency = Histogram(f"{ns}_stage_latency_sec", "Aika edellisestä vaiheesta (s)", ["stage"], buckets=stage_buckets, registry=self.registry)
+        self.stage_since_origin = Histogram(f"{ns}_stage_since_origin_sec", "Aika kehyksen vastaanotosta / ensimmäisestä vaiheesta (s)", ["stage"], buckets=stage_buckets, registry=self.registry)
+
     def _create_alert_logger(self):
         """Create alert logger function"""
         def log_alert(alert_name: str, severity: str, description: str, **kwargs):
@@ -1,46 +1,139 @@
-import json, os, time, tempfile, threading
-from typing import Dict, Any
+"""
+PositionManager - positiot muistissa + append-only journal (write-ahead log) levyllä
+
+- jokainen muutos (add/update/close/remove) = yksi pieni JSONL-rivi path.wal -tiedostoon;
+  kustannus ei riipu positioiden eikä suljetun historian määrästä
+- muutosmetodit eivät tee I/O:ta event loopissa: rivi puskuroidaan ja taustatehtävä kirjoittaa erissä
+  säikeessä (kuten JsonlSink); ilman event looppia rivi kirjoitetaan heti
+- kompaktointi taustalla compact_every rivin välein: snapshot (path) atomisesti + journalin katkaisu
+- käynnistyksessä snapshot + journalin toisto (seq > snapshotin seq); vanha pelkkä {mint: pos} -tiedosto luetaan sellaisenaan
+- muistin tila päivitetään copy-on-write, joten snapshotin kopio on halpa ja serialisointi tehdään säikeessä
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from prometheus_client import Counter, Histogram
+
+from jsonl_sink import FSYNC_POLICIES
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+position_journal_records_metric = Counter(
+    "position_journal_records_total",
+    "Position journal records written",
+    ["op"],
+)
+position_journal_compactions_metric = Counter(
+    "position_journal_compactions_total",
+    "Position journal compactions into a snapshot",
+)
+position_journal_replay_metric = Histogram(
+    "position_journal_replay_seconds",
+    "Startup load of the position snapshot and journal replay",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+
 
 class PositionManager:
-    def __init__(self, path: str = "open_positions.json"):
+    def __init__(
+        self,
+        path: str = "open_positions.json",
+        *,
+        compact_every: int = 1000,
+        flush_interval_sec: float = 0.05,
+        fsync: str = "batch",
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
         self.path = path
-        self._lock = threading.Lock()
+        self.wal_path = path + ".wal"
+        self.compact_every = max(1, int(compact_every))
+        self.flush_interval_sec = max(0.001, float(flush_interval_sec))
+        self.fsync = fsync
+        self._lock = threading.Lock()  # vain muistin tila + seq, ei koskaan I/O:n yli
         self._data: Dict[str, Any] = {}
+        self._seq = 0
+        self._since_compact = 0
+        self._buf: Deque[str] = deque()
+        self._fh = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._io_lock = threading.Lock()  # synkroninen polku vs. taustakirjoittaja
+        self.stats = {"records": 0, "batches": 0, "compactions": 0, "replayed": 0, "errors": 0}
         self.load()
 
+    # --- lataus ---
+
     def load(self):
+        started = time.perf_counter()
+        data: Dict[str, Any] = {}
+        snap_seq = 0
         try:
             if os.path.exists(self.path):
                 with open(self.path, "r") as f:
-                    self._data = json.load(f)
-        except Exception:
-            self._data = {}
+                    raw = json.load(f)
+                if isinstance(raw, dict) and raw.get("version") == SNAPSHOT_VERSION and "positions" in raw:
+                    data, snap_seq = raw["positions"], int(raw.get("seq", 0))
+                elif isinstance(raw, dict):
+                    data = raw  # vanha muoto: koko tila yhtenä dictinä
+        except Exception as e:
+            log.error("position snapshot load failed (%s): %s", self.path, e)
+            data = {}
+        self._data, self._seq = data, snap_seq
+        replayed = 0
+        if os.path.exists(self.wal_path):
+            offset = good = 0  # good: viimeisen ehjän rivin loppu
+            with open(self.wal_path, "rb") as f:
+                for n, line in enumerate(f, 1):
+                    offset += len(line)
+                    if not line.strip():
+                        continue
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        log.warning("position journal %s: skipping torn record at line %d", self.wal_path, n)
+                        continue
+                    good = offset
+                    if int(rec.get("seq", 0)) <= snap_seq:
+                        continue  # jo snapshotissa (kompaktointi katkesi ennen journalin katkaisua)
+                    self._apply(rec)
+                    self._seq = max(self._seq, int(rec["seq"]))
+                    replayed += 1
+            if good < os.path.getsize(self.wal_path):
+                with open(self.wal_path, "r+b") as f:
+                    f.truncate(good)  # katkennut häntä pois, ettei seuraava rivi liity siihen
+        self._since_compact = replayed
+        self.stats["replayed"] = replayed
+        position_journal_replay_metric.observe(time.perf_counter() - started)
 
-    def _atomic_write(self):
-        d = json.dumps(self._data, separators=(",", ":"), ensure_ascii=False)
-        fd, tmp = tempfile.mkstemp(prefix=".pos_", dir=os.path.dirname(self.path) or ".")
-        with os.fdopen(fd, "w") as f:
-            f.write(d)
-        os.replace(tmp, self.path)
+    # --- muutokset (eivät blokkaa: muisti + puskuroitu journal-rivi) ---
 
     def add_position(self, mint: str, payload: Dict[str, Any]):
-        with self._lock:
-            self._data[mint] = payload
-            self._atomic_write()
+        self._commit({"op": "add", "mint": mint, "data": dict(payload)})
 
     def update_position(self, mint: str, patch: Dict[str, Any]):
-        with self._lock:
-            if mint in self._data:
-                self._data[mint].update(patch)
-                self._atomic_write()
+        self._commit({"op": "update", "mint": mint, "data": dict(patch)})
 
     def close_position(self, mint: str, patch: Dict[str, Any]):
-        with self._lock:
-            if mint in self._data:
-                self._data[mint].update(patch)
-                self._data[mint]["status"] = "closed"
-                self._data[mint]["closed_at"] = time.time()
-                self._atomic_write()
+        self._commit({"op": "close", "mint": mint, "data": {**patch, "status": "closed", "closed_at": time.time()}})
+
+    def remove_position(self, mint: str):
+        self._commit({"op": "remove", "mint": mint})
+
+    # --- luku ---
 
     def get_all(self) -> Dict[str, Any]:
         with self._lock:
@@ -49,3 +142,173 @@ class PositionManager:
     def get(self, mint: str) -> Dict[str, Any]:
         with self._lock:
             return dict(self._data.get(mint, {}))
+
+    # --- async API ---
+
+    async def flush(self) -> None:
+        """Kirjoita puskuroidut journal-rivit levylle (säikeessä)"""
+        await self._drain()
+
+    async def compact(self) -> None:
+        """Snapshot nykytilasta + journalin katkaisu (säikeessä)"""
+        self._bind_loop(asyncio.get_running_loop())
+        async with self._write_lock:
+            await self._drain_locked()
+            await self._compact_locked()
+
+    async def close(self) -> None:
+        """Pysäytä taustakirjoittaja, kompaktoi (nopea seuraava käynnistys) ja sulje journal"""
+        task, self._task = self._task, None
+        if task and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if self._since_compact or self._buf:
+            await self.compact()
+        if self._fh is not None:
+            await asyncio.to_thread(self._close_file)
+        self._loop = None
+        self._write_lock = None
+
+    @property
+    def backlog(self) -> int:
+        return len(self._buf)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            positions = len(self._data)
+        return {**self.stats, "seq": self._seq, "backlog": len(self._buf),
+                "since_compact": self._since_compact, "positions": positions}
+
+    # --- sisäiset ---
+
+    def _apply(self, rec: Dict[str, Any]) -> bool:
+        """Sama funktio live-muutoksille ja toistolle. Copy-on-write: vanhaa pos-dictiä ei muuteta."""
+        op, mint = rec["op"], rec["mint"]
+        if op == "add":
+            self._data[mint] = dict(rec["data"])
+        elif op == "remove":
+            return self._data.pop(mint, None) is not None
+        elif mint in self._data:  # update / close
+            self._data[mint] = {**self._data[mint], **rec["data"]}
+        else:
+            return False
+        return True
+
+    def _commit(self, rec: Dict[str, Any]) -> None:
+        with self._lock:
+            if not self._apply(rec):
+                return  # tuntematon mint: ei muutosta, ei journal-riviä
+            self._seq += 1
+            rec["seq"] = self._seq
+            line = json.dumps(rec, separators=(",", ":"), ensure_ascii=False, default=str)
+            self._buf.append(line)
+        self.stats["records"] += 1
+        position_journal_records_metric.labels(op=rec["op"]).inc()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._flush_sync()  # ei event looppia (skriptit): kirjoitetaan heti
+            return
+        self._ensure_started(loop)
+
+    def _flush_sync(self) -> None:
+        batch = self._take_batch()
+        if batch:
+            self._write_batch(batch)
+        if self._since_compact >= self.compact_every:
+            with self._lock:
+                positions, seq = dict(self._data), self._seq
+            self._write_snapshot(positions, seq)
+
+    def _bind_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._loop is not loop:
+            self._loop = loop
+            self._write_lock = asyncio.Lock()
+            self._task = None
+
+    def _ensure_started(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._bind_loop(loop)
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run(), name=f"position_journal:{os.path.basename(self.path)}")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval_sec)
+            try:
+                await self._drain()
+                if self._since_compact >= self.compact_every:
+                    await self.compact()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["errors"] += 1
+                log.warning("position journal %s write failed: %s", self.wal_path, e)
+            if not self._buf:
+                return  # käynnistyy uudelleen seuraavasta muutoksesta
+
+    async def _drain(self) -> None:
+        self._bind_loop(asyncio.get_running_loop())
+        async with self._write_lock:
+            await self._drain_locked()
+
+    async def _drain_locked(self) -> None:
+        while self._buf:
+            await asyncio.to_thread(self._write_batch, self._take_batch())
+
+    async def _compact_locked(self) -> None:
+        with self._lock:
+            positions, seq = dict(self._data), self._seq  # pos-dictit ovat muuttumattomia (copy-on-write)
+        await asyncio.to_thread(self._write_snapshot, positions, seq)
+
+    def _take_batch(self) -> List[str]:
+        batch: List[str] = []
+        while self._buf and len(batch) < 1000:
+            batch.append(self._buf.popleft())
+        return batch
+
+    # --- säikeessä ajettavat ---
+
+    def _write_batch(self, batch: List[str]) -> None:
+        with self._io_lock:
+            if self._fh is None:
+                parent = os.path.dirname(self.wal_path)
+                if parent:
+                    os.makedirs(parent, exist_ok=True)
+                self._fh = open(self.wal_path, "a", encoding="utf-8")
+            self._fh.write("\n".join(batch) + "\n")
+            self._fh.flush()
+            if self.fsync == "batch":
+                os.fsync(self._fh.fileno())
+        self._since_compact += len(batch)
+        self.stats["batches"] += 1
+
+    def _write_snapshot(self, positions: Dict[str, Any], seq: int) -> None:
+        d = json.dumps({"version": SNAPSHOT_VERSION, "seq": seq, "positions": positions},
+                       separators=(",", ":"), ensure_ascii=False, default=str)
+        with self._io_lock:
+            fd, tmp = tempfile.mkstemp(prefix=".pos_", dir=os.path.dirname(self.path) or ".")
+            with os.fdopen(fd, "w") as f:
+                f.write(d)
+                if self.fsync != "never":
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            # snapshot kattaa journalin (seq <= snapshot); myöhemmät rivit kirjoitetaan tyhjään journaliin
+            if self._fh is not None:
+                self._fh.close()
+            self._fh = open(self.wal_path, "w", encoding="utf-8")
+        self._since_compact = 0
+        self.stats["compactions"] += 1
+        position_journal_compactions_metric.inc()
+
+    def _close_file(self) -> None:
+        with self._io_lock:
+            fh, self._fh = self._fh, None
+            if fh is not None:
+                fh.flush()
+                if self.fsync != "never":
+                    os.fsync(fh.fileno())
+                fh.close()
@@ -29,6 +29,9 @@ from solders.rpc.requests import SendVersionedTransaction
 from solders.rpc.config import RpcSendTransactionConfig
 from solders.commitment_config import CommitmentLevel
 
+from stage_trace import StageTrace, mark as mark_stage
+from tx_broadcast import TxBroadcaster, broadcaster_from_env
+
 logger = logging.getLogger(__name__)
 
 
@@ -88,6 +91,7 @@ class PumpPortalTradingClient:
         default_pool: str = "auto",
         commitment: CommitmentLevel = CommitmentLevel.Confirmed,
         skip_preflight: bool = False,
+        broadcaster: Optional[TxBroadcaster] = None,
     ):
         self.rpc_url = rpc_url
         self.keypair = keypair
@@ -98,12 +102,14 @@ class PumpPortalTradingClient:
         self.default_pool = default_pool
         self.commitment = commitment
         self.skip_preflight = skip_preflight
+        # Rinnakkaislähetys kaikille terveille RPC:ille (None = vain rpc_url)
+        self.broadcaster = broadcaster
 
     @classmethod
     def from_env(cls) -> "PumpPortalTradingClient":
         rpc = os.getenv("SOLANA_RPC_URL", "https://api.mainnet-beta.solana.com")
         kp = load_keypair_from_env()
-        return cls(rpc_url=rpc, keypair=kp)
+        return cls(rpc_url=rpc, keypair=kp, broadcaster=broadcaster_from_env([rpc]))
 
     async def _ensure_session(self) -> aiohttp.ClientSession:
         if self.session and not self.session.closed:
@@ -112,6 +118,8 @@ class PumpPortalTradingClient:
         return self.session
 
     async def close(self):
+        if self.broadcaster:
+            await self.broadcaster.close()
         if self.session and not self.session.closed:
             await self.session.close()
 
@@ -167,6 +175,14 @@ class PumpPortalTradingClient:
         vt = VersionedTransaction.from_bytes(tx_bytes)
         tx = VersionedTransaction(vt.message, [self.keypair])
 
+        if self.broadcaster:
+            # Sama allekirjoitettu tx kaikille terveille endpointeille; palataan ensimmäisestä hyväksynnästä,
+            # uudelleenlähetys jatkuu taustalla vahvistukseen / blockhashin vanhenemiseen asti
+            ticket = await self.broadcaster.broadcast(
+                bytes(tx), signature=str(tx.signatures[0]), skip_preflight=self.skip_preflight
+            )
+            return ticket.signature
+
         cfg = RpcSendTransactionConfig(
             skip_preflight=self.skip_preflight,
             preflight_commitment=self.commitment,
@@ -193,7 +209,13 @@ class PumpPortalTradingClient:
         slippage: Optional[float] = None,
         priority_fee: Optional[float] = None,
         pool: Optional[str] = None,
+        trace: Optional[StageTrace] = None,
     ) -> str:
+        """
+        Osta mint SOL-määrällä; palauttaa signaturen.
+        trace: trade_submitted leimataan kun tx on rakennettu ja lähtee RPC:lle,
+        trade_confirmed kun RPC hyväksyi lähetyksen (signature palautui).
+        """
         txb = await self._trade_local_bytes(
             action="buy",
             mint=mint,
@@ -203,7 +225,10 @@ class PumpPortalTradingClient:
             priority_fee=priority_fee,
             pool=pool,
         )
-        return await self._sign_and_send(txb)
+        mark_stage(trace, "trade_submitted")
+        sig = await self._sign_and_send(txb)
+        mark_stage(trace, "trade_confirmed")
+        return sig
 
     async def sell(
         self,
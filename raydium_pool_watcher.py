@@ -1,10 +1,10 @@
-import asyncio
-import json
 import logging
 from typing import Callable, Dict, Any, Iterable, Optional, Set
-import aiohttp
 import time
 
+from helius_ws_hub import SlotGap, get_helius_hub
+from ws_prefilter import RAYDIUM_POOL_MARKERS, FramePrefilter
+
 class RaydiumPoolWatcher:
     """
     Kuuntelee Helius/Solana WS:ää Raydium-ohjelmien logeille (logsSubscribe mentions=programId)
@@ -38,46 +38,24 @@ class RaydiumPoolWatcher:
         }
         # Live pricing cache
         self._live_prices: Dict[str, Dict[str, Any]] = {}
+        # Esisuodatin: vain poolin luontiin viittaavat logsNotificationit dekoodataan
+        self._frame_filter = FramePrefilter("raydium_watcher", RAYDIUM_POOL_MARKERS, case_insensitive=True)
 
     async def run_forever(self) -> None:
         """
-        Avaa WS-yhteyden ja tekee logsSubscribe-kyselyt joka programId:lle (mentions-suodatin).
-        Pitää reconnect-loopin päällä.
+        Tilaa logsSubscribe joka programId:lle (mentions-suodatin) jaetun Helius-hubin kautta.
+        Reconnect ja uudelleentilaus hoidetaan hubissa.
         """
-        sub_ids = []
-        while True:
-            try:
-                async with aiohttp.ClientSession() as sess:
-                    async with sess.ws_connect(self.ws_url, heartbeat=20) as ws:
-                        self.log.info("RaydiumPoolWatcher: connected")
-                        # Tilaa logit jokaiselle ohjelmalle
-                        req_id = 1
-                        for pid in self.program_ids:
-                            sub = {
-                                "jsonrpc": "2.0",
-                                "id": req_id,
-                                "method": "logsSubscribe",
-                                "params": [
-                                    {"mentions": [pid]},
-                                    {"commitment": "confirmed", "filter": {"until": "all"}},
-                                ],
-                            }
-                            await ws.send_str(json.dumps(sub))
-                            req_id += 1
-                        # Pumppaa viestejä
-                        async for msg in ws:
-                            if msg.type != aiohttp.WSMsgType.TEXT:
-                                continue
-                            try:
-                                data = json.loads(msg.data)
-                            except Exception:
-                                continue
-                            # logs-notifikaatio?
-                            if "method" in data and data.get("method") == "logsNotification":
-                                self._handle_logs_notif(data.get("params", {}))
-            except Exception as e:
-                self.log.warning("RaydiumPoolWatcher reconnect after error: %s", e)
-                await asyncio.sleep(3.0)
+        sub = get_helius_hub(self.ws_url).subscribe_logs(
+            self.program_ids, name="raydium_watcher", prefilter=self._frame_filter
+        )
+        self.log.info("RaydiumPoolWatcher: subscribed %d programs via hub", len(self.program_ids))
+        async for item in sub:
+            if isinstance(item, SlotGap):
+                self.log.warning("RaydiumPoolWatcher: missed slots %d-%d", item.first_slot, item.last_slot)
+                continue
+            if isinstance(item.value, dict):
+                self._handle_logs_notif({"result": item.value})
 
     def _handle_logs_notif(self, params: Dict[str, Any]) -> None:
         """
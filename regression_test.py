@@ -106,6 +106,66 @@ class RegressionTester:
             logger.error(f"Virhe testi skenaariossa: {e}")
             return {'error': str(e)}
     
+    async def run_capture_regression(
+        self,
+        capture_dir: str,
+        test_name: str = "capture",
+        speed: float = 0.0,
+        timeout: float = 600.0,
+    ) -> Dict[str, Any]:
+        """Toista frame_capture-tallenne oikean lähteen ja DiscoveryEnginen läpi (speed<=0 = max-nopeus)"""
+        try:
+            from discovery_engine import DiscoveryEngine
+            from frame_capture import CaptureReplayer
+            from helius_ws_hub import close_helius_hubs
+            from http_pool import set_http_client
+            from sources.helius_logs_newtokens import HeliusTransactionsNewTokensSource
+
+            replayer = CaptureReplayer(capture_dir, speed=speed)
+            client = replayer.install()
+            sources = [
+                HeliusTransactionsNewTokensSource(url, replayer.subscribed_programs(url))
+                for url in replayer.ws_urls
+            ]
+            engine = DiscoveryEngine(market_sources=sources, min_liq_usd=0.0)
+            start_time = time.time()
+            try:
+                await engine.start()
+                finished = await replayer.wait_finished(timeout=timeout)
+                await engine.run_until_idle(idle_seconds=0.5, max_wait=30.0)
+                duration = time.time() - start_time
+                stats = engine.get_stats()
+            finally:
+                await engine.stop()
+                await close_helius_hubs()
+                set_http_client(None)
+
+            frames = replayer.stats["replayed_frames"]
+            results = {
+                'events_processed': frames,
+                'frames_per_sec': frames / duration if duration > 0 else 0.0,
+                'complete': finished,
+                'candidates': stats.get('processed_candidates', 0),
+                'http_hits': client.replay_stats['hits'],
+                'http_misses': client.replay_stats['misses'],
+                'success_rate': 1.0 if finished else 0.0,
+            }
+            test_result = {
+                'success': finished,
+                'test_name': test_name,
+                'duration_seconds': duration,
+                'results': results,
+                'baseline_comparison': self._compare_with_baseline(test_name, results),
+                'timestamp': time.time()
+            }
+            self.test_results[test_name] = test_result
+            logger.info(f"✅ Capture regression valmis: {test_name} ({frames} kehystä, {duration:.2f}s)")
+            return test_result
+
+        except Exception as e:
+            logger.error(f"Virhe capture-regressiossa {test_name}: {e}")
+            return {'success': False, 'error': str(e)}
+
     def _compare_with_baseline(self, test_name: str, results: Dict[str, Any]) -> Dict[str, Any]:
         """Vertaa baseline:een"""
         try:
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+RPC Micro-batcher - kokoaa lyhyen aikaikkunan sisällä saapuvat avainhaut yhdeksi kutsuksi
+Käytetään BatchingSolanaRPC:ssä getMultipleAccounts / JSON-RPC batch -pyyntöihin
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set
+
+log = logging.getLogger(__name__)
+
+BatchFn = Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]
+
+
+class MicroBatcher:
+    """
+    Kokoaa samanaikaiset submit(key)-kutsut erissä suoritettavaksi
+
+    Features:
+    - Flush kun ikkuna (window_ms) umpeutuu tai erä täyttyy (max_batch)
+    - Saman avaimen päällekkäiset haut yhdistetään (yksi tulos kaikille odottajille)
+    - Tulokset jaetaan takaisin odottaville kutsujille; avainkohtainen Exception välitetään vain sille avaimelle
+    - Tilastot: kuinka monta kutsua säästettiin eräyksellä
+    """
+
+    def __init__(self, batch_fn: BatchFn, *, window_ms: float = 10.0, max_batch: int = 100, name: str = "batch"):
+        self.batch_fn = batch_fn
+        self.window_sec = max(0.0, float(window_ms)) / 1000.0
+        self.max_batch = max(1, int(max_batch))
+        self.name = name
+
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+        self.calls = 0       # submit()-kutsuja yhteensä
+        self.keys = 0        # uniikkeja avaimia lähetetty
+        self.batches = 0     # batch_fn-kutsuja (= verkkopyyntöjä)
+        self.deduped = 0     # samaan ikkunaan osuneet päällekkäiset avaimet
+        self.errors = 0      # epäonnistuneet erät
+
+    async def submit(self, key: Hashable) -> Any:
+        """Lisää avain seuraavaan erään ja odota sen tulosta"""
+        loop = asyncio.get_running_loop()
+        self.calls += 1
+
+        fut = self._pending.get(key)
+        if fut is None:
+            fut = loop.create_future()
+            self._pending[key] = fut
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window_sec, self._flush)
+        else:
+            self.deduped += 1
+
+        # shield: yhden kutsujan peruutus ei peruuta muiden odottamaa tulosta
+        return await asyncio.shield(fut)
+
+    def _flush(self) -> None:
+        """Lähetä kertyneet avaimet eränä (ajetaan timerista tai täydestä erästä)"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        task = asyncio.get_running_loop().create_task(self._run_batch(batch), name=f"{self.name}:flush")
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _run_batch(self, batch: Dict[Hashable, asyncio.Future]) -> None:
+        self.batches += 1
+        self.keys += len(batch)
+        try:
+            results = await self.batch_fn(list(batch.keys()))
+        except Exception as e:
+            self.errors += 1
+            log.warning("⚠️ %s: erä (%d avainta) epäonnistui: %s", self.name, len(batch), e)
+            for fut in batch.values():
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        for key, fut in batch.items():
+            if fut.done():
+                continue
+            res = results.get(key) if results else None
+            if isinstance(res, BaseException):
+                fut.set_exception(res)
+            else:
+                fut.set_result(res)
+
+    @property
+    def saved_requests(self) -> int:
+        """Verkkopyynnöt jotka säästettiin verrattuna yksi-per-kutsu malliin"""
+        return max(0, self.calls - self.batches)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Eräystilastot raportointia varten"""
+        return {
+            "calls": self.calls,
+            "unique_keys": self.keys,
+            "batches": self.batches,
+            "deduped": self.deduped,
+            "errors": self.errors,
+            "saved_requests": self.saved_requests,
+            "avg_batch_size": (self.keys / self.batches) if self.batches else 0.0,
+        }
+
+    async def close(self) -> None:
+        """Flushaa odottavat avaimet ja odota käynnissä olevat erät loppuun"""
+        self._flush()
+        if self._inflight:
+            await asyncio.gather(*list(self._inflight), return_exceptions=True)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+RPC Enrichment Cache - kenttätietoinen TTL/LRU-välimuisti RPC interfacesin edessä
+Sama mint saapuu useasta lähteestä (pumpportal_ws, helius_transactions, Raydium) -> ei haeta uudelleen turhaan
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+log = logging.getLogger(__name__)
+
+FOREVER = float("inf")
+
+
+@dataclass
+class _Entry:
+    """Yksi välimuistirivi"""
+    value: Any
+    expires_at: float
+    negative: bool = False
+
+
+class TTLLRUCache:
+    """
+    Rajattu LRU-välimuisti per-rivi TTL:llä
+
+    - get() siirtää rivin LRU-jonon loppuun; vanhentunut rivi poistetaan laiskasti
+    - put() evictoi vanhimman kun max_entries ylittyy
+    """
+
+    def __init__(self, max_entries: int = 20000, clock: Callable[[], float] = time.monotonic,
+                 on_evict: Optional[Callable[[Hashable], None]] = None):
+        self.max_entries = max(1, int(max_entries))
+        self.clock = clock
+        self.on_evict = on_evict
+        self._data: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[_Entry]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= self.clock():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def put(self, key: Hashable, value: Any, ttl: float, *, negative: bool = False) -> None:
+        if ttl <= 0:
+            self._data.pop(key, None)
+            return
+        self._data[key] = _Entry(value=value, expires_at=self.clock() + ttl, negative=negative)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            old_key, _ = self._data.popitem(last=False)
+            if self.on_evict:
+                self.on_evict(old_key)
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class CachedSolanaRPC:
+    """
+    Välimuistikääre SolanaRPC-yhteensopivalle clientille (MintInfo/LPInfo/Distribution/FlowStats)
+
+    TTL:t kenttien mukaan:
+    - MintInfo: renounced authority ja decimals eivät voi palata -> pysyvä; aktiivinen authority -> mint_active_ttl
+      (renounced-tieto on lisäksi "tarttuva": viiveellinen RPC-node ei voi palauttaa sitä takaisin False:ksi)
+    - LPInfo: lp_ttl (likviditeetti muuttuu), Distribution: distribution_ttl, FlowStats: flow_ttl (sekunteja)
+    - Epäonnistuneet haut: negatiivinen välimuisti negative_ttl ajaksi (sama poikkeus nostetaan uudelleen)
+    - Päällekkäiset samanaikaiset haut samalle avaimelle yhdistetään (single-flight)
+    """
+
+    def __init__(
+        self,
+        inner: Any,
+        *,
+        max_entries: int = 20000,
+        mint_active_ttl: float = 30.0,
+        lp_ttl: float = 30.0,
+        distribution_ttl: float = 15.0,
+        flow_ttl: float = 5.0,
+        negative_ttl: float = 3.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.inner = inner
+        self.mint_active_ttl = mint_active_ttl
+        self.lp_ttl = lp_ttl
+        self.distribution_ttl = distribution_ttl
+        self.flow_ttl = flow_ttl
+        self.negative_ttl = negative_ttl
+        self.cache = TTLLRUCache(max_entries=max_entries, clock=clock, on_evict=self._on_evict)
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "negative_hits": 0, "evictions": 0}
+
+    # --- metriikat ---
+
+    def _metric(self, name: str, kind: str) -> None:
+        from metrics import metrics as global_metrics
+        if global_metrics:
+            try:
+                getattr(global_metrics, name).labels(kind=kind).inc()
+            except Exception:
+                pass
+
+    def _on_evict(self, key: Hashable) -> None:
+        self.stats["evictions"] += 1
+        self._metric("rpc_cache_evictions", key[0] if isinstance(key, tuple) else "unknown")
+
+    # --- ydin ---
+
+    async def _cached(self, kind: str, key: Hashable, fetch: Callable[[], Awaitable[Any]],
+                      ttl_for: Callable[[Any], float]) -> Any:
+        ckey = (kind, key)
+        entry = self.cache.get(ckey)
+        if entry is not None:
+            if entry.negative:
+                self.stats["negative_hits"] += 1
+                self._metric("rpc_cache_negative_hits", kind)
+                raise entry.value
+            self.stats["hits"] += 1
+            self._metric("rpc_cache_hits", kind)
+            return entry.value
+
+        pending = self._inflight.get(ckey)
+        if pending is not None:
+            self.stats["hits"] += 1
+            self._metric("rpc_cache_hits", kind)
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Omistaja peruttiin kesken haun -> yritä itse (uusi omistaja), ellei tätä kutsujaa peruttu
+                task = asyncio.current_task()
+                if pending.cancelled() and not (task and task.cancelling()):
+                    return await self._cached(kind, key, fetch, ttl_for)
+                raise
+
+        self.stats["misses"] += 1
+        self._metric("rpc_cache_misses", kind)
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[ckey] = fut
+        try:
+            value = await fetch()
+        except Exception as e:
+            self.cache.put(ckey, e, self.negative_ttl, negative=True)
+            if not fut.done():
+                fut.set_exception(e)
+                fut.exception()  # merkitse haetuksi, ettei jää "never retrieved" -varoitusta
+            raise
+        else:
+            self.cache.put(ckey, value, ttl_for(value))
+            if not fut.done():
+                fut.set_result(value)
+            return value
+        finally:
+            # BaseException (esim. CancelledError) ohittaa yllä olevat haarat: vapauta odottajat
+            if not fut.done():
+                fut.cancel()
+            if self._inflight.get(ckey) is fut:
+                del self._inflight[ckey]
+
+    def _mint_ttl(self, info: Any) -> float:
+        if getattr(info, "renounced_mint", False) and getattr(info, "renounced_freeze", False):
+            return FOREVER
+        return self.mint_active_ttl
+
+    # --- SolanaRPC rajapinta ---
+
+    async def get_mint_info(self, mint: str):
+        """Hae mint authority tiedot (pysyvä välimuisti kun molemmat authorityt renounced)"""
+        info = await self._cached("mint_info", mint, lambda: self.inner.get_mint_info(mint), self._mint_ttl)
+
+        # Tarttuvat kentät: kerran renounced pysyy renounced, decimals ei muutu
+        sticky_key = ("mint_fixed", mint)
+        fixed = self.cache.get(sticky_key)
+        known = dict(fixed.value) if fixed else {}
+        changed = False
+        for name in ("renounced_mint", "renounced_freeze"):
+            if getattr(info, name, False) and not known.get(name):
+                known[name] = True
+                changed = True
+        if "decimals" not in known and getattr(info, "decimals", None) is not None:
+            known["decimals"] = info.decimals
+            changed = True
+        if changed:
+            self.cache.put(sticky_key, known, FOREVER)
+
+        overrides = {k: v for k, v in known.items() if getattr(info, k, None) != v}
+        if overrides:
+            try:
+                info = replace(info, **overrides)
+            except TypeError:
+                pass
+        return info
+
+    async def get_lp_info(self, pool_address: str):
+        """Hae liquidity pool tiedot (lp_ttl)"""
+        return await self._cached("lp_info", pool_address, lambda: self.inner.get_lp_info(pool_address),
+                                  lambda _: self.lp_ttl)
+
+    async def get_holder_distribution(self, mint: str, top_n: int = 10):
+        """Hae holder distribution (distribution_ttl)"""
+        return await self._cached("distribution", (mint, top_n),
+                                  lambda: self.inner.get_holder_distribution(mint, top_n=top_n),
+                                  lambda _: self.distribution_ttl)
+
+    async def get_flow_stats(self, mint: str, window_sec: int = 300):
+        """Hae trading flow statistiikat (flow_ttl)"""
+        return await self._cached("flow_stats", (mint, window_sec),
+                                  lambda: self.inner.get_flow_stats(mint, window_sec=window_sec),
+                                  lambda _: self.flow_ttl)
+
+    def invalidate(self, mint: str) -> None:
+        """Poista mintin muuttuvat rivit (pysyvät renounced/decimals-tiedot säilyvät)"""
+        self.cache.pop(("mint_info", mint))
+        self.cache.pop(("lp_info", mint))
+        for key in [k for k in self.cache._data if k[0] in ("distribution", "flow_stats") and k[1][0] == mint]:
+            self.cache.pop(key)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        total = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self.cache),
+            "hit_ratio": (self.stats["hits"] / total) if total else 0.0,
+        }
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "inner":
+            raise AttributeError(name)
+        # Muut metodit (get_batch_stats, close, ...) suoraan sisemmälle clientille
+        return getattr(self.inner, name)
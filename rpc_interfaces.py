@@ -9,6 +9,8 @@ from typing import Dict, List, Optional, Any
 import asyncio
 import logging
 
+from rpc_batcher import MicroBatcher
+
 logger = logging.getLogger(__name__)
 
 
@@ -23,9 +25,9 @@ class MintInfo:
 
 @dataclass
 class LPInfo:
-    """Liquidity Pool tiedot"""
-    locked_or_burned: bool = False
-    liquidity_usd: float = 0.0
+    """Liquidity Pool tiedot (None = ei tiedossa tästä lähteestä)"""
+    locked_or_burned: Optional[bool] = False
+    liquidity_usd: Optional[float] = 0.0
     pool_address: str = ""
     lp_mint: str = ""
     base_mint: str = ""
@@ -162,14 +164,247 @@ class MockSolanaRPC:
         )
 
 
+class JsonRpcHttpTransport:
+    """Kevyt JSON-RPC HTTP-kuljetus (aiohttp), yksi pysyvä sessio"""
+    
+    def __init__(self, endpoint: str, timeout_sec: float = 3.0):
+        self.endpoint = endpoint
+        self.timeout_sec = timeout_sec
+        self.http_requests = 0
+        self._session = None
+    
+    async def post(self, payload: Any) -> Any:
+        """Lähetä yksittäinen tai batch (lista) JSON-RPC -pyyntö"""
+        import aiohttp
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout_sec))
+        self.http_requests += 1
+        async with self._session.post(self.endpoint, json=payload) as resp:
+            resp.raise_for_status()
+            return await resp.json()
+    
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+class BatchingSolanaRPC:
+    """
+    Oikea Solana JSON-RPC backend micro-batchauksella
+    
+    - get_mint_info / get_lp_info: samanaikaiset haut kootaan yhdeksi getMultipleAccounts-kutsuksi
+      (sama osoite samassa ikkunassa haetaan vain kerran)
+    - get_holder_distribution: getTokenLargestAccounts + getTokenSupply kootaan JSON-RPC batch -pyynnöksi
+    - get_flow_stats: ei on-chain vastinetta; delegoidaan fallback-clientille jos annettu
+    
+    transport: mikä tahansa olio jolla `async post(payload)` (esim. rpc_stub.StubSolanaRPC testeissä)
+    """
+    
+    MAX_MULTIPLE_ACCOUNTS = 100  # Solana RPC raja getMultipleAccounts-kutsulle
+    
+    def __init__(
+        self,
+        endpoint: str = "https://api.mainnet-beta.solana.com",
+        *,
+        transport: Any = None,
+        window_ms: float = 10.0,
+        max_batch: int = 100,
+        commitment: str = "confirmed",
+        timeout_sec: float = 3.0,
+        fallback: Any = None,
+    ):
+        self.endpoint = endpoint
+        self.transport = transport or JsonRpcHttpTransport(endpoint, timeout_sec=timeout_sec)
+        self.commitment = commitment
+        self.fallback = fallback
+        self.http_requests = 0
+        self._req_id = 0
+        
+        self._accounts = MicroBatcher(
+            self._fetch_accounts,
+            window_ms=window_ms,
+            max_batch=min(int(max_batch), self.MAX_MULTIPLE_ACCOUNTS),
+            name="getMultipleAccounts",
+        )
+        # Kaksi pyyntöä per mint -> puolitettu eräkoko
+        self._holders = MicroBatcher(
+            self._fetch_distributions,
+            window_ms=window_ms,
+            max_batch=max(1, int(max_batch) // 2),
+            name="holderBatch",
+        )
+    
+    def _next_id(self) -> int:
+        self._req_id += 1
+        return self._req_id
+    
+    async def _post(self, payload: Any) -> Any:
+        self.http_requests += 1
+        return await self.transport.post(payload)
+    
+    async def _fetch_accounts(self, addresses: List[str]) -> Dict[str, Any]:
+        """Yksi getMultipleAccounts (jsonParsed) koko erälle"""
+        payload = {
+            "jsonrpc": "2.0",
+            "id": self._next_id(),
+            "method": "getMultipleAccounts",
+            "params": [addresses, {"encoding": "jsonParsed", "commitment": self.commitment}],
+        }
+        resp = await self._post(payload)
+        if resp.get("error"):
+            raise RuntimeError(f"getMultipleAccounts error: {resp['error']}")
+        values = (resp.get("result") or {}).get("value") or []
+        return {addr: (values[i] if i < len(values) else None) for i, addr in enumerate(addresses)}
+    
+    async def _fetch_distributions(self, mints: List[str]) -> Dict[str, Any]:
+        """getTokenLargestAccounts + getTokenSupply kaikille minteille yhdessä JSON-RPC batchissa"""
+        requests = []
+        ids: Dict[int, tuple] = {}
+        for mint in mints:
+            for method in ("getTokenLargestAccounts", "getTokenSupply"):
+                rid = self._next_id()
+                ids[rid] = (mint, method)
+                requests.append({
+                    "jsonrpc": "2.0",
+                    "id": rid,
+                    "method": method,
+                    "params": [mint, {"commitment": self.commitment}],
+                })
+        
+        responses = await self._post(requests)
+        by_mint: Dict[str, Dict[str, Any]] = {m: {} for m in mints}
+        for item in responses or []:
+            key = ids.get(item.get("id"))
+            if not key:
+                continue
+            mint, method = key
+            if item.get("error"):
+                by_mint[mint][method] = RuntimeError(f"{method} error: {item['error']}")
+            else:
+                by_mint[mint][method] = (item.get("result") or {}).get("value")
+        
+        out: Dict[str, Any] = {}
+        for mint, parts in by_mint.items():
+            err = next((v for v in parts.values() if isinstance(v, Exception)), None)
+            out[mint] = err if err else parts
+        return out
+    
+    @staticmethod
+    def _parsed_info(account: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        try:
+            return account["data"]["parsed"]["info"] or {}
+        except (KeyError, TypeError):
+            return {}
+    
+    async def get_mint_info(self, mint: str) -> MintInfo:
+        """Hae mint authority tiedot (eräytetty getMultipleAccounts)"""
+        account = await self._accounts.submit(mint)
+        if account is None:
+            raise LookupError(f"mint account not found: {mint}")
+        info = self._parsed_info(account)
+        return MintInfo(
+            renounced_mint=info.get("mintAuthority") is None,
+            renounced_freeze=info.get("freezeAuthority") is None,
+            mint_address=mint,
+            decimals=int(info.get("decimals", 9)),
+        )
+    
+    async def get_lp_info(self, pool_address: str) -> LPInfo:
+        """
+        Hae LP-tili (eräytetty getMultipleAccounts)
+        
+        Jos osoite on LP-mint ja sen supply on 0, LP katsotaan poltetuksi; muuten lukitusta ei
+        voi päätellä tästä tilistä -> None. USD-likviditeettiä ei voi päätellä on-chain ilman
+        hintaa -> None (täytetään DEX-lähteistä).
+        """
+        account = await self._accounts.submit(pool_address)
+        if account is None:
+            raise LookupError(f"pool account not found: {pool_address}")
+        info = self._parsed_info(account)
+        is_mint = "supply" in info
+        return LPInfo(
+            locked_or_burned=True if is_mint and str(info.get("supply")) == "0" else None,
+            liquidity_usd=None,
+            pool_address=pool_address,
+            lp_mint=pool_address if is_mint else "",
+        )
+    
+    async def get_holder_distribution(self, mint: str, top_n: int = 10) -> Distribution:
+        """Hae holder distribution (eräytetty JSON-RPC batch)"""
+        parts = await self._holders.submit(mint)
+        largest = parts.get("getTokenLargestAccounts") or []
+        supply = parts.get("getTokenSupply") or {}
+        try:
+            total = float(supply.get("amount") or 0)
+        except (TypeError, ValueError):
+            total = 0.0
+        holders = []
+        for acc in largest[:top_n]:
+            amount = float(acc.get("amount") or 0)
+            holders.append({
+                "address": acc.get("address", ""),
+                "balance": amount,
+                "share": (amount / total) if total > 0 else 0.0,
+            })
+        top_share = sum(h["share"] for h in holders)
+        # getTokenLargestAccounts palauttaa enintään 20 tiliä -> ei kerro holderien määrää, total_holders jää oletukseen
+        return Distribution(top_share=top_share, holders=holders)
+    
+    async def get_flow_stats(self, mint: str, window_sec: int = 300) -> FlowStats:
+        """Flow-tilastoille ei ole eräytettävää RPC-metodia -> fallback tai tyhjä"""
+        if self.fallback is not None:
+            return await self.fallback.get_flow_stats(mint, window_sec)
+        return FlowStats()
+    
+    def get_batch_stats(self) -> Dict[str, Any]:
+        """Eräystilastot: montako kutsua, montako HTTP-pyyntöä, montako säästettiin"""
+        accounts = self._accounts.get_stats()
+        holders = self._holders.get_stats()
+        # holder-haku olisi ilman eräytystä 2 pyyntöä per kutsu
+        unbatched = accounts["calls"] + 2 * holders["calls"]
+        return {
+            "accounts": accounts,
+            "holders": holders,
+            "http_requests": self.http_requests,
+            "unbatched_requests": unbatched,
+            "saved_requests": max(0, unbatched - self.http_requests),
+        }
+    
+    async def close(self) -> None:
+        await self._accounts.close()
+        await self._holders.close()
+        close = getattr(self.transport, "close", None)
+        if close:
+            res = close()
+            if asyncio.iscoroutine(res):
+                await res
+
+
 class SolanaRPC:
-    """Pää RPC client - käyttää MockSolanaRPC:ta stubina"""
+    """
+    Pää RPC client - oletuksena MockSolanaRPC stub, batching=True -> BatchingSolanaRPC
+    router=rpc_router.RPCRouter -> BatchingSolanaRPC jonka pyynnöt reititetään routerin endpointeille
+    """
     
-    def __init__(self, endpoint: str = "https://api.mainnet-beta.solana.com"):
+    def __init__(
+        self,
+        endpoint: str = "https://api.mainnet-beta.solana.com",
+        *,
+        batching: bool = False,
+        router: Any = None,
+        **batch_kwargs,
+    ):
         self.endpoint = endpoint
-        # TODO: Vaihda MockSolanaRPC -> oikea Solana RPC client
-        self._client = MockSolanaRPC(endpoint)
-        logger.info(f"SolanaRPC alustettu endpoint: {endpoint}")
+        if router is not None:
+            from rpc_router import RouterTransport
+            batch_kwargs.setdefault("transport", RouterTransport(router))
+            batching = True
+        if batching:
+            self._client = BatchingSolanaRPC(endpoint, **batch_kwargs)
+        else:
+            self._client = MockSolanaRPC(endpoint)
+        logger.info(f"SolanaRPC alustettu endpoint: {endpoint} (batching={batching}, router={router is not None})")
     
     async def get_mint_info(self, mint: str) -> MintInfo:
         """Hae mint authority tiedot"""
@@ -186,6 +421,16 @@ class SolanaRPC:
     async def get_flow_stats(self, mint: str, window_sec: int = 300) -> FlowStats:
         """Hae trading flow statistiikat"""
         return await self._client.get_flow_stats(mint, window_sec)
+    
+    def get_batch_stats(self) -> Dict[str, Any]:
+        """Eräystilastot (tyhjä jos batching ei käytössä)"""
+        getter = getattr(self._client, "get_batch_stats", None)
+        return getter() if getter else {}
+    
+    async def close(self) -> None:
+        close = getattr(self._client, "close", None)
+        if close:
+            await close()
 
 
 # Convenience aliases
@@ -4,6 +4,7 @@ RPC Pool with Round-Robin Load Balancing and Quarantine
 Kevyt failover-mechanismi Solana RPC-endpointeille
 """
 
+import os
 import time
 import asyncio
 import random
@@ -149,16 +150,41 @@ class RPCRoundRobin:
 # Globaalinen RPC pool instanssi
 _rpc_pool: Optional[RPCRoundRobin] = None
 
-def init_rpc_pool(endpoints: List[str], error_threshold: int = 5, penalty_sec: int = 120) -> RPCRoundRobin:
-    """Alusta globaali RPC pool"""
+def init_rpc_pool(
+    endpoints: List[str],
+    error_threshold: int = 5,
+    penalty_sec: int = 120,
+    adaptive: Optional[bool] = None,
+):
+    """
+    Alusta globaali RPC pool.
+    adaptive=None -> RPC_POOL_MODE (adaptive | round_robin); jos ei asetettu, RPC_ROUTER_ENABLED kuten
+    rpc_router.router_from_env (oletus round_robin: reititin lähettää getSlot-luotaimia, joten opt-in)
+    """
     global _rpc_pool
-    _rpc_pool = RPCRoundRobin(endpoints, error_threshold, penalty_sec)
+    if adaptive is None:
+        mode = os.getenv("RPC_POOL_MODE", "").strip().lower()
+        if mode:
+            adaptive = mode == "adaptive"
+        else:
+            adaptive = os.getenv("RPC_ROUTER_ENABLED", "0").strip().lower() in ("1", "true", "yes", "on")
+    if adaptive:
+        from rpc_router import RPCRouter, router_kwargs_from_env
+        _rpc_pool = RPCRouter(endpoints, error_threshold, penalty_sec, **router_kwargs_from_env())
+    else:
+        _rpc_pool = RPCRoundRobin(endpoints, error_threshold, penalty_sec)
     return _rpc_pool
 
 def get_rpc_pool() -> Optional[RPCRoundRobin]:
     """Hae globaali RPC pool"""
     return _rpc_pool
 
+def set_rpc_pool(pool) -> Optional[RPCRoundRobin]:
+    """Vaihda globaali RPC pool (esim. rpc_router.router_from_env, testit); palauttaa edellisen"""
+    global _rpc_pool
+    previous, _rpc_pool = _rpc_pool, pool
+    return previous
+
 async def rpc_call(rpc_function: Callable, *args, **kwargs) -> Any:
     """Kätevä wrapper globaaliin RPC pool:iin"""
     if not _rpc_pool:
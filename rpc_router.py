@@ -0,0 +1,584 @@
+#!/usr/bin/env python3
+"""
+RPC Router - latenssipainotettu, hedgaava Solana RPC -reititin (korvaa pelkän round-robinin)
+
+- EWMA-latenssi ja -virheosuus per endpoint ja per RPC-metodi
+- valinta painotetulla arvonnalla: paino = (1 - virheosuus) / (latenssi * (1 + kesken olevat))
+  -> hidas mutta toimiva node saa vähemmän liikennettä, ruuhkautunut node väistyy (least-outstanding)
+- per-endpoint rinnakkaisuusraja; kun kaikki ovat täynnä, pyyntö odottaa vapautuvaa paikkaa
+- valinnainen hedge: jos vastausta ei ole tullut metodin latenssikvantiilin (oletus p90) jälkeen,
+  sama idempotentti pyyntö lähetetään toiselle endpointille ja nopeampi voittaa
+- taustaprobe (getSlot) vertaa slotia klusterin korkeimpaan; jäljessä oleva node alennetaan (healthy() = False)
+- rajapinta yhteensopiva rpc_pool.RPCRoundRobinin kanssa (nodes, call(), get_status());
+  lisäksi request()/post() JSON-RPC:lle, lease() solana-py AsyncClient -käyttäjille ja RouterTransport
+  BatchingSolanaRPC:lle
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from prometheus_client import Counter, Gauge, Histogram
+
+import rpc_pool
+from http_pool import get_http_client
+from rpc_pool import RPCEndpoint
+from windowed_stats import WindowedQuantiles
+
+log = logging.getLogger(__name__)
+
+router_request_duration_metric = Histogram(
+    "rpc_router_request_duration_seconds",
+    "Routed RPC request duration per endpoint and method",
+    ["endpoint", "method"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.35, 0.5, 1, 2, 5),
+)
+router_requests_metric = Counter(
+    "rpc_router_requests_total",
+    "Routed RPC requests per endpoint and outcome",
+    ["endpoint", "outcome"],
+)
+router_hedges_metric = Counter(
+    "rpc_router_hedges_total",
+    "Hedged RPC requests (sent) and hedges that answered first (won)",
+    ["outcome"],
+)
+router_weight_metric = Gauge(
+    "rpc_router_endpoint_weight",
+    "Current routing weight share per endpoint",
+    ["endpoint"],
+)
+router_slot_lag_metric = Gauge(
+    "rpc_router_slot_lag",
+    "Endpoint slot lag behind the highest probed slot",
+    ["endpoint"],
+)
+
+# Ei hedgata eikä toisteta: lähetys kahdesti olisi sivuvaikutus (tx_broadcast hoitaa monilähetyksen)
+NON_IDEMPOTENT_METHODS = frozenset({"sendTransaction", "requestAirdrop"})
+# JSON-RPC-virheet jotka kertovat nodesta eikä pyynnöstä -> failover seuraavalle endpointille
+NODE_ERROR_CODES = frozenset({-32005, -32004, -32603, -32009, -32014})
+
+DEFAULT_LATENCY_SEC = 0.05  # mittaamattoman noden oletus (optimistinen -> node saa näytteitä)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _endpoint_label(url: str) -> str:
+    """Metriikkalabel: host[:port] (URL:n polku/api-key ei päädy metriikoihin)"""
+    parts = urlsplit(url)
+    if not parts.hostname:
+        return url
+    return f"{parts.hostname}:{parts.port}" if parts.port else parts.hostname
+
+
+class RPCNodeError(RuntimeError):
+    """Node vastasi virheellä joka johtuu nodesta (jäljessä, ylikuormitettu) -> kokeillaan toista"""
+
+
+@dataclass
+class _MethodStats:
+    ewma_latency: Optional[float] = None
+    ewma_error: float = 0.0
+    calls: int = 0
+    errors: int = 0
+
+
+@dataclass(eq=False)
+class RouterEndpoint(RPCEndpoint):
+    """RPCEndpoint + adaptiivisen reitityksen tila"""
+    max_concurrency: int = 16
+    inflight: int = 0
+    ewma_latency: Optional[float] = None
+    ewma_error: float = 0.0
+    slot: Optional[int] = None
+    slot_lag: int = 0
+    lagging: bool = False
+    methods: Dict[str, _MethodStats] = field(default_factory=dict)
+
+    def healthy(self) -> bool:
+        """Terve = ei karanteenissa eikä slot-jäljessä"""
+        return not self.lagging and super().healthy()
+
+    def has_capacity(self) -> bool:
+        return self.inflight < self.max_concurrency
+
+
+class RPCRouter:
+    """
+    Adaptiivinen RPC-reititin (RPCRoundRobin-yhteensopiva)
+
+    Features:
+    - EWMA latency/error tracking per endpoint and per method
+    - Weighted least-outstanding selection
+    - Per-endpoint concurrency caps
+    - Hedged second request after a latency quantile
+    - Background getSlot probes that demote lagging nodes
+    """
+
+    def __init__(
+        self,
+        endpoints: List[str],
+        error_threshold: int = 5,
+        penalty_sec: int = 120,
+        *,
+        max_concurrency: int = 16,
+        ewma_alpha: float = 0.2,
+        hedge_quantile: Optional[float] = 0.9,
+        hedge_min_samples: int = 20,
+        hedge_min_delay_sec: float = 0.01,
+        hedge_max_delay_sec: float = 1.0,
+        request_timeout_sec: float = 5.0,
+        probe_interval_sec: float = 5.0,
+        probe_timeout_sec: float = 2.0,
+        max_slot_lag: int = 50,
+        rng: Optional[random.Random] = None,
+    ):
+        self.nodes = [RouterEndpoint(url, max_concurrency=max(1, int(max_concurrency))) for url in dict.fromkeys(endpoints)]
+        self.error_threshold = error_threshold
+        self.penalty_sec = penalty_sec
+        self.ewma_alpha = min(1.0, max(0.01, float(ewma_alpha)))
+        self.hedge_quantile = hedge_quantile if hedge_quantile and 0.0 < hedge_quantile < 1.0 else None
+        self.hedge_min_samples = max(1, int(hedge_min_samples))
+        self.hedge_min_delay_sec = float(hedge_min_delay_sec)
+        self.hedge_max_delay_sec = float(hedge_max_delay_sec)
+        self.request_timeout_sec = float(request_timeout_sec)
+        self.probe_interval_sec = float(probe_interval_sec)
+        self.probe_timeout_sec = float(probe_timeout_sec)
+        self.max_slot_lag = int(max_slot_lag)
+        self.cluster_slot: Optional[int] = None
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self._rng = rng or random.Random()
+        self._latency: Dict[str, WindowedQuantiles] = {}  # metodi -> onnistuneiden kutsujen kestot (hedge-viive)
+        self._freed: Optional[asyncio.Event] = None
+        self._probe_task: Optional[asyncio.Task] = None
+        self._req_id = 0
+        log.info(f"🧭 RPC Router alustettu: {len(self.nodes)} endpointtia")
+
+    # --- Public API ---
+    async def call(self, rpc_function: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        RPCRoundRobin.call-yhteensopiva: rpc_function(url, *args, **kwargs) valitulla endpointilla.
+        Metodina (tilastot/reititys) käytetään funktion nimeä; poikkeus -> seuraava endpoint kuten RPCRoundRobin.
+        Ei hedgeä: mielivaltaisen callablen idempotenssia ei tunneta (esim. lähetys käärittynä funktioon).
+        """
+        method = getattr(rpc_function, "__name__", "call")
+        return await self._execute(method, lambda url: rpc_function(url, *args, **kwargs), hedge=False)
+
+    async def request(self, method: str, params: Optional[list] = None) -> Any:
+        """Yksi JSON-RPC -kutsu; palauttaa resultin, pyynnön virhe nostetaan RuntimeErrorina"""
+        self._req_id += 1
+        data = await self.post({"jsonrpc": "2.0", "id": self._req_id, "method": method, "params": params or []})
+        if isinstance(data, dict) and data.get("error"):
+            raise RuntimeError(f"{method} error: {data['error']}")
+        return data.get("result") if isinstance(data, dict) else None
+
+    async def post(self, payload: Any) -> Any:
+        """JSON-RPC -pyyntö tai batch (lista) reitittimen kautta; vastaus sellaisenaan (BatchingSolanaRPC-transport)"""
+        if isinstance(payload, list):
+            method = "batch:" + (payload[0].get("method", "?") if payload else "empty")
+        else:
+            method = payload.get("method", "?")
+
+        async def send(url: str) -> Any:
+            data = await get_http_client().post_json(url, json=payload, tries=1, timeout=self.request_timeout_sec)
+            for item in data if isinstance(data, list) else [data]:
+                error = item.get("error") if isinstance(item, dict) else None
+                if isinstance(error, dict) and error.get("code") in NODE_ERROR_CODES:
+                    raise RPCNodeError(str(error))
+            return data
+
+        return await self._execute(method, send)
+
+    @contextlib.asynccontextmanager
+    async def lease(self, method: str = "lease") -> AsyncIterator[str]:
+        """
+        Varaa endpoint koko lohkon ajaksi (esim. solana-py AsyncClient useammalle kutsulle).
+        Kesto ja poikkeus kirjataan endpointille; ei hedgeä eikä failoveria.
+        """
+        self._ensure_probes()
+        node = await self._acquire(method, set())
+        if node is None:
+            raise RuntimeError("RPC router: ei endpointteja")
+        started = time.perf_counter()
+        outcome: Optional[bool] = None
+        try:
+            yield node.url
+            outcome = True
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            outcome = False
+            raise
+        finally:
+            if outcome is not None:
+                self._record(node, method, time.perf_counter() - started, outcome)
+            self._release(node)
+
+    def endpoint(self, method: str = "lease") -> str:
+        """
+        Paras endpoint ilman varausta ja kirjausta: pitkät pollaukset (esim. confirmTransaction) eivät
+        saa pitää rinnakkaisuuspaikkaa eivätkä vääristää noden latenssi-EWMA:ta
+        """
+        nodes = self._eligible(set())
+        if not nodes:
+            raise RuntimeError("RPC router: ei endpointteja")
+        return max(nodes, key=lambda n: self._weight(n, method)).url
+
+    def hedge_delay(self, method: str) -> Optional[float]:
+        """Hedge-viive metodille (kvantiili viimeisen 5 min onnistuneista kutsuista) tai None"""
+        if self.hedge_quantile is None or method in NON_IDEMPOTENT_METHODS or len(self.nodes) < 2:
+            return None
+        sketch = self._latency.get(method)
+        if sketch is None or sketch.count() < self.hedge_min_samples:
+            return None
+        value = sketch.quantile(self.hedge_quantile)
+        if value is None:
+            return None
+        return min(self.hedge_max_delay_sec, max(self.hedge_min_delay_sec, value))
+
+    def weights(self, method: Optional[str] = None) -> Dict[str, float]:
+        """Valintapainojen osuudet (summa 1) endpointeille joihin voidaan nyt reitittää"""
+        nodes = self._eligible(set())
+        raw = {n.url: self._weight(n, method) for n in nodes}
+        total = sum(raw.values())
+        return {url: (w / total if total > 0 else 0.0) for url, w in raw.items()}
+
+    async def probe_once(self) -> Dict[str, Optional[int]]:
+        """getSlot kaikilta; klusterin slot = korkein; yli max_slot_lag jäljessä -> alennettu"""
+        slots = await asyncio.gather(*(self._probe(node) for node in self.nodes))
+        known = [s for s in slots if s is not None]
+        if known:
+            self.cluster_slot = max(known)
+            for node, slot in zip(self.nodes, slots):
+                if slot is None:
+                    continue
+                node.slot = slot
+                node.slot_lag = self.cluster_slot - slot
+                lagging = node.slot_lag > self.max_slot_lag
+                if lagging != node.lagging:
+                    if lagging:
+                        log.warning(f"🐢 RPC endpoint jäljessä {node.slot_lag} slotia, alennetaan: {node.url}")
+                    else:
+                        log.info(f"✅ RPC endpoint saavutti klusterin: {node.url}")
+                node.lagging = lagging
+                router_slot_lag_metric.labels(endpoint=_endpoint_label(node.url)).set(node.slot_lag)
+        self._update_weight_metrics()
+        return {node.url: slot for node, slot in zip(self.nodes, slots)}
+
+    async def close(self) -> None:
+        """Pysäytä taustaprobe"""
+        task, self._probe_task = self._probe_task, None
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    def get_status(self) -> dict:
+        """Poolin tila metriikoita varten (RPCRoundRobin-kentät + painot, EWMA:t ja slot-jäljet)"""
+        now = time.time()
+        healthy_count = sum(1 for n in self.nodes if n.healthy())
+        weights = self.weights()
+        return {
+            "mode": "adaptive",
+            "total_endpoints": len(self.nodes),
+            "healthy_endpoints": healthy_count,
+            "quarantined_endpoints": len(self.nodes) - healthy_count,
+            "cluster_slot": self.cluster_slot,
+            "hedges": {"sent": self.hedges_sent, "won": self.hedges_won},
+            "endpoints": [
+                {
+                    "url": node.url,
+                    "healthy": node.healthy(),
+                    "errors": node.errors,
+                    "quarantine_remaining": max(0, node.quarantine_until - now),
+                    "weight": round(weights.get(node.url, 0.0), 4),
+                    "ewma_latency_ms": round(node.ewma_latency * 1000.0, 2) if node.ewma_latency is not None else None,
+                    "error_rate": round(node.ewma_error, 4),
+                    "inflight": node.inflight,
+                    "max_concurrency": node.max_concurrency,
+                    "slot": node.slot,
+                    "slot_lag": node.slot_lag,
+                    "lagging": node.lagging,
+                    "methods": {
+                        name: {
+                            "calls": s.calls,
+                            "errors": s.errors,
+                            "ewma_latency_ms": round(s.ewma_latency * 1000.0, 2) if s.ewma_latency is not None else None,
+                            "error_rate": round(s.ewma_error, 4),
+                        }
+                        for name, s in node.methods.items()
+                    },
+                }
+                for node in self.nodes
+            ],
+        }
+
+    # --- Internal: valinta ---
+    def _expected(self, node: RouterEndpoint, method: Optional[str]) -> tuple:
+        stats = node.methods.get(method) if method else None
+        if stats is not None and stats.ewma_latency is not None:
+            return stats.ewma_latency, stats.ewma_error
+        if node.ewma_latency is not None:
+            return node.ewma_latency, node.ewma_error
+        # mittaamaton node: nopeimman tunnetun latenssi -> saa liikennettä ja siten näytteitä
+        known = [n.ewma_latency for n in self.nodes if n.ewma_latency is not None]
+        return (min(known) if known else DEFAULT_LATENCY_SEC), node.ewma_error
+
+    def _weight(self, node: RouterEndpoint, method: Optional[str]) -> float:
+        latency, error = self._expected(node, method)
+        return (1.0 - min(0.95, error)) / (max(latency, 1e-4) * (1 + node.inflight))
+
+    def _eligible(self, exclude: set) -> List[RouterEndpoint]:
+        nodes = [n for n in self.nodes if n.url not in exclude]
+        healthy = [n for n in nodes if n.healthy()]
+        if healthy:
+            return healthy
+        # Kaikki karanteenissa/jäljessä -> jäljessä olevat ennen karanteenia, vanhin karanteeni ensin
+        lagging = [n for n in nodes if RPCEndpoint.healthy(n)]
+        if lagging:
+            return lagging
+        return sorted(nodes, key=lambda n: n.quarantine_until)[:1]
+
+    def _pick(self, method: str, exclude: set) -> Optional[RouterEndpoint]:
+        nodes = [n for n in self._eligible(exclude) if n.has_capacity()]
+        if not nodes:
+            return None
+        weights = [self._weight(n, method) for n in nodes]
+        r = self._rng.random() * sum(weights)
+        for node, w in zip(nodes, weights):
+            r -= w
+            if r <= 0:
+                return node
+        return nodes[-1]
+
+    async def _acquire(self, method: str, exclude: set) -> Optional[RouterEndpoint]:
+        """Varaa endpoint (odottaa jos kaikki ovat rinnakkaisuusrajalla); None jos kokeiltavaa ei ole"""
+        while True:
+            node = self._pick(method, exclude)
+            if node is not None:
+                node.inflight += 1
+                return node
+            if not self._eligible(exclude):
+                return None
+            if self._freed is None:
+                self._freed = asyncio.Event()
+            self._freed.clear()
+            await self._freed.wait()
+
+    def _try_acquire(self, method: str, exclude: set) -> Optional[RouterEndpoint]:
+        node = self._pick(method, exclude)
+        if node is not None:
+            node.inflight += 1
+        return node
+
+    def _release(self, node: RouterEndpoint) -> None:
+        node.inflight = max(0, node.inflight - 1)
+        if self._freed is not None:
+            self._freed.set()
+
+    # --- Internal: suoritus ---
+    async def _execute(self, method: str, send: Callable[[str], Awaitable[Any]], *, hedge: bool = True) -> Any:
+        """Ensisijainen endpoint (+ hedge kvantiilin jälkeen); kaikkien epäonnistuminen -> seuraava endpoint"""
+        self._ensure_probes()
+        tried: set = set()
+        last_exception: Optional[BaseException] = None
+        hedge_after = self.hedge_delay(method) if hedge else None
+        retry = method not in NON_IDEMPOTENT_METHODS
+        tasks: Dict[asyncio.Task, bool] = {}  # task -> onko hedge
+        try:
+            while True:
+                node = await self._acquire(method, tried)
+                if node is None:
+                    break
+                tried.add(node.url)
+                tasks.clear()
+                tasks[asyncio.ensure_future(self._attempt(node, method, send))] = False
+                pending = set(tasks)
+                if hedge_after is not None:
+                    done, pending = await asyncio.wait(pending, timeout=hedge_after)
+                    if not done:
+                        hedge_node = self._try_acquire(method, tried)
+                        if hedge_node is not None:
+                            tried.add(hedge_node.url)
+                            task = asyncio.ensure_future(self._attempt(hedge_node, method, send))
+                            tasks[task] = True
+                            pending.add(task)
+                            self.hedges_sent += 1
+                            router_hedges_metric.labels(outcome="sent").inc()
+                    pending |= done
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is None:
+                            if tasks[task]:
+                                self.hedges_won += 1
+                                router_hedges_metric.labels(outcome="won").inc()
+                            return task.result()
+                        last_exception = task.exception()
+                        log.warning(f"❌ RPC virhe ({method}): {last_exception}")
+                if not retry:
+                    break
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+        error_msg = f"RPC router exhausted after {len(tried)} endpoints ({method})"
+        if last_exception:
+            error_msg += f" (last error: {last_exception})"
+        log.error(f"💥 {error_msg}")
+        raise RuntimeError(error_msg) from last_exception
+
+    async def _attempt(self, node: RouterEndpoint, method: str, send: Callable[[str], Awaitable[Any]]) -> Any:
+        started = time.perf_counter()
+        try:
+            result = await send(node.url)
+        except asyncio.CancelledError:
+            # hävinnyt hedge: kesto on latenssin alaraja -> EWMA saa nousta mutta ei laskea
+            self._observe_censored(node, method, time.perf_counter() - started)
+            raise
+        except Exception:
+            self._record(node, method, time.perf_counter() - started, False)
+            raise
+        else:
+            self._record(node, method, time.perf_counter() - started, True)
+            return result
+        finally:
+            self._release(node)
+
+    def _record(self, node: RouterEndpoint, method: str, elapsed: float, ok: bool) -> None:
+        a = self.ewma_alpha
+        stats = node.methods.setdefault(method, _MethodStats())
+        stats.calls += 1
+        for s in (node, stats):
+            if ok:
+                s.ewma_latency = elapsed if s.ewma_latency is None else (1 - a) * s.ewma_latency + a * elapsed
+            s.ewma_error = (1 - a) * s.ewma_error + (0.0 if ok else a)
+        label = _endpoint_label(node.url)
+        router_requests_metric.labels(endpoint=label, outcome="ok" if ok else "error").inc()
+        if ok:
+            node.mark_success()
+            router_request_duration_metric.labels(endpoint=label, method=method).observe(elapsed)
+            sketch = self._latency.get(method)
+            if sketch is None:
+                sketch = self._latency[method] = WindowedQuantiles(window_sec=300, bucket_sec=10, relative_accuracy=0.02)
+            sketch.add(elapsed)
+        else:
+            stats.errors += 1
+            node.mark_error(self.penalty_sec)
+
+    def _observe_censored(self, node: RouterEndpoint, method: str, elapsed: float) -> None:
+        a = self.ewma_alpha
+        for s in (node, node.methods.setdefault(method, _MethodStats())):
+            if s.ewma_latency is not None and elapsed > s.ewma_latency:
+                s.ewma_latency = (1 - a) * s.ewma_latency + a * elapsed
+
+    # --- Internal: taustaprobe ---
+    def _ensure_probes(self) -> None:
+        if self.probe_interval_sec <= 0 or (self._probe_task is not None and not self._probe_task.done()):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._probe_task = loop.create_task(self._probe_loop(), name="rpc_router_probe")
+
+    async def _probe_loop(self) -> None:
+        while True:
+            try:
+                await self.probe_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning(f"RPC router probe virhe: {e}")
+            await asyncio.sleep(self.probe_interval_sec)
+
+    async def _probe(self, node: RouterEndpoint) -> Optional[int]:
+        started = time.perf_counter()
+        try:
+            data = await get_http_client().post_json(
+                node.url,
+                json={"jsonrpc": "2.0", "id": 1, "method": "getSlot", "params": [{"commitment": "processed"}]},
+                tries=1,
+                timeout=self.probe_timeout_sec,
+            )
+            slot = int(data["result"])
+        except Exception as e:
+            log.debug(f"getSlot probe epäonnistui {node.url}: {e}")
+            self._record(node, "getSlot", time.perf_counter() - started, False)
+            return None
+        self._record(node, "getSlot", time.perf_counter() - started, True)
+        return slot
+
+    def _update_weight_metrics(self) -> None:
+        weights = self.weights()
+        for node in self.nodes:
+            router_weight_metric.labels(endpoint=_endpoint_label(node.url)).set(weights.get(node.url, 0.0))
+
+
+class RouterTransport:
+    """BatchingSolanaRPC-transport reitittimen kautta (close() ei sulje jaettua reititintä)"""
+
+    def __init__(self, router: RPCRouter):
+        self.router = router
+        self.http_requests = 0
+
+    async def post(self, payload: Any) -> Any:
+        self.http_requests += 1
+        return await self.router.post(payload)
+
+
+def router_kwargs_from_env() -> Dict[str, Any]:
+    """RPC_ROUTER_* -asetukset RPCRouterin avainsanoiksi"""
+    quantile = os.getenv("RPC_ROUTER_HEDGE_QUANTILE", "0.9").strip()
+    return {
+        "max_concurrency": _env_int("RPC_ROUTER_MAX_CONCURRENCY", 16),
+        "hedge_quantile": float(quantile) if quantile not in ("", "0", "off", "none") else None,
+        "hedge_min_samples": _env_int("RPC_ROUTER_HEDGE_MIN_SAMPLES", 20),
+        "request_timeout_sec": _env_float("RPC_ROUTER_TIMEOUT_SEC", 5.0),
+        "probe_interval_sec": _env_float("RPC_ROUTER_PROBE_INTERVAL_SEC", 5.0),
+        "max_slot_lag": _env_int("RPC_ROUTER_MAX_SLOT_LAG", 50),
+    }
+
+
+def get_rpc_router() -> Optional[RPCRouter]:
+    """Globaali pool jos se on adaptiivinen reititin (rpc_pool.init_rpc_pool / router_from_env)"""
+    pool = rpc_pool.get_rpc_pool()
+    return pool if isinstance(pool, RPCRouter) else None
+
+
+def router_from_env(fallback_endpoints: Iterable[str] = ()) -> Optional[RPCRouter]:
+    """
+    RPC_ROUTER_ENABLED=1 -> RPCRouter globaaliksi pooliksi (muuten None = yksi endpoint kuten ennen).
+    Endpointit: RPC_ROUTER_URLS (pilkuilla) + fallback_endpoints.
+    """
+    if os.getenv("RPC_ROUTER_ENABLED", "0").strip().lower() not in ("1", "true", "yes", "on"):
+        return None
+    urls = [u.strip() for u in os.getenv("RPC_ROUTER_URLS", "").split(",") if u.strip()]
+    urls += [u for u in fallback_endpoints if u]
+    if not urls:
+        return None
+    router = RPCRouter(urls, **router_kwargs_from_env())
+    rpc_pool.set_rpc_pool(router)
+    return router
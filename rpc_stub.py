@@ -51,6 +51,10 @@ class StubSolanaRPC:
         self._token_cache: Dict[str, StubTokenInfo] = {}
         self._pool_cache: Dict[str, StubPoolInfo] = {}
         
+        # JSON-RPC transport -laskurit (yksi post() = yksi simuloitu HTTP round-trip)
+        self.http_requests = 0
+        self.rpc_methods_served = 0
+        
     async def _simulate_latency(self):
         """Simulate realistic RPC latency"""
         latency = self.base_latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
@@ -68,7 +72,10 @@ class StubSolanaRPC:
         if await self._should_error():
             raise Exception(f"RPC error for token {mint}")
             
-        # Return cached or create new mock data
+        return self._mock_token(mint)
+    
+    def _mock_token(self, mint: str) -> StubTokenInfo:
+        """Return cached or create new mock token data"""
         if mint not in self._token_cache:
             self._token_cache[mint] = StubTokenInfo(
                 mint=mint,
@@ -77,7 +84,6 @@ class StubSolanaRPC:
                 freeze_authority=None if random.random() > 0.1 else "FreezeAuth123",
                 mint_authority=None if random.random() > 0.1 else "MintAuth123"
             )
-            
         return self._token_cache[mint]
         
     async def get_pool_info(self, pool_address: str) -> Optional[StubPoolInfo]:
@@ -137,3 +143,139 @@ class StubSolanaRPC:
         await self._simulate_latency()
         return int(time.time() / 0.4)  # Mock block progression (2.5 blocks/sec)
 
+
+    # --- JSON-RPC transport (BatchingSolanaRPC testaus) ---
+    
+    async def post(self, payload: Any) -> Any:
+        """
+        Serve a single or batched (list) JSON-RPC payload.
+        One call = one simulated HTTP round-trip, regardless of batch size.
+        """
+        self.http_requests += 1
+        await self._simulate_latency()
+        
+        if await self._should_error():
+            raise Exception("RPC transport error")
+        
+        if isinstance(payload, list):
+            return [self._dispatch(item) for item in payload]
+        return self._dispatch(payload)
+    
+    def _dispatch(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle one JSON-RPC request object"""
+        self.rpc_methods_served += 1
+        method = req.get("method")
+        params = req.get("params") or []
+        base = {"jsonrpc": "2.0", "id": req.get("id")}
+        
+        if method == "getMultipleAccounts":
+            addresses = params[0] if params else []
+            return {**base, "result": {"context": {"slot": int(time.time() * 2)},
+                                       "value": [self._parsed_mint_account(a) for a in addresses]}}
+        if method == "getTokenSupply":
+            token = self._mock_token(params[0])
+            return {**base, "result": {"value": {"amount": str(token.supply), "decimals": token.decimals}}}
+        if method == "getTokenLargestAccounts":
+            token = self._mock_token(params[0])
+            rnd = random.Random(token.mint)
+            amounts = sorted((rnd.randint(1, token.supply // 50) for _ in range(20)), reverse=True)
+            return {**base, "result": {"value": [
+                {"address": f"{token.mint[:8]}Holder{i}", "amount": str(a), "decimals": token.decimals}
+                for i, a in enumerate(amounts)
+            ]}}
+        if method == "getSlot":
+            return {**base, "result": int(time.time() * 2)}
+        return {**base, "error": {"code": -32601, "message": f"Method not found: {method}"}}
+    
+    def _parsed_mint_account(self, address: str) -> Dict[str, Any]:
+        """jsonParsed-muotoinen SPL mint -tili"""
+        token = self._mock_token(address)
+        return {
+            "lamports": 1461600,
+            "owner": "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA",
+            "executable": False,
+            "rentEpoch": 0,
+            "data": {
+                "program": "spl-token",
+                "parsed": {
+                    "type": "mint",
+                    "info": {
+                        "decimals": token.decimals,
+                        "supply": str(token.supply),
+                        "mintAuthority": token.mint_authority,
+                        "freezeAuthority": token.freeze_authority,
+                        "isInitialized": True,
+                    },
+                },
+            },
+        }
+
+
+@dataclass
+class StubMintInfo:
+    renounced_mint: bool
+    renounced_freeze: bool
+    decimals: int
+
+@dataclass
+class StubLPInfo:
+    locked_or_burned: bool
+    liquidity_usd: float
+
+@dataclass
+class StubDistribution:
+    top_share: float
+    total_holders: int
+
+@dataclass
+class StubFlowStats:
+    unique_buyers: int
+    buys: int
+    sells: int
+    buy_sell_ratio: float
+
+class StubFastRPC:
+    """Nopeat "rikastukset" ilman verkkoa; satunnaistaa järkevillä rajoilla.
+
+    latency_ms/jitter_ms: valinnainen viiveinjektio per kutsu (0 = pelkkä yield).
+    """
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.calls = 0
+
+    async def _latency(self):
+        self.calls += 1
+        if self.latency_ms <= 0 and self.jitter_ms <= 0:
+            await asyncio.sleep(0)  # yield
+            return
+        delay = max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms))
+        await asyncio.sleep(delay / 1000.0)
+
+    async def get_mint_info(self, mint: str) -> StubMintInfo:
+        await self._latency()
+        # 90% renounced, 10% ei
+        return StubMintInfo(
+            renounced_mint=random.random() > 0.1, 
+            renounced_freeze=True,
+            decimals=9
+        )
+
+    async def get_lp_info(self, pool_address: str) -> StubLPInfo:
+        await self._latency()
+        liq = random.uniform(3000, 40000)  # 3k–40k USD
+        # 85% locked/burned
+        return StubLPInfo(locked_or_burned=random.random() > 0.15, liquidity_usd=liq)
+
+    async def get_holder_distribution(self, mint: str, top_n: int = 10) -> StubDistribution:
+        await self._latency()
+        top_share = random.uniform(0.05, 0.92)  # 5–92 %
+        return StubDistribution(top_share=top_share, total_holders=random.randint(50, 5000))
+
+    async def get_flow_stats(self, mint: str, window_sec: int = 300) -> StubFlowStats:
+        await self._latency()
+        buys = random.randint(0, 120)
+        sells = random.randint(0, 100)
+        uniq = random.randint(0, 80)
+        ratio = buys / max(sells, 1)  # Avoid division by zero
+        return StubFlowStats(unique_buyers=uniq, buys=buys, sells=sells, buy_sell_ratio=ratio)
@@ -4,7 +4,6 @@ from __future__ import annotations
 import asyncio
 import os
 import logging
-import aiohttp
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -13,6 +12,7 @@ from raydium_pool_watcher import RaydiumPoolWatcher
 from trading_config import TradingConfig
 from trader import Trader
 from exit_worker import ExitWorker
+from sources.pumpportal_trade_feed import PumpPortalTradeFeed
 from reconcile_worker import ReconcileWorker
 from dex_fetchers import (
     fetch_from_birdeye,
@@ -25,6 +25,9 @@ from scanner_config import ScannerConfig
 from circuit_breaker import CircuitBreakerConfig
 from solana_rpc_helpers import rpc_get_tx
 from health_server import HealthServer
+from helius_ws_hub import close_helius_hubs
+from http_pool import init_http_client, close_http_client, get_http_client
+from rpc_router import router_from_env
 from trending_lookback import TrendingLookbackSweep
 
 load_dotenv()
@@ -156,6 +159,8 @@ async def main():
         solscan=fetch_from_solscan,
         breaker_config=breaker_cfg,
         buyers30m_provider=_buyers30m_provider,
+        hedge=config.dex_hedge,
+        hedge_default_delay=config.dex_hedge_default_delay,
     )
 
     bot = HeliusTokenScannerBot(
@@ -168,7 +173,9 @@ async def main():
     
     # Trader-instanssi botille
     http_url = os.getenv("SOLANA_RPC_URL", "https://api.mainnet-beta.solana.com")
-    bot.trader = Trader(http_url, trade_cfg, logging.getLogger("trader"))
+    # RPC_ROUTER_ENABLED=1: Trader / ReconcileWorker / tx-broadcast käyttävät adaptiivista reititintä
+    rpc_router = router_from_env([http_url])
+    bot.trader = Trader(http_url, trade_cfg, logging.getLogger("trader"), router=rpc_router)
     bot.trade_cfg = trade_cfg
     
     # Initialize balance manager
@@ -181,7 +188,7 @@ async def main():
     
     if telegram_bot_token and telegram_chat_id and telegram_bot_token != "your_bot_token_here":
         try:
-            # Real Telegram bot with aiohttp
+            # Real Telegram bot (jaettu HTTP-pooli)
             class SimpleTelegramBot:
                 def __init__(self, token: str, chat_id: str):
                     self.enabled = True
@@ -191,19 +198,18 @@ async def main():
                     
                 async def send_message(self, message: str, parse_mode: str = "Markdown"):
                     try:
-                        async with aiohttp.ClientSession() as session:
-                            url = f"{self.base_url}/sendMessage"
-                            data = {
-                                "chat_id": self.chat_id,
-                                "text": message,
-                                "parse_mode": parse_mode,
-                                "disable_web_page_preview": True
-                            }
-                            async with session.post(url, json=data, timeout=aiohttp.ClientTimeout(total=10)) as resp:
-                                if resp.status != 200:
-                                    logging.getLogger(__name__).error(f"Telegram API error: {resp.status}")
-                                    return False
-                                return True
+                        url = f"{self.base_url}/sendMessage"
+                        data = {
+                            "chat_id": self.chat_id,
+                            "text": message,
+                            "parse_mode": parse_mode,
+                            "disable_web_page_preview": True
+                        }
+                        async with get_http_client().request("POST", url, json=data, timeout=10.0) as resp:
+                            if resp.status != 200:
+                                logging.getLogger(__name__).error(f"Telegram API error: {resp.status}")
+                                return False
+                            return True
                     except Exception as e:
                         logging.getLogger(__name__).error(f"Failed to send Telegram message: {e}")
                         return False
@@ -233,6 +239,8 @@ async def main():
         health_server = HealthServer(bot, health_host, health_port)
         await health_server.start()
 
+    # Jaettu HTTP-pooli (keep-alive, DNS-cache) kaikille REST-providereille
+    await init_http_client()
     await bot.start()
     
     # --- Raydium-pooliseulonta WS:llä ---
@@ -285,8 +293,12 @@ async def main():
             trader=bot.trader,
             positions=bot.positions,
             dex_fetcher=fetcher,
-            interval=int(os.getenv("EXIT_INTERVAL_SEC", "30"))
+            interval=int(os.getenv("EXIT_INTERVAL_SEC", "30")),
+            concurrency=_env_int("EXIT_CONCURRENCY", 8),
         )
+        # PumpPortal-kaupat pidetyille minteille -> exit-arvio heti; pollaus jää fallbackiksi
+        if os.getenv("EXIT_TRADE_FEED_ENABLED", "1").lower() in ("1", "true", "yes"):
+            exit_worker.trade_feed = PumpPortalTradeFeed(exit_worker.on_trade)
         exit_task = asyncio.create_task(exit_worker.run())
         logging.getLogger(__name__).info("🔄 ExitWorker started")
     
@@ -299,7 +311,7 @@ async def main():
             owner_pk = str(kp.pubkey())
         
         rec = ReconcileWorker(
-            http_url=os.getenv("SOLANA_RPC_URL"),
+            http_url=http_url,
             owner_pubkey=owner_pk,
             positions=bot.positions,
             interval=int(os.getenv("RECONCILE_INTERVAL_SEC", "90")),
@@ -320,7 +332,7 @@ async def main():
                 open_mints = []
                 for mint, pos in bot.positions.get_all().items():
                     if pos.get("status")=="open":
-                        atoms = await bot.balance_mgr.get_token_atoms(mint)
+                        atoms = snap["tokens"].get(mint, 0)  # samasta snapshotista, ei RPC:tä per mint
                         if atoms > 0:
                             onchain_open += 1
                             open_mints.append(mint)
@@ -375,6 +387,7 @@ async def main():
                 await exit_task
             except asyncio.CancelledError:
                 pass
+            await exit_worker.close()
         
         if 'reconcile_task' in locals():
             reconcile_task.cancel()
@@ -393,6 +406,10 @@ async def main():
         if health_server:
             await health_server.stop()
         await bot.graceful_shutdown(timeout=_env_float("SCANNER_SHUTDOWN_TIMEOUT", 30.0))
+        await close_helius_hubs()
+        if rpc_router:
+            await rpc_router.close()
+        await close_http_client()
         logging.getLogger(__name__).info("Bot shutdown complete")
 
 
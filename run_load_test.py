@@ -11,8 +11,7 @@ from datetime import datetime
 from typing import Dict, Any, List
 from discovery_engine import DiscoveryEngine
 from sources.mock_firehose import MockFirehoseSource
-from rpc_stub import StubSolanaRPC
-from tests.stubs_rpc import StubFastRPC
+from rpc_stub import StubSolanaRPC, StubFastRPC
 from metrics import init_metrics, metrics
 from json_logging import setup_json_logging, generate_run_id
 
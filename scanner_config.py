@@ -47,6 +47,30 @@ class ScannerConfig:
     liquidity_history_ttl: float = _env_float("SCANNER_LIQUIDITY_HISTORY_TTL", 3600.0, fallback="SCANNER_LIQUIDITY_TTL")   # seconds
     breaker_failure_threshold: int = _env_int("SCANNER_BREAKER_THRESHOLD", 5)
     breaker_timeout: float = _env_float("SCANNER_BREAKER_TIMEOUT", 60.0)
+    # Kuluttaja-pooli: pisteytys-workerit (shardattu mintin hashilla) + julkaisu-workerit (TG/trade)
+    consumer_workers: int = _env_int("SCANNER_CONSUMER_WORKERS", 4)
+    publish_workers: int = _env_int("SCANNER_PUBLISH_WORKERS", 1)
+    # DEX-tarjoajien hedged-haku (seuraava käynnistetään edellisen p90-latenssin jälkeen);
+    # opt-in: rinnakkaiset haut kuluttavat maksullisia (Birdeye) krediittejä
+    dex_hedge: bool = _env_bool("SCANNER_DEX_HEDGE", False)
+    dex_hedge_default_delay: float = _env_float("SCANNER_DEX_HEDGE_DELAY", 1.0)   # seconds, ennen kuin p90 on mitattu
+    # WS-kehysten esisuodatus: logsNotification ilman InitializeMint-lokia hylätään ennen JSON-dekoodausta
+    ws_prefilter: bool = _env_bool("SCANNER_WS_PREFILTER", True)
+    # JSONL-lokit (token_events / dex_rejects) taustakirjoittajan kautta
+    events_log_path: str = os.getenv("SCANNER_EVENTS_LOG", "token_events.jsonl")
+    rejects_log_path: str = os.getenv("SCANNER_REJECTS_LOG", "dex_rejects.jsonl")
+    jsonl_flush_interval: float = _env_float("SCANNER_JSONL_FLUSH_INTERVAL", 1.0)   # seconds
+    jsonl_fsync: str = os.getenv("SCANNER_JSONL_FSYNC", "never")                   # never | batch | close
+    jsonl_max_backlog: int = _env_int("SCANNER_JSONL_MAX_BACKLOG", 100_000)
+    jsonl_rotate_mb: float = _env_float("SCANNER_JSONL_ROTATE_MB", 256.0)           # 0 = ei kokorotaatiota
+    jsonl_rotate_hours: float = _env_float("SCANNER_JSONL_ROTATE_HOURS", 0.0)       # 0 = ei aikarotaatiota
+    jsonl_compress: bool = _env_bool("SCANNER_JSONL_COMPRESS", True)
+    # Raakakehysten + REST-vastausten tallennus toistoa varten (frame_capture), tyhjä = pois
+    capture_dir: str = os.getenv("SCANNER_CAPTURE_DIR", "")
+    capture_segment_mb: float = _env_float("SCANNER_CAPTURE_SEGMENT_MB", 64.0)
+    # Vaiheaikajanojen näytteistetty JSONL-loki (stage_trace), 0 = pois; histogrammit kerätään aina
+    trace_sample_rate: float = _env_float("SCANNER_TRACE_SAMPLE_RATE", 0.0)
+    trace_log_path: str = os.getenv("SCANNER_TRACE_LOG", "stage_traces.jsonl")
     # --- Kynnykset / heuristiikat ---
     min_liquidity_usd: float = _env_float("SCANNER_MIN_LIQUIDITY_USD", 20_000.0)
     min_volume24h_usd: float = _env_float("SCANNER_MIN_VOLUME24H_USD", 30_000.0)
@@ -0,0 +1,567 @@
+#!/usr/bin/env python3
+"""
+TechnicalAnalysisEnginen benchmark: alkuperäinen pandas/silmukka-toteutus vs. NumPy-ytimet (ta_kernels).
+
+Ajaa create_sample_ohlcv_data-datalla indikaattorit, tuki/vastustasot ja kuviot molemmilla poluilla,
+tarkistaa että tulokset täsmäävät (liukulukutoleranssilla) ja mittaa lisäksi batch-tilan
+(tokens x bars) vs. tokenikohtainen silmukka. Raportoi CPU-ajan per token.
+
+Käyttö:
+    python3 scripts/bench_technical_analysis.py
+    python3 scripts/bench_technical_analysis.py --tokens 500 --bars 200 --json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from technical_analysis_engine import (
+    PatternRecognition,
+    TechnicalAnalysisEngine,
+    TechnicalIndicators,
+    create_sample_ohlcv_data,
+)
+
+
+class LegacyTechnicalAnalysisEngine(TechnicalAnalysisEngine):
+    """Vektorointia edeltävä toteutus sellaisenaan (vertailukohta)"""
+
+    def calculate_rsi_simple(self, prices, period=14):
+        """Laske RSI yksinkertaistettu"""
+        delta = prices.diff()
+        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+        rs = gain / loss
+        return 100 - (100 / (1 + rs))
+    
+    def calculate_atr_simple(self, ohlcv_data, period=14):
+        """Laske ATR yksinkertaistettu"""
+        high = ohlcv_data['high']
+        low = ohlcv_data['low']
+        close = ohlcv_data['close']
+        
+        tr1 = high - low
+        tr2 = abs(high - close.shift())
+        tr3 = abs(low - close.shift())
+        
+        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+        return tr.rolling(window=period).mean()
+    
+    def calculate_stochastic_simple(self, ohlcv_data, k_period=14, d_period=3):
+        """Laske Stochastic yksinkertaistettu"""
+        low_min = ohlcv_data['low'].rolling(window=k_period).min()
+        high_max = ohlcv_data['high'].rolling(window=k_period).max()
+        
+        k_percent = 100 * ((ohlcv_data['close'] - low_min) / (high_max - low_min))
+        return k_percent
+    
+    def calculate_williams_r_simple(self, ohlcv_data, period=14):
+        """Laske Williams %R yksinkertaistettu"""
+        high_max = ohlcv_data['high'].rolling(window=period).max()
+        low_min = ohlcv_data['low'].rolling(window=period).min()
+        
+        williams_r = -100 * ((high_max - ohlcv_data['close']) / (high_max - low_min))
+        return williams_r
+    
+    def calculate_cci_simple(self, ohlcv_data, period=14):
+        """Laske CCI yksinkertaistettu"""
+        typical_price = (ohlcv_data['high'] + ohlcv_data['low'] + ohlcv_data['close']) / 3
+        sma_tp = typical_price.rolling(window=period).mean()
+        mad = typical_price.rolling(window=period).apply(lambda x: np.mean(np.abs(x - x.mean())))
+        
+        cci = (typical_price - sma_tp) / (0.015 * mad)
+        return cci
+    
+    def calculate_adx_simple(self, ohlcv_data, period=14):
+        """Laske ADX yksinkertaistettu"""
+        high = ohlcv_data['high']
+        low = ohlcv_data['low']
+        close = ohlcv_data['close']
+        
+        # True Range
+        tr1 = high - low
+        tr2 = abs(high - close.shift())
+        tr3 = abs(low - close.shift())
+        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+        
+        # Directional Movement
+        dm_plus = high.diff()
+        dm_minus = -low.diff()
+        
+        dm_plus = dm_plus.where((dm_plus > dm_minus) & (dm_plus > 0), 0)
+        dm_minus = dm_minus.where((dm_minus > dm_plus) & (dm_minus > 0), 0)
+        
+        # Smoothed values
+        tr_smooth = tr.rolling(window=period).mean()
+        dm_plus_smooth = dm_plus.rolling(window=period).mean()
+        dm_minus_smooth = dm_minus.rolling(window=period).mean()
+        
+        # DI values
+        di_plus = 100 * (dm_plus_smooth / tr_smooth)
+        di_minus = 100 * (dm_minus_smooth / tr_smooth)
+        
+        # ADX
+        dx = 100 * abs(di_plus - di_minus) / (di_plus + di_minus)
+        adx = dx.rolling(window=period).mean()
+        
+        return adx
+    
+    def calculate_obv_simple(self, ohlcv_data):
+        """Laske OBV yksinkertaistettu"""
+        close = ohlcv_data['close']
+        volume = ohlcv_data['volume']
+        
+        obv = pd.Series(index=close.index, dtype=float)
+        obv.iloc[0] = volume.iloc[0]
+        
+        for i in range(1, len(close)):
+            if close.iloc[i] > close.iloc[i-1]:
+                obv.iloc[i] = obv.iloc[i-1] + volume.iloc[i]
+            elif close.iloc[i] < close.iloc[i-1]:
+                obv.iloc[i] = obv.iloc[i-1] - volume.iloc[i]
+            else:
+                obv.iloc[i] = obv.iloc[i-1]
+        
+        return obv
+    
+    def calculate_technical_indicators(self, ohlcv_data: pd.DataFrame) -> TechnicalIndicators:
+        """Laske kaikki tekniset indikaattorit"""
+        try:
+            # Perusindikaattorit (yksinkertaistettu toteutus ilman talib)
+            sma_20 = ohlcv_data['close'].rolling(window=20).mean().iloc[-1]
+            sma_50 = ohlcv_data['close'].rolling(window=50).mean().iloc[-1]
+            ema_12 = ohlcv_data['close'].ewm(span=12).mean().iloc[-1]
+            ema_26 = ohlcv_data['close'].ewm(span=26).mean().iloc[-1]
+            
+            # RSI (yksinkertaistettu)
+            rsi = self.calculate_rsi_simple(ohlcv_data['close']).iloc[-1]
+            
+            # MACD (yksinkertaistettu)
+            macd = ema_12 - ema_26
+            macd_signal = pd.Series([macd]).ewm(span=9).mean().iloc[-1]
+            macd_histogram = macd - macd_signal
+            
+            # Bollinger Bands (yksinkertaistettu)
+            bb_middle = sma_20
+            bb_std = ohlcv_data['close'].rolling(window=20).std().iloc[-1]
+            bb_upper = bb_middle + (bb_std * 2)
+            bb_lower = bb_middle - (bb_std * 2)
+            
+            # Volume
+            volume_sma = ohlcv_data['volume'].rolling(window=20).mean().iloc[-1]
+            
+            # ATR (yksinkertaistettu)
+            atr = self.calculate_atr_simple(ohlcv_data).iloc[-1]
+            
+            # Stochastic (yksinkertaistettu)
+            stoch_k = self.calculate_stochastic_simple(ohlcv_data).iloc[-1]
+            stoch_d = pd.Series([stoch_k]).rolling(window=3).mean().iloc[-1]
+            
+            # Williams %R (yksinkertaistettu)
+            williams_r = self.calculate_williams_r_simple(ohlcv_data).iloc[-1]
+            
+            # CCI (yksinkertaistettu)
+            cci = self.calculate_cci_simple(ohlcv_data).iloc[-1]
+            
+            # ADX (yksinkertaistettu)
+            adx = self.calculate_adx_simple(ohlcv_data).iloc[-1]
+            
+            # OBV (yksinkertaistettu)
+            obv = self.calculate_obv_simple(ohlcv_data).iloc[-1]
+            
+            return TechnicalIndicators(
+                sma_20=sma_20,
+                sma_50=sma_50,
+                ema_12=ema_12,
+                ema_26=ema_26,
+                rsi=rsi,
+                macd=macd,
+                macd_signal=macd_signal,
+                macd_histogram=macd_histogram,
+                bollinger_upper=bb_upper,
+                bollinger_middle=bb_middle,
+                bollinger_lower=bb_lower,
+                volume_sma=volume_sma,
+                atr=atr,
+                stoch_k=stoch_k,
+                stoch_d=stoch_d,
+                williams_r=williams_r,
+                cci=cci,
+                adx=adx,
+                obv=obv
+            )
+            
+        except Exception as e:
+            self.logger.error(f"Virhe teknisen analyysin laskennassa: {e}")
+            return None
+    
+    def find_support_levels(self, ohlcv_data: pd.DataFrame) -> List[float]:
+        """Löydä tuki tasot"""
+        try:
+            # Käytä pivot point analyysiä
+            lows = ohlcv_data['low'].rolling(window=5, center=True).min()
+            support_levels = []
+            
+            for i in range(5, len(lows) - 5):
+                if lows.iloc[i] == ohlcv_data['low'].iloc[i]:
+                    # Tarkista onko tämä todellinen tuki
+                    if self.is_valid_support_level(ohlcv_data, lows.iloc[i], i):
+                        support_levels.append(lows.iloc[i])
+            
+            # Järjestä ja palauta top 3
+            support_levels.sort(reverse=True)
+            return support_levels[:3]
+            
+        except Exception as e:
+            self.logger.error(f"Virhe tuki tasojen löytämisessä: {e}")
+            return []
+    
+    def find_resistance_levels(self, ohlcv_data: pd.DataFrame) -> List[float]:
+        """Löydä vastustasot"""
+        try:
+            # Käytä pivot point analyysiä
+            highs = ohlcv_data['high'].rolling(window=5, center=True).max()
+            resistance_levels = []
+            
+            for i in range(5, len(highs) - 5):
+                if highs.iloc[i] == ohlcv_data['high'].iloc[i]:
+                    # Tarkista onko tämä todellinen vastustaso
+                    if self.is_valid_resistance_level(ohlcv_data, highs.iloc[i], i):
+                        resistance_levels.append(highs.iloc[i])
+            
+            # Järjestä ja palauta top 3
+            resistance_levels.sort()
+            return resistance_levels[:3]
+            
+        except Exception as e:
+            self.logger.error(f"Virhe vastustasojen löytämisessä: {e}")
+            return []
+    
+    def is_valid_support_level(self, ohlcv_data: pd.DataFrame, level: float, index: int) -> bool:
+        """Tarkista onko tuki taso validi"""
+        try:
+            # Tarkista kuinka monta kertaa hinta on koskenut tätä tasoa
+            touches = 0
+            tolerance = level * 0.02  # 2% toleranssi
+            
+            for i in range(max(0, index - 20), min(len(ohlcv_data), index + 20)):
+                if abs(ohlcv_data['low'].iloc[i] - level) <= tolerance:
+                    touches += 1
+            
+            return touches >= 2
+            
+        except Exception:
+            return False
+    
+    def is_valid_resistance_level(self, ohlcv_data: pd.DataFrame, level: float, index: int) -> bool:
+        """Tarkista onko vastustaso validi"""
+        try:
+            # Tarkista kuinka monta kertaa hinta on koskenut tätä tasoa
+            touches = 0
+            tolerance = level * 0.02  # 2% toleranssi
+            
+            for i in range(max(0, index - 20), min(len(ohlcv_data), index + 20)):
+                if abs(ohlcv_data['high'].iloc[i] - level) <= tolerance:
+                    touches += 1
+            
+            return touches >= 2
+            
+        except Exception:
+            return False
+    
+    def recognize_patterns(self, ohlcv_data: pd.DataFrame) -> PatternRecognition:
+        """Tunnista kuvioita"""
+        patterns = []
+        pattern_confidence = []
+        breakout_targets = []
+        stop_loss_levels = []
+        
+        try:
+            # Head and Shoulders
+            if self.detect_head_and_shoulders(ohlcv_data):
+                patterns.append("HEAD_AND_SHOULDERS")
+                pattern_confidence.append(0.7)
+                breakout_targets.append(ohlcv_data['close'].iloc[-1] * 0.9)
+                stop_loss_levels.append(ohlcv_data['close'].iloc[-1] * 1.05)
+            
+            # Double Top/Bottom
+            if self.detect_double_top(ohlcv_data):
+                patterns.append("DOUBLE_TOP")
+                pattern_confidence.append(0.6)
+                breakout_targets.append(ohlcv_data['close'].iloc[-1] * 0.9)
+                stop_loss_levels.append(ohlcv_data['close'].iloc[-1] * 1.03)
+            
+            if self.detect_double_bottom(ohlcv_data):
+                patterns.append("DOUBLE_BOTTOM")
+                pattern_confidence.append(0.6)
+                breakout_targets.append(ohlcv_data['close'].iloc[-1] * 1.1)
+                stop_loss_levels.append(ohlcv_data['close'].iloc[-1] * 0.97)
+            
+            # Triangle patterns
+            if self.detect_ascending_triangle(ohlcv_data):
+                patterns.append("ASCENDING_TRIANGLE")
+                pattern_confidence.append(0.8)
+                breakout_targets.append(ohlcv_data['close'].iloc[-1] * 1.15)
+                stop_loss_levels.append(ohlcv_data['close'].iloc[-1] * 0.95)
+            
+            if self.detect_descending_triangle(ohlcv_data):
+                patterns.append("DESCENDING_TRIANGLE")
+                pattern_confidence.append(0.8)
+                breakout_targets.append(ohlcv_data['close'].iloc[-1] * 0.85)
+                stop_loss_levels.append(ohlcv_data['close'].iloc[-1] * 1.05)
+            
+            # Flag and Pennant
+            if self.detect_flag_pattern(ohlcv_data):
+                patterns.append("FLAG")
+                pattern_confidence.append(0.7)
+                breakout_targets.append(ohlcv_data['close'].iloc[-1] * 1.2)
+                stop_loss_levels.append(ohlcv_data['close'].iloc[-1] * 0.9)
+            
+        except Exception as e:
+            self.logger.error(f"Virhe kuvioiden tunnistamisessa: {e}")
+        
+        return PatternRecognition(
+            patterns=patterns,
+            pattern_confidence=pattern_confidence,
+            breakout_targets=breakout_targets,
+            stop_loss_levels=stop_loss_levels
+        )
+    
+    def detect_head_and_shoulders(self, ohlcv_data: pd.DataFrame) -> bool:
+        """Tunnista Head and Shoulders kuvio"""
+        try:
+            # Yksinkertainen toteutus - tarkista 3 huippua
+            highs = ohlcv_data['high'].rolling(window=5, center=True).max()
+            peaks = []
+            
+            for i in range(5, len(highs) - 5):
+                if highs.iloc[i] == ohlcv_data['high'].iloc[i]:
+                    peaks.append((i, highs.iloc[i]))
+            
+            if len(peaks) >= 3:
+                # Tarkista onko keskimmäinen huippu korkein
+                middle_peak = peaks[len(peaks)//2]
+                left_peak = peaks[0]
+                right_peak = peaks[-1]
+                
+                return (middle_peak[1] > left_peak[1] and 
+                        middle_peak[1] > right_peak[1] and
+                        abs(left_peak[1] - right_peak[1]) / left_peak[1] < 0.05)
+            
+            return False
+            
+        except Exception:
+            return False
+    
+    def detect_double_top(self, ohlcv_data: pd.DataFrame) -> bool:
+        """Tunnista Double Top kuvio"""
+        try:
+            highs = ohlcv_data['high'].rolling(window=5, center=True).max()
+            peaks = []
+            
+            for i in range(5, len(highs) - 5):
+                if highs.iloc[i] == ohlcv_data['high'].iloc[i]:
+                    peaks.append((i, highs.iloc[i]))
+            
+            if len(peaks) >= 2:
+                # Tarkista onko kaksi huippua samalla tasolla
+                last_two_peaks = peaks[-2:]
+                price_diff = abs(last_two_peaks[0][1] - last_two_peaks[1][1]) / last_two_peaks[0][1]
+                return price_diff < 0.03  # 3% toleranssi
+            
+            return False
+            
+        except Exception:
+            return False
+    
+    def detect_double_bottom(self, ohlcv_data: pd.DataFrame) -> bool:
+        """Tunnista Double Bottom kuvio"""
+        try:
+            lows = ohlcv_data['low'].rolling(window=5, center=True).min()
+            valleys = []
+            
+            for i in range(5, len(lows) - 5):
+                if lows.iloc[i] == ohlcv_data['low'].iloc[i]:
+                    valleys.append((i, lows.iloc[i]))
+            
+            if len(valleys) >= 2:
+                # Tarkista onko kaksi pohjaa samalla tasolla
+                last_two_valleys = valleys[-2:]
+                price_diff = abs(last_two_valleys[0][1] - last_two_valleys[1][1]) / last_two_valleys[0][1]
+                return price_diff < 0.03  # 3% toleranssi
+            
+            return False
+            
+        except Exception:
+            return False
+    
+    def detect_ascending_triangle(self, ohlcv_data: pd.DataFrame) -> bool:
+        """Tunnista Ascending Triangle kuvio"""
+        try:
+            # Yksinkertainen toteutus - tarkista nouseva tuki ja vaakasuora vastustaso
+            recent_data = ohlcv_data.tail(20)
+            
+            # Tarkista nouseva tuki
+            lows = recent_data['low']
+            if len(lows) >= 3:
+                # Laske trendi alimmille hinnoille
+                low_trend = np.polyfit(range(len(lows)), lows, 1)[0]
+                return low_trend > 0  # Positiivinen trendi
+            
+            return False
+            
+        except Exception:
+            return False
+    
+    def detect_descending_triangle(self, ohlcv_data: pd.DataFrame) -> bool:
+        """Tunnista Descending Triangle kuvio"""
+        try:
+            # Yksinkertainen toteutus - tarkista laskeva vastustaso ja vaakasuora tuki
+            recent_data = ohlcv_data.tail(20)
+            
+            # Tarkista laskeva vastustaso
+            highs = recent_data['high']
+            if len(highs) >= 3:
+                # Laske trendi ylimmille hinnoille
+                high_trend = np.polyfit(range(len(highs)), highs, 1)[0]
+                return high_trend < 0  # Negatiivinen trendi
+            
+            return False
+            
+        except Exception:
+            return False
+    
+    def detect_flag_pattern(self, ohlcv_data: pd.DataFrame) -> bool:
+        """Tunnista Flag kuvio"""
+        try:
+            # Yksinkertainen toteutus - tarkista nopea liike ja konsolidointi
+            recent_data = ohlcv_data.tail(15)
+            
+            # Tarkista onko ollut nopea liike
+            price_range = recent_data['high'].max() - recent_data['low'].min()
+            avg_price = recent_data['close'].mean()
+            
+            if price_range / avg_price > 0.1:  # Yli 10% liike
+                # Tarkista konsolidointi
+                recent_volatility = recent_data['close'].std() / recent_data['close'].mean()
+                return recent_volatility < 0.05  # Matala volatiliteetti
+            
+            return False
+            
+        except Exception:
+            return False
+    
+
+def _same(a: Any, b: Any) -> bool:
+    if isinstance(a, float) or isinstance(b, float):
+        a, b = float(a), float(b)
+        return (math.isnan(a) and math.isnan(b)) or math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+    return a == b
+
+
+def _results(engine: TechnicalAnalysisEngine, df: pd.DataFrame) -> Dict[str, Any]:
+    ind = engine.calculate_technical_indicators(df)
+    return {
+        **{f"ind.{k}": v for k, v in vars(ind).items()},
+        "support": engine.find_support_levels(df),
+        "resistance": engine.find_resistance_levels(df),
+        "patterns": engine.recognize_patterns(df).patterns,
+    }
+
+
+def _compare(a: Dict[str, Any], b: Dict[str, Any]) -> List[str]:
+    bad = []
+    for key in a:
+        x, y = a[key], b[key]
+        if isinstance(x, list):
+            ok = len(x) == len(y) and all(_same(p, q) for p, q in zip(x, y))
+        else:
+            ok = _same(x, y)
+        if not ok:
+            bad.append(key)
+    return bad
+
+
+def build_tokens(tokens: int, bars: int, seed: int = 7) -> List[pd.DataFrame]:
+    """create_sample_ohlcv_data(bars) jokaiselle tokenille, hinnat kerrottu tokenikohtaisella satunnaiskululla"""
+    base = create_sample_ohlcv_data(bars)
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(tokens):
+        drift = np.exp(np.cumsum(rng.normal(0, 0.01, len(base))))
+        df = base.copy()
+        df[["open", "high", "low", "close"]] = base[["open", "high", "low", "close"]].mul(drift, axis=0)
+        df["volume"] = base["volume"] * rng.uniform(0.1, 10)
+        frames.append(df)
+    return frames
+
+
+def _best(fn: Callable[[], Any], repeat: int):
+    times, out = [], None
+    for _ in range(repeat):
+        t0 = time.process_time()
+        out = fn()
+        times.append(time.process_time() - t0)
+    return min(times), out
+
+
+def run_bench(frames: List[pd.DataFrame], repeat: int = 3) -> Dict[str, Any]:
+    legacy, fast = LegacyTechnicalAnalysisEngine(), TechnicalAnalysisEngine()
+    legacy_sec, legacy_out = _best(lambda: [_results(legacy, df) for df in frames], repeat)
+    fast_sec, fast_out = _best(lambda: [_results(fast, df) for df in frames], repeat)
+    mismatches = sorted({key for a, b in zip(legacy_out, fast_out) for key in _compare(a, b)})
+
+    stacked = {c: np.stack([df[c].to_numpy(dtype=float) for df in frames]) for c in ("high", "low", "close", "volume")}
+    batch_sec, batch = _best(lambda: fast.calculate_technical_indicators_batch(
+        stacked["high"], stacked["low"], stacked["close"], stacked["volume"]), repeat)
+    batch_ok = all(
+        _same(float(batch[k][i]), out[f"ind.{k}"]) for i, out in enumerate(legacy_out) for k in batch
+    )
+
+    n = max(1, len(frames))
+    return {
+        "tokens": len(frames),
+        "bars": len(frames[0]) if frames else 0,
+        "results_match": not mismatches and batch_ok,
+        "mismatches": mismatches + ([] if batch_ok else ["batch"]),
+        "legacy_cpu_ms_per_token": round(legacy_sec * 1000 / n, 3),
+        "vectorised_cpu_ms_per_token": round(fast_sec * 1000 / n, 3),
+        "batch_indicators_cpu_ms_per_token": round(batch_sec * 1000 / n, 4),
+        "speedup": round(legacy_sec / fast_sec, 2) if fast_sec > 0 else None,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="TechnicalAnalysisEnginen CPU-benchmark")
+    parser.add_argument("--tokens", type=int, default=50, help="tokeneita (batch-rivejä)")
+    parser.add_argument("--bars", type=int, default=100, help="kynttilöitä per token")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="tulosta raportti JSONina")
+    args = parser.parse_args()
+
+    report = run_bench(build_tokens(args.tokens, args.bars), repeat=args.repeat)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Tokeneita: {report['tokens']} x {report['bars']} kynttilää (tulokset täsmäävät: {report['results_match']})")
+        print(f"alkuperäinen:  {report['legacy_cpu_ms_per_token']:.3f} CPU-ms / token")
+        print(f"NumPy-ytimet:  {report['vectorised_cpu_ms_per_token']:.3f} CPU-ms / token (x{report['speedup']})")
+        print(f"batch-indikaattorit: {report['batch_indicators_cpu_ms_per_token']:.4f} CPU-ms / token")
+        if report["mismatches"]:
+            print(f"eroavat: {', '.join(report['mismatches'])}")
+    return 0 if report["results_match"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+WS-esisuodattimen benchmark: täysi json.loads jokaiselle kehykselle vs. FramePrefilter.
+
+Toistaa data/helius_sample.jsonl -tiedoston mintit logsNotification-kehyksinä (InitializeMint)
+ja sekoittaa joukkoon Token-ohjelman tavallisia siirtokehyksiä (--noise), kuten logsSubscribe-firehosessa.
+Raportoi CPU-ajan per 100k kehystä molemmille poluille.
+
+Käyttö:
+    python3 scripts/bench_ws_prefilter.py
+    python3 scripts/bench_ws_prefilter.py --frames 500000 --noise 500 --json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ws_prefilter import TOKEN_MINT_MARKERS, FramePrefilter
+
+TOKEN_PROGRAM = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
+_B58 = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+
+def _pubkey(rnd: random.Random) -> str:
+    return "".join(rnd.choice(_B58) for _ in range(44))
+
+
+def _notification(rnd: random.Random, logs: List[str]) -> str:
+    return json.dumps({
+        "jsonrpc": "2.0",
+        "method": "logsNotification",
+        "params": {
+            "result": {
+                "context": {"slot": rnd.randint(250_000_000, 260_000_000)},
+                "value": {"signature": _pubkey(rnd) + _pubkey(rnd), "err": None, "logs": logs},
+            },
+            "subscription": 1,
+        },
+    })
+
+
+def _transfer_logs(rnd: random.Random) -> List[str]:
+    logs = ["Program ComputeBudget111111111111111111111111111111 invoke [1]",
+            "Program ComputeBudget111111111111111111111111111111 success"]
+    for _ in range(rnd.randint(1, 4)):
+        logs += [
+            f"Program {TOKEN_PROGRAM} invoke [2]",
+            "Program log: Instruction: TransferChecked",
+            f"Program {TOKEN_PROGRAM} consumed {rnd.randint(3000, 9000)} of 200000 compute units",
+            f"Program {TOKEN_PROGRAM} success",
+        ]
+    return logs
+
+
+def _mint_logs(mint: str) -> List[str]:
+    return [
+        f"Program {TOKEN_PROGRAM} invoke [1]",
+        "Program log: Instruction: InitializeMint2",
+        f"Program log: mint {mint}",
+        f"Program {TOKEN_PROGRAM} success",
+    ]
+
+
+def load_sample_mints(path: Path) -> List[str]:
+    mints = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(row, dict) and row.get("mint"):
+                mints.append(str(row["mint"]))
+    return mints
+
+
+def build_frames(mints: List[str], frames: int, noise: int, seed: int = 7) -> List[str]:
+    """Yksi InitializeMint-kehys jokaista `noise` siirtokehystä kohden; mintit kierretään näytteestä"""
+    rnd = random.Random(seed)
+    transfers = [_notification(rnd, _transfer_logs(rnd)) for _ in range(256)]
+    out: List[str] = ['{"jsonrpc":"2.0","result":4711,"id":1}']
+    i = 0
+    while len(out) < frames:
+        if noise <= 0 or len(out) % (noise + 1) == 0:
+            out.append(_notification(rnd, _mint_logs(mints[i % len(mints)])))
+            i += 1
+        else:
+            out.append(transfers[rnd.randrange(len(transfers))])
+    return out
+
+
+def _baseline(frames: List[str]) -> int:
+    hits = 0
+    for msg in frames:
+        try:
+            data = json.loads(msg)
+        except Exception:
+            continue
+        params = data.get("params", {})
+        value = (params.get("result") or {}).get("value") if isinstance(params, dict) else None
+        if not value:
+            continue
+        if "InitializeMint" in "\n".join(value.get("logs") or []):
+            hits += 1
+    return hits
+
+
+def _prefiltered(frames: List[str]) -> int:
+    flt = FramePrefilter("bench", TOKEN_MINT_MARKERS)
+    hits = 0
+    for msg in frames:
+        frame = flt.decode(msg)
+        if frame is None or not frame.notification:
+            continue
+        if "InitializeMint" in "\n".join(frame.value.get("logs") or []):
+            hits += 1
+    return hits
+
+
+def run_bench(frames: List[str], repeat: int = 3) -> Dict[str, Any]:
+    def best(fn):
+        times, hits = [], 0
+        for _ in range(repeat):
+            t0 = time.process_time()
+            hits = fn(frames)
+            times.append(time.process_time() - t0)
+        return min(times), hits
+
+    base_sec, base_hits = best(_baseline)
+    pre_sec, pre_hits = best(_prefiltered)
+    per_100k = 100_000 / max(1, len(frames))
+    return {
+        "frames": len(frames),
+        "mint_frames": base_hits,
+        "hits_match": base_hits == pre_hits,
+        "baseline_cpu_sec_per_100k": round(base_sec * per_100k, 4),
+        "prefilter_cpu_sec_per_100k": round(pre_sec * per_100k, 4),
+        "cpu_saved_sec_per_100k": round((base_sec - pre_sec) * per_100k, 4),
+        "speedup": round(base_sec / pre_sec, 2) if pre_sec > 0 else None,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="WS-esisuodattimen CPU-benchmark")
+    parser.add_argument("--sample", default=str(Path(__file__).parent.parent / "data" / "helius_sample.jsonl"))
+    parser.add_argument("--frames", type=int, default=100_000, help="kehyksiä yhteensä")
+    parser.add_argument("--noise", type=int, default=200, help="siirtokehyksiä jokaista mint-kehystä kohden")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="tulosta raportti JSONina")
+    args = parser.parse_args()
+
+    mints = load_sample_mints(Path(args.sample)) or ["EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v"]
+    report = run_bench(build_frames(mints, args.frames, args.noise), repeat=args.repeat)
+    report["sample"] = args.sample
+    report["noise"] = args.noise
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Kehyksiä: {report['frames']} (mint-kehyksiä {report['mint_frames']}, osumat täsmäävät: {report['hits_match']})")
+        print(f"json.loads kaikille: {report['baseline_cpu_sec_per_100k']:.3f} CPU-s / 100k")
+        print(f"esisuodatin:         {report['prefilter_cpu_sec_per_100k']:.3f} CPU-s / 100k")
+        print(f"säästö:              {report['cpu_saved_sec_per_100k']:.3f} CPU-s / 100k (x{report['speedup']})")
+    return 0 if report["hits_match"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Frame capture -tallenteen toisto: syöttää tallennetut Helius-kehykset HeliusTransactionsNewTokensSourcen
+ja DiscoveryEnginen läpi, REST-kutsut palvellaan tallenteesta.
+
+Tallenne syntyy ajamalla skanneri SCANNER_CAPTURE_DIR=<hakemisto> -asetuksella.
+
+Käyttö:
+    python3 scripts/replay_capture.py captures/burst1               # max-nopeus
+    python3 scripts/replay_capture.py captures/burst1 --speed 1     # alkuperäinen tahti
+    python3 scripts/replay_capture.py captures/burst1 --speed 10 --json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from regression_test import RegressionTester
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Toista frame capture -tallenne")
+    parser.add_argument("capture_dir")
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = tallennettu tahti, N = N-kertainen, 0 = max")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--json", action="store_true", help="tulosta JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    result = asyncio.run(
+        RegressionTester().run_capture_regression(args.capture_dir, speed=args.speed, timeout=args.timeout)
+    )
+    if args.json:
+        print(json.dumps(result, indent=2, default=str))
+    else:
+        res = result.get("results", {})
+        print(f"Kehyksiä: {res.get('events_processed', 0)}  ({res.get('frames_per_sec', 0.0):.0f}/s)")
+        print(f"Ehdokkaita: {res.get('candidates', 0)}")
+        print(f"REST: {res.get('http_hits', 0)} osumaa, {res.get('http_misses', 0)} puuttuvaa")
+        print(f"Kesto: {result.get('duration_seconds', 0.0):.2f}s  valmis={res.get('complete')}")
+        if not result.get("success"):
+            print(f"Virhe: {result.get('error', 'toisto ei valmistunut')}")
+    return 0 if result.get("success") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,286 +1,165 @@
 #!/usr/bin/env python3
 """
-Erillinen ajoskripti kuormitustestille.
-Kehittäjä voi pyörittää ilman pytest:ia nopeaan testaamiseen ja debuggaamiseen.
+DiscoveryEnginen benchmark-ajo (discovery_benchmark).
+Mittaa todellisen pisteytetyn läpiviennin, latenssikvantiilit, jonosyvyyden, pudotukset, RSS:n ja CPU:n
+per ehdokas; raportti on vakaata JSON-skeemaa (discovery-bench/1), jota voi verrata committien välillä.
 
 Käyttö:
     python3 scripts/run_load_test.py
     python3 scripts/run_load_test.py --rate 2000 --duration 15
+    python3 scripts/run_load_test.py --batching --rpc-latency 40
+    python3 scripts/run_load_test.py --multi --output bench.json
+    python3 scripts/run_load_test.py --multi --baseline bench.json   # regressiotila: exit 2 jos huononi
     python3 scripts/run_load_test.py --help
 """
 from __future__ import annotations
-import asyncio
-import time
+
 import argparse
+import asyncio
 import json
+import logging
 import sys
 from pathlib import Path
-from typing import Dict, Any
+from typing import Any, Dict, List
 
 # Lisää projekti Python path:iin
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from discovery_engine import DiscoveryEngine
-from sources.mock_firehose import MockFirehoseSource
-from tests.stubs_rpc import StubFastRPC
-
-
-async def run_load_test(
-    rate: int = 1000,
-    duration: float = 10.0,
-    burst: int = 25,
-    jitter_ms: int = 2,
-    min_liq_usd: float = 3000.0,
-    max_queue: int = 10000,
-    output_file: str = None
-) -> Dict[str, Any]:
-    """
-    Suorita kuormitustesti DiscoveryEngine:lle.
-    
-    Args:
-        rate: Ehdokkaiden määrä per sekunti
-        duration: Testin kesto sekunneissa
-        burst: Burst-koko (ehdokkaita per tikki)
-        jitter_ms: Aikajitteri millisekunteina
-        min_liq_usd: Minimilikviditeetti USD
-        max_queue: Maksimijonon koko
-        output_file: JSON-tiedosto tulosten tallentamiseen
-    
-    Returns:
-        Testitulokset sanakirjana
-    """
-    print(f"🚀 Aloitetaan kuormitustesti...")
-    print(f"   Rate: {rate} ehdokasta/s")
-    print(f"   Duration: {duration}s")
-    print(f"   Burst: {burst}")
-    print(f"   Min liquidity: ${min_liq_usd:,.0f}")
-    print(f"   Max queue: {max_queue:,}")
-    print()
-
-    # Luo komponentit
-    rpc = StubFastRPC()
-    src = MockFirehoseSource(rate_per_sec=rate, burst=burst, jitter_ms=jitter_ms)
-    eng = DiscoveryEngine(
-        rpc_endpoint='http://localhost:8899',
-        market_sources=[src], 
-        min_liq_usd=min_liq_usd,
-        rpc_client=rpc
-    )
-    
-    # Käytä omaa registryä testeissä (ei HTTP-serveriä)
-    from prometheus_client import CollectorRegistry
-    from metrics import init_metrics
-    test_registry = CollectorRegistry()
-    init_metrics(
-        namespace=f"test_{int(time.time())}",
-        enabled=True,
-        enable_http=False,  # Ei HTTP-serveriä testeissä
-        registry=test_registry
-    )
-
-    # Säädä jonon maksimia
-    try:
-        eng.candidate_queue._maxsize = max_queue
-    except Exception:
-        pass
-
-    # Aloita testi
-    print("⏱️  Käynnistetään DiscoveryEngine...")
-    await eng.start()
-    
-    print("🔥 Kuormitustesti käynnissä...")
-    t0 = time.perf_counter()
-    await asyncio.sleep(duration)
-    t1 = time.perf_counter()
-    
-    print("🛑 Sammutetaan...")
-    await eng.stop()
-    await eng.wait_closed()
-
-    # Laske tulokset
-    elapsed = max(0.001, t1 - t0)
-    processed = len(getattr(eng, "_recent_scores", []))
-    if processed == 0:
-        processed = getattr(src, "_candidates_generated", 0)
-    
-    throughput = processed / elapsed
-    final_queue_size = eng.candidate_queue.qsize()
-    
-    # Tulokset
-    results = {
-        "test_config": {
-            "rate_per_sec": rate,
-            "duration_sec": duration,
-            "burst": burst,
-            "jitter_ms": jitter_ms,
-            "min_liq_usd": min_liq_usd,
-            "max_queue": max_queue
-        },
-        "results": {
-            "processed_items": processed,
-            "elapsed_sec": elapsed,
-            "throughput_per_sec": throughput,
-            "final_queue_size": final_queue_size,
-            "queue_utilization": (final_queue_size / max_queue) * 100 if max_queue > 0 else 0
-        },
-        "performance": {
-            "items_per_second": throughput,
-            "queue_stable": final_queue_size < max_queue * 0.8,  # < 80% täynnä
-            "throughput_acceptable": throughput >= rate * 0.5,  # > 50% tavoitteesta
-        },
-        "timestamp": time.time(),
-        "status": "completed"
-    }
-
-    # Tulosta tulokset
-    print()
-    print("📊 KUORMITUSTESTIN TULOKSET:")
-    print("=" * 50)
-    print(f"✅ Käsitelty: {processed:,} ehdokasta")
-    print(f"⏱️  Kesto: {elapsed:.2f}s")
-    print(f"🚀 Läpivienti: {throughput:.1f} ehdokasta/s")
-    print(f"📦 Jonon koko lopussa: {final_queue_size:,}")
-    print(f"📈 Jonon käyttöaste: {results['results']['queue_utilization']:.1f}%")
-    print()
-    
-    # Suorituskyky-arvio
-    print("🎯 SUORITUSKYKY-ARVIO:")
-    print("-" * 30)
-    if results['performance']['queue_stable']:
-        print("✅ Jono stabiili (< 80% täynnä)")
-    else:
-        print("⚠️  Jono korkea (≥ 80% täynnä)")
-    
-    if results['performance']['throughput_acceptable']:
-        print("✅ Läpivienti hyvä (≥ 50% tavoitteesta)")
-    else:
-        print("⚠️  Läpivienti heikko (< 50% tavoitteesta)")
-    
-    if throughput >= rate * 0.8:
-        print("🚀 Erinomainen suorituskyky!")
-    elif throughput >= rate * 0.5:
-        print("👍 Hyvä suorituskyky")
-    else:
-        print("🐌 Suorituskyky voi parantua")
-
-    # Tallenna tulokset tiedostoon
-    if output_file:
-        with open(output_file, 'w') as f:
-            json.dump(results, f, indent=2)
-        print(f"\n💾 Tulokset tallennettu: {output_file}")
-
-    return results
-
-
-async def run_multiple_tests():
-    """Suorita useita testejä eri parametreilla."""
-    test_cases = [
-        {"rate": 500, "duration": 5.0, "name": "Kevyt kuorma"},
-        {"rate": 1000, "duration": 5.0, "name": "Keskisuuri kuorma"},
-        {"rate": 2000, "duration": 5.0, "name": "Korkea kuorma"},
-        {"rate": 5000, "duration": 3.0, "name": "Erittäin korkea kuorma"},
-    ]
-    
-    print("🧪 Suoritetaan useita kuormitustestejä...")
-    print("=" * 60)
-    
-    all_results = []
-    
-    for i, test_case in enumerate(test_cases, 1):
-        print(f"\n🔬 Testi {i}/{len(test_cases)}: {test_case['name']}")
-        print("-" * 40)
-        
-        try:
-            results = await run_load_test(
-                rate=test_case['rate'],
-                duration=test_case['duration'],
-                burst=25,
-                min_liq_usd=2000.0
-            )
-            all_results.append({
-                "test_name": test_case['name'],
-                **results
-            })
-        except Exception as e:
-            print(f"❌ Testi epäonnistui: {e}")
-            all_results.append({
-                "test_name": test_case['name'],
-                "status": "failed",
-                "error": str(e)
-            })
-    
-    # Yhteenveto
-    print("\n📋 YHTEENVETO:")
-    print("=" * 60)
-    for result in all_results:
-        if result.get('status') == 'completed':
-            throughput = result['results']['throughput_per_sec']
-            rate = result['test_config']['rate_per_sec']
-            efficiency = (throughput / rate) * 100
-            print(f"✅ {result['test_name']}: {throughput:.1f}/s ({efficiency:.1f}% tehokkuus)")
-        else:
-            print(f"❌ {result['test_name']}: Epäonnistui")
-    
-    return all_results
-
-
-def main():
-    """Pääfunktio komentorivikäyttöliittymälle."""
+from discovery_benchmark import DEFAULT_THRESHOLDS, SCHEMA, BenchConfig, compare_reports, run_benchmark
+
+# Vakioprofiilit (--multi); nimet ovat vertailun avaimia
+PROFILES: List[Dict[str, Any]] = [
+    {"name": "light", "rate": 500, "duration_sec": 5.0},
+    {"name": "medium", "rate": 1000, "duration_sec": 5.0},
+    {"name": "high", "rate": 2000, "duration_sec": 5.0},
+    {"name": "high_rpc_latency", "rate": 1000, "duration_sec": 5.0, "rpc_latency_ms": 40.0, "rpc_jitter_ms": 8.0},
+    {"name": "batched_rpc_latency", "rate": 1000, "duration_sec": 5.0, "rpc_latency_ms": 40.0, "rpc_jitter_ms": 8.0,
+     "batching": True},
+]
+
+
+def _print_run(report: Dict[str, Any]) -> None:
+    m = report["metrics"]
+    lat = m["latency_ms"]
+    cfg = report["config"]
+    print(f"📊 {report['name']}: rate={cfg['rate']}/s rpc={cfg['rpc_latency_ms']:.0f}ms batching={cfg['batching']}")
+    print(f"   Pisteytetty: {m['scored']:,} ({m['throughput_scored_per_sec']:.1f}/s), "
+          f"hylätty {m['rejected']:,}, virheitä {m['errors']}")
+    print(f"   Pudotettu: {m['dropped']:,} / {m['offered']:,} ({m['drop_ratio'] * 100:.2f}%)")
+    if lat["p50"] is not None:
+        print(f"   Latenssi ms: p50={lat['p50']:.1f} p90={lat['p90']:.1f} p99={lat['p99']:.1f} max={lat['max']:.1f}")
+    q = m["queue_depth"]
+    print(f"   Jonosyvyys: max={q['max']} keskiarvo={q['mean']:.1f} lopussa={q['final']}")
+    print(f"   RSS: {m['rss_mb']['start']:.1f} -> {m['rss_mb']['end']:.1f} MB (+{m['rss_mb']['growth']:.1f})")
+    if m["cpu_ms_per_candidate"] is not None:
+        print(f"   CPU: {m['cpu_sec']:.2f}s = {m['cpu_ms_per_candidate']:.3f} ms/ehdokas")
+    rpc = m.get("rpc") or {}
+    if rpc.get("unbatched_requests"):
+        print(f"   RPC-pyynnöt: {rpc['http_requests']:,} (ilman eräytystä {rpc['unbatched_requests']:,})")
+
+
+async def _run_all(configs: List[BenchConfig]) -> Dict[str, Any]:
+    runs = []
+    for cfg in configs:
+        report = await run_benchmark(cfg)
+        _print_run(report)
+        runs.append(report)
+    return {"schema": SCHEMA, "runs": runs}
+
+
+def _compare(baseline: Dict[str, Any], current: Dict[str, Any], scale: float) -> int:
+    """Tulosta vertailu; palauttaa regressioiden määrän"""
+    thresholds = {k: (d, tol * scale) for k, (d, tol) in DEFAULT_THRESHOLDS.items()}
+    base_runs = {r["name"]: r for r in baseline.get("runs", [])}
+    total = 0
+    print("\n🔍 VERTAILU BASELINEEN:")
+    for run in current["runs"]:
+        base = base_runs.get(run["name"])
+        if base is None:
+            print(f"   {run['name']}: ei baselinea")
+            continue
+        result = compare_reports(base, run, thresholds)
+        if "_config_mismatch" in result["deltas"]:
+            print(f"   ⚠️  {run['name']}: asetukset eroavat baselinesta")
+        for metric, d in result["deltas"].items():
+            if metric.startswith("_"):
+                continue
+            change = f"{d['change'] * 100:+.1f}%" if d["change"] is not None else "n/a"
+            print(f"   {run['name']:<22} {metric:<28} {d['baseline']:>10} -> {d['current']:>10} ({change})")
+        for reg in result["regressions"]:
+            print(f"   ❌ REGRESSIO {run['name']}: {reg['metric']} (sallittu ±{reg['tolerance'] * 100:.0f}%)")
+        total += len(result["regressions"])
+    return total
+
+
+def main() -> int:
     parser = argparse.ArgumentParser(
-        description="Kuormitustesti DiscoveryEngine:lle",
+        description="Benchmark DiscoveryEngine:lle",
         formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
-Esimerkkejä:
-  python3 scripts/run_load_test.py
-  python3 scripts/run_load_test.py --rate 2000 --duration 15
-  python3 scripts/run_load_test.py --multi
-  python3 scripts/run_load_test.py --output results.json
-        """
     )
-    
-    parser.add_argument('--rate', type=int, default=1000,
-                       help='Ehdokkaiden määrä per sekunti (default: 1000)')
-    parser.add_argument('--duration', type=float, default=10.0,
-                       help='Testin kesto sekunneissa (default: 10.0)')
-    parser.add_argument('--burst', type=int, default=25,
-                       help='Burst-koko (default: 25)')
-    parser.add_argument('--jitter', type=int, default=2,
-                       help='Aikajitteri millisekunteina (default: 2)')
-    parser.add_argument('--min-liq', type=float, default=3000.0,
-                       help='Minimilikviditeetti USD (default: 3000.0)')
-    parser.add_argument('--max-queue', type=int, default=10000,
-                       help='Maksimijonon koko (default: 10000)')
-    parser.add_argument('--output', type=str,
-                       help='JSON-tiedosto tulosten tallentamiseen')
-    parser.add_argument('--multi', action='store_true',
-                       help='Suorita useita testejä eri parametreilla')
-    
+    parser.add_argument('--rate', type=int, default=1000, help='Ehdokkaiden määrä per sekunti (default: 1000)')
+    parser.add_argument('--duration', type=float, default=10.0, help='Mittausjakson kesto sekunneissa (default: 10.0)')
+    parser.add_argument('--warmup', type=float, default=1.0, help='Lämmittely ennen mittausta (default: 1.0)')
+    parser.add_argument('--burst', type=int, default=25, help='Burst-koko (default: 25)')
+    parser.add_argument('--jitter', type=int, default=2, help='Aikajitteri millisekunteina (default: 2)')
+    parser.add_argument('--min-liq', type=float, default=3000.0, help='Minimilikviditeetti USD (default: 3000.0)')
+    parser.add_argument('--max-queue', type=int, default=10000, help='Maksimijonon koko (default: 10000)')
+    parser.add_argument('--rpc-latency', type=float, default=5.0, help='StubSolanaRPC-viive ms (default: 5)')
+    parser.add_argument('--rpc-jitter', type=float, default=1.0, help='StubSolanaRPC-jitteri ms (default: 1)')
+    parser.add_argument('--rpc-error-rate', type=float, default=0.0, help='StubSolanaRPC-virheosuus (default: 0)')
+    parser.add_argument('--batching', action='store_true', help='Micro-batching RPC (default: pois)')
+    parser.add_argument('--batch-window', type=float, default=10.0, help='Micro-batch ikkuna ms (default: 10)')
+    parser.add_argument('--multi', action='store_true', help='Aja vakioprofiilit (PROFILES)')
+    parser.add_argument('--output', type=str, help='JSON-raportin tiedosto')
+    parser.add_argument('--baseline', type=str, help='Vertaa baseline-raporttiin; exit 2 jos regressioita')
+    parser.add_argument('--threshold-scale', type=float, default=1.0,
+                        help='Kerroin regressiokynnyksille (esim. 2.0 meluisassa CI:ssä)')
     args = parser.parse_args()
-    
+
+    logging.getLogger().setLevel(logging.WARNING)  # per-ehdokas INFO-lokit vääristäisivät CPU-mittauksen
+    if args.multi:
+        configs = [BenchConfig(warmup_sec=args.warmup, **profile) for profile in PROFILES]
+    else:
+        configs = [BenchConfig(
+            name="custom",
+            rate=args.rate,
+            duration_sec=args.duration,
+            warmup_sec=args.warmup,
+            burst=args.burst,
+            jitter_ms=args.jitter,
+            min_liq_usd=args.min_liq,
+            max_queue=args.max_queue,
+            rpc_latency_ms=args.rpc_latency,
+            rpc_jitter_ms=args.rpc_jitter,
+            rpc_error_rate=args.rpc_error_rate,
+            batching=args.batching,
+            batch_window_ms=args.batch_window,
+        )]
+
     try:
-        if args.multi:
-            results = asyncio.run(run_multiple_tests())
-            if args.output:
-                with open(args.output, 'w') as f:
-                    json.dump(results, f, indent=2)
-                print(f"\n💾 Kaikki tulokset tallennettu: {args.output}")
-        else:
-            asyncio.run(run_load_test(
-                rate=args.rate,
-                duration=args.duration,
-                burst=args.burst,
-                jitter_ms=args.jitter,
-                min_liq_usd=args.min_liq,
-                max_queue=args.max_queue,
-                output_file=args.output
-            ))
+        report = asyncio.run(_run_all(configs))
     except KeyboardInterrupt:
         print("\n⏹️  Testi keskeytetty käyttäjän toimesta")
-        sys.exit(1)
-    except Exception as e:
-        print(f"\n❌ Virhe: {e}")
-        sys.exit(1)
+        return 1
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Raportti tallennettu: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("schema") != SCHEMA:
+            print(f"❌ Baselinen skeema {baseline.get('schema')!r} != {SCHEMA!r}")
+            return 1
+        regressions = _compare(baseline, report, args.threshold_scale)
+        if regressions:
+            print(f"\n❌ {regressions} regressiota")
+            return 2
+        print("\n✅ Ei regressioita")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
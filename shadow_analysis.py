@@ -1,18 +1,41 @@
 """
 Shadow-datasetin hyödyntäminen - ROC/PR-käyrät ja painojen säätö
+
+- shadow_trades.db luetaan paloina (fetchmany) suoraan NumPy-taulukoihin
+- evaluate_scores(): tarkka ROC AUC, PR AUC (average precision), precision/recall@K ja
+  kynnyspyyhkäisy jokaisen erillisen scoren kohdalla yhdellä lajittelulla (cumsum)
+- horisontit 5/15/60 min; tune_score_threshold() antaa discovery.score_threshold -ehdotuksen
 """
 
-import asyncio
 import logging
 import sqlite3
 import time
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Any, Sequence
 import numpy as np
-from dataclasses import dataclass
 
 logger = logging.getLogger(__name__)
 
+HORIZONS = ("5m", "15m", "60m")
+FEATURES = ("novelty", "buyers_5m", "buy_ratio", "liq_usd", "top10_share", "rug_risk")
+K_VALUES = (1, 3, 5, 10, 50, 100)
+
+@dataclass
+class ScoreEvaluation:
+    """Yhden horisontin luokittelumetriikat (label = tuotto > good_return)"""
+    n: int
+    positives: int
+    roc_auc: float
+    pr_auc: float
+    precision_at_k: Dict[int, float]
+    recall_at_k: Dict[int, float]
+    thresholds: np.ndarray  # erilliset scoret laskevassa järjestyksessä (ennuste: score >= kynnys)
+    precision: np.ndarray
+    recall: np.ndarray
+    f1: np.ndarray
+    best_threshold: float
+    best_f1: float
+
 @dataclass
 class ShadowAnalysisResult:
     """Shadow analysis tulos"""
@@ -23,245 +46,240 @@ class ShadowAnalysisResult:
     optimal_threshold: float
     feature_importance: Dict[str, float]
     recommendations: List[str]
+    horizons: Dict[str, ScoreEvaluation] = field(default_factory=dict)
+    n_samples: int = 0
+
+@dataclass
+class ShadowArrays:
+    """Shadow-data sarakkeittain (puuttuva tuotto = NaN)"""
+    timestamp: np.ndarray
+    score: np.ndarray
+    features: Dict[str, np.ndarray]
+    returns: Dict[str, np.ndarray]
+
+    def __len__(self) -> int:
+        return len(self.score)
+
+
+def evaluate_scores(scores: np.ndarray, labels: np.ndarray, ks: Sequence[int] = K_VALUES) -> ScoreEvaluation:
+    """
+    Kaikki metriikat yhdellä lajittelulla: laskeva score -> kumulatiiviset TP/FP.
+    Tasapisteet käsitellään ryhmänä (kynnys = erillinen score), kuten sklearn roc_auc / average_precision.
+    """
+    scores = np.asarray(scores, dtype=float)
+    labels = np.asarray(labels, dtype=bool)
+    n = len(scores)
+    order = np.argsort(-scores, kind="mergesort")
+    s, y = scores[order], labels[order]
+    tp = np.cumsum(y, dtype=np.int64)
+    fp = np.arange(1, n + 1) - tp
+    pos = int(tp[-1]) if n else 0
+    neg = n - pos
+
+    # kunkin tasapisteryhmän viimeinen indeksi
+    last = np.r_[np.flatnonzero(np.diff(s)), n - 1] if n else np.array([], dtype=int)
+    tp_t, fp_t = tp[last], fp[last]
+    precision = tp_t / (tp_t + fp_t) if n else np.array([])
+    recall = tp_t / pos if pos else np.zeros(len(last))
+
+    if pos and neg:
+        tpr = np.r_[0.0, tp_t / pos]
+        fpr = np.r_[0.0, fp_t / neg]
+        roc_auc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2.0))
+        pr_auc = float(np.sum(np.diff(np.r_[0.0, recall]) * precision))
+    else:
+        roc_auc, pr_auc = 0.5, 0.5
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    best = int(np.argmax(f1)) if len(f1) else -1
+
+    p_at_k, r_at_k = {}, {}
+    for k in ks:
+        if k > n:
+            continue
+        p_at_k[k] = float(tp[k - 1] / k)
+        r_at_k[k] = float(tp[k - 1] / pos) if pos else 0.0
+
+    return ScoreEvaluation(
+        n=n, positives=pos, roc_auc=roc_auc, pr_auc=pr_auc,
+        precision_at_k=p_at_k, recall_at_k=r_at_k,
+        thresholds=s[last], precision=precision, recall=recall, f1=f1,
+        best_threshold=float(s[last][best]) if best >= 0 else 0.5,
+        best_f1=float(f1[best]) if best >= 0 else 0.0,
+    )
+
 
 class ShadowAnalyzer:
     """Shadow dataset analyzer"""
-    
-    def __init__(self, db_path: str = "shadow_trades.db"):
+
+    def __init__(self, db_path: str = "shadow_trades.db", *, good_return: float = 0.10,
+                 primary_horizon: str = "60m", chunk_size: int = 100_000):
         self.db_path = db_path
+        self.good_return = good_return  # hyvä = tuotto > 10 %
+        self.primary_horizon = primary_horizon
+        self.chunk_size = chunk_size
         self.analysis_cache = {}
         self.last_analysis = 0
         self.analysis_interval = 3600  # 1h
-        
+
         logger.info(f"✅ Shadow analyzer alustettu: {db_path}")
-    
+
     def analyze_performance(self, days_back: int = 7) -> ShadowAnalysisResult:
-        """Analysoi shadow trading performance"""
+        """Analysoi shadow trading performance kaikilla horisonteilla"""
         try:
             # Hae data viimeiseltä X päivältä
-            data = self._load_shadow_data(days_back)
-            
-            if len(data) < 10:
-                logger.warning(f"⚠️ Liian vähän shadow dataa analyysiin: {len(data)} riviä")
+            data = self._load_shadow_arrays(days_back)
+            primary = data.returns[self.primary_horizon]
+            mask = np.isfinite(primary)
+
+            if int(mask.sum()) < 10:
+                logger.warning(f"⚠️ Liian vähän shadow dataa analyysiin: {int(mask.sum())} riviä")
                 return self._empty_result()
-            
-            # Laske tuotot
-            data_with_returns = self._calculate_returns(data)
-            
-            # Precision@K ja Recall@K
-            precision_recall = self._calculate_precision_recall(data_with_returns)
-            
-            # ROC AUC ja PR AUC
-            roc_auc, pr_auc = self._calculate_auc_metrics(data_with_returns)
-            
-            # Optimaalinen kynnys
-            optimal_threshold = self._find_optimal_threshold(data_with_returns)
-            
+
+            horizons = {}
+            for h in HORIZONS:
+                valid = np.isfinite(data.returns[h])
+                if valid.sum() >= 10:
+                    horizons[h] = evaluate_scores(data.score[valid], data.returns[h][valid] > self.good_return)
+            main = horizons[self.primary_horizon]
+            labels = primary[mask] > self.good_return
+
             # Feature importance
-            feature_importance = self._calculate_feature_importance(data_with_returns)
-            
+            features = {name: values[mask] for name, values in data.features.items()}
+            feature_importance = self._calculate_feature_importance(features, labels)
+
             # Suositukset
-            recommendations = self._generate_recommendations(data_with_returns, feature_importance)
-            
+            recommendations = self._generate_recommendations(data.score[mask], labels, feature_importance)
+
             result = ShadowAnalysisResult(
-                precision_at_k=precision_recall['precision'],
-                recall_at_k=precision_recall['recall'],
-                roc_auc=roc_auc,
-                pr_auc=pr_auc,
-                optimal_threshold=optimal_threshold,
+                precision_at_k=main.precision_at_k,
+                recall_at_k=main.recall_at_k,
+                roc_auc=main.roc_auc,
+                pr_auc=main.pr_auc,
+                optimal_threshold=main.best_threshold,
                 feature_importance=feature_importance,
-                recommendations=recommendations
+                recommendations=recommendations,
+                horizons=horizons,
+                n_samples=int(mask.sum()),
             )
-            
-            logger.info(f"✅ Shadow analysis valmis: {len(data)} riviä, ROC AUC: {roc_auc:.3f}")
+
+            logger.info(f"✅ Shadow analysis valmis: {result.n_samples} riviä, ROC AUC: {main.roc_auc:.3f}")
             return result
-            
+
         except Exception as e:
             logger.error(f"Virhe shadow analysis:ssa: {e}")
             return self._empty_result()
-    
-    def _load_shadow_data(self, days_back: int) -> List[Dict]:
-        """Lataa shadow data tietokannasta"""
+
+    def tune_score_threshold(self, cfg: Any = None, *, horizon: Optional[str] = None, days_back: int = 7,
+                             min_samples: int = 200, min_positives: int = 20) -> Optional[float]:
+        """
+        Paras F1-kynnys discovery.score_threshold -arvoksi; None jos dataa liian vähän.
+        Jos cfg annetaan, asetetaan cfg.discovery.score_threshold.
+        """
+        data = self._load_shadow_arrays(days_back)
+        returns = data.returns[horizon or self.primary_horizon]
+        valid = np.isfinite(returns)
+        if valid.sum() < min_samples:
+            return None
+        ev = evaluate_scores(data.score[valid], returns[valid] > self.good_return)
+        if ev.positives < min_positives:
+            return None
+        threshold = round(ev.best_threshold, 4)
+        if cfg is not None:
+            cfg.discovery.score_threshold = threshold
+        logger.info(f"🎚️ score_threshold ehdotus {threshold} (F1 {ev.best_f1:.3f}, n={ev.n}, {horizon or self.primary_horizon})")
+        return threshold
+
+    def _load_shadow_arrays(self, days_back: int) -> ShadowArrays:
+        """Lataa shadow data tietokannasta paloina NumPy-taulukoihin"""
+        columns = ("timestamp", "score", *FEATURES, *(f"return_{h}" for h in HORIZONS))
+        chunks: List[np.ndarray] = []
         try:
             conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Hae data viimeiseltä X päivältä
-            cutoff_time = time.time() - (days_back * 86400)
-            
-            cursor.execute("""
-                SELECT timestamp, mint, symbol, score, novelty, buyers_5m, buy_ratio,
-                       liq_usd, top10_share, rug_risk, return_5m, return_15m, return_60m
-                FROM shadow_trades
-                WHERE timestamp > ? AND return_60m IS NOT NULL
-                ORDER BY timestamp DESC
-            """, (cutoff_time,))
-            
-            columns = [desc[0] for desc in cursor.description]
-            data = [dict(zip(columns, row)) for row in cursor.fetchall()]
-            
-            conn.close()
-            return data
-            
+            try:
+                # Hae data viimeiseltä X päivältä
+                cutoff_time = time.time() - (days_back * 86400)
+                cursor = conn.execute(f"""
+                    SELECT {', '.join(columns)}
+                    FROM shadow_trades
+                    WHERE timestamp > ?
+                      AND (return_5m IS NOT NULL OR return_15m IS NOT NULL OR return_60m IS NOT NULL)
+                """, (cutoff_time,))
+                while True:
+                    rows = cursor.fetchmany(self.chunk_size)
+                    if not rows:
+                        break
+                    chunks.append(np.array(rows, dtype=float))  # NULL -> NaN
+            finally:
+                conn.close()
         except Exception as e:
             logger.error(f"Virhe lataessa shadow dataa: {e}")
-            return []
-    
-    def _calculate_returns(self, data: List[Dict]) -> List[Dict]:
-        """Laske tuotot ja luokittele"""
-        for row in data:
-            # Käytä 60min tuottoa pääindikaattorina
-            return_60m = row.get('return_60m', 0)
-            
-            # Luokittele: 1 = hyvä (return > 10%), 0 = huono
-            row['is_good'] = 1 if return_60m > 0.10 else 0
-            row['return_60m_pct'] = return_60m * 100
-            
-        return data
-    
-    def _calculate_precision_recall(self, data: List[Dict]) -> Dict[str, Dict[int, float]]:
-        """Laske Precision@K ja Recall@K"""
-        try:
-            # Järjestä score:n mukaan
-            sorted_data = sorted(data, key=lambda x: x['score'], reverse=True)
-            
-            precision = {}
-            recall = {}
-            
-            total_good = sum(1 for row in data if row['is_good'])
-            
-            for k in [1, 3, 5, 10]:
-                if k > len(sorted_data):
-                    continue
-                
-                top_k = sorted_data[:k]
-                good_in_top_k = sum(1 for row in top_k if row['is_good'])
-                
-                precision[k] = good_in_top_k / k if k > 0 else 0
-                recall[k] = good_in_top_k / total_good if total_good > 0 else 0
-            
-            return {'precision': precision, 'recall': recall}
-            
-        except Exception as e:
-            logger.error(f"Virhe laskettaessa precision/recall: {e}")
-            return {'precision': {}, 'recall': {}}
-    
-    def _calculate_auc_metrics(self, data: List[Dict]) -> Tuple[float, float]:
-        """Laske ROC AUC ja PR AUC"""
-        try:
-            scores = [row['score'] for row in data]
-            labels = [row['is_good'] for row in data]
-            
-            # Yksinkertainen AUC laskenta (korvaa sklearn:llä jos saatavilla)
-            if len(set(labels)) < 2:
-                return 0.5, 0.5
-            
-            # Mock AUC laskenta
-            roc_auc = 0.65  # Mock arvo
-            pr_auc = 0.45   # Mock arvo
-            
-            return roc_auc, pr_auc
-            
-        except Exception as e:
-            logger.error(f"Virhe laskettaessa AUC metriikoita: {e}")
-            return 0.5, 0.5
-    
-    def _find_optimal_threshold(self, data: List[Dict]) -> float:
-        """Etsi optimaalinen score-kynnys"""
-        try:
-            # Yksinkertainen optimointi: maksimoi precision * recall
-            best_threshold = 0.5
-            best_score = 0
-            
-            for threshold in np.arange(0.1, 1.0, 0.05):
-                predicted_good = [1 for row in data if row['score'] >= threshold]
-                actual_good = [row['is_good'] for row in data if row['score'] >= threshold]
-                
-                if len(predicted_good) == 0:
-                    continue
-                
-                precision = sum(actual_good) / len(predicted_good)
-                recall = sum(actual_good) / sum(1 for row in data if row['is_good'])
-                
-                f1_score = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
-                
-                if f1_score > best_score:
-                    best_score = f1_score
-                    best_threshold = threshold
-            
-            return best_threshold
-            
-        except Exception as e:
-            logger.error(f"Virhe etsittäessä optimaalista kynnystä: {e}")
-            return 0.5
-    
-    def _calculate_feature_importance(self, data: List[Dict]) -> Dict[str, float]:
-        """Laske feature importance"""
+        table = np.concatenate(chunks) if chunks else np.empty((0, len(columns)))
+        col = {name: table[:, i] for i, name in enumerate(columns)}
+        return ShadowArrays(
+            timestamp=col["timestamp"],
+            score=np.nan_to_num(col["score"]),
+            features={f: np.nan_to_num(col[f]) for f in FEATURES},
+            returns={h: col[f"return_{h}"] for h in HORIZONS},
+        )
+
+    def _calculate_feature_importance(self, features: Dict[str, np.ndarray], labels: np.ndarray) -> Dict[str, float]:
+        """Laske feature importance (hyvien keskiarvon ero kaikkien keskiarvoon)"""
         try:
-            features = ['novelty', 'buyers_5m', 'buy_ratio', 'liq_usd', 'top10_share', 'rug_risk']
-            importance = {}
-            
-            for feature in features:
-                # Yksinkertainen korrelaatio hyvyyden kanssa
-                feature_values = [row[feature] for row in data]
-                good_values = [row[feature] for row in data if row['is_good']]
-                
-                if len(good_values) > 0:
-                    # Laske keskiarvojen ero
-                    avg_all = np.mean(feature_values)
-                    avg_good = np.mean(good_values)
-                    importance[feature] = abs(avg_good - avg_all)
-                else:
-                    importance[feature] = 0
-            
+            if not labels.any():
+                return {name: 0.0 for name in features}
+            importance = {
+                name: float(abs(values[labels].mean() - values.mean()))
+                for name, values in features.items()
+            }
+
             # Normalisoi
             total_importance = sum(importance.values())
             if total_importance > 0:
                 importance = {k: v / total_importance for k, v in importance.items()}
-            
+
             return importance
-            
+
         except Exception as e:
             logger.error(f"Virhe laskettaessa feature importance: {e}")
             return {}
-    
-    def _generate_recommendations(self, data: List[Dict], feature_importance: Dict[str, float]) -> List[str]:
+
+    def _generate_recommendations(self, scores: np.ndarray, labels: np.ndarray,
+                                  feature_importance: Dict[str, float]) -> List[str]:
         """Generoi suositukset"""
         recommendations = []
-        
+
         try:
             # Analysoi performance
-            good_count = sum(1 for row in data if row['is_good'])
-            total_count = len(data)
-            success_rate = good_count / total_count if total_count > 0 else 0
-            
+            success_rate = float(labels.mean()) if len(labels) else 0.0
+
             if success_rate < 0.2:
                 recommendations.append("⚠️ Success rate alle 20% - harkitse kynnyksen nostamista")
             elif success_rate > 0.5:
                 recommendations.append("✅ Hyvä success rate - kynnys voi olla liian korkea")
-            
+
             # Feature importance suositukset
             if feature_importance:
                 top_feature = max(feature_importance.items(), key=lambda x: x[1])
                 recommendations.append(f"🎯 Tärkein feature: {top_feature[0]} (importance: {top_feature[1]:.2f})")
-                
+
                 low_features = [f for f, imp in feature_importance.items() if imp < 0.1]
                 if low_features:
                     recommendations.append(f"📉 Vähän vaikuttavat features: {', '.join(low_features)}")
-            
+
             # Score jakauma
-            scores = [row['score'] for row in data]
-            avg_score = np.mean(scores)
+            avg_score = float(scores.mean()) if len(scores) else 0.0
             if avg_score < 0.3:
                 recommendations.append("📊 Keskimääräinen score matala - harkitse filtterien pehmentämistä")
             elif avg_score > 0.8:
                 recommendations.append("📊 Keskimääräinen score korkea - filtterit voivat olla liian tiukat")
-            
+
         except Exception as e:
             logger.error(f"Virhe generoitaessa suosituksia: {e}")
-        
+
         return recommendations
-    
+
     def _empty_result(self) -> ShadowAnalysisResult:
         """Tyhjä tulos"""
         return ShadowAnalysisResult(
@@ -273,37 +291,54 @@ class ShadowAnalyzer:
             feature_importance={},
             recommendations=["Ei tarpeeksi dataa analyysiin"]
         )
-    
+
     def get_analysis_summary(self) -> str:
         """Hae analysis yhteenveto"""
         try:
             result = self.analyze_performance()
-            
+
             summary = f"""📊 *Shadow Analysis Yhteenveto*
-            
+
 🎯 ROC AUC: {result.roc_auc:.3f}
 📈 PR AUC: {result.pr_auc:.3f}
 ⚖️ Optimaalinen kynnys: {result.optimal_threshold:.2f}
-
-📊 *Precision@K:*
 """
-            
+
+            for h, ev in result.horizons.items():
+                summary += f"⏱️ {h}: ROC {ev.roc_auc:.3f} / PR {ev.pr_auc:.3f} / kynnys {ev.best_threshold:.2f} (n={ev.n})\n"
+
+            summary += f"\n📊 *Precision@K:*\n"
             for k, precision in result.precision_at_k.items():
                 summary += f"P@{k}: {precision:.1%}\n"
-            
+
             summary += f"\n🎯 *Feature Importance:*\n"
             for feature, importance in result.feature_importance.items():
                 summary += f"{feature}: {importance:.2f}\n"
-            
+
             summary += f"\n💡 *Suositukset:*\n"
             for rec in result.recommendations[:3]:  # Top 3
                 summary += f"• {rec}\n"
-            
+
             return summary
-            
+
         except Exception as e:
             logger.error(f"Virhe luodessa analysis yhteenvetoa: {e}")
             return "📊 Shadow Analysis: Virhe"
 
 # Global instance
 shadow_analyzer = ShadowAnalyzer()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    p = argparse.ArgumentParser("Shadow analysis -> discovery.score_threshold")
+    p.add_argument("--db", default="shadow_trades.db")
+    p.add_argument("--days", type=int, default=7)
+    p.add_argument("--horizon", choices=HORIZONS, default="60m")
+    args = p.parse_args()
+    analyzer = ShadowAnalyzer(args.db, primary_horizon=args.horizon)
+    print(analyzer.get_analysis_summary())
+    threshold = analyzer.tune_score_threshold(days_back=args.days)
+    if threshold is not None:
+        print(f"DISCOVERY_SCORE_THRESHOLD={threshold}")
@@ -1,20 +1,31 @@
 """
 Shadow Trading Logger - Dataset keruu
 Kerää dataa hot-kandidateista ja niiden toteutuneista tuotoista
+
+- tarkistuspisteet (signaali, 1/15/60 min) ajastinpyörässä: tick käsittelee vain erääntyneet tietueet
+- erääntyneiden minttien hinnat yhdellä batch-haulla (dex_fetchers.fetch_dexscreener_prices)
+- valmiit tietueet tallennetaan yhden pitkäikäisen WAL-yhteyden kautta executemany-erinä säikeessä (+ CSV)
 """
 
 import asyncio
 import csv
 import logging
+import math
 import sqlite3
+import threading
 import time
-from datetime import datetime
+from dataclasses import dataclass, fields
 from pathlib import Path
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# (nimi, viive signaalista s); nimi -> kentät price_<nimi> / return_<nimi>
+# huom: "5m"-sarakkeet täytetään 1 min kohdalla (historiallinen skeema)
+CHECKPOINTS: Tuple[Tuple[str, float], ...] = (("5m", 60.0), ("15m", 900.0), ("60m", 3600.0))
+
+PriceBatchFn = Callable[[Iterable[str]], Awaitable[Dict[str, Dict[str, float]]]]
+
 @dataclass
 class ShadowTradeRecord:
     """Shadow trade -tietue"""
@@ -36,76 +47,82 @@ class ShadowTradeRecord:
     return_15m: Optional[float] = None
     return_60m: Optional[float] = None
 
+COLUMNS = [f.name for f in fields(ShadowTradeRecord)]
+
+
+class TimerWheel:
+    """
+    Hajautettu ajastinpyörä: slot = tick_id % n_slots
+
+    schedule() ja pop_due() ovat O(1) per ajastin; pop_due() käy läpi vain edellisen kutsun jälkeen
+    ohitetut slotit. Ajastimet jotka ovat kauempana kuin yksi kierros jäävät slottiin seuraavaan kierrokseen.
+    """
+
+    def __init__(self, tick_sec: float = 5.0, horizon_sec: float = 3600.0,
+                 clock: Callable[[], float] = time.time):
+        self.tick_sec = float(tick_sec)
+        self.n_slots = max(1, int(math.ceil(float(horizon_sec) / self.tick_sec)) + 1)
+        self.clock = clock
+        self._slots: List[List[Tuple[int, Any]]] = [[] for _ in range(self.n_slots)]
+        self._cursor = self._tick_id(self.clock())  # seuraava käsittelemätön tick
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _tick_id(self, ts: float) -> int:
+        return int(ts // self.tick_sec)
+
+    def schedule(self, due_ts: float, item: Any) -> None:
+        tick = max(self._tick_id(due_ts), self._cursor)  # mennyt aika -> seuraava pop_due
+        self._slots[tick % self.n_slots].append((tick, item))
+        self._size += 1
+
+    def pop_due(self, now: Optional[float] = None) -> List[Any]:
+        """Palauta ajastimet joiden tick <= nyt (vain erääntyneet slotit käydään läpi)"""
+        current = self._tick_id(self.clock() if now is None else now)
+        due: List[Any] = []
+        if current < self._cursor:
+            return due
+        for tick in range(self._cursor, min(current, self._cursor + self.n_slots - 1) + 1):
+            slot = self._slots[tick % self.n_slots]
+            if not slot:
+                continue
+            keep = [(t, item) for t, item in slot if t > current]
+            due.extend(item for t, item in slot if t <= current)
+            self._slots[tick % self.n_slots] = keep
+        self._size -= len(due)
+        self._cursor = current + 1
+        return due
+
+
 class ShadowTradingLogger:
     """Shadow trading -loggeri dataset keruulle"""
-    
-    def __init__(self, db_path: str = "shadow_trades.db"):
+
+    def __init__(self, db_path: str = "shadow_trades.db", *, csv_path: str = "shadow_trades.csv",
+                 price_batch: Optional[PriceBatchFn] = None, tick_sec: float = 5.0,
+                 retry_sec: float = 30.0, max_retries: int = 3, clock: Callable[[], float] = time.time):
         self.db_path = db_path
-        self.csv_path = "shadow_trades.csv"
+        self.csv_path = csv_path
         self.pending_trades: Dict[str, ShadowTradeRecord] = {}
-        self.price_cache: Dict[str, Dict[str, float]] = {}  # mint -> {timestamp: price}
-        
-        # Alusta tietokanta
-        self._init_database()
-        
-        # Alusta CSV
-        self._init_csv()
-        
+        self.price_batch = price_batch  # None -> dex_fetchers.fetch_dexscreener_prices ensimmäisellä haulla
+        self.retry_sec = float(retry_sec)
+        self.max_retries = int(max_retries)
+        self.clock = clock
+        self.wheel = TimerWheel(tick_sec, CHECKPOINTS[-1][1] + retry_sec * (max_retries + 1), clock)
+        # Tallennus: yksi yhteys, avataan ensimmäisessä kirjoituksessa säikeessä (import ei luo tiedostoja)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.stats = {"logged": 0, "ticks": 0, "due": 0, "price_batches": 0, "saved": 0, "retries": 0, "errors": 0}
+
         logger.info(f"✅ Shadow trading logger alustettu: {db_path}")
-    
-    def _init_database(self):
-        """Alusta SQLite tietokanta"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS shadow_trades (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp REAL,
-                mint TEXT,
-                symbol TEXT,
-                score REAL,
-                novelty REAL,
-                buyers_5m INTEGER,
-                buy_ratio REAL,
-                liq_usd REAL,
-                top10_share REAL,
-                rug_risk REAL,
-                price_at_signal REAL,
-                price_5m REAL,
-                price_15m REAL,
-                price_60m REAL,
-                return_5m REAL,
-                return_15m REAL,
-                return_60m REAL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Indeksit
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_mint ON shadow_trades(mint)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_timestamp ON shadow_trades(timestamp)")
-        
-        conn.commit()
-        conn.close()
-    
-    def _init_csv(self):
-        """Alusta CSV tiedosto"""
-        if not Path(self.csv_path).exists():
-            with open(self.csv_path, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow([
-                    'timestamp', 'mint', 'symbol', 'score', 'novelty', 'buyers_5m', 
-                    'buy_ratio', 'liq_usd', 'top10_share', 'rug_risk',
-                    'price_at_signal', 'price_5m', 'price_15m', 'price_60m',
-                    'return_5m', 'return_15m', 'return_60m'
-                ])
-    
+
     def log_hot_candidate(self, candidate) -> None:
-        """Kirjaa hot-kandidatin shadow trade -tietueeksi"""
+        """Kirjaa hot-kandidatin shadow trade -tietueeksi ja ajasta sen tarkistuspisteet"""
         try:
+            price = getattr(candidate, 'price_usd', None)
             record = ShadowTradeRecord(
-                timestamp=time.time(),
+                timestamp=self.clock(),
                 mint=getattr(candidate, 'mint', 'unknown'),
                 symbol=getattr(candidate, 'symbol', 'unknown'),
                 score=getattr(candidate, 'overall_score', 0.0),
@@ -114,108 +131,164 @@ class ShadowTradingLogger:
                 buy_ratio=getattr(candidate, 'buy_sell_ratio', 1.0),
                 liq_usd=getattr(candidate, 'liquidity_usd', 0.0),
                 top10_share=getattr(candidate, 'top10_holder_share', 0.0),
-                rug_risk=getattr(candidate, 'rug_risk_score', 0.0)
+                rug_risk=getattr(candidate, 'rug_risk_score', 0.0),
+                price_at_signal=float(price) if price else None,
             )
-            
-            self.pending_trades[record.mint] = record
+
+            self.pending_trades[record.mint] = record  # uusi signaali korvaa vanhan (vanhat ajastimet ohitetaan)
+            if record.price_at_signal is None:
+                self.wheel.schedule(record.timestamp, (record, "signal", 0))
+            for name, delay in CHECKPOINTS:
+                self.wheel.schedule(record.timestamp + delay, (record, name, 0))
+            self.stats["logged"] += 1
             logger.info(f"📊 Shadow trade kirjattu: {record.symbol} (score: {record.score:.2f})")
-            
+
         except Exception as e:
             logger.error(f"Virhe kirjattaessa shadow trade: {e}")
-    
-    async def _fetch_price(self, mint: str) -> Optional[float]:
-        """Hae tokenin hinta Jupiter API:sta"""
+
+    async def _fetch_prices(self, mints: List[str]) -> Dict[str, float]:
+        """Hae minttien USD-hinnat yhdellä batch-haulla"""
+        if self.price_batch is None:
+            from dex_fetchers import fetch_dexscreener_prices
+            self.price_batch = fetch_dexscreener_prices
         try:
-            # Mock hinta - korvaa oikealla Jupiter API:lla
-            import random
-            return random.uniform(0.001, 10.0)
+            data = await self.price_batch(mints)
         except Exception as e:
-            logger.debug(f"Virhe haettaessa hintaa {mint}: {e}")
-            return None
-    
+            logger.debug(f"Virhe haettaessa hintoja ({len(mints)} mint): {e}")
+            return {}
+        finally:
+            self.stats["price_batches"] += 1
+        return {m: float(row["price_usd"]) for m, row in data.items() if row and row.get("price_usd")}
+
     async def _update_pending_trades(self):
-        """Päivitä odottavat shadow trades"""
-        current_time = time.time()
-        
-        for mint, record in list(self.pending_trades.items()):
-            try:
-                # Tarkista onko aika päivittää hintoja
-                time_since_signal = current_time - record.timestamp
-                
-                if time_since_signal >= 60 and record.price_5m is None:  # 1 min
-                    price = await self._fetch_price(mint)
-                    if price:
-                        record.price_5m = price
-                        if record.price_at_signal:
-                            record.return_5m = (price - record.price_at_signal) / record.price_at_signal
-                
-                elif time_since_signal >= 900 and record.price_15m is None:  # 15 min
-                    price = await self._fetch_price(mint)
-                    if price:
-                        record.price_15m = price
-                        if record.price_at_signal:
-                            record.return_15m = (price - record.price_at_signal) / record.price_at_signal
-                
-                elif time_since_signal >= 3600 and record.price_60m is None:  # 60 min
-                    price = await self._fetch_price(mint)
-                    if price:
-                        record.price_60m = price
-                        if record.price_at_signal:
-                            record.return_60m = (price - record.price_at_signal) / record.price_at_signal
-                        
-                        # Valmis - tallenna ja poista
-                        await self._save_record(record)
-                        del self.pending_trades[mint]
-                
-            except Exception as e:
-                logger.error(f"Virhe päivittäessä shadow trade {mint}: {e}")
-    
-    async def _save_record(self, record: ShadowTradeRecord):
-        """Tallenna shadow trade -tietue"""
+        """Käsittele erääntyneet tarkistuspisteet (vain ajastinpyörän erääntyneet slotit)"""
+        now = self.clock()
+        self.stats["ticks"] += 1
+        due = [(r, cp, n) for r, cp, n in self.wheel.pop_due(now) if self.pending_trades.get(r.mint) is r]
+        if not due:
+            return
+        self.stats["due"] += len(due)
+        prices = await self._fetch_prices(sorted({r.mint for r, _, _ in due}))
+
+        finished: List[ShadowTradeRecord] = []
+        for record, checkpoint, attempt in due:
+            price = prices.get(record.mint)
+            if price:
+                if checkpoint == "signal":
+                    record.price_at_signal = price
+                else:
+                    setattr(record, f"price_{checkpoint}", price)
+                    self._fill_returns(record)
+            elif attempt < self.max_retries:
+                self.stats["retries"] += 1
+                self.wheel.schedule(now + self.retry_sec, (record, checkpoint, attempt + 1))
+                continue
+            if checkpoint == CHECKPOINTS[-1][0]:
+                # Valmis (tai viimeinen hinta ei löytynyt) - tallenna ja poista
+                self._fill_returns(record)
+                finished.append(record)
+                del self.pending_trades[record.mint]
+        if finished:
+            await self._save_records(finished)
+
+    @staticmethod
+    def _fill_returns(record: ShadowTradeRecord) -> None:
+        base = record.price_at_signal
+        if not base:
+            return
+        for name, _ in CHECKPOINTS:
+            price = getattr(record, f"price_{name}")
+            if price is not None:
+                setattr(record, f"return_{name}", (price - base) / base)
+
+    async def _save_records(self, records: List[ShadowTradeRecord]):
+        """Tallenna valmiit tietueet yhtenä eränä (säikeessä, ei blokkaa event looppia)"""
+        rows = [tuple(getattr(r, c) for c in COLUMNS) for r in records]
         try:
-            # SQLite
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT INTO shadow_trades 
-                (timestamp, mint, symbol, score, novelty, buyers_5m, buy_ratio, 
-                 liq_usd, top10_share, rug_risk, price_at_signal, price_5m, 
-                 price_15m, price_60m, return_5m, return_15m, return_60m)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                record.timestamp, record.mint, record.symbol, record.score,
-                record.novelty, record.buyers_5m, record.buy_ratio,
-                record.liq_usd, record.top10_share, record.rug_risk,
-                record.price_at_signal, record.price_5m, record.price_15m,
-                record.price_60m, record.return_5m, record.return_15m, record.return_60m
-            ))
-            
+            await asyncio.to_thread(self._write_rows, rows)
+            self.stats["saved"] += len(rows)
+            logger.info(f"💾 Shadow trades tallennettu: {len(rows)} kpl")
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Virhe tallentaessa shadow trades: {e}")
+
+    async def _save_record(self, record: ShadowTradeRecord):
+        """Tallenna yksittäinen shadow trade -tietue"""
+        await self._save_records([record])
+
+    # --- säikeessä ajettavat ---
+
+    def _connect(self) -> sqlite3.Connection:
+        """Pitkäikäinen WAL-yhteys + skeema (ensimmäisellä kirjoituksella)"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS shadow_trades (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp REAL,
+                    mint TEXT,
+                    symbol TEXT,
+                    score REAL,
+                    novelty REAL,
+                    buyers_5m INTEGER,
+                    buy_ratio REAL,
+                    liq_usd REAL,
+                    top10_share REAL,
+                    rug_risk REAL,
+                    price_at_signal REAL,
+                    price_5m REAL,
+                    price_15m REAL,
+                    price_60m REAL,
+                    return_5m REAL,
+                    return_15m REAL,
+                    return_60m REAL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            # Indeksit
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_mint ON shadow_trades(mint)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_timestamp ON shadow_trades(timestamp)")
             conn.commit()
-            conn.close()
-            
+            self._conn = conn
+        return self._conn
+
+    def _write_rows(self, rows: List[tuple]) -> None:
+        with self._db_lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    f"INSERT INTO shadow_trades ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                    rows,
+                )
             # CSV
+            new_file = not Path(self.csv_path).exists()
             with open(self.csv_path, 'a', newline='', encoding='utf-8') as f:
                 writer = csv.writer(f)
-                writer.writerow([
-                    record.timestamp, record.mint, record.symbol, record.score,
-                    record.novelty, record.buyers_5m, record.buy_ratio,
-                    record.liq_usd, record.top10_share, record.rug_risk,
-                    record.price_at_signal, record.price_5m, record.price_15m,
-                    record.price_60m, record.return_5m, record.return_15m, record.return_60m
-                ])
-            
-            logger.info(f"💾 Shadow trade tallennettu: {record.symbol}")
-            
-        except Exception as e:
-            logger.error(f"Virhe tallentaessa shadow trade: {e}")
-    
+                if new_file:
+                    writer.writerow(COLUMNS)
+                writer.writerows(rows)
+
+    def _close_db(self) -> None:
+        with self._db_lock:
+            conn, self._conn = self._conn, None
+            if conn is not None:
+                conn.close()
+
+    async def close(self):
+        """Sulje tietokantayhteys (odottavat tietueet jäävät muistiin)"""
+        await asyncio.to_thread(self._close_db)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "pending": len(self.pending_trades), "timers": len(self.wheel)}
+
     async def start_background_task(self):
         """Käynnistä taustatehtävä"""
         while True:
             try:
                 await self._update_pending_trades()
-                await asyncio.sleep(30)  # Päivitä 30s välein
+                await asyncio.sleep(self.wheel.tick_sec)
             except Exception as e:
                 logger.error(f"Virhe shadow trading taustatehtävässä: {e}")
                 await asyncio.sleep(60)
@@ -1,8 +1,9 @@
 import os
-import aiohttp
 from typing import Any, Dict
 from dotenv import load_dotenv
 
+from http_pool import get_http_client
+
 load_dotenv()
 
 SOLANA_RPC_URL = os.getenv("SOLANA_RPC_URL", "https://api.mainnet-beta.solana.com")
@@ -21,9 +22,5 @@ async def rpc_get_tx(signature: str) -> Dict[str, Any]:
 			}
 		]
 	}
-	timeout = aiohttp.ClientTimeout(total=6)
-	async with aiohttp.ClientSession(timeout=timeout) as s:
-		async with s.post(SOLANA_RPC_URL, json=payload) as r:
-			r.raise_for_status()
-			data = await r.json()
-			return data.get("result") or {}
+	data = await get_http_client().post_json(SOLANA_RPC_URL, json=payload, timeout=6.0)
+	return data.get("result") or {}
@@ -2,24 +2,46 @@ from __future__ import annotations
 
 import asyncio
 import contextlib
-import json
 import logging
 import os
 import time
 from dataclasses import dataclass
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
-from typing import Dict, Iterable, Optional
+from typing import Callable, Dict, Iterable, Optional, Set
 
-import aiohttp
-import websockets
+from prometheus_client import Gauge, Histogram
 from zoneinfo import ZoneInfo
 
 from discovery_engine import TokenCandidate
+from helius_ws_hub import HubSubscription, SlotGap, get_helius_hub
+from http_pool import HttpClient, get_http_client
 from metrics import metrics
+from stage_trace import mark as mark_stage
+from ws_prefilter import TOKEN_MINT_MARKERS, FramePrefilter
 
 logger = logging.getLogger(__name__)
 
+recv_loop_lag_metric = Histogram(
+    "helius_source_recv_loop_lag_seconds",
+    "Time spent handling a Helius WS frame before the next recv()",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1),
+)
+metadata_latency_metric = Histogram(
+    "helius_source_metadata_latency_seconds",
+    "Time from candidate emission to resolved getAsset metadata",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+metadata_batch_size_metric = Histogram(
+    "helius_source_metadata_batch_size",
+    "Mints per getAssetBatch request",
+    buckets=(1, 2, 5, 10, 25, 50, 100),
+)
+metadata_pending_metric = Gauge(
+    "helius_source_metadata_pending",
+    "Mints waiting for getAsset metadata resolution",
+)
+
 
 @dataclass
 class MintCandidate:
@@ -31,6 +53,123 @@ class MintCandidate:
     initialize_seen: bool
 
 
+class AssetMetadataResolver:
+    """
+    getAsset-metadatan taustaratkaisija
+
+    - submit(mint) ei blokkaa; mintit kerätään eriin (max batch_size, odotus batch_wait_sec) ja haetaan getAssetBatch-kutsulla
+    - enintään `concurrency` erää lennossa; täysi jono -> mint ohitetaan (kandidaatti jää placeholderiksi)
+    - on_resolved(mint, metadata) kutsutaan jokaiselle mintille (tyhjä dict jos haku epäonnistui)
+    """
+
+    def __init__(
+        self,
+        rpc_url: Optional[str],
+        on_resolved: Callable[[str, dict], None],
+        *,
+        batch_size: int = 50,
+        batch_wait_sec: float = 0.05,
+        concurrency: int = 4,
+        timeout: float = 10.0,
+        max_pending: int = 10_000,
+        client: Optional[HttpClient] = None,
+    ) -> None:
+        self.rpc_url = rpc_url
+        self.on_resolved = on_resolved
+        self.batch_size = max(1, int(batch_size))
+        self.batch_wait_sec = max(0.0, float(batch_wait_sec))
+        self.timeout = timeout
+        self._client = client
+        self._pending: asyncio.Queue[tuple[str, float]] = asyncio.Queue(maxsize=max(1, int(max_pending)))
+        self._sem = asyncio.Semaphore(max(1, int(concurrency)))
+        self._inflight: Set[asyncio.Task] = set()
+        self.stats = {"submitted": 0, "resolved": 0, "failed": 0, "dropped": 0, "batches": 0}
+
+    def submit(self, mint: str) -> bool:
+        if not self.rpc_url or not mint:
+            return False
+        try:
+            self._pending.put_nowait((mint, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            return False
+        self.stats["submitted"] += 1
+        metadata_pending_metric.set(self._pending.qsize())
+        return True
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._pending.get()]
+            deadline = loop.time() + self.batch_wait_sec
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._pending.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._pending.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+            metadata_pending_metric.set(self._pending.qsize())
+            await self._sem.acquire()
+            task = asyncio.create_task(self._resolve_batch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def close(self) -> None:
+        tasks = list(self._inflight)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _resolve_batch(self, batch: list[tuple[str, float]]) -> None:
+        try:
+            mints = [mint for mint, _ in batch]
+            results = await self._fetch_batch(mints)
+            self.stats["batches"] += 1
+            metadata_batch_size_metric.observe(len(batch))
+            now = time.perf_counter()
+            for (mint, submitted_at), metadata in zip(batch, results):
+                metadata_latency_metric.observe(now - submitted_at)
+                self.stats["resolved" if metadata else "failed"] += 1
+                try:
+                    self.on_resolved(mint, metadata)
+                except Exception:
+                    logger.debug("Metadata callback failed for %s", mint, exc_info=True)
+        finally:
+            self._sem.release()
+
+    async def _fetch_batch(self, mints: list[str]) -> list[dict]:
+        payload = {
+            "jsonrpc": "2.0",
+            "id": "get-asset-batch",
+            "method": "getAssetBatch",
+            "params": {
+                "ids": mints,
+                "displayOptions": {"showFungible": True},
+            },
+        }
+        client = self._client or get_http_client()
+        try:
+            data = await client.post_json(self.rpc_url, json=payload, timeout=self.timeout)
+        except Exception as exc:
+            logger.debug("Helius getAssetBatch failed (%d mints): %s", len(mints), exc)
+            return [{} for _ in mints]
+        result = data.get("result") if isinstance(data, dict) else None
+        if not isinstance(result, list):
+            return [{} for _ in mints]
+        # Vastaus on ids-järjestyksessä; puuttuvat/null -> {}
+        by_id = {item.get("id"): item for item in result if isinstance(item, dict)}
+        if not by_id and len(result) == len(mints):
+            return [item if isinstance(item, dict) else {} for item in result]
+        return [by_id.get(mint) or {} for mint in mints]
+
+
 class HeliusTransactionsNewTokensSource:
     """Helius transactionSubscribe source for real-time token creations."""
 
@@ -57,121 +196,141 @@ class HeliusTransactionsNewTokensSource:
         *,
         seen_ttl: float = 3600.0,
         metadata_timeout: float = 10.0,
+        metadata_batch_size: int = 50,
+        metadata_concurrency: int = 4,
     ) -> None:
         self.ws_url = ws_url
         self.programs = list(programs or [])
         self._stop = asyncio.Event()
         self._seen: Dict[str, float] = {}
         self._seen_ttl = seen_ttl
-        self._ws: Optional[websockets.WebSocketClientProtocol] = None
+        self._subscription: Optional[HubSubscription] = None
         self._metadata_timeout = metadata_timeout
         self._rpc_url = self._normalize_rpc_url(ws_url)
+        self._frame_filter = FramePrefilter("helius_transactions", TOKEN_MINT_MARKERS)
+        # getAsset-metadata ratkaistaan erissä receive-loopin ulkopuolella
+        self._out_queue: Optional[asyncio.Queue] = None
+        self._pending_metadata: Dict[str, MintCandidate] = {}
+        self._resolver = AssetMetadataResolver(
+            self._rpc_url,
+            self._on_metadata,
+            batch_size=metadata_batch_size,
+            concurrency=metadata_concurrency,
+            timeout=metadata_timeout,
+        )
 
     async def run(self, queue: asyncio.Queue) -> None:
         logger.info("🦅 HeliusTransactionsNewTokensSource run() käynnistetty")
-
-        while not self._stop.is_set():
-            try:
-                async with websockets.connect(self.ws_url) as ws:
-                    self._ws = ws
-                    async with aiohttp.ClientSession(
-                        timeout=aiohttp.ClientTimeout(total=self._metadata_timeout)
-                    ) as http_session:
-                        await self._subscribe(ws)
-
-                        while not self._stop.is_set():
-                            raw_msg = await ws.recv()
-                            try:
-                                event = json.loads(raw_msg)
-                            except json.JSONDecodeError as exc:
-                                logger.warning("Helius WS JSON-virhe: %s", exc)
-                                continue
-
-                            if not self._is_transaction_notification(event):
-                                continue
-
-                            value = event["params"]["result"].get("value") or {}
-                            signature = value.get("signature")
-                            slot = value.get("slot")
-                            block_time = value.get("blockTime")
-
-                            for candidate in self._extract_candidates(value):
-                                mint = candidate.mint
-                                self._prune_seen()
-                                if mint in self._seen:
-                                    continue
-
-                                metadata = await self._fetch_metadata(http_session, mint)
-                                symbol, name, decimals = self._derive_metadata(candidate, metadata)
-
-                                self._seen[mint] = time.time()
-
-                                token = TokenCandidate(
-                                    mint=mint,
-                                    symbol=symbol,
-                                    name=name,
-                                    decimals=decimals if decimals is not None else (candidate.decimals or 9),
-                                    first_seen=datetime.now(tz=ZoneInfo("Europe/Helsinki")),
-                                    extra={
-                                        "source": "helius_transactions",
-                                        "signature": signature,
-                                        "slot": slot,
-                                        "block_time": block_time,
-                                        "owner": candidate.owner,
-                                        "minted_amount_raw": str(candidate.minted_raw),
-                                        "minted_amount_ui": candidate.minted_ui,
-                                        "metadata": metadata,
-                                        "initialize_seen": candidate.initialize_seen,
-                                    },
-                                )
-
-                                with contextlib.suppress(asyncio.QueueFull):
-                                    if metrics:
-                                        metrics.candidates_in.labels(source="helius_transactions").inc()
-                                    queue.put_nowait(token)
-
-                                logger.info(
-                                    "🆕 Helius: Uusi token: %s... (symbol=%s, owner=%s)",
-                                    mint[:8],
-                                    symbol,
-                                    candidate.owner[:8],
-                                )
-
-            except websockets.exceptions.ConnectionClosedOK:
-                logger.info("Helius WS-yhteys suljettiin siististi")
-            except asyncio.CancelledError:
-                raise
-            except Exception as exc:
-                logger.warning("Helius WS-virhe: %s – yritetään uudestaan 5s kuluttua", exc)
-                await asyncio.sleep(5)
+        if not self.programs:
+            raise RuntimeError("Helius transaction source vaatii program-listan")
+        self._out_queue = queue
+        # Jaettu hub-yhteys: sama logsSubscribe skannerin kanssa tilataan palvelimelta vain kerran
+        self._subscription = get_helius_hub(self.ws_url).subscribe_logs(
+            self.programs, name="helius_transactions", prefilter=self._frame_filter
+        )
+        logger.info("✅ Helius hub: logsSubscribe %d ohjelmalle", len(self.programs))
+
+        # Resolver vasta kun run() varmasti pääsee try/finallyyn, joka sen pysäyttää
+        resolver_task = asyncio.create_task(self._resolver.run(), name="helius_asset_resolver")
+        try:
+            while not self._stop.is_set():
+                item = await self._subscription.get()
+                if item is None:
+                    break
+                if isinstance(item, SlotGap):
+                    logger.warning("Helius: slotit %d-%d ohitettu reconnectissa", item.first_slot, item.last_slot)
+                    continue
+                started = time.perf_counter()
+                if isinstance(item.value, dict):
+                    self._handle_value(item.value, queue, received_at=item.received_at or None)
+                # Aika ennen seuraavaa get():tä: kehyksen käsittely ei saa odottaa verkkoa
+                recv_loop_lag_metric.observe(time.perf_counter() - started)
+        finally:
+            resolver_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await resolver_task
+            await self._resolver.close()
 
         logger.info("🛑 HeliusTransactionsNewTokensSource run() lopetettu")
 
-    async def stop(self) -> None:
-        self._stop.set()
-        if self._ws:
-            await self._ws.close()
+    def _handle_value(self, value: dict, queue: asyncio.Queue, received_at: Optional[float] = None) -> None:
+        """Käsittele yksi logsNotification-value: emittoi kandidaatit heti placeholder-symbolilla, metadata ratkaistaan taustalla"""
+        signature = value.get("signature")
+        slot = value.get("slot")
+        block_time = value.get("blockTime")
 
-    async def _subscribe(self, ws: websockets.WebSocketClientProtocol) -> None:
-        if not self.programs:
-            raise RuntimeError("Helius transaction source vaatii program-listan")
+        for candidate in self._extract_candidates(value):
+            mint = candidate.mint
+            self._prune_seen()
+            if mint in self._seen:
+                continue
+
+            symbol, name, decimals = self._derive_metadata(candidate, {})
+
+            self._seen[mint] = time.time()
+
+            token = TokenCandidate(
+                mint=mint,
+                symbol=symbol,
+                name=name,
+                decimals=decimals if decimals is not None else (candidate.decimals or 9),
+                first_seen=datetime.now(tz=ZoneInfo("Europe/Helsinki")),
+                extra={
+                    "source": "helius_transactions",
+                    "signature": signature,
+                    "slot": slot,
+                    "block_time": block_time,
+                    "owner": candidate.owner,
+                    "minted_amount_raw": str(candidate.minted_raw),
+                    "minted_amount_ui": candidate.minted_ui,
+                    "metadata": {},
+                    "metadata_pending": True,
+                    "initialize_seen": candidate.initialize_seen,
+                },
+            )
+
+            if received_at is not None:
+                mark_stage(token, "frame_received", received_at)
+            mark_stage(token, "enqueued")
+            with contextlib.suppress(asyncio.QueueFull):
+                if metrics:
+                    metrics.candidates_in.labels(source="helius_transactions").inc()
+                queue.put_nowait(token)
+
+            if self._resolver.submit(mint):
+                self._pending_metadata[mint] = candidate
 
-        for idx, program_id in enumerate(self.programs, start=1):
-            subscribe_msg = {
-                "jsonrpc": "2.0",
-                "id": idx,
-                "method": "logsSubscribe",
-                "params": [
-                    {"mentions": [program_id]},
-                    {"commitment": "confirmed"},
-                ],
-            }
-            await ws.send(json.dumps(subscribe_msg))
             logger.info(
-                "✅ Helius WS: logsSubscribe lähetetty: %s...",
-                program_id[:8],
+                "🆕 Helius: Uusi token: %s... (symbol=%s, owner=%s)",
+                mint[:8],
+                symbol,
+                candidate.owner[:8],
             )
 
+    def _on_metadata(self, mint: str, metadata: dict) -> None:
+        """Resolverin callback: työnnä metadata-päivitys DiscoveryEnginen jonoon"""
+        candidate = self._pending_metadata.pop(mint, None)
+        if candidate is None or not metadata or self._out_queue is None:
+            return
+        symbol, name, decimals = self._derive_metadata(candidate, metadata)
+        update = {
+            "type": "metadata_update",
+            "mint": mint,
+            "symbol": symbol,
+            "name": name,
+            "decimals": decimals,
+            "metadata": metadata,
+            "source": "helius_transactions",
+            "ts": time.time(),
+        }
+        with contextlib.suppress(asyncio.QueueFull):
+            self._out_queue.put_nowait(update)
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._subscription is not None:
+            self._subscription.close()
+
     def _is_transaction_notification(self, event: dict) -> bool:
         if not isinstance(event, dict):
             return False
@@ -326,29 +485,6 @@ class HeliusTransactionsNewTokensSource:
             return ws_url
         return None
 
-    async def _fetch_metadata(self, session: aiohttp.ClientSession, mint: str) -> dict:
-        if not self._rpc_url or not mint:
-            return {}
-        payload = {
-            "jsonrpc": "2.0",
-            "id": "get-asset",
-            "method": "getAsset",
-            "params": {
-                "id": mint,
-                "displayOptions": {"showFungible": True},
-            },
-        }
-        try:
-            async with session.post(self._rpc_url, json=payload) as resp:
-                if resp.status != 200:
-                    return {}
-                data = await resp.json()
-        except Exception as exc:
-            logger.debug("Helius metadata fetch failed for %s: %s", mint, exc)
-            return {}
-
-        return data.get("result") or {}
-
     def _derive_metadata(self, candidate: MintCandidate, metadata: dict) -> tuple[str, str, Optional[int]]:
         mint = candidate.mint
         symbol = None
@@ -3,6 +3,7 @@ from __future__ import annotations
 import asyncio, time, random, contextlib
 from typing import Optional
 from discovery_engine import TokenCandidate
+from stage_trace import mark as mark_stage
 
 class MockFirehoseSource:
     """
@@ -17,6 +18,7 @@ class MockFirehoseSource:
         self.jitter_ms = max(0, int(jitter_ms))
         self._stop = asyncio.Event()
         self._candidates_generated = 0  # Laskuri tuotetuille ehdokkaille
+        self._candidates_dropped = 0    # QueueFull -> ohitetut
 
     async def run(self, queue):
         try:
@@ -24,6 +26,7 @@ class MockFirehoseSource:
             bursts_per_sec = max(1, self.rate // self.burst)
             tick = 1.0 / bursts_per_sec
             mint_counter = 0
+            next_tick = time.perf_counter()
             
             while not self._stop.is_set():
                 # lähetä burst
@@ -35,23 +38,26 @@ class MockFirehoseSource:
                         symbol=f"MOCK{mint_counter%999}",
                         name=f"Mock Token {mint_counter}",
                         liquidity_usd=random.uniform(1000, 100000),
+                        top10_holder_share=random.uniform(0.05, 0.9),
                         age_minutes=random.uniform(0, 60),
                         lp_locked=random.random() > 0.3,
                         mint_authority_renounced=random.random() > 0.2,
                         freeze_authority_renounced=random.random() > 0.2
                     )
+                    mark_stage(c, "enqueued")  # DiscoveryEngine.latency_stats
                     try:
                         queue.put_nowait(c)
                         self._candidates_generated += 1  # Kasvata laskuria
                     except asyncio.QueueFull:
                         # Queue täynnä, ohita tämä ehdokas
-                        pass
+                        self._candidates_dropped += 1
 
-                # pieni jitter
+                # seuraava tikki aikataulusta (ei ajaudu generoinnin keston verran) + pieni jitter
+                next_tick += tick
+                delay = next_tick - time.perf_counter()
                 if self.jitter_ms:
-                    await asyncio.sleep(tick + random.uniform(0, self.jitter_ms/1000.0))
-                else:
-                    await asyncio.sleep(tick)
+                    delay += random.uniform(0, self.jitter_ms/1000.0)
+                await asyncio.sleep(max(0.0, delay))
         except asyncio.CancelledError:
             raise
         except Exception:
@@ -0,0 +1,226 @@
+# sources/pumpportal_subscriptions.py
+"""
+PumpPortal trade-tilausten elinkaari: rajattu joukko seurattuja minttejä, eräviestit ja uudelleentilaus reconnectissa
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+tracked_mints_metric = Gauge(
+    "pumpportal_tracked_mints",
+    "Mints with an active PumpPortal trade subscription",
+    ["feed"],
+)
+subscription_messages_metric = Counter(
+    "pumpportal_subscription_messages_total",
+    "Grouped subscribe/unsubscribe messages sent to PumpPortal",
+    ["op"],
+)
+subscription_removed_metric = Counter(
+    "pumpportal_subscriptions_removed_total",
+    "Trade subscriptions dropped per reason",
+    ["reason"],
+)
+
+SendFn = Callable[[dict], Awaitable[None]]
+ScoreFn = Callable[[str], Optional[float]]
+
+
+@dataclass
+class _Tracked:
+    added_at: float
+    last_activity: float
+    score: Optional[float] = None
+
+
+class TradeSubscriptionManager:
+    """
+    subscribeTokenTrade-tilausten hallinta yhdelle WS-yhteydelle
+
+    - track()/untrack() eivät lähetä mitään; flush() kokoaa muutokset ryhmäviesteiksi (keys, max batch_size)
+    - mint poistetaan kun siitä ei ole tullut kauppoja idle_ttl_sec aikaan, kun se on ollut seurannassa
+      max_age_sec, tai kun score_fn palauttaa None (poistunut ehdokasjoukosta) grace_sec jälkeen
+    - max_tracked täynnä -> häädetään pienin score (pisteyttämättömät grace-ajan sisällä suojattu, tasapelissä vanhin aktiivisuus)
+    - attach() uudella yhteydellä merkitsee koko seuratun joukon uudelleentilattavaksi
+    """
+
+    def __init__(
+        self,
+        *,
+        max_tracked: int = 500,
+        idle_ttl_sec: float = 600.0,
+        max_age_sec: float = 3600.0,
+        grace_sec: float = 120.0,
+        batch_size: int = 100,
+        batch_window_sec: float = 0.05,
+        sweep_interval_sec: float = 10.0,
+        score_fn: Optional[ScoreFn] = None,
+        clock: Callable[[], float] = time.time,
+        name: str = "pumpportal",
+    ):
+        self.max_tracked = max(1, int(max_tracked))
+        self.idle_ttl_sec = float(idle_ttl_sec)
+        self.max_age_sec = float(max_age_sec)
+        self.grace_sec = float(grace_sec)
+        self.batch_size = max(1, int(batch_size))
+        self.batch_window_sec = max(0.0, float(batch_window_sec))
+        self.sweep_interval_sec = max(0.1, float(sweep_interval_sec))
+        self.score_fn = score_fn
+        self._clock = clock
+        self.name = name
+        self._tracked_gauge = tracked_mints_metric.labels(feed=name)  # oma sarja per omistaja: uutuuslähde ja kauppasyöte samassa prosessissa
+        self._tracked: Dict[str, _Tracked] = {}
+        self._to_subscribe: Set[str] = set()
+        self._to_unsubscribe: Set[str] = set()
+        self._send: Optional[SendFn] = None
+        self._wakeup = asyncio.Event()
+        self.stats = {"subscribe_msgs": 0, "unsubscribe_msgs": 0, "evicted": 0, "expired": 0, "left_candidates": 0}
+
+    # --- tila ---
+
+    def __contains__(self, mint: str) -> bool:
+        return mint in self._tracked
+
+    def __len__(self) -> int:
+        return len(self._tracked)
+
+    def tracked(self) -> List[str]:
+        return list(self._tracked)
+
+    def track(self, mint: str, score: Optional[float] = None) -> None:
+        now = self._clock()
+        entry = self._tracked.get(mint)
+        if entry is not None:
+            entry.last_activity = now
+            if score is not None:
+                entry.score = score
+            return
+        while len(self._tracked) >= self.max_tracked:
+            self._remove(self._eviction_victim(now), "evicted")
+        self._tracked[mint] = _Tracked(added_at=now, last_activity=now, score=score)
+        self._to_unsubscribe.discard(mint)
+        self._to_subscribe.add(mint)
+        self._tracked_gauge.set(len(self._tracked))
+        self._wakeup.set()
+
+    def touch(self, mint: str, ts: Optional[float] = None) -> None:
+        """Kirjaa kauppa-aktiivisuus (nollaa idle-TTL:n)"""
+        entry = self._tracked.get(mint)
+        if entry is not None:
+            entry.last_activity = ts if ts is not None else self._clock()
+
+    def set_score(self, mint: str, score: Optional[float]) -> None:
+        entry = self._tracked.get(mint)
+        if entry is not None:
+            entry.score = score
+
+    def untrack(self, mint: str, reason: str = "manual") -> None:
+        if mint in self._tracked:
+            self._remove(mint, reason)
+
+    # --- yhteys ---
+
+    def attach(self, send: SendFn) -> None:
+        """Uusi yhteys: palvelimella ei ole tilauksia -> tilataan koko seurattu joukko"""
+        self._send = send
+        self._to_unsubscribe.clear()
+        self._to_subscribe = set(self._tracked)
+        if self._to_subscribe:
+            self._wakeup.set()
+
+    def detach(self) -> None:
+        self._send = None
+
+    async def flush(self) -> None:
+        """Lähetä odottavat muutokset ryhmäviesteinä"""
+        if self._send is None:
+            return
+        unsub, self._to_unsubscribe = sorted(self._to_unsubscribe), set()
+        sub, self._to_subscribe = sorted(self._to_subscribe), set()
+        try:
+            for op, keys in (("unsubscribeTokenTrade", unsub), ("subscribeTokenTrade", sub)):
+                for i in range(0, len(keys), self.batch_size):
+                    chunk = keys[i:i + self.batch_size]
+                    await self._send({"method": op, "keys": chunk})
+                    subscription_messages_metric.labels(op=op).inc()
+                    self.stats["subscribe_msgs" if op == "subscribeTokenTrade" else "unsubscribe_msgs"] += 1
+        except Exception:
+            # lähetys katkesi: seuraava attach() tilaa koko joukon uudelleen
+            self._to_subscribe.update(m for m in sub if m in self._tracked)
+            raise
+
+    def sweep(self) -> None:
+        """
+        Poista vanhentuneet ja ehdokasjoukosta poistuneet mintit; päivitä scoret score_fn:stä.
+        score == inf = kiinnitetty (esim. avoin positio): ei idle/max_age-vanhenemista.
+        """
+        now = self._clock()
+        for mint, entry in list(self._tracked.items()):
+            score = None
+            if self.score_fn is not None:
+                try:
+                    score = self.score_fn(mint)
+                except Exception:
+                    score = entry.score
+                else:
+                    if score is None and now - entry.added_at > self.grace_sec:
+                        self._remove(mint, "left_candidates")
+                        continue
+                    if score is not None:
+                        entry.score = score
+            if score == math.inf:
+                continue
+            if now - entry.last_activity > self.idle_ttl_sec or now - entry.added_at > self.max_age_sec:
+                self._remove(mint, "expired")
+
+    async def run(self) -> None:
+        """Ylläpitoloop yhteyden ajan: kerää muutokset batch_window_sec ajan ja lähettää ne, sweep välein"""
+        next_sweep = self._clock() + self.sweep_interval_sec
+        while True:
+            timeout = max(0.0, next_sweep - self._clock())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                if self.batch_window_sec:
+                    await asyncio.sleep(self.batch_window_sec)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._clock() >= next_sweep:
+                self.sweep()
+                next_sweep = self._clock() + self.sweep_interval_sec
+            await self.flush()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, "tracked": len(self._tracked), "pending": len(self._to_subscribe) + len(self._to_unsubscribe)}
+
+    # --- sisäiset ---
+
+    def _eviction_victim(self, now: float) -> str:
+        def priority(item):
+            mint, entry = item
+            if entry.score is not None:
+                score = entry.score
+            else:
+                score = math.inf if now - entry.added_at <= self.grace_sec else -math.inf
+            return (score, entry.last_activity)
+        return min(self._tracked.items(), key=priority)[0]
+
+    def _remove(self, mint: str, reason: str) -> None:
+        self._tracked.pop(mint, None)
+        if mint in self._to_subscribe:
+            self._to_subscribe.discard(mint)   # ei koskaan lähetetty
+        else:
+            self._to_unsubscribe.add(mint)
+        self.stats[reason] = self.stats.get(reason, 0) + 1
+        subscription_removed_metric.labels(reason=reason).inc()
+        self._tracked_gauge.set(len(self._tracked))
+        self._wakeup.set()
@@ -0,0 +1,105 @@
+# sources/pumpportal_trade_feed.py
+"""
+PumpPortal trade-syöte rajatulle mint-joukolle (esim. avoimet positiot ExitWorkerille)
+
+Vain subscribeTokenTrade-tilaukset (ei uusia tokeneita); sync() pitää tilatun joukon samana kuin annettu
+mint-joukko ja TradeSubscriptionManager hoitaa eräviestit ja uudelleentilauksen reconnectissa.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import math
+import time
+from typing import Awaitable, Callable, Iterable
+
+import websockets
+
+from sources.pumpportal_subscriptions import TradeSubscriptionManager
+
+logger = logging.getLogger(__name__)
+
+PUMPPORTAL_WS_URL = "wss://pumpportal.fun/api/data"
+
+TradeFn = Callable[[dict, float], Awaitable[None]]
+
+
+class PumpPortalTradeFeed:
+    """Kauppatapahtumat seuratuille minteille: on_trade(event, received_at_perf_counter)"""
+
+    def __init__(self, on_trade: TradeFn, *, url: str = PUMPPORTAL_WS_URL, max_tracked: int = 500):
+        self.url = url
+        self._on_trade = on_trade
+        self._stop = asyncio.Event()
+        # Positiot voivat olla hiljaisia pitkään -> ei idle/ikä-karsintaa, joukon määrää sync()
+        self.subscriptions = TradeSubscriptionManager(
+            max_tracked=max_tracked,
+            idle_ttl_sec=math.inf,
+            max_age_sec=math.inf,
+            batch_window_sec=0.0,
+            name="trade_feed",
+        )
+        self.stats = {"events": 0, "reconnects": 0}
+
+    def sync(self, mints: Iterable[str]) -> None:
+        """Tilaa uudet mintit ja peru poistuneet (flush seuraavalla ylläpitokierroksella)"""
+        wanted = set(mints)
+        for mint in self.subscriptions.tracked():
+            if mint not in wanted:
+                self.subscriptions.untrack(mint, "closed")
+        for mint in wanted:
+            if mint not in self.subscriptions:
+                self.subscriptions.track(mint)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    async def run(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            maintenance = None
+            try:
+                async with websockets.connect(self.url) as ws:
+                    self.subscriptions.attach(lambda msg: ws.send(json.dumps(msg)))
+                    maintenance = asyncio.create_task(self.subscriptions.run(), name="pumpportal_trade_feed_subs")
+                    backoff = 1.0
+                    while not self._stop.is_set():
+                        try:
+                            raw = await asyncio.wait_for(ws.recv(), timeout=1.0)
+                        except asyncio.TimeoutError:
+                            if maintenance.done() and not maintenance.cancelled() and maintenance.exception():
+                                raise maintenance.exception()
+                            continue
+                        received_at = time.perf_counter()
+                        try:
+                            ev = json.loads(raw)
+                        except ValueError:
+                            continue
+                        d = ev.get("data") if isinstance(ev.get("data"), dict) else ev
+                        if str(d.get("txType") or "").lower() not in ("buy", "sell"):
+                            continue
+                        self.stats["events"] += 1
+                        try:
+                            await self._on_trade(d, received_at)
+                        except Exception as e:
+                            logger.warning(f"PumpPortal trade feed callback virhe: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                self.stats["reconnects"] += 1
+                logger.warning(f"PumpPortal trade feed virhe: {e} – yhdistetään uudelleen {backoff:.0f}s kuluttua")
+                await asyncio.sleep(backoff)
+                backoff = min(30.0, backoff * 2.0)
+            finally:
+                self.subscriptions.detach()
+                if maintenance and not maintenance.done():
+                    maintenance.cancel()
+                    with contextlib.suppress(asyncio.CancelledError, Exception):
+                        await maintenance
+
+    def get_stats(self) -> dict:
+        return {**self.stats, **self.subscriptions.get_stats()}
@@ -5,7 +5,10 @@ from datetime import datetime
 from zoneinfo import ZoneInfo
 from discovery_engine import TokenCandidate
 from metrics import metrics
+from stage_trace import mark as mark_stage
+from trade_window import TradeWindowStore, WINDOW_30S
 from typing import Awaitable, Callable, Optional
+from sources.pumpportal_subscriptions import TradeSubscriptionManager
 
 logger = logging.getLogger(__name__)
 
@@ -15,54 +18,88 @@ class PumpPortalWSNewTokensSource:
         *,
         on_new_token: Optional[Callable[[TokenCandidate, dict], Awaitable[None]]] = None,
         on_trade: Optional[Callable[[dict], Awaitable[None]]] = None,
+        trade_windows: Optional[TradeWindowStore] = None,
+        candidate_score: Optional[Callable[[str], Optional[float]]] = None,
+        max_tracked: int = 500,
+        idle_ttl_sec: float = 600.0,
+        max_age_sec: float = 3600.0,
     ):
         self._stop = asyncio.Event()
         self._ws = None
-        self._trade_stats = {}  # mint -> {"buys":int,"sells":int,"unique_buyers":set(),"first_ts":float,"last_ts":float}
-        self._subscribed_mints = set()  # Mintit joille on jo tilattu trade-seuranta
+        # jaettu DiscoveryEnginen/sniperin kanssa
+        self.trade_windows = trade_windows if trade_windows is not None else TradeWindowStore()
+        # Trade-seurannan tilaukset: rajattu joukko, eräviestit, TTL/ehdokasjoukko-karsinta, uudelleentilaus reconnectissa
+        self.subscriptions = TradeSubscriptionManager(
+            max_tracked=max_tracked,
+            idle_ttl_sec=idle_ttl_sec,
+            max_age_sec=max_age_sec,
+            score_fn=candidate_score,
+            name="new_tokens",
+        )
         self._debug_counter = 0
         self._on_new_token = on_new_token
         self._on_trade = on_trade
 
     async def run(self, queue):
         logger.info("🎯 PumpPortalWSNewTokensSource run() käynnistetty")
-        try:
-            async with websockets.connect("wss://pumpportal.fun/api/data") as ws:
-                self._ws = ws
-                await ws.send(json.dumps({"method":"subscribeNewToken"}))
-                logger.info("✅ PumpPortal WS: Tilaus 'subscribeNewToken' lähetetty")
-                
-                while not self._stop.is_set():
-                    try:
-                        raw = await asyncio.wait_for(ws.recv(), timeout=1.0)
+        backoff = 1.0
+        while not self._stop.is_set():
+            maintenance = None
+            try:
+                async with websockets.connect("wss://pumpportal.fun/api/data") as ws:
+                    self._ws = ws
+                    await ws.send(json.dumps({"method":"subscribeNewToken"}))
+                    logger.info("✅ PumpPortal WS: Tilaus 'subscribeNewToken' lähetetty")
+                    # Uusi yhteys: seurattu joukko tilataan uudelleen ryhmäviestein
+                    self.subscriptions.attach(lambda msg: ws.send(json.dumps(msg)))
+                    maintenance = asyncio.create_task(self.subscriptions.run(), name="pumpportal_subscriptions")
+                    backoff = 1.0
+
+                    while not self._stop.is_set():
                         try:
-                            ev = json.loads(raw)
-                            
-                            # Tarkista onko new-token vai trade-event
-                            if ev.get("method") == "subscribeNewToken" or "mint" in ev:
-                                await self._handle_new_token_event(ev, queue)
-                            elif ev.get("method") == "subscribeTokenTrade" or "trader" in ev:
-                                await self._handle_trade_event(ev, queue)
-                                
-                        except Exception as e:
-                            logger.warning(f"PumpPortal WS event error: {e}")
-                    except asyncio.TimeoutError:
-                        if self._stop.is_set():
-                            break
-                        continue
-                    except asyncio.CancelledError:
-                        with contextlib.suppress(Exception):
-                            await ws.close()
-                        raise
-                        continue
-        except asyncio.CancelledError:
-            raise
-        except Exception as e:
-            logger.warning(f"PumpPortal WS virhe: {e}")
-            await asyncio.sleep(1.0)
+                            raw = await asyncio.wait_for(ws.recv(), timeout=1.0)
+                            received_at = time.perf_counter()
+                            try:
+                                ev = json.loads(raw)
+
+                                # Tarkista onko new-token vai trade-event
+                                if self._is_trade_event(ev):
+                                    await self._handle_trade_event(ev, queue)
+                                elif ev.get("method") == "subscribeNewToken" or "mint" in ev:
+                                    await self._handle_new_token_event(ev, queue, received_at)
+
+                            except Exception as e:
+                                logger.warning(f"PumpPortal WS event error: {e}")
+                        except asyncio.TimeoutError:
+                            if maintenance.done() and not maintenance.cancelled() and maintenance.exception():
+                                raise maintenance.exception()
+                            continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                logger.warning(f"PumpPortal WS virhe: {e} – yhdistetään uudelleen {backoff:.0f}s kuluttua")
+                await asyncio.sleep(backoff)
+                backoff = min(30.0, backoff * 2.0)
+            finally:
+                self.subscriptions.detach()
+                self._ws = None
+                if maintenance and not maintenance.done():
+                    maintenance.cancel()
+                    with contextlib.suppress(asyncio.CancelledError, Exception):
+                        await maintenance
         logger.info("🛑 PumpPortalWSNewTokensSource run() lopetettu")
 
-    async def _handle_new_token_event(self, ev, queue):
+    @staticmethod
+    def _is_trade_event(ev: dict) -> bool:
+        d = ev.get("data") or ev
+        tx_type = str(d.get("txType") or "").lower()
+        if tx_type in ("buy", "sell"):
+            return True
+        return ev.get("method") == "subscribeTokenTrade" or "trader" in ev
+
+    async def _handle_new_token_event(self, ev, queue, received_at: Optional[float] = None):
         """Käsittele new-token event ja aloita trade-seuranta"""
         d = ev.get("data") or ev
         mint = d.get("mint") or d.get("tokenAddress") or d.get("mintAddress")
@@ -79,16 +116,6 @@ class PumpPortalWSNewTokensSource:
         # Convert timestamp to datetime
         first_seen_dt = datetime.fromtimestamp(ts, tz=ZoneInfo("Europe/Helsinki"))
         
-        # Alusta trade-tilastot
-        if mint not in self._trade_stats:
-            self._trade_stats[mint] = {
-                "buys": 0,
-                "sells": 0, 
-                "unique_buyers": set(),
-                "first_ts": ts,
-                "last_ts": ts
-            }
-        
         cand = TokenCandidate(
             mint=mint,
             symbol=d.get("symbol") or d.get("ticker") or (mint[:8] + "…" + mint[-4:] if len(mint) > 12 else mint),
@@ -105,6 +132,8 @@ class PumpPortalWSNewTokensSource:
                 "last_trade_ts": ts
             },
         )
+        if received_at is not None:
+            mark_stage(cand, "frame_received", received_at)
         
         if self._on_new_token:
             async def _invoke_callback():
@@ -121,21 +150,15 @@ class PumpPortalWSNewTokensSource:
         # DEBUG: lokita jokainen ehdokas
         logger.info(f"PUSH cand mint={mint} first_ts={ts} liq_hint=0 src=pumpportal_ws")
         
+        mark_stage(cand, "enqueued")
         with contextlib.suppress(asyncio.QueueFull):
             if metrics: metrics.candidates_in.labels(source="pumpportal_ws").inc()
             queue.put_nowait(cand)
         
-        # Aloita trade-seuranta tälle mintille
-        if mint not in self._subscribed_mints and self._ws:
-            try:
-                await self._ws.send(json.dumps({
-                    "method": "subscribeTokenTrade",
-                    "keys": [mint]
-                }))
-                self._subscribed_mints.add(mint)
-                logger.debug(f"✅ Trade-seuranta aloitettu mintille: {mint[:8]}...")
-            except Exception as e:
-                logger.warning(f"Virhe aloittaessa trade-seurantaa {mint}: {e}")
+        # Aloita trade-seuranta tälle mintille (tilaus lähtee seuraavassa ryhmäviestissä)
+        if mint not in self.subscriptions:
+            self.subscriptions.track(mint)
+            logger.debug(f"✅ Trade-seuranta aloitettu mintille: {mint[:8]}...")
 
     async def _handle_trade_event(self, ev, queue):
         """Käsittele trade-event ja päivitä tilastot"""
@@ -144,28 +167,15 @@ class PumpPortalWSNewTokensSource:
         if not mint:
             return
             
-        trader = d.get("trader") or d.get("buyer") or d.get("seller")
-        side = d.get("side") or d.get("type")  # "buy" tai "sell"
+        trader = d.get("trader") or d.get("traderPublicKey") or d.get("buyer") or d.get("seller")
+        side = d.get("side") or d.get("type") or d.get("txType")  # "buy" tai "sell"
         ts = time.time()
         
-        # Päivitä trade-tilastot
-        if mint in self._trade_stats:
-            stats = self._trade_stats[mint]
-            if side == "buy":
-                stats["buys"] += 1
-            elif side == "sell":
-                stats["sells"] += 1
-            
-            if trader:
-                stats["unique_buyers"].add(trader)
-            
-            stats["last_ts"] = ts
-            
-            # Päivitä trade-tilastot extra-dataan
-            stats["trade_buys_30s"] = stats["buys"]
-            stats["trade_sells_30s"] = stats["sells"] 
-            stats["trade_unique_buyers_30s"] = len(stats["unique_buyers"])
-            stats["last_trade_ts"] = ts
+        # Päivitä trade-ikkunat (vain mintit joille trade-seuranta on tilattu)
+        if mint in self.subscriptions:
+            self.subscriptions.touch(mint, ts)
+            self.trade_windows.record(mint, side, trader, ts)
+            stats = self.trade_windows.window(mint, WINDOW_30S, now=ts)
             
             # DEBUG-loki 1/20 trade-eventistä
             self._debug_counter += 1
@@ -183,10 +193,11 @@ class PumpPortalWSNewTokensSource:
                 "buyer": trader,
                 "side": side,
                 "ts": ts,
+                "trade_windows": self.trade_windows,  # kirjattu jo tähän varastoon
                 "stats": {
-                    "buys": stats["buys"],
-                    "sells": stats["sells"],
-                    "unique_buyers": len(stats["unique_buyers"])
+                    "buys": stats.buys,
+                    "sells": stats.sells,
+                    "unique_buyers": stats.unique_buyers
                 }
             }
 
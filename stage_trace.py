@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Stage Trace - token->kauppa -polun vaihekohtaiset monotoniset aikaleimat
+
+TokenCandidate / NewTokenEvent kantaa StageTracea (kenttä `trace`, dictissä avain "_trace").
+mark(obj, vaihe) tallentaa time.perf_counter()-leiman ja havaitsee metrics.Metricsin histogrammit:
+- stage_latency_sec{stage}: aika edellisestä merkitystä vaiheesta (mihin häntälatenssi kuluu)
+- stage_since_origin_sec{stage}: aika ensimmäisestä vaiheesta (yleensä frame_received)
+
+Vaihe merkitään kerran (ensimmäinen voittaa): toistuvat kutsut (esim. best_candidates joka syklissä) eivät tuplaa.
+Valinnainen näytteistetty trace-loki: finish(obj, outcome) kirjoittaa koko aikajanan JSONL-tiedostoon.
+Näytteistys päätetään tracea luotaessa, joten saman tokenin kaikki finish-rivit joko kirjoitetaan tai ei.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import metrics as _metrics_module
+from jsonl_sink import JsonlSink
+
+log = logging.getLogger(__name__)
+
+# Vaiheet polun järjestyksessä (raportointi; mark() hyväksyy vain nämä)
+STAGES = (
+    "frame_received",
+    "enqueued",
+    "dequeued",
+    "filtered",
+    "enriched",
+    "scored",
+    "published",
+    "trade_submitted",
+    "trade_confirmed",
+)
+_STAGE_SET = frozenset(STAGES)
+
+_sample_rate = 0.0
+_sink: Optional[JsonlSink] = None
+_children: Dict[str, Tuple[Any, Any]] = {}
+_children_owner: Any = None  # metrics.Metrics, jolle _children on luotu
+
+
+class StageTrace:
+    """Yhden tokenin vaiheleimat (perf_counter-sekunteja)"""
+
+    __slots__ = ("marks", "sampled")
+
+    def __init__(self, *, sampled: bool = False):
+        self.marks: Dict[str, float] = {}
+        self.sampled = sampled
+
+    def __contains__(self, stage: str) -> bool:
+        return stage in self.marks
+
+    def __repr__(self) -> str:
+        return f"StageTrace({', '.join(f'{k}={v:.6f}' for k, v in self.marks.items())})"
+
+    def mark(self, stage: str, t: Optional[float] = None) -> Optional[Tuple[Optional[float], float]]:
+        """Tallenna vaihe; palauttaa (aika edellisestä, aika alusta) tai None jos vaihe oli jo merkitty"""
+        if stage in self.marks:
+            return None
+        if stage not in _STAGE_SET:
+            raise ValueError(f"tuntematon vaihe: {stage}")
+        t = time.perf_counter() if t is None else t
+        earlier = [v for v in self.marks.values() if v <= t]
+        origin = min(self.marks.values()) if self.marks else t
+        self.marks[stage] = t
+        return (t - max(earlier) if earlier else None), max(0.0, t - origin)
+
+    def between(self, start: str, end: str) -> Optional[float]:
+        """Kesto vaiheesta toiseen sekunteina (None jos kumpi tahansa puuttuu)"""
+        if start not in self.marks or end not in self.marks:
+            return None
+        return self.marks[end] - self.marks[start]
+
+    def timeline_ms(self) -> Dict[str, float]:
+        """Vaiheet millisekunteina ensimmäisestä leimasta, aikajärjestyksessä"""
+        if not self.marks:
+            return {}
+        origin = min(self.marks.values())
+        return {k: round((v - origin) * 1000.0, 3) for k, v in sorted(self.marks.items(), key=lambda kv: kv[1])}
+
+
+def configure_stage_trace(sample_rate: Optional[float] = None, path: Optional[str] = None) -> None:
+    """
+    Aseta trace-lokin näytteistys (0 = pois) ja tiedosto.
+    Oletukset ympäristöstä: STAGE_TRACE_SAMPLE_RATE (0.0), STAGE_TRACE_LOG (stage_traces.jsonl).
+    """
+    global _sample_rate, _sink
+    if sample_rate is None:
+        sample_rate = float(os.getenv("STAGE_TRACE_SAMPLE_RATE", "0") or 0.0)
+    _sample_rate = min(1.0, max(0.0, float(sample_rate)))
+    path = path or os.getenv("STAGE_TRACE_LOG", "stage_traces.jsonl")
+    if _sample_rate > 0 and (_sink is None or _sink.path != path):
+        _sink = JsonlSink(path, flush_interval_sec=1.0, max_backlog=20_000, name="stage_trace")
+    if _sample_rate > 0:
+        log.info("🧭 Stage trace -loki: %.1f%% -> %s", _sample_rate * 100.0, path)
+
+
+async def close_stage_trace() -> None:
+    """Kirjoita trace-lokin puskuri (graceful shutdown)"""
+    global _sink
+    sink, _sink = _sink, None
+    if sink is not None:
+        await sink.close()
+
+
+def trace_of(obj: Any, *, create: bool = True) -> Optional[StageTrace]:
+    """Objektin StageTrace (luodaan tarvittaessa); dict-objekteilla avain "_trace" """
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        trace = obj.get("_trace")
+        if trace is None and create:
+            trace = obj["_trace"] = StageTrace(sampled=_sample())
+        return trace
+    trace = getattr(obj, "trace", None)
+    if trace is not None and not isinstance(trace, StageTrace):
+        return None
+    if trace is None and create:
+        trace = StageTrace(sampled=_sample())
+        try:
+            obj.trace = trace
+        except AttributeError:
+            return None
+    return trace
+
+
+def mark(obj: Any, stage: str, t: Optional[float] = None) -> Optional[StageTrace]:
+    """Merkitse vaihe objektin traceen ja havaitse histogrammit; palauttaa tracen"""
+    trace = obj if isinstance(obj, StageTrace) else trace_of(obj)
+    if trace is None:
+        return None
+    result = trace.mark(stage, t)
+    if result is not None:
+        _observe(stage, *result)
+    return trace
+
+
+def finish(obj: Any, outcome: str, **fields: Any) -> None:
+    """Kirjoita näytteistetyn tracen aikajana lokiin (ei mitään jos näytettä ei valittu)"""
+    trace = obj if isinstance(obj, StageTrace) else trace_of(obj, create=False)
+    if trace is None or not trace.sampled or _sink is None:
+        return
+    record = {"ts": time.time(), "outcome": outcome, "stages_ms": trace.timeline_ms()}
+    mint = obj.get("mint") if isinstance(obj, dict) else getattr(obj, "mint", None)
+    if mint:
+        record["mint"] = mint
+    record.update(fields)
+    _sink.write(record)
+
+
+def _sample() -> bool:
+    return _sample_rate > 0 and (_sample_rate >= 1.0 or random.random() < _sample_rate)
+
+
+def _observe(stage: str, since_prev: Optional[float], since_origin: float) -> None:
+    global _children_owner
+    m = _metrics_module.metrics
+    if m is None or not hasattr(m, "stage_latency"):
+        return
+    if m is not _children_owner:  # init_metrics loi uuden instanssin (testit)
+        _children.clear()
+        _children_owner = m
+    children = _children.get(stage)
+    if children is None:
+        children = _children[stage] = (
+            m.stage_latency.labels(stage=stage),
+            m.stage_since_origin.labels(stage=stage),
+        )
+    if since_prev is not None:
+        children[0].observe(since_prev)
+    children[1].observe(since_origin)
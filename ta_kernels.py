@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+TA Kernels - NumPy-vektoroidut indikaattori- ja taso/kuvio-ytimet TechnicalAnalysisEnginelle
+
+- kaikki ytimet laskevat viimeisen akselin yli: 1-D (bars) tai 2-D (tokens x bars) samalla koodilla
+- tulokset vastaavat pandas-toteutuksia (rolling(min_periods=window), ewm(adjust=True), diff/shift -> NaN);
+  liukuvat ikkunat sliding_window_view:llä, ei Python-silmukoita barien yli
+- ikkunaa lyhyempi sarja -> NaN (kuten pandas)
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+PIVOT_WINDOW = 5      # keskitetty pivot-ikkuna (rolling(5, center=True))
+PIVOT_MARGIN = 5      # pivotit indekseistä [5, n-5)
+LEVEL_SPAN = 20       # tasokosketukset välillä [i-20, i+20)
+LEVEL_TOLERANCE = 0.02
+
+
+def _as_float(x) -> np.ndarray:
+    return np.asarray(x, dtype=float)
+
+
+def _windows(x: np.ndarray, window: int) -> np.ndarray:
+    """(..., n) -> (..., n-window+1, window)"""
+    return sliding_window_view(x, window, axis=-1)
+
+
+def _pad_front(values: np.ndarray, n: int) -> np.ndarray:
+    """Täydennä alkuun NaN:t niin että tulos on pituutta n (pandas rolling -tasaus)"""
+    out = np.full(values.shape[:-1] + (n,), np.nan)
+    out[..., n - values.shape[-1]:] = values
+    return out
+
+
+def _rolling(x: np.ndarray, window: int, reduce) -> np.ndarray:
+    x = _as_float(x)
+    n = x.shape[-1]
+    if window > n:
+        return np.full(x.shape, np.nan)
+    return _pad_front(reduce(_windows(x, window)), n)
+
+
+def rolling_mean(x, window: int) -> np.ndarray:
+    return _rolling(x, window, lambda w: w.mean(axis=-1))
+
+
+def rolling_std(x, window: int) -> np.ndarray:
+    return _rolling(x, window, lambda w: w.std(axis=-1, ddof=1))
+
+
+def rolling_min(x, window: int) -> np.ndarray:
+    return _rolling(x, window, lambda w: w.min(axis=-1))
+
+
+def rolling_max(x, window: int) -> np.ndarray:
+    return _rolling(x, window, lambda w: w.max(axis=-1))
+
+
+def centered(values: np.ndarray, window: int) -> np.ndarray:
+    """Takaperoinen rolling-tulos -> center=True (pariton ikkuna)"""
+    shift = window // 2
+    out = np.full(values.shape, np.nan)
+    if values.shape[-1] > shift:
+        out[..., :-shift or None] = values[..., shift:]
+    return out
+
+
+def diff(x) -> np.ndarray:
+    x = _as_float(x)
+    out = np.full(x.shape, np.nan)
+    out[..., 1:] = x[..., 1:] - x[..., :-1]
+    return out
+
+
+def shift(x) -> np.ndarray:
+    x = _as_float(x)
+    out = np.full(x.shape, np.nan)
+    out[..., 1:] = x[..., :-1]
+    return out
+
+
+def ewm_mean_last(x, span: float) -> np.ndarray:
+    """ewm(span, adjust=True).mean() viimeinen arvo: painot (1-a)^k uusimmasta taaksepäin"""
+    x = _as_float(x)
+    n = x.shape[-1]
+    decay = 1.0 - 2.0 / (span + 1.0)
+    weights = decay ** np.arange(n - 1, -1, -1, dtype=float)
+    return (x @ weights) / weights.sum()
+
+
+def true_range(high, low, close) -> np.ndarray:
+    high, low = _as_float(high), _as_float(low)
+    prev = shift(close)
+    # pandas concat(...).max(axis=1) ohittaa NaN:t -> fmax
+    return np.fmax(np.fmax(high - low, np.abs(high - prev)), np.abs(low - prev))
+
+
+def rsi(close, period: int = 14) -> np.ndarray:
+    delta = diff(close)
+    gain = rolling_mean(np.where(delta > 0, delta, 0.0), period)
+    loss = rolling_mean(-np.where(delta < 0, delta, 0.0), period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100 - (100 / (1 + gain / loss))
+
+
+def atr(high, low, close, period: int = 14) -> np.ndarray:
+    return rolling_mean(true_range(high, low, close), period)
+
+
+def stochastic_k(high, low, close, k_period: int = 14) -> np.ndarray:
+    low_min = rolling_min(low, k_period)
+    high_max = rolling_max(high, k_period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100 * ((_as_float(close) - low_min) / (high_max - low_min))
+
+
+def williams_r(high, low, close, period: int = 14) -> np.ndarray:
+    high_max = rolling_max(high, period)
+    low_min = rolling_min(low, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return -100 * ((high_max - _as_float(close)) / (high_max - low_min))
+
+
+def cci(high, low, close, period: int = 14) -> np.ndarray:
+    tp = (_as_float(high) + _as_float(low) + _as_float(close)) / 3
+    n = tp.shape[-1]
+    if period > n:
+        return np.full(tp.shape, np.nan)
+    win = _windows(tp, period)
+    mean = win.mean(axis=-1)
+    mad = np.abs(win - mean[..., None]).mean(axis=-1)  # rolling().apply(mean(|x - mean|)) ilman lambdaa
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return _pad_front((tp[..., period - 1:] - mean) / (0.015 * mad), n)
+
+
+def adx(high, low, close, period: int = 14) -> np.ndarray:
+    tr = true_range(high, low, close)
+    dm_plus = diff(high)
+    dm_minus = -diff(low)
+    # sama järjestys kuin pandas-versiossa: dm_minus verrataan jo nollattuun dm_plus:iin
+    dm_plus = np.where((dm_plus > dm_minus) & (dm_plus > 0), dm_plus, 0.0)
+    dm_minus = np.where((dm_minus > dm_plus) & (dm_minus > 0), dm_minus, 0.0)
+    tr_smooth = rolling_mean(tr, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        di_plus = 100 * (rolling_mean(dm_plus, period) / tr_smooth)
+        di_minus = 100 * (rolling_mean(dm_minus, period) / tr_smooth)
+        dx = 100 * np.abs(di_plus - di_minus) / (di_plus + di_minus)
+    return rolling_mean(dx, period)
+
+
+def obv(close, volume) -> np.ndarray:
+    close, volume = _as_float(close), _as_float(volume)
+    step = np.zeros(close.shape)
+    step[..., 1:] = np.where(close[..., 1:] > close[..., :-1], 1.0,
+                             np.where(close[..., 1:] < close[..., :-1], -1.0, 0.0))
+    signed = step * volume
+    signed[..., 0] = volume[..., 0]
+    return np.cumsum(signed, axis=-1)
+
+
+def indicators_last(high, low, close, volume) -> Dict[str, np.ndarray]:
+    """
+    TechnicalIndicators-kenttien viimeiset arvot; (bars,) -> skalaarit, (tokens, bars) -> (tokens,)
+    macd_signal / stoch_d lasketaan kuten alkuperäinen: yhden arvon sarjasta (= macd, NaN)
+    """
+    close = _as_float(close)
+    sma_20 = rolling_mean(close, 20)[..., -1]
+    ema_12 = ewm_mean_last(close, 12)
+    ema_26 = ewm_mean_last(close, 26)
+    macd = ema_12 - ema_26
+    bb_std = rolling_std(close, 20)[..., -1]
+    stoch = stochastic_k(high, low, close)[..., -1]
+    return {
+        "sma_20": sma_20,
+        "sma_50": rolling_mean(close, 50)[..., -1],
+        "ema_12": ema_12,
+        "ema_26": ema_26,
+        "rsi": rsi(close)[..., -1],
+        "macd": macd,
+        "macd_signal": macd,  # pd.Series([macd]).ewm(span=9).mean() == macd
+        "macd_histogram": macd - macd,
+        "bollinger_upper": sma_20 + bb_std * 2,
+        "bollinger_middle": sma_20,
+        "bollinger_lower": sma_20 - bb_std * 2,
+        "volume_sma": rolling_mean(volume, 20)[..., -1],
+        "atr": atr(high, low, close)[..., -1],
+        "stoch_k": stoch,
+        "stoch_d": np.full(np.shape(stoch), np.nan),  # pd.Series([k]).rolling(3).mean() == NaN
+        "williams_r": williams_r(high, low, close)[..., -1],
+        "cci": cci(high, low, close)[..., -1],
+        "adx": adx(high, low, close)[..., -1],
+        "obv": obv(close, volume)[..., -1],
+    }
+
+
+# --- pivotit, tasot ja kuviot (1-D) ---
+
+def pivot_indices(values, kind: str) -> np.ndarray:
+    """Pivot-indeksit: rolling(5, center=True).min/max == arvo, indeksit [5, n-5)"""
+    values = _as_float(values)
+    reduce = rolling_min if kind == "low" else rolling_max
+    extreme = centered(reduce(values, PIVOT_WINDOW), PIVOT_WINDOW)
+    idx = np.arange(values.shape[-1])
+    mask = (extreme == values) & (idx >= PIVOT_MARGIN) & (idx < values.shape[-1] - PIVOT_MARGIN)
+    return np.flatnonzero(mask)
+
+
+def level_touches(values, idx: np.ndarray) -> np.ndarray:
+    """Kosketukset (|x - taso| <= 2 % tasosta) välillä [i-20, i+20) jokaiselle pivotille i"""
+    values = _as_float(values)
+    if len(idx) == 0:
+        return np.zeros(0, dtype=int)
+    padded = np.concatenate([np.full(LEVEL_SPAN, np.nan), values, np.full(LEVEL_SPAN, np.nan)])
+    win = _windows(padded, 2 * LEVEL_SPAN)[idx]  # alkaa alkuperäisestä indeksistä i-20
+    level = values[idx]
+    return (np.abs(win - level[:, None]) <= (level * LEVEL_TOLERANCE)[:, None]).sum(axis=-1)
+
+
+def support_levels(low, top: int = 3) -> List[float]:
+    idx = pivot_indices(low, "low")
+    levels = _as_float(low)[idx][level_touches(low, idx) >= 2]
+    return np.sort(levels)[::-1][:top].tolist()
+
+
+def resistance_levels(high, top: int = 3) -> List[float]:
+    idx = pivot_indices(high, "high")
+    levels = _as_float(high)[idx][level_touches(high, idx) >= 2]
+    return np.sort(levels)[:top].tolist()
+
+
+def slope(y) -> float:
+    """Lineaarisen sovituksen kulmakerroin (np.polyfit(range(n), y, 1)[0] suljetussa muodossa)"""
+    y = _as_float(y)
+    x = np.arange(len(y), dtype=float)
+    xc = x - x.mean()
+    return float((xc @ (y - y.mean())) / (xc @ xc))
+
+
+def detect_patterns(high, low, close) -> Dict[str, bool]:
+    """Kaikki kuviot yhdellä pivot-laskennalla (ennen jokainen detektori laski pivotit erikseen)"""
+    high, low, close = _as_float(high), _as_float(low), _as_float(close)
+    peaks = high[pivot_indices(high, "high")]
+    valleys = low[pivot_indices(low, "low")]
+    out = {"HEAD_AND_SHOULDERS": False, "DOUBLE_TOP": False, "DOUBLE_BOTTOM": False,
+           "ASCENDING_TRIANGLE": False, "DESCENDING_TRIANGLE": False, "FLAG": False}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if len(peaks) >= 3:
+            left, middle, right = peaks[0], peaks[len(peaks) // 2], peaks[-1]
+            out["HEAD_AND_SHOULDERS"] = bool(middle > left and middle > right and abs(left - right) / left < 0.05)
+        if len(peaks) >= 2:
+            out["DOUBLE_TOP"] = bool(abs(peaks[-2] - peaks[-1]) / peaks[-2] < 0.03)
+        if len(valleys) >= 2:
+            out["DOUBLE_BOTTOM"] = bool(abs(valleys[-2] - valleys[-1]) / valleys[-2] < 0.03)
+        if len(low[-20:]) >= 3:
+            out["ASCENDING_TRIANGLE"] = slope(low[-20:]) > 0
+            out["DESCENDING_TRIANGLE"] = slope(high[-20:]) < 0
+        tail_close = close[-15:]
+        if len(tail_close):
+            price_range = high[-15:].max() - low[-15:].min()
+            avg_price = tail_close.mean()
+            if price_range / avg_price > 0.1 and len(tail_close) > 1:
+                out["FLAG"] = bool(tail_close.std(ddof=1) / avg_price < 0.05)
+    return out
+
+
+def batch_shape(*arrays) -> Tuple[int, int]:
+    """Tarkista että batch-taulukot ovat samaa muotoa (tokens, bars)"""
+    shapes = {np.shape(a) for a in arrays}
+    if len(shapes) != 1 or len(next(iter(shapes))) != 2:
+        raise ValueError(f"batch inputs must share one 2-D shape (tokens, bars), got {sorted(shapes)}")
+    return next(iter(shapes))
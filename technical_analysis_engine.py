@@ -11,6 +11,8 @@ from dataclasses import dataclass
 from datetime import datetime, timedelta
 import logging
 
+import ta_kernels
+
 @dataclass
 class TechnicalIndicators:
     """Tekniset indikaattorit"""
@@ -61,173 +63,62 @@ class TechnicalAnalysisEngine:
     
     def calculate_rsi_simple(self, prices, period=14):
         """Laske RSI yksinkertaistettu"""
-        delta = prices.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        return 100 - (100 / (1 + rs))
+        return pd.Series(ta_kernels.rsi(prices.to_numpy(), period), index=prices.index)
     
     def calculate_atr_simple(self, ohlcv_data, period=14):
         """Laske ATR yksinkertaistettu"""
-        high = ohlcv_data['high']
-        low = ohlcv_data['low']
-        close = ohlcv_data['close']
-        
-        tr1 = high - low
-        tr2 = abs(high - close.shift())
-        tr3 = abs(low - close.shift())
-        
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        return tr.rolling(window=period).mean()
+        high, low, close = self._hlc(ohlcv_data)
+        return pd.Series(ta_kernels.atr(high, low, close, period), index=ohlcv_data.index)
     
     def calculate_stochastic_simple(self, ohlcv_data, k_period=14, d_period=3):
         """Laske Stochastic yksinkertaistettu"""
-        low_min = ohlcv_data['low'].rolling(window=k_period).min()
-        high_max = ohlcv_data['high'].rolling(window=k_period).max()
-        
-        k_percent = 100 * ((ohlcv_data['close'] - low_min) / (high_max - low_min))
-        return k_percent
+        high, low, close = self._hlc(ohlcv_data)
+        return pd.Series(ta_kernels.stochastic_k(high, low, close, k_period), index=ohlcv_data.index)
     
     def calculate_williams_r_simple(self, ohlcv_data, period=14):
         """Laske Williams %R yksinkertaistettu"""
-        high_max = ohlcv_data['high'].rolling(window=period).max()
-        low_min = ohlcv_data['low'].rolling(window=period).min()
-        
-        williams_r = -100 * ((high_max - ohlcv_data['close']) / (high_max - low_min))
-        return williams_r
+        high, low, close = self._hlc(ohlcv_data)
+        return pd.Series(ta_kernels.williams_r(high, low, close, period), index=ohlcv_data.index)
     
     def calculate_cci_simple(self, ohlcv_data, period=14):
         """Laske CCI yksinkertaistettu"""
-        typical_price = (ohlcv_data['high'] + ohlcv_data['low'] + ohlcv_data['close']) / 3
-        sma_tp = typical_price.rolling(window=period).mean()
-        mad = typical_price.rolling(window=period).apply(lambda x: np.mean(np.abs(x - x.mean())))
-        
-        cci = (typical_price - sma_tp) / (0.015 * mad)
-        return cci
+        high, low, close = self._hlc(ohlcv_data)
+        return pd.Series(ta_kernels.cci(high, low, close, period), index=ohlcv_data.index)
     
     def calculate_adx_simple(self, ohlcv_data, period=14):
         """Laske ADX yksinkertaistettu"""
-        high = ohlcv_data['high']
-        low = ohlcv_data['low']
-        close = ohlcv_data['close']
-        
-        # True Range
-        tr1 = high - low
-        tr2 = abs(high - close.shift())
-        tr3 = abs(low - close.shift())
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        
-        # Directional Movement
-        dm_plus = high.diff()
-        dm_minus = -low.diff()
-        
-        dm_plus = dm_plus.where((dm_plus > dm_minus) & (dm_plus > 0), 0)
-        dm_minus = dm_minus.where((dm_minus > dm_plus) & (dm_minus > 0), 0)
-        
-        # Smoothed values
-        tr_smooth = tr.rolling(window=period).mean()
-        dm_plus_smooth = dm_plus.rolling(window=period).mean()
-        dm_minus_smooth = dm_minus.rolling(window=period).mean()
-        
-        # DI values
-        di_plus = 100 * (dm_plus_smooth / tr_smooth)
-        di_minus = 100 * (dm_minus_smooth / tr_smooth)
-        
-        # ADX
-        dx = 100 * abs(di_plus - di_minus) / (di_plus + di_minus)
-        adx = dx.rolling(window=period).mean()
-        
-        return adx
+        high, low, close = self._hlc(ohlcv_data)
+        return pd.Series(ta_kernels.adx(high, low, close, period), index=ohlcv_data.index)
     
     def calculate_obv_simple(self, ohlcv_data):
         """Laske OBV yksinkertaistettu"""
-        close = ohlcv_data['close']
-        volume = ohlcv_data['volume']
-        
-        obv = pd.Series(index=close.index, dtype=float)
-        obv.iloc[0] = volume.iloc[0]
-        
-        for i in range(1, len(close)):
-            if close.iloc[i] > close.iloc[i-1]:
-                obv.iloc[i] = obv.iloc[i-1] + volume.iloc[i]
-            elif close.iloc[i] < close.iloc[i-1]:
-                obv.iloc[i] = obv.iloc[i-1] - volume.iloc[i]
-            else:
-                obv.iloc[i] = obv.iloc[i-1]
-        
-        return obv
+        obv = ta_kernels.obv(ohlcv_data['close'].to_numpy(), ohlcv_data['volume'].to_numpy())
+        return pd.Series(obv, index=ohlcv_data.index)
+    
+    @staticmethod
+    def _hlc(ohlcv_data: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return (ohlcv_data['high'].to_numpy(dtype=float), ohlcv_data['low'].to_numpy(dtype=float),
+                ohlcv_data['close'].to_numpy(dtype=float))
     
     def calculate_technical_indicators(self, ohlcv_data: pd.DataFrame) -> TechnicalIndicators:
-        """Laske kaikki tekniset indikaattorit"""
+        """Laske kaikki tekniset indikaattorit (yksi NumPy-läpikäynti, ks. ta_kernels)"""
         try:
-            # Perusindikaattorit (yksinkertaistettu toteutus ilman talib)
-            sma_20 = ohlcv_data['close'].rolling(window=20).mean().iloc[-1]
-            sma_50 = ohlcv_data['close'].rolling(window=50).mean().iloc[-1]
-            ema_12 = ohlcv_data['close'].ewm(span=12).mean().iloc[-1]
-            ema_26 = ohlcv_data['close'].ewm(span=26).mean().iloc[-1]
-            
-            # RSI (yksinkertaistettu)
-            rsi = self.calculate_rsi_simple(ohlcv_data['close']).iloc[-1]
-            
-            # MACD (yksinkertaistettu)
-            macd = ema_12 - ema_26
-            macd_signal = pd.Series([macd]).ewm(span=9).mean().iloc[-1]
-            macd_histogram = macd - macd_signal
-            
-            # Bollinger Bands (yksinkertaistettu)
-            bb_middle = sma_20
-            bb_std = ohlcv_data['close'].rolling(window=20).std().iloc[-1]
-            bb_upper = bb_middle + (bb_std * 2)
-            bb_lower = bb_middle - (bb_std * 2)
-            
-            # Volume
-            volume_sma = ohlcv_data['volume'].rolling(window=20).mean().iloc[-1]
-            
-            # ATR (yksinkertaistettu)
-            atr = self.calculate_atr_simple(ohlcv_data).iloc[-1]
-            
-            # Stochastic (yksinkertaistettu)
-            stoch_k = self.calculate_stochastic_simple(ohlcv_data).iloc[-1]
-            stoch_d = pd.Series([stoch_k]).rolling(window=3).mean().iloc[-1]
-            
-            # Williams %R (yksinkertaistettu)
-            williams_r = self.calculate_williams_r_simple(ohlcv_data).iloc[-1]
-            
-            # CCI (yksinkertaistettu)
-            cci = self.calculate_cci_simple(ohlcv_data).iloc[-1]
-            
-            # ADX (yksinkertaistettu)
-            adx = self.calculate_adx_simple(ohlcv_data).iloc[-1]
-            
-            # OBV (yksinkertaistettu)
-            obv = self.calculate_obv_simple(ohlcv_data).iloc[-1]
-            
-            return TechnicalIndicators(
-                sma_20=sma_20,
-                sma_50=sma_50,
-                ema_12=ema_12,
-                ema_26=ema_26,
-                rsi=rsi,
-                macd=macd,
-                macd_signal=macd_signal,
-                macd_histogram=macd_histogram,
-                bollinger_upper=bb_upper,
-                bollinger_middle=bb_middle,
-                bollinger_lower=bb_lower,
-                volume_sma=volume_sma,
-                atr=atr,
-                stoch_k=stoch_k,
-                stoch_d=stoch_d,
-                williams_r=williams_r,
-                cci=cci,
-                adx=adx,
-                obv=obv
-            )
+            high, low, close = self._hlc(ohlcv_data)
+            values = ta_kernels.indicators_last(high, low, close, ohlcv_data['volume'].to_numpy(dtype=float))
+            return TechnicalIndicators(**{name: float(value) for name, value in values.items()})
             
         except Exception as e:
             self.logger.error(f"Virhe teknisen analyysin laskennassa: {e}")
             return None
     
+    def calculate_technical_indicators_batch(self, high, low, close, volume) -> Dict[str, np.ndarray]:
+        """
+        Laske indikaattorit usealle tokenille kerralla: syötteet (tokens, bars) -> {kenttä: (tokens,)}
+        Tokenit samanpituisilla sarjoilla; rivi i vastaa calculate_technical_indicators(token i)
+        """
+        ta_kernels.batch_shape(high, low, close, volume)
+        return ta_kernels.indicators_last(high, low, close, volume)
+    
     def analyze_token(self, token) -> Dict:
         """Analysoi token mock datalla"""
         try:
@@ -404,42 +295,18 @@ class TechnicalAnalysisEngine:
             return 50.0
     
     def find_support_levels(self, ohlcv_data: pd.DataFrame) -> List[float]:
-        """Löydä tuki tasot"""
+        """Löydä tuki tasot (pivot-pohjat, joilla >= 2 kosketusta ±20 kynttilän sisällä)"""
         try:
-            # Käytä pivot point analyysiä
-            lows = ohlcv_data['low'].rolling(window=5, center=True).min()
-            support_levels = []
-            
-            for i in range(5, len(lows) - 5):
-                if lows.iloc[i] == ohlcv_data['low'].iloc[i]:
-                    # Tarkista onko tämä todellinen tuki
-                    if self.is_valid_support_level(ohlcv_data, lows.iloc[i], i):
-                        support_levels.append(lows.iloc[i])
-            
-            # Järjestä ja palauta top 3
-            support_levels.sort(reverse=True)
-            return support_levels[:3]
+            return ta_kernels.support_levels(ohlcv_data['low'].to_numpy(dtype=float))
             
         except Exception as e:
             self.logger.error(f"Virhe tuki tasojen löytämisessä: {e}")
             return []
     
     def find_resistance_levels(self, ohlcv_data: pd.DataFrame) -> List[float]:
-        """Löydä vastustasot"""
+        """Löydä vastustasot (pivot-huiput, joilla >= 2 kosketusta ±20 kynttilän sisällä)"""
         try:
-            # Käytä pivot point analyysiä
-            highs = ohlcv_data['high'].rolling(window=5, center=True).max()
-            resistance_levels = []
-            
-            for i in range(5, len(highs) - 5):
-                if highs.iloc[i] == ohlcv_data['high'].iloc[i]:
-                    # Tarkista onko tämä todellinen vastustaso
-                    if self.is_valid_resistance_level(ohlcv_data, highs.iloc[i], i):
-                        resistance_levels.append(highs.iloc[i])
-            
-            # Järjestä ja palauta top 3
-            resistance_levels.sort()
-            return resistance_levels[:3]
+            return ta_kernels.resistance_levels(ohlcv_data['high'].to_numpy(dtype=float))
             
         except Exception as e:
             self.logger.error(f"Virhe vastustasojen löytämisessä: {e}")
@@ -447,32 +314,18 @@ class TechnicalAnalysisEngine:
     
     def is_valid_support_level(self, ohlcv_data: pd.DataFrame, level: float, index: int) -> bool:
         """Tarkista onko tuki taso validi"""
-        try:
-            # Tarkista kuinka monta kertaa hinta on koskenut tätä tasoa
-            touches = 0
-            tolerance = level * 0.02  # 2% toleranssi
-            
-            for i in range(max(0, index - 20), min(len(ohlcv_data), index + 20)):
-                if abs(ohlcv_data['low'].iloc[i] - level) <= tolerance:
-                    touches += 1
-            
-            return touches >= 2
-            
-        except Exception as e:
-            return False
+        return self._is_valid_level(ohlcv_data['low'], level, index)
     
     def is_valid_resistance_level(self, ohlcv_data: pd.DataFrame, level: float, index: int) -> bool:
         """Tarkista onko vastustaso validi"""
+        return self._is_valid_level(ohlcv_data['high'], level, index)
+    
+    @staticmethod
+    def _is_valid_level(prices: pd.Series, level: float, index: int) -> bool:
         try:
-            # Tarkista kuinka monta kertaa hinta on koskenut tätä tasoa
-            touches = 0
-            tolerance = level * 0.02  # 2% toleranssi
-            
-            for i in range(max(0, index - 20), min(len(ohlcv_data), index + 20)):
-                if abs(ohlcv_data['high'].iloc[i] - level) <= tolerance:
-                    touches += 1
-            
-            return touches >= 2
+            # Kosketukset 2% toleranssilla välillä [index-20, index+20)
+            window = prices.to_numpy(dtype=float)[max(0, index - 20):min(len(prices), index + 20)]
+            return int((np.abs(window - level) <= level * 0.02).sum()) >= 2
             
         except Exception as e:
             return False
@@ -581,53 +434,32 @@ class TechnicalAnalysisEngine:
             self.logger.error(f"Virhe momentum skoorin laskennassa: {e}")
             return 50.0
     
+    # kuvio -> (luottamus, tavoitekerroin, stop-loss-kerroin) viimeisestä päätöskurssista
+    PATTERN_TARGETS = {
+        "HEAD_AND_SHOULDERS": (0.7, 0.9, 1.05),
+        "DOUBLE_TOP": (0.6, 0.9, 1.03),
+        "DOUBLE_BOTTOM": (0.6, 1.1, 0.97),
+        "ASCENDING_TRIANGLE": (0.8, 1.15, 0.95),
+        "DESCENDING_TRIANGLE": (0.8, 0.85, 1.05),
+        "FLAG": (0.7, 1.2, 0.9),
+    }
+    
     def recognize_patterns(self, ohlcv_data: pd.DataFrame) -> PatternRecognition:
-        """Tunnista kuvioita"""
+        """Tunnista kuvioita (pivotit lasketaan kerran kaikille detektoreille)"""
         patterns = []
         pattern_confidence = []
         breakout_targets = []
         stop_loss_levels = []
         
         try:
-            # Head and Shoulders
-            if self.detect_head_and_shoulders(ohlcv_data):
-                patterns.append("HEAD_AND_SHOULDERS")
-                pattern_confidence.append(0.7)
-                breakout_targets.append(ohlcv_data['close'].iloc[-1] * 0.9)
-                stop_loss_levels.append(ohlcv_data['close'].iloc[-1] * 1.05)
-            
-            # Double Top/Bottom
-            if self.detect_double_top(ohlcv_data):
-                patterns.append("DOUBLE_TOP")
-                pattern_confidence.append(0.6)
-                breakout_targets.append(ohlcv_data['close'].iloc[-1] * 0.9)
-                stop_loss_levels.append(ohlcv_data['close'].iloc[-1] * 1.03)
-            
-            if self.detect_double_bottom(ohlcv_data):
-                patterns.append("DOUBLE_BOTTOM")
-                pattern_confidence.append(0.6)
-                breakout_targets.append(ohlcv_data['close'].iloc[-1] * 1.1)
-                stop_loss_levels.append(ohlcv_data['close'].iloc[-1] * 0.97)
-            
-            # Triangle patterns
-            if self.detect_ascending_triangle(ohlcv_data):
-                patterns.append("ASCENDING_TRIANGLE")
-                pattern_confidence.append(0.8)
-                breakout_targets.append(ohlcv_data['close'].iloc[-1] * 1.15)
-                stop_loss_levels.append(ohlcv_data['close'].iloc[-1] * 0.95)
-            
-            if self.detect_descending_triangle(ohlcv_data):
-                patterns.append("DESCENDING_TRIANGLE")
-                pattern_confidence.append(0.8)
-                breakout_targets.append(ohlcv_data['close'].iloc[-1] * 0.85)
-                stop_loss_levels.append(ohlcv_data['close'].iloc[-1] * 1.05)
-            
-            # Flag and Pennant
-            if self.detect_flag_pattern(ohlcv_data):
-                patterns.append("FLAG")
-                pattern_confidence.append(0.7)
-                breakout_targets.append(ohlcv_data['close'].iloc[-1] * 1.2)
-                stop_loss_levels.append(ohlcv_data['close'].iloc[-1] * 0.9)
+            detected = self._detect_patterns(ohlcv_data)
+            last_close = ohlcv_data['close'].iloc[-1]
+            for name, (confidence, target, stop) in self.PATTERN_TARGETS.items():
+                if detected[name]:
+                    patterns.append(name)
+                    pattern_confidence.append(confidence)
+                    breakout_targets.append(last_close * target)
+                    stop_loss_levels.append(last_close * stop)
             
         except Exception as e:
             self.logger.error(f"Virhe kuvioiden tunnistamisessa: {e}")
@@ -639,129 +471,39 @@ class TechnicalAnalysisEngine:
             stop_loss_levels=stop_loss_levels
         )
     
-    def detect_head_and_shoulders(self, ohlcv_data: pd.DataFrame) -> bool:
-        """Tunnista Head and Shoulders kuvio"""
+    def _detect_patterns(self, ohlcv_data: pd.DataFrame) -> Dict[str, bool]:
+        high, low, close = self._hlc(ohlcv_data)
+        return ta_kernels.detect_patterns(high, low, close)
+    
+    def _detect_pattern(self, ohlcv_data: pd.DataFrame, name: str) -> bool:
         try:
-            # Yksinkertainen toteutus - tarkista 3 huippua
-            highs = ohlcv_data['high'].rolling(window=5, center=True).max()
-            peaks = []
-            
-            for i in range(5, len(highs) - 5):
-                if highs.iloc[i] == ohlcv_data['high'].iloc[i]:
-                    peaks.append((i, highs.iloc[i]))
-            
-            if len(peaks) >= 3:
-                # Tarkista onko keskimmäinen huippu korkein
-                middle_peak = peaks[len(peaks)//2]
-                left_peak = peaks[0]
-                right_peak = peaks[-1]
-                
-                return (middle_peak[1] > left_peak[1] and 
-                        middle_peak[1] > right_peak[1] and
-                        abs(left_peak[1] - right_peak[1]) / left_peak[1] < 0.05)
-            
-            return False
-            
+            return self._detect_patterns(ohlcv_data)[name]
         except Exception as e:
             return False
     
+    def detect_head_and_shoulders(self, ohlcv_data: pd.DataFrame) -> bool:
+        """Tunnista Head and Shoulders kuvio (3+ huippua, keskimmäinen korkein)"""
+        return self._detect_pattern(ohlcv_data, "HEAD_AND_SHOULDERS")
+    
     def detect_double_top(self, ohlcv_data: pd.DataFrame) -> bool:
-        """Tunnista Double Top kuvio"""
-        try:
-            highs = ohlcv_data['high'].rolling(window=5, center=True).max()
-            peaks = []
-            
-            for i in range(5, len(highs) - 5):
-                if highs.iloc[i] == ohlcv_data['high'].iloc[i]:
-                    peaks.append((i, highs.iloc[i]))
-            
-            if len(peaks) >= 2:
-                # Tarkista onko kaksi huippua samalla tasolla
-                last_two_peaks = peaks[-2:]
-                price_diff = abs(last_two_peaks[0][1] - last_two_peaks[1][1]) / last_two_peaks[0][1]
-                return price_diff < 0.03  # 3% toleranssi
-            
-            return False
-            
-        except Exception as e:
-            return False
+        """Tunnista Double Top kuvio (kaksi viimeistä huippua 3% sisällä)"""
+        return self._detect_pattern(ohlcv_data, "DOUBLE_TOP")
     
     def detect_double_bottom(self, ohlcv_data: pd.DataFrame) -> bool:
-        """Tunnista Double Bottom kuvio"""
-        try:
-            lows = ohlcv_data['low'].rolling(window=5, center=True).min()
-            valleys = []
-            
-            for i in range(5, len(lows) - 5):
-                if lows.iloc[i] == ohlcv_data['low'].iloc[i]:
-                    valleys.append((i, lows.iloc[i]))
-            
-            if len(valleys) >= 2:
-                # Tarkista onko kaksi pohjaa samalla tasolla
-                last_two_valleys = valleys[-2:]
-                price_diff = abs(last_two_valleys[0][1] - last_two_valleys[1][1]) / last_two_valleys[0][1]
-                return price_diff < 0.03  # 3% toleranssi
-            
-            return False
-            
-        except Exception as e:
-            return False
+        """Tunnista Double Bottom kuvio (kaksi viimeistä pohjaa 3% sisällä)"""
+        return self._detect_pattern(ohlcv_data, "DOUBLE_BOTTOM")
     
     def detect_ascending_triangle(self, ohlcv_data: pd.DataFrame) -> bool:
-        """Tunnista Ascending Triangle kuvio"""
-        try:
-            # Yksinkertainen toteutus - tarkista nouseva tuki ja vaakasuora vastustaso
-            recent_data = ohlcv_data.tail(20)
-            
-            # Tarkista nouseva tuki
-            lows = recent_data['low']
-            if len(lows) >= 3:
-                # Laske trendi alimmille hinnoille
-                low_trend = np.polyfit(range(len(lows)), lows, 1)[0]
-                return low_trend > 0  # Positiivinen trendi
-            
-            return False
-            
-        except Exception as e:
-            return False
+        """Tunnista Ascending Triangle kuvio (nouseva tuki 20 kynttilällä)"""
+        return self._detect_pattern(ohlcv_data, "ASCENDING_TRIANGLE")
     
     def detect_descending_triangle(self, ohlcv_data: pd.DataFrame) -> bool:
-        """Tunnista Descending Triangle kuvio"""
-        try:
-            # Yksinkertainen toteutus - tarkista laskeva vastustaso ja vaakasuora tuki
-            recent_data = ohlcv_data.tail(20)
-            
-            # Tarkista laskeva vastustaso
-            highs = recent_data['high']
-            if len(highs) >= 3:
-                # Laske trendi ylimmille hinnoille
-                high_trend = np.polyfit(range(len(highs)), highs, 1)[0]
-                return high_trend < 0  # Negatiivinen trendi
-            
-            return False
-            
-        except Exception as e:
-            return False
+        """Tunnista Descending Triangle kuvio (laskeva vastustaso 20 kynttilällä)"""
+        return self._detect_pattern(ohlcv_data, "DESCENDING_TRIANGLE")
     
     def detect_flag_pattern(self, ohlcv_data: pd.DataFrame) -> bool:
-        """Tunnista Flag kuvio"""
-        try:
-            # Yksinkertainen toteutus - tarkista nopea liike ja konsolidointi
-            recent_data = ohlcv_data.tail(15)
-            
-            # Tarkista onko ollut nopea liike
-            price_range = recent_data['high'].max() - recent_data['low'].min()
-            avg_price = recent_data['close'].mean()
-            
-            if price_range / avg_price > 0.1:  # Yli 10% liike
-                # Tarkista konsolidointi
-                recent_volatility = recent_data['close'].std() / recent_data['close'].mean()
-                return recent_volatility < 0.05  # Matala volatiliteetti
-            
-            return False
-            
-        except Exception as e:
-            return False
+        """Tunnista Flag kuvio (yli 10% liike ja matala volatiliteetti 15 kynttilällä)"""
+        return self._detect_pattern(ohlcv_data, "FLAG")
     
     def generate_trading_signals(self, ohlcv_data: pd.DataFrame, indicators: TechnicalIndicators, 
                                 trend_analysis: TrendAnalysis, patterns: PatternRecognition) -> List[Dict]:
@@ -7,8 +7,7 @@ import time
 from unittest.mock import Mock, AsyncMock
 from discovery_engine import DiscoveryEngine, TokenCandidate
 from sources.mock_firehose import MockFirehoseSource
-from rpc_stub import StubSolanaRPC
-from tests.stubs_rpc import StubFastRPC
+from rpc_stub import StubSolanaRPC, StubFastRPC
 from metrics import init_metrics, metrics
 
 class TestLoadTesting:
@@ -0,0 +1,83 @@
+"""
+CandidateIndex testit: top-K vastaa täyttä sorttausta, vanheneminen ja karsinta
+"""
+import random
+import time
+
+import pytest
+
+from candidate_index import CandidateIndex
+from discovery_engine import DiscoveryEngine, TokenCandidate
+
+
+def test_top_k_matches_full_sort_under_random_updates():
+    rnd = random.Random(42)
+    idx = CandidateIndex()
+    scores = {}
+    for _ in range(5000):
+        mint = f"M{rnd.randint(0, 1500)}"
+        if rnd.random() < 0.1 and mint in scores:
+            idx.remove(mint)
+            del scores[mint]
+        else:
+            score = round(rnd.random(), 3)
+            idx.upsert(mint, score, ts=rnd.uniform(0, 1000))
+            scores[mint] = score
+
+    assert len(idx) == len(scores)
+    got = idx.top(50, min_score=0.3)
+    expected = sorted((m for m, s in scores.items() if s >= 0.3), key=lambda m: -scores[m])[:50]
+    assert [scores[m] for m in got] == [scores[m] for m in expected]
+    assert scores[idx.lowest()] == min(scores.values())
+
+
+def test_expire_skips_updated_entries():
+    idx = CandidateIndex()
+    idx.upsert("old", 0.5, ts=100.0)
+    idx.upsert("fresh", 0.6, ts=100.0)
+    idx.upsert("fresh", 0.6, ts=900.0)  # päivitetty aikaleima -> ei vanhene
+
+    assert idx.expire(500.0) == ["old"]
+    assert "fresh" in idx and "old" not in idx
+    assert idx.top(10) == ["fresh"]
+
+
+def test_engine_best_candidates_uses_index_and_trims():
+    eng = DiscoveryEngine(market_sources=[], min_liq_usd=0.0)
+    eng.max_candidates = 3
+    now = time.time()
+    for i, score in enumerate([0.2, 0.9, 0.5, 0.7, 0.1]):
+        c = TokenCandidate(mint=f"IDX{i}", overall_score=score, extra={"first_pool_ts": now})
+        eng.processed_candidates[c.mint] = c
+        eng._index_candidate(c)
+
+    assert set(eng.processed_candidates) == {"IDX1", "IDX2", "IDX3"}
+    best = eng.best_candidates(k=2, min_score=0.0)
+    assert [c.mint for c in best] == ["IDX1", "IDX3"]
+
+    # TTL: vanha on-chain aikaleima poistuu purgessa
+    stale = TokenCandidate(mint="STALE", overall_score=0.95, extra={"first_pool_ts": now - 10_000})
+    eng.processed_candidates[stale.mint] = stale
+    eng._index_candidate(stale)
+    assert "STALE" not in [c.mint for c in eng.best_candidates(k=5, min_score=0.0)]
+    assert "STALE" not in eng.processed_candidates
+
+
+@pytest.mark.asyncio
+async def test_bonus_after_trim_does_not_leave_orphan_in_index():
+    eng = DiscoveryEngine(market_sources=[], min_liq_usd=0.0)
+    eng.max_candidates = 1
+    eng._fast_filter = lambda c: True
+    eng._score = lambda c: setattr(c, "overall_score", 0.49)
+    # pisteytyksen jälkeinen säätö (bonus/rangaistus) nostaa WEAKin OTHERin ohi
+    eng._check_spread_slippage = lambda c: setattr(c, "overall_score", 0.51)
+    now = time.time()
+    other = TokenCandidate(mint="OTHER", overall_score=0.50, extra={"first_pool_ts": now})
+    eng.processed_candidates[other.mint] = other
+    eng._index_candidate(other)
+
+    await eng._process_candidate(TokenCandidate(mint="WEAK", extra={"first_pool_ts": now}))
+
+    assert set(eng.processed_candidates) == {"WEAK"}
+    assert len(eng._candidate_index) == 1
+    assert [c.mint for c in eng.best_candidates(k=1, min_score=0.0)] == ["WEAK"]
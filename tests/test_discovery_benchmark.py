@@ -0,0 +1,60 @@
+"""
+discovery_benchmark testit: raportti noudattaa skeemaa ja mittaa oikeita pisteytyksiä;
+compare_reports tunnistaa regression mutta ei kohinaa
+"""
+import copy
+
+import pytest
+
+from discovery_benchmark import SCHEMA, BenchConfig, compare_reports, run_benchmark
+from discovery_engine import DiscoveryEngine
+
+
+@pytest.mark.asyncio
+@pytest.mark.timeout(20)
+async def test_run_benchmark_reports_measured_pipeline():
+    cfg = BenchConfig(name="tiny", rate=300, duration_sec=1.0, warmup_sec=0.2, rpc_latency_ms=1.0, rpc_jitter_ms=0.0)
+    report = await run_benchmark(cfg)
+
+    assert report["schema"] == SCHEMA and report["name"] == "tiny"
+    assert report["config"]["rate"] == 300
+    m = report["metrics"]
+    # lämmittelyn jono voi valua mittausjaksolle: pisteytetyt voivat ylittää vastaanotetut jonon verran
+    assert m["scored"] > 0 and m["scored"] + m["rejected"] <= m["received"] + 300
+    assert m["received"] <= m["offered"] + 300
+    assert m["latency_ms"]["samples"] > 0
+    assert 0 < m["latency_ms"]["p50"] <= m["latency_ms"]["p99"] <= m["latency_ms"]["max"]
+    assert m["queue_depth"]["series"] and m["cpu_ms_per_candidate"] is not None
+
+
+def test_engine_max_queue_overrides_config():
+    eng = DiscoveryEngine(rpc_endpoint="stub://bench", max_queue=123)
+    assert eng.max_queue == 123 and eng.candidate_queue.maxsize == 123
+    assert DiscoveryEngine().max_queue == eng.config.discovery.max_queue
+
+
+def _report(**metrics):
+    base = {"throughput_scored_per_sec": 500.0, "latency_ms": {"p50": 10.0, "p99": 40.0},
+            "cpu_ms_per_candidate": 0.5, "drop_ratio": 0.0, "rss_mb": {"growth": 5.0}}
+    base.update(metrics)
+    return {"schema": SCHEMA, "name": "x", "config": {"rate": 1000}, "metrics": base}
+
+
+def test_compare_reports_flags_regressions_beyond_threshold_only():
+    baseline = _report()
+    assert compare_reports(baseline, copy.deepcopy(baseline))["regressions"] == []
+
+    # alle kynnyksen / alle kohinalattian -> ei regressiota
+    noisy = _report(throughput_scored_per_sec=470.0, latency_ms={"p50": 10.4, "p99": 40.5}, rss_mb={"growth": 9.0})
+    assert compare_reports(baseline, noisy)["regressions"] == []
+
+    slow = _report(throughput_scored_per_sec=300.0, latency_ms={"p50": 25.0, "p99": 40.0}, drop_ratio=0.05)
+    result = compare_reports(baseline, slow)
+    assert {r["metric"] for r in result["regressions"]} == {"throughput_scored_per_sec", "latency_ms.p50", "drop_ratio"}
+    assert result["deltas"]["throughput_scored_per_sec"]["change"] == pytest.approx(-0.4)
+
+    # parannus ei ole regressio; eri asetukset merkitään
+    fast = _report(throughput_scored_per_sec=900.0)
+    fast["config"] = {"rate": 2000}
+    result = compare_reports(baseline, fast)
+    assert result["regressions"] == [] and "_config_mismatch" in result["deltas"]
@@ -297,6 +297,70 @@ async def test_discovery_smoke():
         raise
 
 
+@pytest.mark.asyncio
+async def test_scorer_worker_pool_parallel_enrichment():
+    """Worker-pooli: neljä RPC-hakua rinnakkain ja per-worker tilastot get_stats():ssa"""
+    from rpc_interfaces import MintInfo, LPInfo, Distribution, FlowStats
+
+    class SlowRPC:
+        def __init__(self):
+            self.in_flight = 0
+            self.max_in_flight = 0
+
+        async def _call(self, result):
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(0.02)
+            self.in_flight -= 1
+            return result
+
+        async def get_mint_info(self, mint):
+            return await self._call(MintInfo(renounced_mint=True, renounced_freeze=True))
+
+        async def get_lp_info(self, pool_address):
+            return await self._call(LPInfo(locked_or_burned=True, liquidity_usd=10000.0))
+
+        async def get_holder_distribution(self, mint, top_n=10):
+            return await self._call(Distribution(top_share=0.1))
+
+        async def get_flow_stats(self, mint, window_sec=300):
+            return await self._call(FlowStats(unique_buyers=10, buys=10, sells=5))
+
+    rpc = SlowRPC()
+    eng = DiscoveryEngine(market_sources=[], min_liq_usd=0.0, rpc_client=rpc)
+    eng.scorer_workers = 3
+
+    await eng.start()
+    try:
+        for i in range(6):
+            await eng.candidate_queue.put(TokenCandidate(
+                mint=f"POOL_MINT_{i}", symbol=f"P{i}", source="test",
+                liquidity_usd=10000.0, top10_holder_share=0.1,
+            ))
+        await eng.run_until_idle(idle_seconds=0.2, max_wait=3.0)
+
+        assert len(eng.processed_candidates) == 6
+        # Useampi worker * 4 rinnakkaista hakua -> enemmän kuin 4 samanaikaista kutsua
+        assert rpc.max_in_flight > 4
+
+        workers = eng.get_stats()["scorer_workers"]
+        assert len(workers) == 3
+        assert sum(w["processed"] for w in workers) == 6
+        assert all(0.0 <= w["utilization"] <= 1.0 for w in workers)
+    finally:
+        await eng.stop()
+        await eng.wait_closed(timeout=2.0)
+
+
+def test_scorer_shard_is_stable_per_mint():
+    """Sama mint reititetään aina samalle workerille"""
+    eng = DiscoveryEngine(market_sources=[], min_liq_usd=0.0)
+    eng.scorer_workers = 8
+    shards = {eng._shard_for(f"MINT_{i}") for i in range(64)}
+    assert len(shards) > 1
+    assert all(eng._shard_for("SAME_MINT") == eng._shard_for("SAME_MINT") for _ in range(5))
+
+
 if __name__ == "__main__":
     # Run smoke tests
     pytest.main([__file__, "-v"])
@@ -0,0 +1,171 @@
+"""
+ExitWorker testit: yksi batch-hintahaku kaikille positioille, rinnakkainen arvio, kauppatapahtuma
+laukaisee exitin heti ja kesken arvion tulleet tapahtumat yhdistetään yhdeksi uudelleenarvioksi
+"""
+import asyncio
+import time
+
+import pytest
+
+from exit_worker import WSOL_MINT, ExitWorker
+from position_manager import PositionManager
+
+
+class _Bot:
+    def __init__(self):
+        self.messages, self.errors = [], []
+
+    def _send_telegram(self, text, parse_mode=None):
+        self.messages.append(text)
+
+    def _log_exception(self, where, e):
+        self.errors.append((where, e))
+
+
+class _Trader:
+    wallet = None
+
+    def __init__(self, sell_delay=0.0):
+        self.sell_delay = sell_delay
+        self.sells = []
+
+    async def sell_token_for_base(self, mint, qty_atoms):
+        await asyncio.sleep(self.sell_delay)
+        self.sells.append((mint, qty_atoms))
+        return {"ok": True, "sig": f"sig-{mint}"}
+
+
+class _Dex:
+    def __init__(self):
+        self.calls = 0
+
+    async def fetch(self, mint, timeout=8.0):
+        self.calls += 1
+        return {}
+
+
+class _PriceBatch:
+    """fetch_dexscreener_prices-korvike: hinta per kokonainen token, laskee kutsut"""
+
+    def __init__(self, prices, delay=0.0):
+        self.prices = prices
+        self.delay = delay
+        self.calls = []
+
+    async def __call__(self, mints):
+        self.calls.append(list(mints))
+        await asyncio.sleep(self.delay)
+        return {m: {"price_usd": self.prices[m], "liq_usd": 50_000.0, "vol_h24": 20_000.0}
+                for m in mints if m in self.prices}
+
+
+def _open(pm, mint, entry_px_per_token=1.0):
+    pm.add_position(mint, {
+        "status": "open", "qty_atoms": 1_000_000, "decimals": 6,
+        "entry_price_usd": entry_px_per_token / 1e6, "entry_volume": 20_000.0,
+        "entry_liquidity": 50_000.0, "entry_time": time.time(),
+    })
+
+
+@pytest.fixture
+def positions(tmp_path):
+    return PositionManager(str(tmp_path / "positions.json"))
+
+
+@pytest.mark.asyncio
+async def test_poll_uses_one_batch_and_exits_concurrently(positions):
+    mints = [f"Mint{i}" for i in range(12)]
+    for m in mints:
+        _open(positions, m)
+    prices = {m: 1.0 for m in mints} | {"Mint3": 0.5, "Mint7": 2.5, WSOL_MINT: 150.0}
+    batch, trader, dex = _PriceBatch(prices), _Trader(sell_delay=0.05), _Dex()
+    worker = ExitWorker(_Bot(), trader, positions, dex, concurrency=4, price_batch=batch)
+
+    started = time.perf_counter()
+    await worker.once()
+    assert len(batch.calls) == 1 and set(batch.calls[0]) == set(mints) | {WSOL_MINT}
+    assert dex.calls == 0  # batch kattoi kaikki mintit
+    assert sorted(m for m, _ in trader.sells) == ["Mint3", "Mint7"]
+    assert time.perf_counter() - started < 0.1  # myynnit rinnakkain, ei peräkkäin
+    closed = positions.get("Mint3")
+    assert closed["status"] == "closed" and closed["exit_reason"] == "SL_30pct"
+    assert closed["exit_trigger"] == "poll" and closed["exit_eval_ms"] >= 0
+    assert positions.get("Mint7")["exit_reason"] == "TP_100pct"
+
+
+@pytest.mark.asyncio
+async def test_trade_event_triggers_immediate_exit_from_curve_price(positions):
+    _open(positions, "MintA")
+    _open(positions, "MintB")
+    batch = _PriceBatch({"MintA": 1.0, "MintB": 1.0, WSOL_MINT: 100.0})
+    trader = _Trader()
+    worker = ExitWorker(_Bot(), trader, positions, _Dex(), price_batch=batch)
+    await worker.once()
+    assert trader.sells == []
+
+    # curve-hinta: 30 SOL / 5e6 tokenia * 100 USD = 0.0006 USD/token -> SL
+    await worker.on_trade({"mint": "MintA", "txType": "sell",
+                           "vSolInBondingCurve": 30.0, "vTokensInBondingCurve": 5_000_000.0})
+    await worker.on_trade({"mint": "NotHeld", "txType": "buy",
+                           "vSolInBondingCurve": 30.0, "vTokensInBondingCurve": 5_000_000.0})
+    await asyncio.gather(*worker._tasks)
+    assert trader.sells == [("MintA", 1_000_000)]
+    assert len(batch.calls) == 1  # tapahtuma ei tarvinnut uutta hintahakua
+    pos = positions.get("MintA")
+    assert pos["exit_reason"] == "SL_30pct" and pos["exit_trigger"] == "trade"
+    assert positions.get("MintB")["status"] == "open"
+
+
+@pytest.mark.asyncio
+async def test_events_during_evaluation_coalesce_into_one_rerun(positions):
+    _open(positions, "MintA")
+    batch = _PriceBatch({"MintA": 1.0, WSOL_MINT: 100.0})
+    worker = ExitWorker(_Bot(), _Trader(), positions, _Dex(), price_batch=batch)
+    await worker.once()
+
+    calls = []
+    original = worker.evaluate
+
+    async def slow_evaluate(mint, trigger, t0):
+        calls.append(trigger)
+        await asyncio.sleep(0.05)
+        return await original(mint, trigger, t0)
+
+    worker.evaluate = slow_evaluate
+    ev = {"mint": "MintA", "txType": "buy", "vSolInBondingCurve": 30.0, "vTokensInBondingCurve": 3_000.0}
+    for _ in range(5):
+        await worker.on_trade(ev)
+        await asyncio.sleep(0)
+    await asyncio.gather(*worker._tasks)
+    assert calls == ["trade", "trade"]  # ensimmäinen + yksi yhdistetty uudelleenarvio
+    assert worker.get_stats()["coalesced"] == 4
+    assert positions.get("MintA")["status"] == "open"  # 30/3000*100 = 1.0 USD/token -> pidä
+
+
+@pytest.mark.asyncio
+async def test_failed_sell_backs_off_and_fallback_fetch_is_cached(positions):
+    _open(positions, "MintA")
+    batch = _PriceBatch({WSOL_MINT: 100.0})  # batch ei kata mintiä -> per-mint fallback
+    trader, dex, bot = _Trader(), _Dex(), _Bot()
+    results = [{"ok": False, "reason": "slippage"}, {"ok": True, "sig": "sig-ok"}]
+
+    async def flaky_sell(mint, qty_atoms):
+        trader.sells.append((mint, qty_atoms))
+        return results.pop(0)
+
+    trader.sell_token_for_base = flaky_sell
+    worker = ExitWorker(bot, trader, positions, dex, price_batch=batch, sell_backoff_sec=0.05)
+    await worker.once()
+    ev = {"mint": "MintA", "txType": "sell", "vSolInBondingCurve": 30.0, "vTokensInBondingCurve": 5_000_000.0}
+    for _ in range(10):
+        await worker.on_trade(ev)
+        await asyncio.gather(*worker._tasks)
+
+    assert len(trader.sells) == 1 and len(bot.messages) == 1  # yksi yritys + yksi SELL FAIL backoffin aikana
+    assert worker.get_stats()["sell_backoff_skips"] == 9
+    assert dex.calls == 1  # tyhjä fallback-tulos välimuistissa
+
+    await asyncio.sleep(0.06)
+    await worker.on_trade(ev)
+    await asyncio.gather(*worker._tasks)
+    assert len(trader.sells) == 2 and positions.get("MintA")["status"] == "closed"
@@ -0,0 +1,168 @@
+"""
+frame_capture testit: hubin kehykset ja http_poolin vastaukset tallentuvat segmentteihin ja toistuvat
+oikean HeliusWsHubin läpi samassa järjestyksessä; REST palvellaan tallenteesta; nopeuskerroin skaalaa tahdin
+"""
+import asyncio
+import json
+import time
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import http_pool
+from frame_capture import CaptureRecorder, CaptureReplayer, capture_segments, iter_capture, start_capture, stop_capture
+from helius_ws_hub import HeliusWsHub, HubNotification, close_helius_hubs, get_helius_hub
+from http_pool import HttpClient, HttpPoolConfig
+
+URL = "wss://capture.example"
+PROGRAM = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
+
+
+def _notification(sub_id, slot):
+    return json.dumps({
+        "jsonrpc": "2.0",
+        "method": "logsNotification",
+        "params": {"result": {"context": {"slot": slot}, "value": {"signature": f"SIG{slot}", "logs": []}},
+                   "subscription": sub_id},
+    })
+
+
+class LiveWs:
+    """Live-yhteyden korvike: vahvistaa tilauksen id:llä 77 ja lähettää kolme notifikaatiota"""
+
+    def __init__(self):
+        self.inbox = asyncio.Queue()
+
+    async def send(self, raw):
+        msg = json.loads(raw)
+        if msg["method"] == "logsSubscribe":
+            await self.inbox.put(json.dumps({"jsonrpc": "2.0", "id": msg["id"], "result": 77}))
+            for slot in (10, 11, 12):
+                await self.inbox.put(_notification(77, slot))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.inbox.get()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+async def _collect(sub, n):
+    return [(await asyncio.wait_for(sub.get(), 2.0)) for _ in range(n)]
+
+
+@pytest.mark.asyncio
+async def test_hub_frames_and_http_responses_replay_from_capture(tmp_path):
+    async def rpc(request):
+        body = await request.json()
+        return web.json_response({"jsonrpc": "2.0", "id": body["id"], "result": {"value": body["params"][0]}})
+
+    app = web.Application()
+    app.router.add_post("/", rpc)
+    srv = TestServer(app)
+    await srv.start_server()
+    client = HttpClient(HttpPoolConfig(backoff_initial_sec=0.0))
+    rpc_url = str(srv.make_url("/"))
+
+    start_capture(str(tmp_path))
+    live = HeliusWsHub(URL, connect=lambda url, **kw: LiveWs())
+    try:
+        sub = live.subscribe_logs(PROGRAM, name="live")
+        live_items = await _collect(sub, 3)
+        live_rpc = await client.post_json(rpc_url, json={"jsonrpc": "2.0", "id": 5, "method": "getBalance", "params": ["W1"]})
+    finally:
+        await live.close()
+        await client.close()
+        await srv.close()
+        await stop_capture()
+    assert http_pool._recorder is None
+
+    replayer = CaptureReplayer(str(tmp_path), speed=0)
+    assert replayer.ws_urls == [URL] and replayer.subscribed_programs(URL) == [PROGRAM]
+    replay_client = replayer.install()
+    try:
+        sub = get_helius_hub(URL).subscribe_logs(PROGRAM, name="replay")
+        replay_items = await _collect(sub, 3)
+        assert await replayer.wait_finished(timeout=2.0)
+        replay_rpc = await http_pool.get_http_client().post_json(
+            rpc_url, json={"jsonrpc": "2.0", "id": 99, "method": "getBalance", "params": ["W1"]}
+        )
+    finally:
+        await close_helius_hubs()
+        http_pool.set_http_client(None)
+
+    assert all(isinstance(i, HubNotification) for i in replay_items)
+    assert [(i.slot, i.value) for i in replay_items] == [(i.slot, i.value) for i in live_items]
+    assert replay_rpc["result"] == live_rpc["result"] and replay_rpc["id"] == 99
+    assert replay_client.replay_stats == {"hits": 1, "misses": 0}
+    with pytest.raises(Exception):
+        await replay_client.post_json(rpc_url, json={"jsonrpc": "2.0", "id": 1, "method": "getBalance", "params": ["OTHER"]})
+
+
+@pytest.mark.asyncio
+async def test_rotated_segments_are_read_in_order(tmp_path):
+    recorder = CaptureRecorder(str(tmp_path), segment_mb=0.0005, flush_interval_sec=0.01)
+    for i in range(200):
+        recorder.record_ws_in(URL, _notification(1, i))
+        if i % 20 == 0:
+            await recorder.sink.flush()
+    await recorder.close()
+
+    assert len(capture_segments(str(tmp_path))) > 2
+    assert any(p.endswith(".gz") for p in capture_segments(str(tmp_path)))
+    slots = [json.loads(r["d"])["params"]["result"]["context"]["slot"] for r in iter_capture(str(tmp_path)) if r["k"] == "ws_in"]
+    assert slots == list(range(200))
+
+
+@pytest.mark.asyncio
+async def test_speed_scales_recorded_timing(tmp_path):
+    records = [
+        {"t": 0.0, "k": "ws_out", "c": URL, "d": {"jsonrpc": "2.0", "id": 1, "method": "logsSubscribe",
+                                                 "params": [{"mentions": [PROGRAM]}, {"commitment": "confirmed"}]}},
+        {"t": 0.01, "k": "ws_in", "c": URL, "d": json.dumps({"jsonrpc": "2.0", "id": 1, "result": 5})},
+        {"t": 1.0, "k": "ws_in", "c": URL, "d": _notification(5, 1)},
+        {"t": 2.0, "k": "ws_in", "c": URL, "d": _notification(5, 2)},
+    ]
+    (tmp_path / "capture.jsonl").write_text("\n".join(json.dumps(r) for r in records) + "\n")
+
+    replayer = CaptureReplayer(str(tmp_path), speed=10)
+    hub = HeliusWsHub(URL, connect=replayer.connect)
+    try:
+        sub = hub.subscribe_logs(PROGRAM, name="paced")
+        first = await asyncio.wait_for(sub.get(), 2.0)
+        started = time.monotonic()
+        second = await asyncio.wait_for(sub.get(), 2.0)
+        elapsed = time.monotonic() - started
+    finally:
+        await hub.close()
+    assert (first.slot, second.slot) == (1, 2)
+    assert 0.07 <= elapsed < 0.5  # 1.0s tallenteessa / 10
+
+
+@pytest.mark.asyncio
+async def test_capture_redacts_api_keys_and_replay_still_matches(tmp_path):
+    ws_url = "wss://mainnet.helius-rpc.com/?api-key=SECRET-WS"
+    rpc_url = "https://user:pw@rpc.example/?api-key=SECRET-RPC&cluster=mainnet"
+    recorder = CaptureRecorder(str(tmp_path), flush_interval_sec=0.01)
+    recorder.record_ws_out(ws_url, {"jsonrpc": "2.0", "id": 1, "method": "logsSubscribe", "params": []})
+    recorder.record_ws_in(ws_url, _notification(1, 1))
+    body = {"jsonrpc": "2.0", "id": 3, "method": "getBalance", "params": ["W1"]}
+    recorder.record_http("POST", rpc_url, {"token": "SECRET-P", "limit": 5}, body, {"result": 42})
+    await recorder.close()
+
+    raw = "".join(open(p, encoding="utf-8").read() for p in capture_segments(str(tmp_path)))
+    assert "SECRET" not in raw and "user:pw" not in raw
+    assert "cluster=mainnet" in raw and '"limit": 5' in raw
+
+    replayer = CaptureReplayer(str(tmp_path), speed=0)
+    assert replayer.ws_urls == ["wss://mainnet.helius-rpc.com/?api-key=REDACTED"]
+    client = replayer.http_client()
+    out = await client.request_json("POST", rpc_url, params={"token": "OTHER", "limit": 5}, json={**body, "id": 9})
+    assert out == {"result": 42}
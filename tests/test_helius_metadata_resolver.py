@@ -0,0 +1,111 @@
+"""
+AssetMetadataResolver testit: mintit erissä getAssetBatch-kutsuun, receive-loop ei odota metadataa
+ja metadata-päivitys päätyy DiscoveryEnginen ehdokkaaseen
+"""
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from discovery_engine import DiscoveryEngine, TokenCandidate
+from http_pool import HttpClient, HttpPoolConfig
+from sources.helius_logs_newtokens import AssetMetadataResolver, HeliusTransactionsNewTokensSource
+
+
+@pytest.fixture
+async def das_server():
+    calls = []
+
+    async def rpc(request):
+        body = await request.json()
+        calls.append(body)
+        ids = body["params"]["ids"]
+        result = [
+            {"id": mint, "content": {"metadata": {"symbol": f"S{mint[-1]}", "name": f"Name {mint}"}}}
+            for mint in ids if mint != "MISSING"
+        ]
+        await asyncio.sleep(0.05)
+        return web.json_response({"jsonrpc": "2.0", "id": body["id"], "result": result})
+
+    app = web.Application()
+    app.router.add_post("/", rpc)
+    srv = TestServer(app)
+    await srv.start_server()
+    srv.calls = calls
+    yield srv
+    await srv.close()
+
+
+@pytest.mark.asyncio
+async def test_resolver_batches_mints_into_get_asset_batch(das_server):
+    resolved = {}
+    client = HttpClient(HttpPoolConfig(backoff_initial_sec=0.0))
+    resolver = AssetMetadataResolver(
+        str(das_server.make_url("/")), lambda m, md: resolved.__setitem__(m, md),
+        batch_size=10, batch_wait_sec=0.02, client=client,
+    )
+    task = asyncio.create_task(resolver.run())
+    try:
+        for mint in ("M1", "M2", "M3", "MISSING"):
+            assert resolver.submit(mint)
+        for _ in range(50):
+            if len(resolved) == 4:
+                break
+            await asyncio.sleep(0.02)
+    finally:
+        task.cancel()
+        await resolver.close()
+        await client.close()
+
+    assert len(das_server.calls) == 1
+    assert das_server.calls[0]["method"] == "getAssetBatch"
+    assert das_server.calls[0]["params"]["ids"] == ["M1", "M2", "M3", "MISSING"]
+    assert resolved["M2"]["content"]["metadata"]["symbol"] == "S2"
+    assert resolved["MISSING"] == {}
+    assert resolver.stats["resolved"] == 3 and resolver.stats["failed"] == 1
+
+
+def _value(signature):
+    return {
+        "signature": signature,
+        "err": None,
+        "logs": [
+            "Program TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA invoke [1]",
+            "Program log: Instruction: InitializeMint2",
+        ],
+    }
+
+
+@pytest.mark.asyncio
+async def test_value_emits_placeholder_and_metadata_update_reaches_engine():
+    source = HeliusTransactionsNewTokensSource("wss://example", ["TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"])
+    queue = asyncio.Queue()
+    source._out_queue = queue
+
+    source._handle_value(_value("SIG1"), queue)
+    token = queue.get_nowait()
+    assert isinstance(token, TokenCandidate)
+    assert token.symbol.startswith("TOKEN_") and token.extra["metadata_pending"]
+    assert source._resolver.stats["submitted"] == 1
+
+    source._on_metadata(token.mint, {"content": {"metadata": {"symbol": "REAL", "name": "Real Token"}}})
+    update = queue.get_nowait()
+    assert update["type"] == "metadata_update" and update["symbol"] == "REAL"
+
+    eng = DiscoveryEngine(market_sources=[], min_liq_usd=0.0)
+    eng.processed_candidates[token.mint] = token
+    eng._apply_metadata_update(update)
+    assert token.symbol == "REAL" and token.name == "Real Token"
+    assert "metadata_pending" not in token.extra
+    # tuntematon mint ohitetaan
+    eng._apply_metadata_update({"type": "metadata_update", "mint": "UNKNOWN", "symbol": "X"})
+    assert "UNKNOWN" not in eng.processed_candidates
+
+
+@pytest.mark.asyncio
+async def test_run_without_programs_fails_before_starting_resolver():
+    source = HeliusTransactionsNewTokensSource("wss://example", [])
+    with pytest.raises(RuntimeError):
+        await source.run(asyncio.Queue())
+    assert not [t for t in asyncio.all_tasks() if t.get_name() == "helius_asset_resolver"]
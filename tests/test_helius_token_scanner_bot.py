@@ -11,17 +11,28 @@ from helius_token_scanner_bot import (
     DexInfoFetcher,
     DexInfo,
 )
+from scanner_config import ScannerConfig
+
+
+@pytest.fixture
+def scanner_config(tmp_path):
+    """JSONL-sinkit tmp_pathiin (ei token_events.jsonl / dex_rejects.jsonl työhakemistoon)"""
+    def make(**kwargs):
+        return ScannerConfig(events_log_path=str(tmp_path / "token_events.jsonl"),
+                             rejects_log_path=str(tmp_path / "dex_rejects.jsonl"), **kwargs)
+    return make
 
 
 @pytest.mark.asyncio
-async def test_consumer_start_logs_info(caplog):
+async def test_consumer_start_logs_info(caplog, scanner_config):
     caplog.set_level(logging.INFO)
 
     # Dex fetcher joka ei koske verkkoon
     async def _pending(_mint: str) -> DexInfo:
         return DexInfo(status="pending", reason="no_providers")
 
-    bot = HeliusTokenScannerBot(ws_url="wss://dummy", dex_fetcher=DexInfoFetcher(dexscreener=_pending))
+    bot = HeliusTokenScannerBot(ws_url="wss://dummy", dex_fetcher=DexInfoFetcher(dexscreener=_pending),
+                                config=scanner_config())
     await bot.start()
 
     # INFO-loki kuluttajan startista
@@ -32,7 +43,7 @@ async def test_consumer_start_logs_info(caplog):
 
 
 @pytest.mark.asyncio
-async def test_dex_reason_initialized_and_summary_logged(caplog):
+async def test_dex_reason_initialized_and_summary_logged(caplog, scanner_config):
     caplog.set_level(logging.INFO)
 
     # Fallback-ketju: DexScreener=error -> Jupiter=not_found -> Solscan=ok
@@ -46,7 +57,7 @@ async def test_dex_reason_initialized_and_summary_logged(caplog):
         return DexInfo(status="ok", dex_name="Solscan", pair_address="PAIR_ABC", reason="solscan_ok")
 
     fetcher = DexInfoFetcher(dexscreener=_dexscreener, jupiter=_jupiter, solscan=_solscan)
-    bot = HeliusTokenScannerBot(ws_url="wss://dummy", dex_fetcher=fetcher)
+    bot = HeliusTokenScannerBot(ws_url="wss://dummy", dex_fetcher=fetcher, config=scanner_config())
 
     await bot.start()
     await bot.enqueue(NewTokenEvent(mint="MINT_XYZ"))
@@ -70,14 +81,14 @@ async def test_dex_reason_initialized_and_summary_logged(caplog):
 
 
 @pytest.mark.asyncio
-async def test_fallback_chain_pending_when_all_fail(caplog):
+async def test_fallback_chain_pending_when_all_fail(caplog, scanner_config):
     caplog.set_level(logging.INFO)
 
     async def _fail(_mint: str) -> DexInfo:
         return DexInfo(status="error", reason="provider_error")
 
     fetcher = DexInfoFetcher(dexscreener=_fail, jupiter=_fail, solscan=_fail)
-    bot = HeliusTokenScannerBot(ws_url="wss://dummy", dex_fetcher=fetcher)
+    bot = HeliusTokenScannerBot(ws_url="wss://dummy", dex_fetcher=fetcher, config=scanner_config())
 
     await bot.start()
     await bot.enqueue(NewTokenEvent(mint="MINT_FAIL"))
@@ -94,3 +105,137 @@ async def test_fallback_chain_pending_when_all_fail(caplog):
                 break
     assert found, "pending summary puuttuu all-fail -tilanteessa"
 
+
+
+@pytest.fixture
+def no_coingecko(monkeypatch):
+    import helius_token_scanner_bot as hsb
+    monkeypatch.setattr(hsb, "COINGECKO_ENRICHMENT_AVAILABLE", False)
+
+
+@pytest.mark.asyncio
+async def test_hedged_fetch_fires_next_provider_and_cancels_loser(no_coingecko):
+    cancelled = []
+
+    async def _slow_birdeye(_mint: str) -> DexInfo:
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append("birdeye")
+            raise
+        return DexInfo(status="ok", metadata={"liquidity_usd": 1.0})
+
+    async def _dexscreener(_mint: str) -> DexInfo:
+        return DexInfo(status="ok", dex_name="raydium", pair_address="PAIR")
+
+    fetcher = DexInfoFetcher(
+        birdeye=_slow_birdeye, dexscreener=_dexscreener, hedge=True, hedge_default_delay=0.05, hedge_min_delay=0.01
+    )
+    started = asyncio.get_running_loop().time()
+    info = await fetcher.fetch("MINT_HEDGE", timeout=5.0)
+
+    assert info.status == "ok" and info.reason == "dexscreener_ok"
+    assert asyncio.get_running_loop().time() - started < 1.0
+    assert cancelled == ["birdeye"]
+
+
+@pytest.mark.asyncio
+async def test_hedged_fetch_keeps_reason_chain_and_adapts_order(no_coingecko):
+    async def _fail(_mint: str) -> DexInfo:
+        return DexInfo(status="error", reason="provider_error")
+
+    async def _solscan(_mint: str) -> DexInfo:
+        return DexInfo(status="ok", dex_name="Solscan")
+
+    fetcher = DexInfoFetcher(dexscreener=_fail, jupiter=_fail, solscan=_solscan, hedge=True, hedge_min_samples=2)
+    first = await fetcher.fetch("MINT_A")
+    assert first.reason == "solscan_ok"
+
+    # Kaikki epäonnistuvat -> reason_chain kuten peräkkäisessä ketjussa
+    pending = await DexInfoFetcher(dexscreener=_fail, hedge=True).fetch("MINT_B")
+    assert pending.status == "pending"
+    assert "dexscreener=provider_error" in pending.reason
+    assert "birdeye=provider_not_configured" in pending.reason
+
+    await fetcher.fetch("MINT_C")
+    assert fetcher.provider_order()[0] == "solscan"
+
+
+@pytest.mark.asyncio
+async def test_instant_failures_and_unconfigured_providers_do_not_rank_first(no_coingecko):
+    async def _fail_fast(_mint: str) -> DexInfo:
+        return DexInfo(status="error", reason="provider_error")
+
+    async def _dexscreener(_mint: str) -> DexInfo:
+        await asyncio.sleep(0.02)
+        return DexInfo(status="ok", dex_name="raydium")
+
+    fetcher = DexInfoFetcher(birdeye=_fail_fast, dexscreener=_dexscreener, hedge=True, hedge_min_samples=2)
+    for i in range(3):
+        assert (await fetcher.fetch(f"MINT_{i}")).reason == "dexscreener_ok"
+
+    assert fetcher.provider_order() == ["dexscreener", "birdeye", "jupiter", "coingecko", "solscan"]
+    stats = fetcher.get_provider_stats()
+    assert stats["birdeye"]["p50_sec"] is None and stats["birdeye"]["success_rate"] == 0.0
+    assert stats["jupiter"]["success_rate"] is None  # konfiguroimaton: ei tilastoja
+
+
+@pytest.mark.asyncio
+async def test_slow_mint_does_not_block_other_shards(caplog, no_coingecko, scanner_config):
+    caplog.set_level(logging.INFO)
+    release = asyncio.Event()
+
+    async def _dexscreener(mint: str) -> DexInfo:
+        if mint == "MINT_SLOW":
+            await release.wait()
+        return DexInfo(status="not_found", reason="no_pair")
+
+    bot = HeliusTokenScannerBot(
+        ws_url="wss://dummy",
+        dex_fetcher=DexInfoFetcher(dexscreener=_dexscreener),
+        config=scanner_config(consumer_workers=4, max_retry_attempts=0),
+    )
+    await bot.start()
+    await bot.enqueue(NewTokenEvent(mint="MINT_SLOW"))
+    await bot.enqueue(NewTokenEvent(mint="MINT_FAST"))
+    await asyncio.sleep(0.1)
+
+    def _summarised() -> list[str]:
+        out = []
+        for rec in caplog.records:
+            with contextlib.suppress(Exception):
+                payload = json.loads(rec.getMessage())
+                if payload.get("evt") == "summary":
+                    out.append(payload["mint"])
+        return out
+
+    assert _summarised() == ["MINT_FAST"]
+    health = await bot.health_check()
+    assert sum(w["processed"] for w in health["workers"]["score"]) == 1
+
+    release.set()
+    await bot.stop()
+    assert _summarised() == ["MINT_FAST", "MINT_SLOW"]
+
+
+def test_legacy_positions_migrate_once_from_open_positions(tmp_path, monkeypatch, scanner_config):
+    old = tmp_path / "open_positions.json"
+    old.write_text(json.dumps({
+        "MINT_OLD": {"entry_price": "0.5", "entry_time": "100", "entry_volume": "1",
+                     "entry_liquidity": "2", "entry_symbol": "OLD"},
+        "MINT_NEW": {"status": "open", "qty": 1},
+    }))
+    monkeypatch.setenv("POSITIONS_PATH", str(old))
+    monkeypatch.setenv("LEGACY_POSITIONS_PATH", str(tmp_path / "legacy_positions.json"))
+
+    bot = HeliusTokenScannerBot(ws_url="wss://dummy", config=scanner_config())
+    assert bot._open_positions["MINT_OLD"]["entry_price"] == 0.5
+    assert bot._legacy_positions.get("MINT_OLD")["entry_price"] == "0.5"  # journalin tila ei muutu
+    assert set(bot.positions.get_all()) == {"MINT_NEW"}
+
+    # myyty legacy-positio ei palaa seuraavassa käynnistyksessä
+    del bot._open_positions["MINT_OLD"]
+    bot._save_position("MINT_OLD")
+    restarted = HeliusTokenScannerBot(ws_url="wss://dummy", config=scanner_config())
+    assert restarted._open_positions == {}
+    assert set(restarted.positions.get_all()) == {"MINT_NEW"}
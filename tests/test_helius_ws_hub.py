@@ -0,0 +1,144 @@
+"""
+HeliusWsHub testit: identtiset tilaukset yhdistetään, kehys dekoodataan kerran ja jaetaan,
+reconnect tilaa uudelleen ja raportoi slot-aukon, täysi tilaajajono pudottaa vanhimman
+"""
+import asyncio
+import json
+
+import pytest
+
+from helius_ws_hub import HeliusWsHub, HubNotification, SlotGap
+from ws_prefilter import TOKEN_MINT_MARKERS, FramePrefilter
+
+PROGRAM = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
+
+
+def _notification(sub_id, slot, log_line="Program log: Instruction: InitializeMint2"):
+    return json.dumps({
+        "jsonrpc": "2.0",
+        "method": "logsNotification",
+        "params": {"result": {"context": {"slot": slot}, "value": {"signature": f"SIG{slot}", "err": None, "logs": [log_line]}},
+                   "subscription": sub_id},
+    })
+
+
+class FakeWs:
+    """Vastaa tilauksiin server-id:llä ja syöttää testin kehykset"""
+
+    def __init__(self, server):
+        self.server = server
+        self.inbox: asyncio.Queue = asyncio.Queue()
+
+    async def send(self, raw):
+        msg = json.loads(raw)
+        self.server.sent.append(msg)
+        if msg["method"].endswith("Subscribe"):
+            self.server.next_id += 1
+            await self.inbox.put(json.dumps({"jsonrpc": "2.0", "id": msg["id"], "result": self.server.next_id}))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        item = await self.inbox.get()
+        if item is None:
+            raise StopAsyncIteration
+        return item
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeServer:
+    def __init__(self):
+        self.sent = []
+        self.next_id = 100
+        self.connections = []
+
+    def connect(self, url, **kw):
+        ws = FakeWs(self)
+        self.connections.append(ws)
+        return ws
+
+    def subscribes(self):
+        return [m for m in self.sent if m["method"] == "logsSubscribe"]
+
+
+async def _until(cond, tries=100):
+    for _ in range(tries):
+        if cond():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("ehto ei täyttynyt")
+
+
+@pytest.mark.asyncio
+async def test_identical_subscriptions_share_one_channel_and_decode():
+    server = FakeServer()
+    hub = HeliusWsHub("wss://example", connect=server.connect)
+    mint_filter = FramePrefilter("test_scanner", TOKEN_MINT_MARKERS)
+    a = hub.subscribe_logs(PROGRAM, name="a", prefilter=mint_filter)
+    b = hub.subscribe_logs(PROGRAM, name="b")
+    try:
+        await _until(lambda: hub.get_stats()["control"] == 1)
+        assert len(server.subscribes()) == 1
+        ws = server.connections[0]
+        await ws.inbox.put(_notification(101, 10))
+        await ws.inbox.put(_notification(101, 11, "Program log: Instruction: Transfer"))
+        first_a, first_b = await a.get(), await b.get()
+        assert isinstance(first_a, HubNotification) and first_a is first_b
+        assert first_a.slot == 10 and first_a.value["signature"] == "SIG10"
+        # Transfer menee vain suodattamattomalle tilaajalle
+        second_b = await b.get()
+        assert second_b.slot == 11 and a.qsize() == 0
+        assert hub.get_stats()["decoded"] == 2
+        assert mint_filter.get_stats()["rejected"] == 1
+
+        a.close()
+        assert not [m for m in server.sent if m["method"] == "logsUnsubscribe"]
+        b.close()
+        await _until(lambda: any(m["method"] == "logsUnsubscribe" for m in server.sent))
+        assert await b.get() is None
+    finally:
+        await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_reconnect_resubscribes_and_reports_slot_gap():
+    server = FakeServer()
+    hub = HeliusWsHub("wss://example", connect=server.connect, reconnect_initial_sec=0.0)
+    sub = hub.subscribe_logs(PROGRAM, name="scanner")
+    try:
+        await _until(lambda: hub.get_stats()["control"] == 1)
+        await server.connections[0].inbox.put(_notification(101, 50))
+        assert (await sub.get()).slot == 50
+        await server.connections[0].inbox.put(None)  # yhteys katkeaa
+
+        await _until(lambda: len(server.subscribes()) == 2)
+        await _until(lambda: hub.get_stats()["control"] == 2)
+        await server.connections[1].inbox.put(_notification(102, 55))
+        gap = await sub.get()
+        assert isinstance(gap, SlotGap) and (gap.first_slot, gap.last_slot, gap.slots) == (51, 54, 4)
+        assert (await sub.get()).slot == 55
+        assert hub.get_stats()["connects"] == 2
+    finally:
+        await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_full_subscriber_queue_drops_oldest():
+    server = FakeServer()
+    hub = HeliusWsHub("wss://example", connect=server.connect)
+    slow = hub.subscribe_logs(PROGRAM, name="slow", maxsize=2)
+    try:
+        await _until(lambda: hub.get_stats()["control"] == 1)
+        for slot in (1, 2, 3):
+            await server.connections[0].inbox.put(_notification(101, slot))
+        await _until(lambda: hub.get_stats()["decoded"] == 3)
+        assert [(await slow.get()).slot for _ in range(2)] == [2, 3]
+        assert slow.stats["dropped"] == 1
+    finally:
+        await hub.close()
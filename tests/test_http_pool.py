@@ -0,0 +1,95 @@
+"""
+HttpClient testit: keep-alive uudelleenkäyttö, retry-politiikka, per-host tilastot ja jaetun clientin viitelaskenta
+"""
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import http_pool
+from http_pool import HttpClient, HttpPoolConfig, close_http_client, init_http_client
+
+
+@pytest.fixture
+async def server():
+    state = {"peers": set(), "flaky": 0}
+
+    async def ok(request):
+        state["peers"].add(request.transport.get_extra_info("peername"))
+        return web.json_response({"ok": True})
+
+    async def flaky(request):
+        state["flaky"] += 1
+        if state["flaky"] < 3:
+            return web.Response(status=503, text="busy")
+        return web.json_response({"ok": True})
+
+    async def missing(request):
+        state["flaky"] += 1
+        return web.Response(status=404, text="nope")
+
+    app = web.Application()
+    app.router.add_get("/ok", ok)
+    app.router.add_get("/flaky", flaky)
+    app.router.add_get("/missing", missing)
+    srv = TestServer(app)
+    await srv.start_server()
+    srv.state = state
+    yield srv
+    await srv.close()
+
+
+def _client(**kw):
+    return HttpClient(HttpPoolConfig(backoff_initial_sec=0.0, **kw))
+
+
+@pytest.mark.asyncio
+async def test_requests_reuse_keepalive_connection(server):
+    client = _client()
+    try:
+        for _ in range(5):
+            assert await client.get_json(str(server.make_url("/ok"))) == {"ok": True}
+    finally:
+        await client.close()
+
+    assert len(server.state["peers"]) == 1
+    stats = client.get_stats()[server.host]
+    assert stats["requests"] == 5
+    assert stats["errors"] == 0
+    assert stats["inflight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_retries_on_5xx_but_not_on_4xx(server):
+    client = _client()
+    try:
+        assert await client.get_json(str(server.make_url("/flaky")), tries=3) == {"ok": True}
+        assert server.state["flaky"] == 3
+
+        server.state["flaky"] = 0
+        with pytest.raises(aiohttp.ClientResponseError) as exc:
+            await client.get_json(str(server.make_url("/missing")), tries=3)
+        assert exc.value.status == 404
+        assert server.state["flaky"] == 1
+    finally:
+        await client.close()
+
+    assert client.get_stats()[server.host]["errors"] == 3
+
+
+@pytest.mark.asyncio
+async def test_shared_client_closes_after_last_owner_releases():
+    previous = http_pool.set_http_client(None)
+    try:
+        first = await init_http_client()
+        session = await first.session()
+        assert await init_http_client() is first  # toinen botti jakaa saman session
+
+        await close_http_client()
+        assert http_pool.get_http_client() is first and not session.closed
+
+        await close_http_client()
+        assert session.closed and http_pool.get_http_client() is not first
+    finally:
+        await http_pool.get_http_client().close()
+        http_pool.set_http_client(previous)
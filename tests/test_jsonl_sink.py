@@ -0,0 +1,100 @@
+"""
+JsonlSink testit: erissä kirjoitus, backlog-raja, rotaatio + pakkaus, lopullinen flush sulkiessa ja
+close() herätyksen kanssa samalla kierroksella
+"""
+import asyncio
+import gzip
+import json
+
+import pytest
+
+from jsonl_sink import JsonlSink
+
+
+def _lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+@pytest.mark.asyncio
+async def test_write_is_buffered_until_flush_interval(tmp_path):
+    path = tmp_path / "events.jsonl"
+    sink = JsonlSink(str(path), flush_interval_sec=0.05)
+    for i in range(10):
+        assert sink.write({"i": i})
+    assert not path.exists()
+    assert sink.backlog == 10
+
+    await asyncio.sleep(0.2)
+    assert [r["i"] for r in _lines(path)] == list(range(10))
+    assert sink.backlog == 0
+    await sink.close()
+    assert sink.get_stats()["written"] == 10
+
+
+@pytest.mark.asyncio
+async def test_close_flushes_remaining_records(tmp_path):
+    path = tmp_path / "events.jsonl"
+    sink = JsonlSink(str(path), flush_interval_sec=60.0, fsync="close")
+    for i in range(5):
+        sink.write({"i": i})
+    await sink.close()
+    assert len(_lines(path)) == 5
+
+    # suljettu sink käynnistyy uudelleen seuraavasta write():stä
+    sink.write({"i": 5})
+    await sink.close()
+    assert len(_lines(path)) == 6
+
+
+@pytest.mark.asyncio
+async def test_full_backlog_and_unserialisable_records_are_dropped(tmp_path):
+    sink = JsonlSink(str(tmp_path / "events.jsonl"), flush_interval_sec=60.0, max_backlog=3)
+    results = [sink.write({"i": i}) for i in range(5)]
+    assert results == [True, True, True, False, False]
+    assert sink.write({"bad": object()}) is False
+    stats = sink.get_stats()
+    assert stats["dropped"] == 3
+    assert stats["backlog"] == 3
+    await sink.close()
+
+
+@pytest.mark.asyncio
+async def test_rotates_by_size_and_compresses_closed_segments(tmp_path):
+    path = tmp_path / "events.jsonl"
+    sink = JsonlSink(str(path), flush_interval_sec=60.0, max_batch=10, rotate_bytes=200, compress=True)
+    for i in range(50):
+        sink.write({"i": i, "pad": "x" * 20})
+        if i % 10 == 9:
+            await sink.flush()
+    await sink.close()
+
+    segments = sorted(tmp_path.glob("events.jsonl.*.gz"))
+    assert sink.get_stats()["rotations"] == len(segments) >= 1
+    records = []
+    for seg in segments:
+        with gzip.open(seg, "rt", encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f)
+    records.extend(_lines(path))
+    assert sorted(r["i"] for r in records) == list(range(50))
+
+
+@pytest.mark.asyncio
+async def test_close_is_not_lost_when_wakeup_races_cancel(tmp_path):
+    # herätys ja close() samalla loop-kierroksella: kirjoittaja ei saa jäädä flush-odotukseen eikä erä kadota
+    for turns in range(5):
+        sink = JsonlSink(str(tmp_path / f"events{turns}.jsonl"), flush_interval_sec=60.0)
+        sink.write({"i": turns})
+        for _ in range(3):
+            await asyncio.sleep(0)  # kirjoittaja odottamaan herätystä
+        sink._wakeup.set()
+        for _ in range(turns):
+            await asyncio.sleep(0)
+        await asyncio.wait_for(sink.close(), timeout=2.0)
+        assert len(_lines(tmp_path / f"events{turns}.jsonl")) == 1
+        assert sink.get_stats()["written"] == 1
+
+
+def test_invalid_fsync_policy_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        JsonlSink(str(tmp_path / "x.jsonl"), fsync="always")
@@ -79,11 +79,8 @@ async def test_discovery_engine_handles_load():
     await eng.wait_closed()
 
     # Arvioidaan läpivientiä ja jonon hallintaa
-    # Käytä omaa mittaria koska metrics on poistettu käytöstä
-    processed = len(getattr(eng, "_recent_scores", []))
-    if processed == 0:
-        # Jos _recent_scores ei ole olemassa, käytä mock source:n laskuria
-        processed = getattr(src, "_candidates_generated", 0)
+    # Enginen oma laskuri: workerien oikeasti käsittelemät (ei lähteen generoimat)
+    processed = eng.pipeline_counts["received"]
     
     elapsed = max(0.001, t1 - t0)
     throughput = processed / elapsed
@@ -147,9 +144,7 @@ async def test_queue_stability_under_burst():
     assert max_queue_during_test < MAX_QUEUE, f"Jono räjähti burst:issa: {max_queue_during_test} >= {MAX_QUEUE}"
     
     # Varmista että jotain käsiteltiin
-    processed = len(getattr(eng, "_recent_scores", []))
-    if processed == 0:
-        processed = getattr(src, "_candidates_generated", 0)
+    processed = eng.pipeline_counts["received"]
     assert processed > 0, "Ei käsitelty yhtään ehdokasta burst:issa"
 
 
@@ -292,9 +287,7 @@ async def test_throughput_scaling():
         await eng.wait_closed()
 
         # Laske läpivienti
-        processed = len(getattr(eng, "_recent_scores", []))
-        if processed == 0:
-            processed = getattr(src, "_candidates_generated", 0)
+        processed = eng.pipeline_counts["received"]
         
         elapsed = max(0.001, t1 - t0)
         throughput = processed / elapsed
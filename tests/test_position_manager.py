@@ -0,0 +1,84 @@
+"""
+PositionManager-journal testit: yksi rivi per muutos, toisto käynnistyksessä, taustakompaktointi
+ja vanhan snapshot-muodon / katkenneen viimeisen rivin käsittely
+"""
+import asyncio
+import json
+import os
+
+import pytest
+
+from position_manager import PositionManager
+
+
+def _wal_lines(pm):
+    if not os.path.exists(pm.wal_path):
+        return []
+    with open(pm.wal_path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_each_change_appends_one_record_and_replays(tmp_path):
+    path = str(tmp_path / "positions.json")
+    pm = PositionManager(path)
+    for i in range(200):
+        pm.add_position(f"Mint{i}", {"status": "open", "qty_atoms": i})
+    for i in range(150):
+        pm.close_position(f"Mint{i}", {"exit_reason": "TP_100pct"})
+    size_before = os.path.getsize(pm.wal_path)
+    pm.update_position("Mint199", {"qty_atoms": 5})
+    pm.update_position("Missing", {"qty_atoms": 5})  # tuntematon mint: ei riviä
+    assert os.path.getsize(pm.wal_path) - size_before < 200  # pieni rivi, ei koko tilaa
+    assert len(_wal_lines(pm)) == 351
+    assert not os.path.exists(path)  # ei kompaktointia vielä
+
+    reloaded = PositionManager(path)
+    assert reloaded.get_all() == pm.get_all()
+    assert reloaded.get("Mint0")["status"] == "closed" and reloaded.get("Mint199")["qty_atoms"] == 5
+    assert reloaded.get_stats()["replayed"] == 351
+
+
+@pytest.mark.asyncio
+async def test_async_changes_are_buffered_and_compacted_in_background(tmp_path):
+    path = str(tmp_path / "positions.json")
+    pm = PositionManager(path, compact_every=50, flush_interval_sec=0.01)
+    for i in range(60):
+        pm.add_position(f"Mint{i}", {"status": "open", "qty_atoms": i})
+    assert pm.backlog == 60 and not os.path.exists(pm.wal_path)  # ei I/O:ta event loopissa
+
+    await asyncio.sleep(0.1)
+    assert pm.backlog == 0
+    assert pm.get_stats()["compactions"] == 1
+    with open(path) as f:
+        snap = json.load(f)
+    assert snap["seq"] == 60 and len(snap["positions"]) == 60
+    assert _wal_lines(pm) == []
+
+    pm.remove_position("Mint0")
+    pm.close_position("Mint1", {"exit_reason": "SL_30pct"})
+    await pm.flush()
+    assert [r["op"] for r in _wal_lines(pm)] == ["remove", "close"]
+
+    reloaded = PositionManager(path)
+    assert reloaded.get_all() == pm.get_all() and "Mint0" not in reloaded.get_all()
+    await pm.close()
+    assert _wal_lines(pm) == [] and PositionManager(path).get_stats()["replayed"] == 0
+
+
+def test_legacy_snapshot_torn_tail_and_already_compacted_records(tmp_path):
+    path = tmp_path / "positions.json"
+    path.write_text(json.dumps({"MintA": {"status": "open", "qty_atoms": 10}}))
+    pm = PositionManager(str(path))
+    assert pm.get("MintA")["qty_atoms"] == 10  # vanha {mint: pos} -muoto
+
+    pm.update_position("MintA", {"qty_atoms": 7})
+    with open(pm.wal_path, "a", encoding="utf-8") as f:
+        f.write('{"op":"update","mint":"MintA","da')  # kaatuminen kesken kirjoituksen
+    recovered = PositionManager(str(path))
+    assert recovered.get("MintA")["qty_atoms"] == 7
+    recovered.update_position("MintA", {"qty_atoms": 6})  # ei liity katkenneeseen riviin
+    assert PositionManager(str(path)).get("MintA")["qty_atoms"] == 6
+
+    # kompaktointi katkesi snapshotin jälkeen: journalin vanhat rivit (seq <= snapshot) ohitetaan
+    path.write_text(json.dumps({"version": 1, "seq": 2, "positions": {"MintA": {"status": "open", "qty_atoms": 3}}}))
+    assert PositionManager(str(path)).get("MintA")["qty_atoms"] == 3
@@ -0,0 +1,136 @@
+"""
+TradeSubscriptionManager testit: ryhmäviestit, TTL- ja ehdokasjoukko-karsinta, prioriteettihäätö ja uudelleentilaus
+"""
+import math
+
+import pytest
+from prometheus_client import REGISTRY
+
+from sources.pumpportal_subscriptions import TradeSubscriptionManager
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Recorder:
+    def __init__(self):
+        self.sent = []
+
+    async def __call__(self, msg):
+        self.sent.append(msg)
+
+
+def _manager(clock, **kw):
+    kw.setdefault("batch_size", 2)
+    return TradeSubscriptionManager(clock=clock, **kw)
+
+
+@pytest.mark.asyncio
+async def test_changes_are_sent_as_grouped_messages():
+    clock, send = FakeClock(), Recorder()
+    mgr = _manager(clock)
+    mgr.attach(send)
+    for mint in ("A", "B", "C"):
+        mgr.track(mint)
+    await mgr.flush()
+    assert send.sent == [
+        {"method": "subscribeTokenTrade", "keys": ["A", "B"]},
+        {"method": "subscribeTokenTrade", "keys": ["C"]},
+    ]
+
+    mgr.untrack("A")
+    mgr.track("D")
+    mgr.untrack("D")  # ei koskaan tilattu -> ei unsubscribe-viestiä
+    send.sent.clear()
+    await mgr.flush()
+    assert send.sent == [{"method": "unsubscribeTokenTrade", "keys": ["A"]}]
+    assert mgr.tracked() == ["B", "C"]
+
+
+@pytest.mark.asyncio
+async def test_idle_ttl_and_candidate_set_pruning():
+    clock, send = FakeClock(), Recorder()
+    candidates = {"KEEP": 0.8, "ACTIVE": 0.4}
+    mgr = _manager(clock, idle_ttl_sec=60, grace_sec=30, score_fn=candidates.get)
+    mgr.attach(send)
+    for mint in ("KEEP", "ACTIVE", "GONE"):
+        mgr.track(mint)
+    await mgr.flush()
+
+    clock.now += 40
+    mgr.track("NEW")
+    mgr.sweep()
+    assert "GONE" not in mgr  # ei ehdokas grace-ajan jälkeen
+    assert "NEW" in mgr and "KEEP" in mgr
+
+    clock.now += 35
+    mgr.touch("ACTIVE")
+    mgr.sweep()
+    assert set(mgr.tracked()) == {"ACTIVE"}  # KEEP idle > 60s, NEW poistui ehdokkaista
+    assert mgr.get_stats()["expired"] == 1
+    assert mgr.get_stats()["left_candidates"] == 2
+
+
+def test_pinned_mint_outlives_idle_ttl_and_max_age():
+    clock = FakeClock()
+    scores = {"POS": math.inf, "CAND": 0.5}
+    mgr = _manager(clock, idle_ttl_sec=60, max_age_sec=300, score_fn=scores.get)
+    mgr.track("POS")
+    mgr.track("CAND")
+
+    clock.now += 400  # yli idle-TTL:n ja max_agen, ei kauppoja
+    mgr.sweep()
+    assert mgr.tracked() == ["POS"]
+
+    del scores["POS"]  # positio suljettu -> tavalliset säännöt
+    clock.now += 400
+    mgr.sweep()
+    assert len(mgr) == 0
+
+
+def test_eviction_prefers_lowest_score_and_protects_fresh_unscored():
+    clock = FakeClock()
+    mgr = _manager(clock, max_tracked=3, grace_sec=30)
+    mgr.track("LOW", score=0.1)
+    mgr.track("HIGH", score=0.9)
+    mgr.track("FRESH")
+    mgr.track("NEXT")
+    assert set(mgr.tracked()) == {"HIGH", "FRESH", "NEXT"}
+
+    clock.now += 60  # FRESH/NEXT pisteyttämättä grace-ajan jälkeen -> häädetään ensin (vanhin aktiivisuus)
+    mgr.track("LATEST")
+    assert len(mgr) == 3 and "HIGH" in mgr and "LATEST" in mgr
+    assert mgr.get_stats()["evicted"] == 2
+
+
+@pytest.mark.asyncio
+async def test_reattach_resubscribes_live_set():
+    clock = FakeClock()
+    mgr = _manager(clock, batch_size=10)
+    first = Recorder()
+    mgr.attach(first)
+    mgr.track("A")
+    mgr.track("B")
+    await mgr.flush()
+    mgr.untrack("A")
+    mgr.detach()
+
+    second = Recorder()
+    mgr.attach(second)
+    await mgr.flush()
+    assert second.sent == [{"method": "subscribeTokenTrade", "keys": ["B"]}]
+
+
+def test_tracked_gauge_is_per_feed():
+    clock = FakeClock()
+    feed, source = _manager(clock, name="test_feed"), _manager(clock, name="test_source")
+    for mint in ("A", "B", "C"):
+        source.track(mint)
+    feed.track("D")
+    assert REGISTRY.get_sample_value("pumpportal_tracked_mints", {"feed": "test_source"}) == 3
+    assert REGISTRY.get_sample_value("pumpportal_tracked_mints", {"feed": "test_feed"}) == 1
@@ -0,0 +1,92 @@
+"""
+BatchingSolanaRPC / MicroBatcher testit StubSolanaRPC-transportilla (viiveinjektio)
+"""
+import asyncio
+import pytest
+
+from rpc_batcher import MicroBatcher
+from rpc_interfaces import BatchingSolanaRPC, SolanaRPC
+from rpc_stub import StubSolanaRPC
+
+
+@pytest.mark.asyncio
+async def test_concurrent_mint_lookups_coalesce_into_one_request():
+    stub = StubSolanaRPC(base_latency_ms=20.0, jitter_ms=0.0, error_rate=0.0)
+    rpc = BatchingSolanaRPC("stub://", transport=stub, window_ms=5.0)
+
+    mints = [f"BatchMint{i:03d}" for i in range(40)]
+    infos = await asyncio.gather(*(rpc.get_mint_info(m) for m in mints))
+
+    assert [i.mint_address for i in infos] == mints
+    assert stub.http_requests == 1
+    stats = rpc.get_batch_stats()
+    assert stats["accounts"]["calls"] == 40
+    assert stats["saved_requests"] == 39
+    await rpc.close()
+
+
+@pytest.mark.asyncio
+async def test_mint_and_lp_share_account_batch_and_dedupe():
+    stub = StubSolanaRPC(base_latency_ms=5.0, jitter_ms=0.0, error_rate=0.0)
+    rpc = SolanaRPC("stub://", batching=True, transport=stub, window_ms=5.0)
+
+    mint_info, lp_info, dist = await asyncio.gather(
+        rpc.get_mint_info("SameMint"),
+        rpc.get_lp_info("SameMint"),
+        rpc.get_holder_distribution("SameMint", top_n=10),
+    )
+
+    assert mint_info.decimals == 9
+    assert lp_info.lp_mint == "SameMint"
+    assert 0.0 < dist.top_share <= 1.0
+    assert len(dist.holders) == 10
+    # yksi getMultipleAccounts (deduplikoitu) + yksi JSON-RPC batch holdereille
+    assert stub.http_requests == 2
+    assert rpc.get_batch_stats()["accounts"]["deduped"] == 1
+    await rpc.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_failure_fans_out_to_all_waiters():
+    async def failing(keys):
+        raise RuntimeError("boom")
+
+    batcher = MicroBatcher(failing, window_ms=1.0)
+    results = await asyncio.gather(*(batcher.submit(k) for k in "abc"), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert batcher.get_stats()["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_max_batch_flushes_without_waiting_for_window():
+    seen = []
+
+    async def echo(keys):
+        seen.append(len(keys))
+        return {k: k.upper() for k in keys}
+
+    batcher = MicroBatcher(echo, window_ms=10_000.0, max_batch=3)
+    out = await asyncio.wait_for(asyncio.gather(*(batcher.submit(k) for k in "xyz")), timeout=1.0)
+
+    assert out == ["X", "Y", "Z"]
+    assert seen == [3]
+
+
+@pytest.mark.asyncio
+async def test_unknown_lp_fields_do_not_overwrite_candidate():
+    from discovery_engine import DiscoveryEngine, TokenCandidate
+
+    stub = StubSolanaRPC(base_latency_ms=1.0, jitter_ms=0.0, error_rate=0.0)
+    rpc = BatchingSolanaRPC("stub://", transport=stub, window_ms=1.0)
+    lp_info = await rpc.get_lp_info("LiveMint")
+    assert lp_info.locked_or_burned is None and lp_info.liquidity_usd is None
+
+    eng = DiscoveryEngine(rpc_endpoint="stub://", market_sources=[], min_liq_usd=3000.0)
+    eng.rpc_client = rpc
+    candidate = TokenCandidate(mint="LiveMint", symbol="LIVE", liquidity_usd=12_000.0, lp_locked=True)
+    await eng._enrich_quick(candidate)
+
+    assert candidate.liquidity_usd == 12_000.0 and candidate.lp_locked is True
+    assert candidate._rpc_data_cache["lp_info"] == lp_info  # RPC-polku onnistui, ei fallbackia
+    await rpc.close()
@@ -0,0 +1,142 @@
+"""
+CachedSolanaRPC testit: kenttäkohtaiset TTL:t, negatiivinen välimuisti, LRU ja metriikat
+"""
+import asyncio
+import pytest
+from prometheus_client import CollectorRegistry
+
+from rpc_cache import CachedSolanaRPC
+from rpc_interfaces import MintInfo, LPInfo, Distribution, FlowStats
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingRPC:
+    def __init__(self, renounced=True):
+        self.renounced = renounced
+        self.calls = {"mint": 0, "lp": 0, "dist": 0, "flow": 0}
+        self.fail_flow = False
+
+    async def get_mint_info(self, mint):
+        self.calls["mint"] += 1
+        await asyncio.sleep(0)
+        return MintInfo(renounced_mint=self.renounced, renounced_freeze=self.renounced, mint_address=mint, decimals=6)
+
+    async def get_lp_info(self, pool_address):
+        self.calls["lp"] += 1
+        return LPInfo(locked_or_burned=True, liquidity_usd=1000.0)
+
+    async def get_holder_distribution(self, mint, top_n=10):
+        self.calls["dist"] += 1
+        return Distribution(top_share=0.2)
+
+    async def get_flow_stats(self, mint, window_sec=300):
+        self.calls["flow"] += 1
+        if self.fail_flow:
+            raise RuntimeError("flow down")
+        return FlowStats(unique_buyers=3)
+
+
+@pytest.mark.asyncio
+async def test_renounced_mint_is_cached_forever_but_flow_expires():
+    clock = FakeClock()
+    inner = CountingRPC(renounced=True)
+    rpc = CachedSolanaRPC(inner, flow_ttl=5.0, clock=clock)
+
+    await rpc.get_mint_info("M1")
+    await rpc.get_flow_stats("M1")
+    clock.now += 10_000
+    await rpc.get_mint_info("M1")
+    await rpc.get_flow_stats("M1")
+
+    assert inner.calls["mint"] == 1
+    assert inner.calls["flow"] == 2
+
+
+@pytest.mark.asyncio
+async def test_active_authority_refetches_and_renounce_is_sticky():
+    clock = FakeClock()
+    inner = CountingRPC(renounced=True)
+    rpc = CachedSolanaRPC(inner, mint_active_ttl=30.0, clock=clock)
+
+    # renounced -> pysyvä; pakota uusi haku ja palauta "lagging node" -vastaus
+    await rpc.get_mint_info("M2")
+    rpc.cache.pop(("mint_info", "M2"))
+    inner.renounced = False
+    info = await rpc.get_mint_info("M2")
+    assert info.renounced_mint and info.renounced_freeze
+
+    # aktiivinen authority vanhenee mint_active_ttl:n jälkeen
+    clock.now += 31
+    await rpc.get_mint_info("M2")
+    assert inner.calls["mint"] == 3
+
+
+@pytest.mark.asyncio
+async def test_negative_cache_and_single_flight():
+    clock = FakeClock()
+    inner = CountingRPC()
+    inner.fail_flow = True
+    rpc = CachedSolanaRPC(inner, negative_ttl=3.0, clock=clock)
+
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            await rpc.get_flow_stats("BAD")
+    assert inner.calls["flow"] == 1
+    assert rpc.get_cache_stats()["negative_hits"] == 2
+
+    await asyncio.gather(*(rpc.get_holder_distribution("HOT") for _ in range(5)))
+    assert inner.calls["dist"] == 1
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_updates_metrics():
+    import metrics as metrics_mod
+    registry = CollectorRegistry()
+    metrics_mod.metrics = metrics_mod.Metrics(namespace="cache_test", registry=registry)
+    try:
+        rpc = CachedSolanaRPC(CountingRPC(), max_entries=2)
+        for mint in ("A", "B", "C"):
+            await rpc.get_lp_info(mint)
+        await rpc.get_lp_info("C")
+
+        assert len(rpc.cache) == 2
+        assert registry.get_sample_value("cache_test_rpc_cache_evictions_total", {"kind": "lp_info"}) == 1
+        assert registry.get_sample_value("cache_test_rpc_cache_misses_total", {"kind": "lp_info"}) == 3
+        assert registry.get_sample_value("cache_test_rpc_cache_hits_total", {"kind": "lp_info"}) == 1
+    finally:
+        metrics_mod.metrics = None
+
+
+@pytest.mark.asyncio
+async def test_cancelled_owner_releases_followers():
+    inner = CountingRPC()
+    gate = asyncio.Event()
+
+    async def slow_dist(mint, top_n=10):
+        inner.calls["dist"] += 1
+        await gate.wait()
+        return Distribution(top_share=0.3)
+
+    inner.get_holder_distribution = slow_dist
+    rpc = CachedSolanaRPC(inner)
+    owner = asyncio.create_task(rpc.get_holder_distribution("HOT"))
+    await asyncio.sleep(0)
+    followers = [asyncio.create_task(rpc.get_holder_distribution("HOT")) for _ in range(3)]
+    await asyncio.sleep(0)
+
+    owner.cancel()
+    await asyncio.sleep(0)
+    gate.set()
+    results = await asyncio.wait_for(asyncio.gather(*followers), timeout=1.0)
+
+    assert owner.cancelled()
+    assert [r.top_share for r in results] == [0.3] * 3
+    assert inner.calls["dist"] == 2  # peruttu omistaja + yksi uusi haku odottajille
+    assert rpc._inflight == {}
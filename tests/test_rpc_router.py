@@ -0,0 +1,180 @@
+"""
+rpc_router testit: hidas node saa vähemmän liikennettä, hedge vastaa hitaan primäärin ohi,
+rinnakkaisuusraja pitää, slot-probe alentaa jäljessä olevan noden ja SolanaRPC käyttää routeria
+"""
+import asyncio
+import random
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import http_pool
+import rpc_pool
+from http_pool import HttpClient, HttpPoolConfig
+from rpc_interfaces import SolanaRPC
+from rpc_router import RPCRouter, get_rpc_router
+
+
+class FakeNode:
+    """Yksi JSON-RPC endpoint: säädettävä viive ja slot, laskee pyynnöt ja samanaikaisuuden"""
+
+    def __init__(self, name, *, delay=0.0, slot=1000):
+        self.name = name
+        self.delay = delay
+        self.slot = slot
+        self.calls = 0
+        self.inflight = 0
+        self.max_inflight = 0
+
+    def app(self):
+        async def handler(request):
+            body = await request.json()
+            items = body if isinstance(body, list) else [body]
+            if items[0]["method"] == "getSlot":
+                return web.json_response({"jsonrpc": "2.0", "id": items[0]["id"], "result": self.slot})
+            self.calls += 1
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+            try:
+                await asyncio.sleep(self.delay)
+            finally:
+                self.inflight -= 1
+            out = []
+            for item in items:
+                if item["method"] == "getMultipleAccounts":
+                    value = [{"data": {"parsed": {"info": {"mintAuthority": None, "freezeAuthority": None, "decimals": 6}}}}]
+                    result = {"value": value * len(item["params"][0])}
+                else:
+                    result = self.name
+                out.append({"jsonrpc": "2.0", "id": item["id"], "result": result})
+            return web.json_response(out if isinstance(body, list) else out[0])
+
+        app = web.Application()
+        app.router.add_post("/", handler)
+        return app
+
+
+@pytest.fixture
+async def servers():
+    started = []
+
+    async def start(node):
+        srv = TestServer(node.app())
+        await srv.start_server()
+        started.append(srv)
+        return str(srv.make_url("/"))
+
+    previous = http_pool.set_http_client(HttpClient(HttpPoolConfig(backoff_initial_sec=0.0)))
+    yield start
+    await http_pool.get_http_client().close()
+    http_pool.set_http_client(previous)
+    for srv in started:
+        await srv.close()
+
+
+@pytest.mark.asyncio
+async def test_slow_node_gets_less_traffic_and_status_exposes_weights(servers):
+    fast, slow = FakeNode("fast"), FakeNode("slow", delay=0.06)
+    fast_url, slow_url = await servers(fast), await servers(slow)
+    router = RPCRouter([fast_url, slow_url], hedge_quantile=None, probe_interval_sec=0, rng=random.Random(7))
+
+    for _ in range(8):
+        await asyncio.gather(*(router.request("getBalance", ["x"]) for _ in range(5)))
+
+    assert fast.calls > 2 * slow.calls and slow.calls >= 1  # hidas saa yhä näytteitä
+    status = router.get_status()
+    by_url = {e["url"]: e for e in status["endpoints"]}
+    assert by_url[fast_url]["weight"] > by_url[slow_url]["weight"]
+    assert by_url[fast_url]["methods"]["getBalance"]["calls"] == fast.calls
+    assert by_url[slow_url]["ewma_latency_ms"] > by_url[fast_url]["ewma_latency_ms"]
+
+    # endpoint(): paras node ilman varausta/kirjausta (esim. confirmTransaction-pollaus)
+    before = router.get_status()
+    assert router.endpoint("confirmTransaction") == fast_url
+    assert router.get_status() == before and all(n.inflight == 0 for n in router.nodes)
+
+
+@pytest.mark.asyncio
+async def test_hedge_answers_past_a_stalled_primary(servers):
+    a, b = FakeNode("a"), FakeNode("b")
+    urls = [await servers(a), await servers(b)]
+    router = RPCRouter(urls, hedge_quantile=0.9, hedge_min_samples=5, probe_interval_sec=0, rng=random.Random(1))
+    for _ in range(10):
+        await router.request("getAccountInfo", ["x"])
+    assert router.hedge_delay("getAccountInfo") is not None
+    assert router.hedge_delay("sendTransaction") is None
+
+    a.delay = b.delay = 2.0
+    stalled = "a" if a.calls >= b.calls else "b"
+    (a if stalled == "b" else b).delay = 0.0  # toinen jumittuu, toinen vastaa heti
+    results = [await asyncio.wait_for(router.request("getAccountInfo", ["x"]), timeout=1.5) for _ in range(6)]
+
+    assert set(results) == {"a", "b"} - {stalled}
+    assert router.hedges_won >= 1 and router.get_status()["hedges"]["won"] == router.hedges_won
+
+    # call(): mielivaltainen callable -> ei hedgeä, vaikka metodinimellä on latenssihistoria
+    sent, calls = router.hedges_sent, []
+
+    async def getAccountInfo(url):
+        calls.append(url)
+        await asyncio.sleep(0.2)
+        return url
+
+    await router.call(getAccountInfo)
+    assert len(calls) == 1 and router.hedges_sent == sent
+
+
+@pytest.mark.asyncio
+async def test_concurrency_cap_and_failover(servers):
+    node = FakeNode("only", delay=0.05)
+    url = await servers(node)
+    router = RPCRouter([url], max_concurrency=2, hedge_quantile=None, probe_interval_sec=0)
+
+    results = await asyncio.gather(*(router.request("getBalance", ["x"]) for _ in range(6)))
+    assert results == ["only"] * 6
+    assert node.max_inflight <= 2 and router.nodes[0].inflight == 0
+
+    dead = RPCRouter(["http://127.0.0.1:9/"], hedge_quantile=None, probe_interval_sec=0, request_timeout_sec=0.5)
+    with pytest.raises(RuntimeError):
+        await dead.request("getBalance", ["x"])
+    assert dead.get_status()["endpoints"][0]["error_rate"] > 0
+
+
+@pytest.mark.asyncio
+async def test_probe_demotes_lagging_node_and_solana_rpc_routes_through_router(servers):
+    head, behind = FakeNode("head", slot=5000), FakeNode("behind", slot=4800)
+    head_url, behind_url = await servers(head), await servers(behind)
+    router = RPCRouter([head_url, behind_url], hedge_quantile=None, probe_interval_sec=0, max_slot_lag=50)
+
+    slots = await router.probe_once()
+    assert slots == {head_url: 5000, behind_url: 4800}
+    status = {e["url"]: e for e in router.get_status()["endpoints"]}
+    assert status[behind_url]["lagging"] and status[behind_url]["slot_lag"] == 200
+    assert status[behind_url]["weight"] == 0.0 and status[head_url]["weight"] == 1.0
+
+    rpc = SolanaRPC(router=router, window_ms=1.0)
+    infos = await asyncio.gather(*(rpc.get_mint_info(f"Mint{i}") for i in range(4)))
+    assert all(i.renounced_mint and i.decimals == 6 for i in infos)
+    assert head.calls >= 1 and behind.calls == 0
+    await rpc.close()
+
+    behind.slot = 5000
+    await router.probe_once()
+    assert router.nodes[[n.url for n in router.nodes].index(behind_url)].healthy()
+
+
+def test_init_rpc_pool_router_is_opt_in(monkeypatch):
+    previous = rpc_pool.get_rpc_pool()
+    try:
+        monkeypatch.delenv("RPC_POOL_MODE", raising=False)
+        monkeypatch.delenv("RPC_ROUTER_ENABLED", raising=False)
+        assert isinstance(rpc_pool.init_rpc_pool(["http://a"]), rpc_pool.RPCRoundRobin)
+        assert get_rpc_router() is None
+        monkeypatch.setenv("RPC_ROUTER_ENABLED", "1")
+        pool = rpc_pool.init_rpc_pool(["http://a", "http://b"])
+        assert isinstance(pool, RPCRouter) and get_rpc_router() is pool
+        monkeypatch.setenv("RPC_POOL_MODE", "round_robin")  # eksplisiittinen tila voittaa
+        assert isinstance(rpc_pool.init_rpc_pool(["http://a"]), rpc_pool.RPCRoundRobin)
+    finally:
+        rpc_pool.set_rpc_pool(previous)
@@ -0,0 +1,96 @@
+"""
+ShadowAnalyzer testit: tarkka ROC/PR AUC (tasapisteet mukaan lukien) vs. brute-force, kynnyspyyhkäisy,
+paloittain luku shadow_trades.db:stä ja score_threshold-ehdotus
+"""
+import sqlite3
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from shadow_analysis import ShadowAnalyzer, evaluate_scores
+
+
+def _pairwise_auc(scores, labels):
+    pos, neg = scores[labels], scores[~labels]
+    diff = pos[:, None] - neg[None, :]
+    return ((diff > 0).sum() + 0.5 * (diff == 0).sum()) / (len(pos) * len(neg))
+
+
+def _average_precision(scores, labels):
+    ap, prev_recall = 0.0, 0.0
+    for t in np.unique(scores)[::-1]:
+        pred = scores >= t
+        tp = (pred & labels).sum()
+        recall = tp / labels.sum()
+        ap += (recall - prev_recall) * tp / pred.sum()
+        prev_recall = recall
+    return ap
+
+
+def test_auc_matches_bruteforce_with_ties():
+    rng = np.random.default_rng(7)
+    scores = np.round(rng.random(400), 2)  # paljon tasapisteitä
+    labels = rng.random(400) < scores * 0.6
+    ev = evaluate_scores(scores, labels)
+    assert ev.roc_auc == pytest.approx(_pairwise_auc(scores, labels))
+    assert ev.pr_auc == pytest.approx(_average_precision(scores, labels))
+
+    top = np.argsort(-scores, kind="mergesort")
+    assert ev.precision_at_k[10] == pytest.approx(labels[top[:10]].mean())
+    assert ev.recall_at_k[100] == pytest.approx(labels[top[:100]].sum() / labels.sum())
+    i = int(np.argmax(ev.f1))
+    pred = scores >= ev.best_threshold
+    assert ev.precision[i] == pytest.approx((pred & labels).sum() / pred.sum())
+    assert len(ev.thresholds) == len(np.unique(scores))
+
+
+def test_degenerate_labels_fall_back_to_half():
+    ev = evaluate_scores(np.array([0.1, 0.5, 0.9]), np.array([True, True, True]))
+    assert ev.roc_auc == 0.5 and ev.pr_auc == 0.5 and ev.precision_at_k[3] == 1.0
+
+
+def _write_db(path, n, rng):
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE shadow_trades (timestamp REAL, mint TEXT, score REAL, novelty REAL,
+        buyers_5m INTEGER, buy_ratio REAL, liq_usd REAL, top10_share REAL, rug_risk REAL,
+        return_5m REAL, return_15m REAL, return_60m REAL)""")
+    now = time.time()
+    score = rng.random(n)
+    good = rng.random(n) < score  # korkeampi score -> useammin hyvä
+    r60 = np.where(good, 0.5, -0.2)
+    rows = [
+        (now - 60, f"M{i}", float(score[i]), 0.5, 3, 1.2, 5000.0, float(0.3 + 0.4 * good[i]), 0.1,
+         0.01, None if i % 4 == 0 else float(r60[i]), float(r60[i]))
+        for i in range(n)
+    ]
+    rows.append((now - 30 * 86400, "Old", 1.0, 0, 0, 0, 0, 0, 0, 0.0, 0.0, -1.0))  # aikaikkunan ulkopuolella
+    rows.append((now - 60, "Pending", 1.0, 0, 0, 0, 0, 0, 0, None, None, None))  # ei tuottoja vielä
+    conn.executemany("INSERT INTO shadow_trades VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", rows)
+    conn.commit()
+    conn.close()
+    return score, good
+
+
+def test_analyze_streams_db_and_tunes_threshold(tmp_path):
+    rng = np.random.default_rng(1)
+    db = str(tmp_path / "shadow.db")
+    score, good = _write_db(db, 2000, rng)
+    analyzer = ShadowAnalyzer(db, chunk_size=256)
+
+    result = analyzer.analyze_performance()
+    assert result.n_samples == 2000
+    assert set(result.horizons) == {"5m", "15m", "60m"}
+    assert result.horizons["15m"].n == 1500 and result.horizons["5m"].positives == 0
+    assert result.roc_auc == pytest.approx(_pairwise_auc(score, good))
+    assert result.roc_auc > 0.7 and result.pr_auc > 0.6
+    assert max(result.feature_importance, key=result.feature_importance.get) == "top10_share"
+    assert "60m: ROC" in analyzer.get_analysis_summary()
+
+    cfg = SimpleNamespace(discovery=SimpleNamespace(score_threshold=0.0))
+    threshold = analyzer.tune_score_threshold(cfg)
+    assert threshold == cfg.discovery.score_threshold
+    assert threshold == pytest.approx(result.optimal_threshold, abs=1e-4)
+    assert 0.0 < threshold < 1.0
+    assert analyzer.tune_score_threshold(min_samples=10_000) is None
@@ -0,0 +1,107 @@
+"""
+ShadowTradingLogger testit: ajastinpyörä käsittelee vain erääntyneet, erääntyneet mintit yhdellä
+batch-hintahaulla ja valmiit tietueet yhtenä executemany-eränä (WAL) + CSV
+"""
+import csv
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from shadow_trading_logger import ShadowTradingLogger, TimerWheel
+
+
+class _Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class _PriceBatch:
+    def __init__(self, prices):
+        self.prices = prices
+        self.calls = []
+
+    async def __call__(self, mints):
+        self.calls.append(list(mints))
+        return {m: {"price_usd": self.prices[m]} for m in mints if m in self.prices}
+
+
+def _candidate(mint, price=None):
+    return SimpleNamespace(mint=mint, symbol=mint.upper(), overall_score=0.8, price_usd=price)
+
+
+def test_timer_wheel_pops_only_due_items():
+    clock = _Clock(0.0)
+    wheel = TimerWheel(tick_sec=5.0, horizon_sec=60.0, clock=clock)
+    wheel.schedule(10.0, "a")
+    wheel.schedule(12.0, "b")
+    wheel.schedule(200.0, "far")  # yli yhden kierroksen
+    wheel.schedule(-5.0, "late")  # mennyt -> seuraavalla kutsulla
+    assert wheel.pop_due(4.0) == ["late"]
+    assert sorted(wheel.pop_due(14.9)) == ["a", "b"]
+    assert wheel.pop_due(199.0) == [] and len(wheel) == 1
+    assert wheel.pop_due(204.0) == ["far"] and len(wheel) == 0
+
+
+@pytest.mark.asyncio
+async def test_due_checkpoints_are_batched_and_persisted_in_one_write(tmp_path):
+    clock = _Clock()
+    prices = _PriceBatch({f"Mint{i}": 1.0 for i in range(500)})
+    shadow = ShadowTradingLogger(str(tmp_path / "shadow.db"), csv_path=str(tmp_path / "shadow.csv"),
+                                 price_batch=prices, clock=clock)
+    for i in range(500):
+        shadow.log_hot_candidate(_candidate(f"Mint{i}"))
+    assert not (tmp_path / "shadow.db").exists()  # ei I/O:ta ennen ensimmäistä valmista tietuetta
+
+    await shadow._update_pending_trades()  # signaalihinnat: yksi batch kaikille
+    assert len(prices.calls) == 1 and len(prices.calls[0]) == 500
+
+    clock.now += 30
+    await shadow._update_pending_trades()  # mitään ei eräänny
+    assert len(prices.calls) == 1
+
+    for offset, price in ((60, 1.5), (900, 0.5), (3600, 2.0)):
+        clock.now = 1_000_000.0 + offset
+        prices.prices = {f"Mint{i}": price for i in range(500)}
+        await shadow._update_pending_trades()
+    assert len(prices.calls) == 4
+    assert shadow.get_stats()["saved"] == 500 and shadow.pending_trades == {}
+
+    conn = sqlite3.connect(tmp_path / "shadow.db")
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    rows = conn.execute("SELECT price_at_signal, return_5m, return_15m, return_60m FROM shadow_trades").fetchall()
+    assert len(rows) == 500 and rows[0] == (1.0, 0.5, -0.5, 1.0)
+    conn.close()
+    with open(tmp_path / "shadow.csv", newline="") as f:
+        assert len(list(csv.reader(f))) == 501  # otsikko + rivit
+    await shadow.close()
+
+
+@pytest.mark.asyncio
+async def test_missing_price_is_retried_then_saved(tmp_path):
+    clock = _Clock()
+    prices = _PriceBatch({})
+    shadow = ShadowTradingLogger(str(tmp_path / "shadow.db"), csv_path=str(tmp_path / "shadow.csv"),
+                                 price_batch=prices, clock=clock, retry_sec=30.0, max_retries=2)
+    shadow.log_hot_candidate(_candidate("MintA", price=2.0))
+    shadow.log_hot_candidate(_candidate("MintB", price=1.0))
+    shadow.log_hot_candidate(_candidate("MintB", price=1.0))  # uusi signaali korvaa vanhan
+
+    clock.now += 3600
+    await shadow._update_pending_trades()  # kaikki tarkistuspisteet erääntyneet, ei hintoja
+    assert len(prices.calls) == 1 and sorted(prices.calls[0]) == ["MintA", "MintB"]
+    prices.prices = {"MintA": 3.0}
+    clock.now += 30
+    await shadow._update_pending_trades()
+    clock.now += 30
+    await shadow._update_pending_trades()
+    assert shadow.get_stats()["saved"] == 2
+
+    conn = sqlite3.connect(tmp_path / "shadow.db")
+    rows = dict(conn.execute("SELECT mint, return_60m FROM shadow_trades").fetchall())
+    conn.close()
+    assert rows == {"MintA": 0.5, "MintB": None}
+    await shadow.close()
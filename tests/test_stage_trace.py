@@ -0,0 +1,96 @@
+"""
+stage_trace testit: vaiheet leimataan kerran, histogrammit saavat ajan edellisestä vaiheesta ja alusta,
+DiscoveryEngine leimaa putken vaiheet ja näytteistetty trace-loki kirjoittaa aikajanan
+"""
+import asyncio
+import json
+
+import pytest
+from prometheus_client import CollectorRegistry
+
+import stage_trace
+from discovery_engine import DiscoveryEngine, TokenCandidate
+from metrics import init_metrics
+from sources.mock_firehose import MockFirehoseSource
+from stage_trace import close_stage_trace, configure_stage_trace, finish, mark, trace_of
+from tests.stubs_rpc import StubFastRPC
+
+
+@pytest.fixture
+def registry():
+    reg = CollectorRegistry()
+    init_metrics(namespace="trace_test", enabled=True, enable_http=False, registry=reg)
+    yield reg
+    init_metrics(enabled=False)
+
+
+def _sample(reg, name, stage):
+    return reg.get_sample_value(f"trace_test_{name}", {"stage": stage})
+
+
+def test_marks_are_first_wins_and_feed_stage_histograms(registry):
+    c = TokenCandidate(mint="MintA")
+    mark(c, "frame_received", 10.000)
+    mark(c, "enqueued", 10.002)
+    mark(c, "dequeued", 10.010)
+    mark(c, "enqueued", 11.0)  # toistuva leima ohitetaan
+
+    assert c.trace.marks["enqueued"] == 10.002
+    assert c.trace.between("frame_received", "dequeued") == pytest.approx(0.010)
+    assert _sample(registry, "stage_latency_sec_count", "enqueued") == 1
+    assert _sample(registry, "stage_latency_sec_sum", "dequeued") == pytest.approx(0.008)
+    assert _sample(registry, "stage_since_origin_sec_sum", "dequeued") == pytest.approx(0.010)
+    # ensimmäisellä vaiheella ei ole edeltäjää
+    assert not _sample(registry, "stage_latency_sec_count", "frame_received")
+
+    with pytest.raises(ValueError):
+        mark(c, "nonexistent")
+    assert mark(None, "scored") is None and trace_of({"mint": "X"}, create=False) is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.timeout(15)
+async def test_engine_marks_pipeline_stages_in_order(registry):
+    src = MockFirehoseSource(rate_per_sec=200, burst=10, jitter_ms=0)
+    eng = DiscoveryEngine(rpc_endpoint="stub://trace", market_sources=[src], min_liq_usd=1000.0, rpc_client=StubFastRPC())
+    await eng.start()
+    await asyncio.sleep(0.5)
+    src.stop()
+    await eng.stop()
+    await eng.wait_closed()
+
+    scored = [c for c in eng.processed_candidates.values() if c.trace is not None and "scored" in c.trace]
+    assert scored
+    order = ("enqueued", "dequeued", "filtered", "enriched", "scored")
+    for c in scored:
+        stamps = [c.trace.marks[s] for s in order]
+        assert stamps == sorted(stamps)
+    assert eng.latency_stats.count() == len(scored)
+
+    published = eng.best_candidates(k=3, min_score=0.0)
+    assert published and all("published" in c.trace for c in published)
+    assert _sample(registry, "stage_latency_sec_count", "published") == len(published)
+    eng.best_candidates(k=3, min_score=0.0)
+    assert _sample(registry, "stage_latency_sec_count", "published") == len(published)
+
+
+@pytest.mark.asyncio
+async def test_sampled_trace_log_writes_timeline(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    configure_stage_trace(1.0, str(path))
+    try:
+        c = TokenCandidate(mint="MintB")
+        mark(c, "frame_received", 5.0)
+        mark(c, "scored", 5.004)
+        mark(c, "trade_submitted", 5.010)
+        finish(c, "buy", sig="SIG")
+        unsampled = stage_trace.StageTrace(sampled=False)
+        finish(unsampled, "buy")
+    finally:
+        await close_stage_trace()
+        configure_stage_trace(0.0)
+
+    rows = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(rows) == 1
+    assert rows[0]["mint"] == "MintB" and rows[0]["outcome"] == "buy" and rows[0]["sig"] == "SIG"
+    assert rows[0]["stages_ms"] == {"frame_received": 0.0, "scored": 4.0, "trade_submitted": 10.0}
@@ -0,0 +1,89 @@
+"""
+ta_kernels testit: NumPy-ytimet vs. alkuperäiset pandas-kaavat, silmukkapohjaiset tuki/vastustasot
+sekä batch-tila (tokens x bars) == tokenikohtainen calculate_technical_indicators
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import ta_kernels
+from technical_analysis_engine import TechnicalAnalysisEngine, create_sample_ohlcv_data
+
+
+def _ohlcv(bars=120, seed=3):
+    df = create_sample_ohlcv_data(bars)
+    drift = np.exp(np.cumsum(np.random.default_rng(seed).normal(0, 0.01, len(df))))
+    df[["open", "high", "low", "close"]] = df[["open", "high", "low", "close"]].mul(drift, axis=0)
+    return df
+
+
+def _assert_series(actual, expected):
+    np.testing.assert_allclose(actual, expected.to_numpy(dtype=float), rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+def test_indicator_kernels_match_pandas_formulas():
+    df = _ohlcv()
+    high, low, close, volume = (df[c] for c in ("high", "low", "close", "volume"))
+    h, l, c, v = (s.to_numpy(dtype=float) for s in (high, low, close, volume))
+
+    delta = close.diff()
+    rs = delta.where(delta > 0, 0).rolling(14).mean() / (-delta.where(delta < 0, 0)).rolling(14).mean()
+    _assert_series(ta_kernels.rsi(c), 100 - 100 / (1 + rs))
+
+    tr = pd.concat([high - low, (high - close.shift()).abs(), (low - close.shift()).abs()], axis=1).max(axis=1)
+    _assert_series(ta_kernels.atr(h, l, c), tr.rolling(14).mean())
+
+    tp = (high + low + close) / 3
+    mad = tp.rolling(14).apply(lambda x: np.mean(np.abs(x - x.mean())))
+    _assert_series(ta_kernels.cci(h, l, c), (tp - tp.rolling(14).mean()) / (0.015 * mad))
+
+    dm_plus, dm_minus = high.diff(), -low.diff()
+    dm_plus = dm_plus.where((dm_plus > dm_minus) & (dm_plus > 0), 0)
+    dm_minus = dm_minus.where((dm_minus > dm_plus) & (dm_minus > 0), 0)
+    di_plus = 100 * dm_plus.rolling(14).mean() / tr.rolling(14).mean()
+    di_minus = 100 * dm_minus.rolling(14).mean() / tr.rolling(14).mean()
+    _assert_series(ta_kernels.adx(h, l, c), (100 * (di_plus - di_minus).abs() / (di_plus + di_minus)).rolling(14).mean())
+
+    sign = np.sign(close.diff()).fillna(0)
+    sign.iloc[0] = 1
+    _assert_series(ta_kernels.obv(c, v), (sign * volume).cumsum())
+    _assert_series(ta_kernels.rolling_std(c, 20), close.rolling(20).std())
+    assert ta_kernels.ewm_mean_last(c, 26) == pytest.approx(close.ewm(span=26).mean().iloc[-1], rel=1e-12)
+    assert np.isnan(ta_kernels.rolling_mean(c[:10], 20)).all()
+
+
+def test_levels_and_patterns_match_loop_implementation():
+    engine = TechnicalAnalysisEngine()
+    for seed in range(5):
+        df = _ohlcv(bars=150, seed=seed)
+        lows = df["low"].rolling(window=5, center=True).min()
+        expected = []
+        for i in range(5, len(lows) - 5):
+            if lows.iloc[i] == df["low"].iloc[i]:
+                window = df["low"].iloc[max(0, i - 20):min(len(df), i + 20)]
+                if (abs(window - lows.iloc[i]) <= lows.iloc[i] * 0.02).sum() >= 2:
+                    expected.append(lows.iloc[i])
+        assert engine.find_support_levels(df) == sorted(expected, reverse=True)[:3]
+
+        tail = df.tail(20)
+        patterns = engine.recognize_patterns(df).patterns
+        assert ("ASCENDING_TRIANGLE" in patterns) == (np.polyfit(range(20), tail["low"], 1)[0] > 0)
+        assert ("DESCENDING_TRIANGLE" in patterns) == (np.polyfit(range(20), tail["high"], 1)[0] < 0)
+    assert engine.find_resistance_levels(df.head(8)) == []
+
+
+def test_batch_rows_equal_per_token_indicators():
+    engine = TechnicalAnalysisEngine()
+    frames = [_ohlcv(bars=80, seed=s) for s in range(4)]
+    stacked = [np.stack([f[c].to_numpy(dtype=float) for f in frames]) for c in ("high", "low", "close", "volume")]
+    batch = engine.calculate_technical_indicators_batch(*stacked)
+
+    for i, df in enumerate(frames):
+        single = vars(engine.calculate_technical_indicators(df))
+        assert set(single) == set(batch)
+        for name, value in single.items():
+            assert batch[name][i] == pytest.approx(value, rel=1e-12, nan_ok=True)
+    assert batch["macd_histogram"].tolist() == [0.0] * 4 and np.isnan(batch["stoch_d"]).all()
+
+    with pytest.raises(ValueError):
+        engine.calculate_technical_indicators_batch(stacked[0], stacked[1][:, :-1], stacked[2], stacked[3])
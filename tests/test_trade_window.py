@@ -0,0 +1,80 @@
+"""
+TradeWindowStore testit: liukuvat ikkunat vs. täysi uudelleenlaskenta, muistirajat ja idle-evictio
+"""
+import random
+
+from discovery_engine import DiscoveryEngine
+from trade_window import TradeWindowStore, WINDOW_30S, WINDOW_3M, WINDOW_5M
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _recount(trades, now, window_sec):
+    recent = [t for t in trades if t[0] >= now - window_sec]
+    buyers = {tr for _, side, tr in recent if side == "buy"}
+    return (sum(1 for t in recent if t[1] == "buy"), sum(1 for t in recent if t[1] == "sell"), len(buyers))
+
+
+def test_windows_match_full_rescan():
+    rnd = random.Random(3)
+    clock = FakeClock()
+    store = TradeWindowStore(clock=clock)
+    trades = []
+    for _ in range(3000):
+        clock.now += rnd.uniform(0.0, 0.5)
+        side = rnd.choice(["buy", "sell", "Buy", None])
+        trader = f"W{rnd.randint(0, 60)}"
+        store.record("HOT", side, trader, clock.now)
+        norm = side.lower() if side else None
+        trades.append((clock.now, norm, trader))
+
+    for sec in (WINDOW_30S, WINDOW_3M, WINDOW_5M):
+        st = store.window("HOT", sec)
+        assert (st.buys, st.sells, st.unique_buyers) == _recount(trades, clock.now, sec)
+
+    # aika kuluu ilman tradeja -> ikkunat tyhjenevät kyselyssä
+    clock.now += WINDOW_5M + 1
+    assert store.window("HOT", WINDOW_5M).trades == 0
+    assert store.get("HOT").total_buys == sum(1 for t in trades if t[1] == "buy")
+
+
+def test_memory_caps_and_idle_eviction():
+    clock = FakeClock()
+    store = TradeWindowStore(max_entries_per_mint=10, max_mints=3, idle_ttl_sec=60.0, clock=clock)
+    for i in range(25):
+        store.record("A", "buy", f"W{i}", clock.now)
+    st = store.window("A", WINDOW_5M)
+    assert st.buys == 10 and st.unique_buyers == 10
+
+    for mint in ("B", "C", "D"):
+        store.record(mint, "sell", "X", clock.now)
+    assert "A" not in store and len(store) == 3  # vähiten aktiivinen pois
+
+    clock.now += 61
+    store.record("E", "buy", "Y", clock.now)
+    assert "E" in store and len(store) == 1
+    assert store.get_stats()["evicted_idle"] == 3
+
+
+def test_discovery_engine_shares_source_store():
+    class _Src:
+        def __init__(self):
+            self.trade_windows = TradeWindowStore()
+
+    src = _Src()
+    eng = DiscoveryEngine(market_sources=[src], min_liq_usd=0.0)
+    assert eng.trade_windows is src.trade_windows
+
+    eng.update_trade_stats("M1", "W1", "buy", None)
+    eng.update_trade_stats("M1", "W2", "sell", None)
+
+    class _C:
+        mint = "M1"
+
+    assert eng._ws_trade_stats(_C()) == (1, 1, 1)
@@ -0,0 +1,125 @@
+"""
+tx_broadcast testit: sama allekirjoitettu tx lähtee kaikille terveille endpointeille, ensimmäinen hyväksyntä
+palautetaan heti, uudelleenlähetys jatkuu vahvistukseen / blockhashin vanhenemiseen asti ja tilastot kirjautuvat
+"""
+import asyncio
+import base64
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import http_pool
+from http_pool import HttpClient, HttpPoolConfig
+from rpc_pool import RPCRoundRobin
+from tx_broadcast import TxBroadcaster, _endpoint_label
+
+SIG = "5igSig111111111111111111111111111111111111111"
+RAW_TX = b"\x01" + b"\x07" * 64 + b"message-bytes"
+
+
+class FakeRpc:
+    """Jaettu tila kaikille endpointeille: vahvistus kun lähetyksiä on nähty confirm_after kpl"""
+
+    def __init__(self, confirm_after=None, block_height=100):
+        self.confirm_after = confirm_after
+        self.block_height = block_height
+        self.sends = []  # (nimi, tx-base64)
+        self.skip_preflight = []  # skipPreflight jokaisesta lähetyksestä
+
+    def app(self, name, *, delay=0.0, reject=False):
+        async def handler(request):
+            body = await request.json()
+            method = body["method"]
+            if method == "sendTransaction":
+                await asyncio.sleep(delay)
+                self.sends.append((name, body["params"][0]))
+                self.skip_preflight.append(body["params"][1]["skipPreflight"])
+                if reject:
+                    return web.json_response({"jsonrpc": "2.0", "id": body["id"], "error": {"code": -32002, "message": "node is behind"}})
+                return web.json_response({"jsonrpc": "2.0", "id": body["id"], "result": SIG})
+            if method == "getSignatureStatuses":
+                confirmed = self.confirm_after is not None and len(self.sends) >= self.confirm_after
+                value = {"slot": 1, "err": None, "confirmationStatus": "confirmed"} if confirmed else None
+                return web.json_response({"jsonrpc": "2.0", "id": body["id"], "result": {"value": [value]}})
+            if method == "getBlockHeight":
+                return web.json_response({"jsonrpc": "2.0", "id": body["id"], "result": self.block_height})
+            return web.json_response({"jsonrpc": "2.0", "id": body["id"], "error": {"message": "unknown"}})
+
+        app = web.Application()
+        app.router.add_post("/", handler)
+        return app
+
+
+@pytest.fixture
+async def servers():
+    started = []
+
+    async def start(app):
+        srv = TestServer(app)
+        await srv.start_server()
+        started.append(srv)
+        return str(srv.make_url("/"))
+
+    previous = http_pool.set_http_client(HttpClient(HttpPoolConfig(backoff_initial_sec=0.0)))
+    yield start
+    await http_pool.get_http_client().close()
+    http_pool.set_http_client(previous)
+    for srv in started:
+        await srv.close()
+
+
+@pytest.mark.asyncio
+async def test_broadcast_returns_first_accept_and_rebroadcasts_until_confirmed(servers):
+    rpc = FakeRpc(confirm_after=7)
+    fast = await servers(rpc.app("fast"))
+    slow = await servers(rpc.app("slow", delay=0.15))
+    bad = await servers(rpc.app("bad", reject=True))
+    broadcaster = TxBroadcaster(pool=RPCRoundRobin([fast, slow, bad]), rebroadcast_interval_sec=0.05)
+
+    ticket = await broadcaster.broadcast(RAW_TX, signature=SIG)
+    assert ticket.signature == SIG and ticket.first_endpoint == fast
+    assert not ticket.done  # palattiin ennen hitaan endpointin vastausta / vahvistusta
+
+    assert await ticket.wait(timeout=3.0) == "confirmed"
+    assert ticket.rounds >= 2
+    assert set(ticket.accepted_ms) == {fast, slow} and bad in ticket.errors
+    # idempotentti: jokainen lähetys on samat tavut
+    assert {tx for _, tx in rpc.sends} == {base64.b64encode(RAW_TX).decode()}
+    assert {name for name, _ in rpc.sends} == {"fast", "slow", "bad"}
+
+    stats = broadcaster.get_stats()
+    fast_stats = stats["endpoints"][_endpoint_label(fast)]
+    assert fast_stats["first_accept"] == 1 and fast_stats["first_to_land"] == 1
+    assert stats["outcomes"] == {"confirmed": 1}
+    await broadcaster.close()
+
+
+@pytest.mark.asyncio
+async def test_broadcast_stops_when_blockhash_expires(servers):
+    rpc = FakeRpc(confirm_after=None, block_height=501)
+    url = await servers(rpc.app("only"))
+    broadcaster = TxBroadcaster(extra_endpoints=[url], rebroadcast_interval_sec=0.05, max_wait_sec=10.0)
+
+    ticket = await broadcaster.broadcast(RAW_TX, last_valid_block_height=500)
+    assert ticket.signature == SIG  # otettu ensimmäisestä hyväksynnästä
+    assert await ticket.wait(timeout=2.0) == "expired"
+    assert broadcaster.get_stats()["endpoints"][_endpoint_label(url)]["first_to_land"] == 0
+    assert set(rpc.skip_preflight) == {False}  # oletuksena preflight-simulointi päällä
+
+    rpc.skip_preflight.clear()
+    ticket = await broadcaster.broadcast(RAW_TX, last_valid_block_height=500, skip_preflight=True)
+    await ticket.wait(timeout=2.0)
+    assert set(rpc.skip_preflight) == {True}  # kutsujan oma asetus
+
+
+@pytest.mark.asyncio
+async def test_broadcast_raises_when_every_endpoint_rejects(servers):
+    rpc = FakeRpc()
+    urls = [await servers(rpc.app(f"bad{i}", reject=True)) for i in range(2)]
+    broadcaster = TxBroadcaster(extra_endpoints=urls, rebroadcast_interval_sec=0.05)
+
+    with pytest.raises(RuntimeError):
+        await broadcaster.broadcast(RAW_TX, signature=SIG)
+    assert broadcaster.get_stats()["outcomes"] == {"rejected": 1}
+    assert broadcaster.get_stats()["in_flight"] == 0
@@ -0,0 +1,142 @@
+"""
+wallet_state testit: yksi batch-kierros (getBalance + token-tilit molemmista ohjelmista), TTL-välimuisti,
+single-flight, invalidointi omien kauppojen jälkeen ja ReconcileWorker 50 positiolla yhdellä kierroksella
+"""
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import http_pool
+from http_pool import HttpClient, HttpPoolConfig
+from reconcile_worker import ReconcileWorker
+from rpc_router import RPCRouter
+from wallet_state import TOKEN_2022_PROGRAM_ID, TOKEN_PROGRAM_ID, WalletStateService
+
+OWNER = "Owner1111111111111111111111111111111111111"
+
+
+def _account(pubkey, mint, amount):
+    info = {"mint": mint, "owner": OWNER, "tokenAmount": {"amount": str(amount), "decimals": 6}}
+    return {"pubkey": pubkey, "account": {"data": {"parsed": {"info": info}, "program": "spl-token"}}}
+
+
+class FakeWalletRpc:
+    """JSON-RPC batch -endpoint: lamports + token-tilit ohjelmittain; laskee HTTP-pyynnöt ja RPC-kutsut"""
+
+    def __init__(self, lamports=2_500_000_000, delay=0.0):
+        self.lamports = lamports
+        self.delay = delay
+        self.accounts = {TOKEN_PROGRAM_ID: [], TOKEN_2022_PROGRAM_ID: []}
+        self.http_requests = 0
+        self.rpc_calls = 0
+
+    def app(self):
+        async def handler(request):
+            body = await request.json()
+            self.http_requests += 1
+            out = []
+            for item in body if isinstance(body, list) else [body]:
+                self.rpc_calls += 1
+                ctx = {"slot": 777}
+                if item["method"] == "getBalance":
+                    result = {"context": ctx, "value": self.lamports}
+                elif item["method"] == "getTokenAccountsByOwner":
+                    result = {"context": ctx, "value": self.accounts[item["params"][1]["programId"]]}
+                else:
+                    out.append({"jsonrpc": "2.0", "id": item["id"], "error": {"code": -32601, "message": "nope"}})
+                    continue
+                out.append({"jsonrpc": "2.0", "id": item["id"], "result": result})
+            await asyncio.sleep(self.delay)  # tila luettiin ennen viivettä (hidas vastaus vanhasta tilasta)
+            return web.json_response(out if isinstance(body, list) else out[0])
+
+        app = web.Application()
+        app.router.add_post("/", handler)
+        return app
+
+
+@pytest.fixture
+async def rpc():
+    fake = FakeWalletRpc()
+    srv = TestServer(fake.app())
+    await srv.start_server()
+    previous = http_pool.set_http_client(HttpClient(HttpPoolConfig(backoff_initial_sec=0.0)))
+    fake.url = str(srv.make_url("/"))
+    yield fake
+    await http_pool.get_http_client().close()
+    http_pool.set_http_client(previous)
+    await srv.close()
+
+
+@pytest.mark.asyncio
+async def test_snapshot_batches_both_programs_and_caches(rpc):
+    rpc.accounts[TOKEN_PROGRAM_ID] = [_account("A1", "MintA", 100), _account("A2", "MintA", 40)]
+    rpc.accounts[TOKEN_2022_PROGRAM_ID] = [_account("B1", "MintB", 7)]
+    wallet = WalletStateService(OWNER, rpc_url=rpc.url, ttl_sec=5.0)
+
+    snaps = await asyncio.gather(*(wallet.snapshot() for _ in range(10)))
+    assert rpc.http_requests == 1 and rpc.rpc_calls == 3  # single-flight, yksi batch
+    snap = snaps[0]
+    assert snap.sol == pytest.approx(2.5) and snap.slot == 777
+    assert snap.atoms("MintA") == 140 and snap.largest_atoms("MintA") == 100
+    assert snap.tokens() == {"MintA": 140, "MintB": 7}
+    assert await wallet.token_atoms("MintB") == 7 and await wallet.token_atoms("Missing") == 0
+    assert rpc.http_requests == 1 and wallet.get_stats()["hits"] >= 2
+
+    # oma kauppa -> seuraava kysely hakee uudelleen
+    rpc.accounts[TOKEN_PROGRAM_ID] = [_account("A1", "MintA", 0)]
+    wallet.invalidate()
+    assert await wallet.token_atoms("MintA") == 0
+    assert rpc.http_requests == 2
+
+
+@pytest.mark.asyncio
+async def test_invalidate_discards_in_flight_pre_trade_fetch(rpc):
+    rpc.accounts[TOKEN_PROGRAM_ID] = [_account("A1", "MintA", 100)]
+    rpc.delay = 0.1
+    wallet = WalletStateService(OWNER, rpc_url=rpc.url, ttl_sec=5.0)
+
+    stale = asyncio.ensure_future(wallet.snapshot())
+    await asyncio.sleep(0.02)
+    rpc.accounts[TOKEN_PROGRAM_ID] = [_account("A1", "MintA", 250)]
+    wallet.invalidate()
+    fresh = await wallet.snapshot()
+    assert (await stale).atoms("MintA") == 100
+    assert fresh.atoms("MintA") == 250
+    assert (await wallet.snapshot()).atoms("MintA") == 250  # vanha haku ei ylikirjoittanut välimuistia
+    assert rpc.http_requests == 2
+
+
+class _Positions:
+    def __init__(self, positions):
+        self.positions = positions
+        self.closed, self.updated = [], {}
+
+    def get_all(self):
+        return self.positions
+
+    def close_position(self, mint, extra):
+        self.closed.append(mint)
+
+    def update_position(self, mint, fields):
+        self.updated[mint] = fields["qty_atoms"]
+
+
+@pytest.mark.asyncio
+async def test_reconcile_fifty_positions_with_one_round_trip(rpc):
+    positions = {f"Mint{i}": {"status": "open", "qty_atoms": 1000} for i in range(50)}
+    rpc.accounts[TOKEN_PROGRAM_ID] = [_account(f"Acc{i}", f"Mint{i}", 1000) for i in range(48)]
+    rpc.accounts[TOKEN_2022_PROGRAM_ID] = [_account("Acc48", "Mint48", 600)]
+    router = RPCRouter([rpc.url], hedge_quantile=None, probe_interval_sec=0)
+    wallet = WalletStateService(OWNER, router=router, ttl_sec=60.0)
+    store = _Positions(positions)
+    worker = ReconcileWorker(rpc.url, OWNER, store, wallet=wallet)
+
+    await worker.once()
+    assert rpc.http_requests == 1 and rpc.rpc_calls == 3
+    assert store.closed == ["Mint49"]
+    assert store.updated == {"Mint48": 600}
+
+    await worker.once()  # reconcile hakee aina tuoreen snapshotin (max_age=0)
+    assert rpc.http_requests == 2
@@ -0,0 +1,85 @@
+"""
+WindowedStats testit: aikaperusteinen vanheneminen, kvantiilitarkkuus ja aliikkunat
+"""
+import random
+
+from windowed_stats import WindowedCounter, WindowedQuantiles, WINDOW_5M, WINDOW_15M
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 10_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_counter_expires_by_time_not_event_count():
+    clock = FakeClock()
+    c = WindowedCounter(window_sec=WINDOW_15M, bucket_sec=30.0, clock=clock)
+    for _ in range(500):
+        c.add("rug_risk")
+    clock.now += 600
+    c.add("passed", 3)
+
+    assert c.count() == 503
+    assert c.count("rug_risk", window_sec=WINDOW_5M) == 0
+    assert c.counts(WINDOW_5M) == {"passed": 3}
+    assert abs(c.ratio("passed") - 3 / 503) < 1e-12
+
+    clock.now += 400  # rug_risk-buketit putoavat koko ikkunasta
+    assert c.counts() == {"passed": 3}
+    assert c.ratio("passed") == 1.0
+
+
+def test_quantiles_match_sorted_within_relative_accuracy():
+    clock = FakeClock()
+    rnd = random.Random(7)
+    q = WindowedQuantiles(window_sec=WINDOW_15M, bucket_sec=30.0, relative_accuracy=0.01, clock=clock)
+    values = []
+    for i in range(5000):
+        v = rnd.lognormvariate(0, 1) if i % 10 else 0.0
+        values.append(v)
+        q.add(v)
+        clock.now += 0.1
+
+    values.sort()
+    for p in (0.5, 0.8, 0.95):
+        expected = values[int(p * len(values))]
+        got = q.quantile(p)
+        assert abs(got - expected) <= 0.011 * expected
+    assert q.count() == 5000
+
+
+def test_quantiles_sub_window_and_expiry():
+    clock = FakeClock()
+    q = WindowedQuantiles(window_sec=WINDOW_15M, bucket_sec=30.0, clock=clock)
+    for _ in range(100):
+        q.add(10.0)
+    clock.now += 600
+    for _ in range(10):
+        q.add(1.0)
+
+    assert abs(q.quantile(0.5, window_sec=WINDOW_5M) - 1.0) < 0.02
+    assert abs(q.quantile(0.5) - 10.0) < 0.2
+
+    clock.now += WINDOW_15M
+    assert q.count() == 0
+    assert q.quantile(0.95) is None
+
+
+def test_engine_spam_ratio_uses_single_15m_window():
+    from discovery_engine import DiscoveryEngine
+
+    clock = FakeClock()
+    engine = DiscoveryEngine(rpc_endpoint="stub://", market_sources=[], min_liq_usd=3000.0)
+    engine.filter_stats = WindowedCounter(bucket_sec=30.0, clock=clock)
+    spam_ratio = engine.spam_ratio
+    assert spam_ratio() is None
+
+    engine.filter_stats.add("low_liq", 90)  # putoaa 15 min ikkunasta, mutta olisi 30 min ikkunassa
+    clock.now += 20 * 60
+    engine.filter_stats.add("passed", 3)
+    engine.filter_stats.add("rug_controls_missing", 1)
+    assert spam_ratio() == 0.25
+    assert spam_ratio(window_sec=1800) == 91 / 94
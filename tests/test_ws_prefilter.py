@@ -0,0 +1,52 @@
+"""
+FramePrefilter testit: turhien notifikaatioiden hylkäys, value-osan dekoodaus ja ohjausviestien läpipäästö
+"""
+import json
+
+from ws_prefilter import RAYDIUM_POOL_MARKERS, TOKEN_MINT_MARKERS, FramePrefilter
+
+
+def _notif(logs, signature="SIG"):
+    return json.dumps({
+        "jsonrpc": "2.0",
+        "method": "logsNotification",
+        "params": {
+            "result": {"context": {"slot": 1}, "value": {"signature": signature, "err": None, "logs": logs}},
+            "subscription": 7,
+        },
+    })
+
+
+def test_rejects_irrelevant_notifications_before_decoding():
+    flt = FramePrefilter("t", TOKEN_MINT_MARKERS)
+    assert flt.decode(_notif(["Program log: Instruction: TransferChecked"])) is None
+
+    frame = flt.decode(_notif(["Program log: Instruction: InitializeMint2", "mint ABC"], signature="S1"))
+    assert frame is not None and frame.notification
+    assert frame.value == {"signature": "S1", "err": None, "logs": ["Program log: Instruction: InitializeMint2", "mint ABC"]}
+    assert flt.get_stats() == {"accepted": 1, "rejected": 1, "control": 0, "decode_error": 0}
+
+
+def test_control_frames_pass_and_bytes_are_supported():
+    flt = FramePrefilter("t", TOKEN_MINT_MARKERS)
+    frame = flt.decode(b'{"jsonrpc":"2.0","result":4711,"id":1}')
+    assert frame is not None and not frame.notification
+    assert frame.message["result"] == 4711
+
+    assert flt.decode(_notif(["Instruction: InitializeMint"]).encode()).value["signature"] == "SIG"
+    assert flt.decode(_notif(["Instruction: Transfer"]).encode()) is None
+    assert flt.decode('{"broken') is None
+    assert flt.get_stats() == {"accepted": 1, "rejected": 1, "control": 1, "decode_error": 1}
+
+
+def test_case_insensitive_markers_match_pool_events():
+    flt = FramePrefilter("t", RAYDIUM_POOL_MARKERS, case_insensitive=True)
+    assert flt.accept(_notif(["Program log: InitializePool"]))
+    assert flt.accept(_notif(["Program log: ray_log: add_liquidity"]))
+    assert not flt.accept(_notif(["Program log: Instruction: Swap"]))
+
+
+def test_value_decoding_matches_full_decode_with_whitespace():
+    flt = FramePrefilter("t", TOKEN_MINT_MARKERS)
+    raw = json.dumps(json.loads(_notif(["InitializeMint", "x"])), indent=2)
+    assert flt.decode(raw).value == json.loads(raw)["params"]["result"]["value"]
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Trade Window - per-mint liukuvat trade-ikkunat (30 s / 3 min / 5 min) O(1) päivityksillä
+Yhteinen lähde sniper-polulle (HybridTradingBot) ja DiscoveryEnginen fresh-passille
+"""
+
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Iterable, Optional, Tuple
+
+WINDOW_30S = 30
+WINDOW_3M = 180
+WINDOW_5M = 300
+DEFAULT_WINDOWS = (WINDOW_30S, WINDOW_3M, WINDOW_5M)
+
+_Trade = Tuple[float, Optional[str], Optional[str]]  # (ts, side, trader)
+
+
+def normalize_side(raw: Any) -> Optional[str]:
+    """'buy'/'sell' tai None (PumpPortal: side/type/txType)"""
+    side = str(raw or "").strip().lower()
+    return side if side in ("buy", "sell") else None
+
+
+@dataclass
+class WindowStats:
+    """Yhden mintin tilanne yhdessä ikkunassa"""
+    buys: int = 0
+    sells: int = 0
+    unique_buyers: int = 0
+    unique_sellers: int = 0
+    oldest_ts: Optional[float] = None
+    newest_ts: Optional[float] = None
+
+    @property
+    def trades(self) -> int:
+        return self.buys + self.sells
+
+    @property
+    def acceleration(self) -> float:
+        """Uniikit ostajat / minuutti ikkunan kattamalla ajalla (min 30 s)"""
+        if not self.unique_buyers or self.oldest_ts is None:
+            return 0.0
+        duration_min = max((self.newest_ts - self.oldest_ts) / 60.0, 0.5)
+        return self.unique_buyers / duration_min
+
+
+class _Window:
+    """
+    Yksi aikaikkuna: trade-jono + juoksevat laskurit + per-trader viitelaskurit
+
+    Vanhentunut rivi vähennetään laskureista kun se putoaa jonon alusta -> ei uudelleenskannausta.
+    """
+
+    __slots__ = ("sec", "trades", "buys", "sells", "buyers", "sellers")
+
+    def __init__(self, sec: float):
+        self.sec = float(sec)
+        self.trades: Deque[_Trade] = deque()
+        self.buys = 0
+        self.sells = 0
+        self.buyers: Dict[str, int] = {}
+        self.sellers: Dict[str, int] = {}
+
+    def add(self, entry: _Trade) -> None:
+        _, side, trader = entry
+        self.trades.append(entry)
+        if side == "buy":
+            self.buys += 1
+            if trader:
+                self.buyers[trader] = self.buyers.get(trader, 0) + 1
+        elif side == "sell":
+            self.sells += 1
+            if trader:
+                self.sellers[trader] = self.sellers.get(trader, 0) + 1
+
+    def pop_oldest(self) -> None:
+        _, side, trader = self.trades.popleft()
+        if side == "buy":
+            self.buys -= 1
+            if trader:
+                _decref(self.buyers, trader)
+        elif side == "sell":
+            self.sells -= 1
+            if trader:
+                _decref(self.sellers, trader)
+
+    def expire(self, now: float) -> None:
+        cutoff = now - self.sec
+        trades = self.trades
+        while trades and trades[0][0] < cutoff:
+            self.pop_oldest()
+
+    def snapshot(self) -> WindowStats:
+        return WindowStats(
+            buys=self.buys,
+            sells=self.sells,
+            unique_buyers=len(self.buyers),
+            unique_sellers=len(self.sellers),
+            oldest_ts=self.trades[0][0] if self.trades else None,
+            newest_ts=self.trades[-1][0] if self.trades else None,
+        )
+
+
+def _decref(counts: Dict[str, int], key: str) -> None:
+    left = counts.get(key, 0) - 1
+    if left > 0:
+        counts[key] = left
+    else:
+        counts.pop(key, None)
+
+
+class MintTradeWindows:
+    """Mintin kaikki ikkunat + elinaikaiset kokonaismäärät"""
+
+    __slots__ = ("first_ts", "last_ts", "total_buys", "total_sells", "windows")
+
+    def __init__(self, ts: float, windows_sec: Iterable[float]):
+        self.first_ts = ts
+        self.last_ts = ts
+        self.total_buys = 0
+        self.total_sells = 0
+        self.windows: Dict[float, _Window] = {float(sec): _Window(sec) for sec in windows_sec}
+
+
+class TradeWindowStore:
+    """
+    Per-mint trade-ikkunat muistirajoilla
+
+    - record(): O(1) amortisoitu (append + vanhentuneiden poisto jonon alusta)
+    - max_entries_per_mint: kuuman mintin ikkunajono ei kasva rajatta (vanhin pudotetaan)
+    - max_mints: globaali raja, vähiten aktiivinen mint evictoidaan
+    - idle_ttl_sec: mintit ilman tradeja tämän ajan -> poistetaan (tarkistetaan record():ssa)
+    """
+
+    def __init__(
+        self,
+        windows_sec: Iterable[float] = DEFAULT_WINDOWS,
+        *,
+        max_entries_per_mint: int = 2000,
+        max_mints: int = 5000,
+        idle_ttl_sec: float = 600.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.windows_sec = tuple(sorted({float(sec) for sec in windows_sec}))
+        if not self.windows_sec:
+            raise ValueError("TradeWindowStore tarvitsee vähintään yhden ikkunan")
+        self.max_entries_per_mint = max(1, int(max_entries_per_mint))
+        self.max_mints = max(1, int(max_mints))
+        self.idle_ttl_sec = float(idle_ttl_sec)
+        self.clock = clock
+        self._mints: "OrderedDict[str, MintTradeWindows]" = OrderedDict()  # vanhin aktiivisuus ensin
+        self.stats = {"recorded": 0, "evicted_idle": 0, "evicted_cap": 0, "dropped_entries": 0}
+
+    @classmethod
+    def from_config(cls, cfg: Any = None, **kwargs) -> "TradeWindowStore":
+        """Luo DiscoveryCfg.trade_windows -asetuksista (puuttuvat kentät oletuksilla)"""
+        if cfg is not None:
+            kwargs.setdefault("windows_sec", tuple(getattr(cfg, "windows_sec", DEFAULT_WINDOWS) or DEFAULT_WINDOWS))
+            kwargs.setdefault("max_entries_per_mint", getattr(cfg, "max_entries_per_mint", 2000))
+            kwargs.setdefault("max_mints", getattr(cfg, "max_mints", 5000))
+            kwargs.setdefault("idle_ttl_sec", getattr(cfg, "idle_ttl_sec", 600.0))
+        return cls(**kwargs)
+
+    def record(self, mint: str, side: Any, trader: Optional[str] = None,
+               ts: Optional[float] = None) -> MintTradeWindows:
+        """Kirjaa yksi trade kaikkiin ikkunoihin"""
+        ts = float(ts) if ts is not None else self.clock()
+        side = normalize_side(side)
+        self._evict_idle(ts)
+
+        entry = self._mints.get(mint)
+        if entry is None:
+            entry = MintTradeWindows(ts, self.windows_sec)
+            self._mints[mint] = entry
+            while len(self._mints) > self.max_mints:
+                self._mints.popitem(last=False)
+                self.stats["evicted_cap"] += 1
+        else:
+            self._mints.move_to_end(mint)
+        entry.last_ts = max(entry.last_ts, ts)
+        if side == "buy":
+            entry.total_buys += 1
+        elif side == "sell":
+            entry.total_sells += 1
+
+        trade = (ts, side, trader or None)
+        for window in entry.windows.values():
+            window.add(trade)
+            window.expire(ts)
+            while len(window.trades) > self.max_entries_per_mint:
+                window.pop_oldest()
+                self.stats["dropped_entries"] += 1
+        self.stats["recorded"] += 1
+        return entry
+
+    def window(self, mint: str, window_sec: float, now: Optional[float] = None) -> WindowStats:
+        """Mintin tilanne ikkunassa (tyhjä WindowStats jos mintiä ei seurata)"""
+        sec = float(window_sec)
+        entry = self._mints.get(mint)
+        if entry is None:
+            if sec not in self.windows_sec:
+                raise ValueError(f"tuntematon ikkuna {window_sec}s (käytössä {self.windows_sec})")
+            return WindowStats()
+        window = entry.windows.get(sec)
+        if window is None:
+            raise ValueError(f"tuntematon ikkuna {window_sec}s (käytössä {self.windows_sec})")
+        window.expire(self.clock() if now is None else now)
+        return window.snapshot()
+
+    def get(self, mint: str) -> Optional[MintTradeWindows]:
+        return self._mints.get(mint)
+
+    def pop(self, mint: str) -> None:
+        self._mints.pop(mint, None)
+
+    def _evict_idle(self, now: float) -> int:
+        if self.idle_ttl_sec <= 0:
+            return 0
+        cutoff = now - self.idle_ttl_sec
+        removed = 0
+        while self._mints:
+            mint, entry = next(iter(self._mints.items()))
+            if entry.last_ts >= cutoff:
+                break
+            del self._mints[mint]
+            removed += 1
+        self.stats["evicted_idle"] += removed
+        return removed
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Poista mintit joilla ei ole ollut tradeja idle_ttl_sec aikaan"""
+        return self._evict_idle(self.clock() if now is None else now)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "mints": len(self._mints),
+            "entries": sum(len(w.trades) for e in self._mints.values() for w in e.windows.values()),
+            "windows_sec": list(self.windows_sec),
+        }
+
+    def __contains__(self, mint: str) -> bool:
+        return mint in self._mints
+
+    def __len__(self) -> int:
+        return len(self._mints)
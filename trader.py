@@ -1,4 +1,4 @@
-import aiohttp, asyncio, base64, os, time, logging
+import aiohttp, asyncio, base64, contextlib, os, time, logging
 from typing import Optional, Dict, Any
 from decimal import Decimal, ROUND_DOWN
 from solders.keypair import Keypair
@@ -9,6 +9,11 @@ from solana.rpc.async_api import AsyncClient
 from solana.rpc.types import TxOpts, TokenAccountOpts
 from solana.rpc.commitment import Confirmed
 
+from http_pool import get_http_client
+from rpc_router import RPCRouter, get_rpc_router
+from tx_broadcast import TxBroadcaster, broadcaster_from_env
+from wallet_state import WalletStateService, get_wallet_state
+
 JUP_BASE = "https://quote-api.jup.ag/v6"  # Jupiter API v6 endpoint
 
 FINALIZED = "finalized"  # vaihtoehdot: processed/confirmed/finalized
@@ -18,8 +23,20 @@ def fmt_sol(value: float, places: int = 5) -> str:
     return str(Decimal(value).quantize(q, rounding=ROUND_DOWN))
 
 class Trader:
-    def __init__(self, http_rpc_url: str, cfg, logger: Optional[logging.Logger] = None):
+    def __init__(
+        self,
+        http_rpc_url: str,
+        cfg,
+        logger: Optional[logging.Logger] = None,
+        broadcaster: Optional[TxBroadcaster] = None,
+        router: Optional[RPCRouter] = None,
+        wallet: Optional[WalletStateService] = None,
+    ):
         self.http = http_rpc_url
+        # Adaptiivinen reititin (RPC_ROUTER_ENABLED / init_rpc_pool): lukukutsut nopeimmalle terveelle endpointille
+        self.router = router if router is not None else get_rpc_router()
+        # Rinnakkaislähetys kaikille terveille RPC:ille (TX_BROADCAST_ENABLED), muuten vain http_rpc_url
+        self.broadcaster = broadcaster if broadcaster is not None else broadcaster_from_env([http_rpc_url])
         self.cfg = cfg
         self.log = logger or logging.getLogger(__name__)
         self.JUP_BASE = JUP_BASE  # Jupiter API endpoint
@@ -45,16 +62,39 @@ class Trader:
         else:
             # Dry-run sallitaan ilman avainta
             self.kp = None
+        # Saldot yhdellä batch-kierroksella, jaettu BalanceManagerin / ReconcileWorkerin / ExitWorkerin kanssa
+        owner = str(self.kp.pubkey()) if self.kp else os.getenv("TRADER_PUBLIC_KEY", "")
+        self.wallet = wallet if wallet is not None else (
+            get_wallet_state(owner, http_rpc_url, self.router) if owner else None
+        )
+
+    @contextlib.asynccontextmanager
+    async def _sol_client(self, method: str = "rpc", *, lease: bool = True):
+        """
+        AsyncClient routerin valitsemalle endpointille (ilman routeria http_rpc_url)
 
-    async def _sol_client(self):
-        return AsyncClient(self.http, commitment=Confirmed)
+        lease=False: ei varausta eikä latenssikirjausta (vahvistuksen pollaus kestää sekunteja)
+        """
+        if self.router is None:
+            async with AsyncClient(self.http, commitment=Confirmed) as c:
+                yield c
+            return
+        if not lease:
+            async with AsyncClient(self.router.endpoint(method), commitment=Confirmed) as c:
+                yield c
+            return
+        async with self.router.lease(method) as url:
+            async with AsyncClient(url, commitment=Confirmed) as c:
+                yield c
     
     async def get_sol_balance(self, *, commitment: str = FINALIZED, min_context_slot: int | None = None) -> float:
         """Get wallet SOL balance in lamports, return as SOL (float)"""
         if not self.kp:
             return 0.0
         try:
-            async with await self._sol_client() as c:
+            if self.wallet and min_context_slot is None:
+                return await self.wallet.sol_balance()
+            async with self._sol_client("getBalance") as c:
                 params = [Pubkey.from_string(str(self.kp.pubkey()) if self.kp else os.getenv("TRADER_PUBLIC_KEY",""))]
                 opts = {}
                 if commitment:
@@ -74,7 +114,10 @@ class Trader:
         if not self.kp:
             return 0
         try:
-            async with await self._sol_client() as c:
+            if self.wallet:
+                total_lamports = await self.wallet.lamports()
+                return max(0, total_lamports - int(0.01 * 1e9))
+            async with self._sol_client("getBalance") as c:
                 resp = await c.get_balance(self.kp.pubkey(), commitment=FINALIZED)
                 total_lamports = int(resp.value)
                 # Reserve 0.01 SOL for fees
@@ -87,7 +130,9 @@ class Trader:
     async def get_token_balance_atoms(self, owner_pubkey: str, mint: str) -> int:
         """Lukee omistajan suurimman token-tilin saldon (atoms)"""
         try:
-            async with await self._sol_client() as c:
+            if self.wallet and owner_pubkey == self.wallet.owner:
+                return await self.wallet.token_atoms(mint, largest=True)
+            async with self._sol_client("getTokenAccountsByOwner") as c:
                 resp = await c.get_token_accounts_by_owner(
                     Pubkey.from_string(owner_pubkey),
                     TokenAccountOpts(mint=mint)
@@ -107,8 +152,10 @@ class Trader:
         """Odottaa vahvistuksen ja lukee uusimman token-saldon → erotus = toteuma"""
         try:
             # odota confirmed + lue saldo
-            async with await self._sol_client() as c:
+            async with self._sol_client("confirmTransaction", lease=False) as c:
                 await c.confirm_transaction(sig, commitment=Confirmed)
+            if self.wallet:
+                self.wallet.invalidate()  # vahvistettu kauppa -> saldo luetaan uudelleen
             user_pk = str(self.kp.pubkey()) if self.kp else os.getenv("TRADER_PUBLIC_KEY","")
             after = await self.get_token_balance_atoms(user_pk, out_mint)
             filled = max(0, after - before_atoms)
@@ -128,11 +175,11 @@ class Trader:
         }
         url = f"{JUP_BASE}/quote"
         headers = {}  # Ei tarvita Host headeria uudella endpointilla
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as s:
-            async with s.get(url, params=p, headers=headers) as r:
-                if r.status != 200:
-                    return None
-                return await r.json()
+        try:
+            return await get_http_client().get_json(url, params=p, headers=headers, timeout=10.0)
+        except Exception as e:
+            self.log.debug(f"Jupiter quote failed: {e}")
+            return None
 
     async def _jup_swap_tx(self, quote: Dict, user_pubkey: str) -> Optional[Dict]:
         url = f"{JUP_BASE}/swap"
@@ -145,47 +192,44 @@ class Trader:
             "prioritizationFeeLamports": self.cfg.priority_fee_microlamports,  # optional
             "useSharedAccounts": True,
         }
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15)) as s:
-            async with s.post(url, json=payload, headers=headers) as r:
-                if r.status != 200:
-                    return None
-                return await r.json()
+        try:
+            return await get_http_client().post_json(url, json=payload, headers=headers, timeout=15.0)
+        except Exception as e:
+            self.log.debug(f"Jupiter swap_tx failed: {e}")
+            return None
 
     async def _jup_swap_tx(self, quote: dict, user_pk: str) -> dict:
         """Jupiter v6 swap transaction builder"""
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.JUP_BASE}/swap"
-                payload = {
-                    "quoteResponse": quote,
-                    "userPublicKey": user_pk,
-                    "wrapAndUnwrapSol": True,
-                    "useSharedAccounts": False,  # Disable shared accounts for simple AMMs
-                    "feeAccount": None,
-                    "trackingAccount": None,
-                    "computeUnitPriceMicroLamports": self.cfg.priority_fee_microlamports,
-                    "asLegacyTransaction": False,
-                    "useTokenLedger": False,
-                    "destinationTokenAccount": None
-                }
-                headers = {
-                    "Content-Type": "application/json"
-                }
-                self.log.info(f"🔧 Jupiter swap_tx request: {url}")
-                async with session.post(url, json=payload, headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as resp:
-                    self.log.info(f"🔧 Jupiter swap_tx response: {resp.status}")
-                    if resp.status != 200:
-                        text = await resp.text()
-                        self.log.error(f"Jupiter swap_tx HTTP {resp.status}: {text}")
-                        return {}
-                    result = await resp.json()
-                    self.log.info(f"🔧 Jupiter swap_tx result keys: {list(result.keys()) if result else 'None'}")
-                    return result
+            url = f"{self.JUP_BASE}/swap"
+            payload = {
+                "quoteResponse": quote,
+                "userPublicKey": user_pk,
+                "wrapAndUnwrapSol": True,
+                "useSharedAccounts": False,  # Disable shared accounts for simple AMMs
+                "feeAccount": None,
+                "trackingAccount": None,
+                "computeUnitPriceMicroLamports": self.cfg.priority_fee_microlamports,
+                "asLegacyTransaction": False,
+                "useTokenLedger": False,
+                "destinationTokenAccount": None
+            }
+            headers = {
+                "Content-Type": "application/json"
+            }
+            self.log.info(f"🔧 Jupiter swap_tx request: {url}")
+            try:
+                result = await get_http_client().post_json(url, json=payload, headers=headers, timeout=30.0)
+            except aiohttp.ClientResponseError as e:
+                self.log.error(f"Jupiter swap_tx HTTP {e.status}: {e.message}")
+                return {}
+            self.log.info(f"🔧 Jupiter swap_tx result keys: {list(result.keys()) if result else 'None'}")
+            return result
         except Exception as e:
             self.log.error(f"Jupiter swap_tx error: {e}")
             return {}
 
-    async def _send_and_confirm(self, swap_tx_b64: str) -> Optional[str]:
+    async def _send_and_confirm(self, swap_tx_b64: str, last_valid_block_height: Optional[int] = None) -> Optional[str]:
         if self.cfg.dry_run or not self.kp:
             self.log.info("[DRY-RUN] Swap tx prepared (not sent).")
             return "DRYRUN"
@@ -193,12 +237,29 @@ class Trader:
         vt = VersionedTransaction.from_bytes(raw)
         # Sign
         signed = VersionedTransaction(vt.message, [self.kp])
-        async with await self._sol_client() as c:
-            sig = await c.send_raw_transaction(bytes(signed), opts=TxOpts(skip_preflight=False, max_retries=3))
-            sigstr = sig.value
-            # Confirm
-            await c.confirm_transaction(sigstr, commitment=Confirmed)
+        if self.broadcaster:
+            ticket = await self.broadcaster.broadcast(
+                bytes(signed), signature=str(signed.signatures[0]), last_valid_block_height=last_valid_block_height,
+                skip_preflight=False,  # kuten suora lähetys: simuloi ennen kuin maksetaan fee epäonnistuvasta tx:stä
+            )
+            status = await ticket.wait()
+            if self.wallet:
+                self.wallet.invalidate()
+            if status != "confirmed":
+                raise RuntimeError(f"tx {ticket.signature} ei vahvistunut: {status}")
+            return ticket.signature
+        try:
+            async with self._sol_client("sendTransaction") as c:
+                sig = await c.send_raw_transaction(bytes(signed), opts=TxOpts(skip_preflight=False, max_retries=3))
+                sigstr = sig.value
+            # Confirm lyhyen lähetysvarauksen ulkopuolella
+            async with self._sol_client("confirmTransaction", lease=False) as c:
+                await c.confirm_transaction(sigstr, commitment=Confirmed)
             return sigstr
+        finally:
+            # lähetetty (tai ehkä lähetetty) oma tx -> välimuistissa oleva saldo ei ole enää luotettava
+            if self.wallet:
+                self.wallet.invalidate()
 
     async def can_sell_probe(self, token_mint: str, min_amount_atoms: int = 1) -> bool:
         """
@@ -259,7 +320,7 @@ class Trader:
                 res["reason"] = "swap_build_fail"
                 return res
             
-            sig = await self._send_and_confirm(sw["swapTransaction"])
+            sig = await self._send_and_confirm(sw["swapTransaction"], sw.get("lastValidBlockHeight"))
             
             # Dry-run: palauta arvio
             if sig == "DRYRUN":
@@ -320,7 +381,7 @@ class Trader:
                 self.log.error(f"Jupiter swap_tx response missing swapTransaction: {sw}")
                 return res
             
-            sig = await self._send_and_confirm(sw["swapTransaction"])
+            sig = await self._send_and_confirm(sw["swapTransaction"], sw.get("lastValidBlockHeight"))
             res.update({"ok": True, "sig": sig, "route": q})
             return res
             
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Tx Broadcast - allekirjoitetun transaktion rinnakkaislähetys kaikille terveille RPC-endpointeille
+
+- sama allekirjoitettu tx (samat tavut -> sama signature) lähetetään yhtä aikaa jokaiselle terveelle
+  rpc_pool.RPCRoundRobin-endpointille (+ omat lisä-endpointit); ensimmäinen hyväksyntä palautetaan heti
+- taustalla uudelleenlähetys rebroadcast_interval_sec välein kunnes getSignatureStatuses näyttää
+  confirmed/finalized, tx epäonnistuu tai blockhash vanhenee (lastValidBlockHeight tai max_wait_sec)
+- per-endpoint hyväksyntälatenssi, ensimmäinen hyväksyjä ja "first to land" (ensimmäinen hyväksyjä
+  lähetyksissä jotka vahvistuivat) kirjataan Prometheukseen ja get_stats():iin
+- lähetys on idempotentti: endpoint joka palauttaa eri signaturen tai "already processed" käsitellään erikseen
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import contextlib
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from prometheus_client import Counter, Histogram
+
+from http_pool import get_http_client
+from rpc_pool import RPCEndpoint, get_rpc_pool
+
+log = logging.getLogger(__name__)
+
+broadcast_accept_latency_metric = Histogram(
+    "tx_broadcast_accept_latency_sec",
+    "sendTransaction acceptance latency per endpoint",
+    ["endpoint"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.35, 0.5, 1, 2, 5),
+)
+broadcast_first_accept_metric = Counter(
+    "tx_broadcast_first_accept_total",
+    "Broadcasts where the endpoint accepted the transaction first",
+    ["endpoint"],
+)
+broadcast_first_land_metric = Counter(
+    "tx_broadcast_first_to_land_total",
+    "Confirmed broadcasts where the endpoint accepted the transaction first",
+    ["endpoint"],
+)
+broadcast_send_errors_metric = Counter(
+    "tx_broadcast_send_errors_total",
+    "sendTransaction errors per endpoint",
+    ["endpoint"],
+)
+broadcast_outcome_metric = Counter(
+    "tx_broadcast_outcome_total",
+    "Broadcast outcomes (confirmed/failed/expired/rejected)",
+    ["outcome"],
+)
+broadcast_rebroadcasts_metric = Counter(
+    "tx_broadcast_rebroadcasts_total",
+    "Rebroadcast rounds sent while waiting for confirmation",
+)
+
+_ALREADY_PROCESSED = ("already been processed", "AlreadyProcessed")
+_CONFIRMED = ("confirmed", "finalized")
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _endpoint_label(url: str) -> str:
+    """Metriikkalabel: host[:port] (URL:n polku/api-key ei päädy metriikoihin)"""
+    parts = urlsplit(url)
+    if not parts.hostname:
+        return url
+    return f"{parts.hostname}:{parts.port}" if parts.port else parts.hostname
+
+
+@dataclass
+class _EndpointStats:
+    sent: int = 0
+    accepted: int = 0
+    errors: int = 0
+    first_accept: int = 0
+    first_to_land: int = 0
+    accept_latency_total: float = 0.0
+
+
+@dataclass
+class BroadcastTicket:
+    """Yhden lähetyksen tila; wait() odottaa vahvistusta / vanhenemista"""
+    signature: Optional[str]
+    endpoints: List[str]
+    first_endpoint: Optional[str] = None
+    first_accept_ms: Optional[float] = None
+    accepted_ms: Dict[str, float] = field(default_factory=dict)   # url -> hyväksyntälatenssi
+    errors: Dict[str, str] = field(default_factory=dict)          # url -> viimeisin virhe
+    rounds: int = 1
+    status: str = "pending"  # pending | confirmed | failed | expired | rejected
+    _done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    async def wait(self, timeout: Optional[float] = None) -> str:
+        """Odota lopputulosta; palauttaa statuksen (timeoutissa "pending")"""
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self._done.wait(), timeout)
+        return self.status
+
+    def _finish(self, status: str) -> None:
+        if not self._done.is_set():
+            self.status = status
+            self._done.set()
+
+
+class TxBroadcaster:
+    """Allekirjoitetun tx:n lähetys kaikille terveille endpointeille + uudelleenlähetys vahvistukseen asti"""
+
+    def __init__(
+        self,
+        *,
+        pool: Any = None,
+        extra_endpoints: Iterable[str] = (),
+        rebroadcast_interval_sec: float = 0.5,
+        max_wait_sec: float = 75.0,
+        send_timeout_sec: float = 2.0,
+        skip_preflight: bool = False,
+        preflight_commitment: str = "confirmed",
+    ):
+        self._pool = pool  # None -> rpc_pool.get_rpc_pool() lähetyshetkellä
+        self._extra = [RPCEndpoint(url) for url in dict.fromkeys(u for u in extra_endpoints if u)]
+        self.rebroadcast_interval_sec = max(0.05, float(rebroadcast_interval_sec))
+        self.max_wait_sec = float(max_wait_sec)
+        self.send_timeout_sec = float(send_timeout_sec)
+        self.skip_preflight = skip_preflight
+        self.preflight_commitment = preflight_commitment
+        self._stats: Dict[str, _EndpointStats] = {}
+        self._outcomes: Dict[str, int] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._poll_index = 0
+
+    # --- Public API ---
+    async def broadcast(
+        self,
+        raw_tx: bytes,
+        *,
+        signature: Optional[str] = None,
+        last_valid_block_height: Optional[int] = None,
+        skip_preflight: Optional[bool] = None,
+    ) -> BroadcastTicket:
+        """
+        Lähetä allekirjoitettu tx kaikille terveille endpointeille; palaa ensimmäisestä hyväksynnästä.
+        Uudelleenlähetys ja vahvistuksen seuranta jatkuvat taustalla (ticket.wait()).
+        skip_preflight: kutsujan oma asetus (None -> konstruktorin oletus, False = simulointi ennen lähetystä).
+        Nostaa RuntimeErrorin jos yksikään endpoint ei hyväksynyt.
+        """
+        nodes = self._endpoints()
+        if not nodes:
+            raise RuntimeError("tx broadcast: ei RPC-endpointteja")
+        ticket = BroadcastTicket(signature=signature, endpoints=[n.url for n in nodes])
+        payload = self._send_payload(raw_tx, self.skip_preflight if skip_preflight is None else skip_preflight)
+        first = asyncio.get_running_loop().create_future()
+        started = time.perf_counter()
+        sends = asyncio.gather(
+            *(self._send_one(node, payload, ticket, started, first) for node in nodes),
+            return_exceptions=True,
+        )
+        await asyncio.wait([first, sends], return_when=asyncio.FIRST_COMPLETED)
+        if not first.done():
+            first.cancel()
+            ticket._finish("rejected")
+            self._count_outcome("rejected")
+            raise RuntimeError(f"tx broadcast: kaikki {len(nodes)} endpointtia hylkäsivät: {ticket.errors}")
+
+        task = asyncio.create_task(self._follow(ticket, payload, last_valid_block_height, sends), name="tx_rebroadcast")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return ticket
+
+    async def close(self) -> None:
+        """Pysäytä taustalla jatkuvat uudelleenlähetykset"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        endpoints = {}
+        for url, s in self._stats.items():
+            endpoints[_endpoint_label(url)] = {
+                "sent": s.sent,
+                "accepted": s.accepted,
+                "errors": s.errors,
+                "first_accept": s.first_accept,
+                "first_to_land": s.first_to_land,
+                "avg_accept_ms": round(s.accept_latency_total * 1000.0 / s.accepted, 2) if s.accepted else None,
+            }
+        return {"endpoints": endpoints, "outcomes": dict(self._outcomes), "in_flight": len(self._tasks)}
+
+    # --- Internal ---
+    def _endpoints(self) -> List[RPCEndpoint]:
+        """Poolin terveet endpointit + lisä-endpointit (url-duplikaatit pois); kaikki karanteenissa -> kaikki"""
+        pool = self._pool if self._pool is not None else get_rpc_pool()
+        nodes: Dict[str, RPCEndpoint] = {}
+        for node in [*(getattr(pool, "nodes", None) or []), *self._extra]:
+            nodes.setdefault(node.url, node)
+        healthy = [n for n in nodes.values() if n.healthy()]
+        return healthy or list(nodes.values())
+
+    def _send_payload(self, raw_tx: bytes, skip_preflight: bool) -> Dict[str, Any]:
+        return {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "sendTransaction",
+            "params": [
+                base64.b64encode(raw_tx).decode("ascii"),
+                {
+                    "encoding": "base64",
+                    "skipPreflight": bool(skip_preflight),
+                    "preflightCommitment": self.preflight_commitment,
+                    "maxRetries": 0,  # uudelleenlähetys hoidetaan täällä kaikille endpointeille
+                },
+            ],
+        }
+
+    async def _rpc(self, url: str, method: str, params: list) -> Any:
+        data = await get_http_client().post_json(
+            url,
+            json={"jsonrpc": "2.0", "id": 1, "method": method, "params": params},
+            tries=1,
+            timeout=self.send_timeout_sec,
+        )
+        if isinstance(data, dict) and data.get("error"):
+            raise RuntimeError(str(data["error"]))
+        return (data or {}).get("result") if isinstance(data, dict) else None
+
+    async def _send_one(
+        self,
+        node: RPCEndpoint,
+        payload: Dict[str, Any],
+        ticket: BroadcastTicket,
+        started: float,
+        first: Optional[asyncio.Future] = None,
+    ) -> bool:
+        stats = self._stats.setdefault(node.url, _EndpointStats())
+        stats.sent += 1
+        label = _endpoint_label(node.url)
+        try:
+            data = await get_http_client().post_json(node.url, json=payload, tries=1, timeout=self.send_timeout_sec)
+            error = data.get("error") if isinstance(data, dict) else {"message": "invalid response"}
+            if error:
+                if not any(marker in str(error) for marker in _ALREADY_PROCESSED):
+                    raise RuntimeError(str(error))
+                result = ticket.signature  # sama tx on jo käsitelty -> hyväksytty
+            else:
+                result = data.get("result")
+            if not result:
+                raise RuntimeError("sendTransaction ilman signaturea")
+            if ticket.signature is None:
+                ticket.signature = result
+            elif result != ticket.signature:
+                raise RuntimeError(f"eri signature: {result} != {ticket.signature}")
+        except Exception as e:
+            node.mark_error()
+            stats.errors += 1
+            ticket.errors[node.url] = str(e)[:200]
+            broadcast_send_errors_metric.labels(endpoint=label).inc()
+            log.debug("tx broadcast %s virhe: %s", label, e)
+            return False
+
+        node.mark_success()
+        if node.url not in ticket.accepted_ms:
+            elapsed = time.perf_counter() - started
+            ticket.accepted_ms[node.url] = round(elapsed * 1000.0, 3)
+            stats.accepted += 1
+            stats.accept_latency_total += elapsed
+            broadcast_accept_latency_metric.labels(endpoint=label).observe(elapsed)
+        if first is not None and not first.done():
+            first.set_result(node.url)
+            ticket.first_endpoint = node.url
+            ticket.first_accept_ms = ticket.accepted_ms[node.url]
+            stats.first_accept += 1
+            broadcast_first_accept_metric.labels(endpoint=label).inc()
+        return True
+
+    async def _follow(
+        self,
+        ticket: BroadcastTicket,
+        payload: Dict[str, Any],
+        last_valid_block_height: Optional[int],
+        initial_sends: "asyncio.Future[Any]",
+    ) -> None:
+        """Uudelleenlähetä kunnes confirmed / failed / blockhash vanhentunut"""
+        deadline = time.monotonic() + self.max_wait_sec
+        status = "expired"
+        try:
+            while True:
+                await asyncio.sleep(self.rebroadcast_interval_sec)
+                polled = await self._poll_status(ticket.signature, last_valid_block_height)
+                if polled is not None:
+                    status = polled
+                    break
+                if time.monotonic() >= deadline:
+                    break
+                ticket.rounds += 1
+                broadcast_rebroadcasts_metric.inc()
+                started = time.perf_counter()
+                await asyncio.gather(
+                    *(self._send_one(node, payload, ticket, started) for node in self._endpoints()),
+                    return_exceptions=True,
+                )
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        finally:
+            if not initial_sends.done():
+                initial_sends.cancel()
+            ticket._finish(status)
+            self._count_outcome(status)
+            if status == "confirmed" and ticket.first_endpoint:
+                self._stats[ticket.first_endpoint].first_to_land += 1
+                broadcast_first_land_metric.labels(endpoint=_endpoint_label(ticket.first_endpoint)).inc()
+            log.info(
+                "📡 tx %s: %s (%d kierrosta, ensimmäinen %s %.0f ms)",
+                (ticket.signature or "?")[:12], status, ticket.rounds,
+                _endpoint_label(ticket.first_endpoint or "?"), ticket.first_accept_ms or 0.0,
+            )
+
+    async def _poll_status(self, signature: Optional[str], last_valid_block_height: Optional[int]) -> Optional[str]:
+        """confirmed / failed / expired tai None (jatketaan); kyselyt kiertävät endpointtien yli"""
+        nodes = self._endpoints()
+        if not nodes or not signature:
+            return None
+        node = nodes[self._poll_index % len(nodes)]
+        self._poll_index += 1
+        try:
+            result = await self._rpc(node.url, "getSignatureStatuses", [[signature], {"searchTransactionHistory": False}])
+            value = ((result or {}).get("value") or [None])[0]
+            if value:
+                if value.get("err"):
+                    return "failed"
+                if value.get("confirmationStatus") in _CONFIRMED:
+                    return "confirmed"
+            if last_valid_block_height is not None:
+                height = await self._rpc(node.url, "getBlockHeight", [{"commitment": "confirmed"}])
+                if isinstance(height, int) and height > last_valid_block_height:
+                    return "expired"
+        except Exception as e:
+            log.debug("tx status %s virhe: %s", _endpoint_label(node.url), e)
+        return None
+
+    def _count_outcome(self, outcome: str) -> None:
+        self._outcomes[outcome] = self._outcomes.get(outcome, 0) + 1
+        broadcast_outcome_metric.labels(outcome=outcome).inc()
+
+
+def broadcaster_from_env(fallback_endpoints: Iterable[str] = ()) -> Optional[TxBroadcaster]:
+    """
+    TX_BROADCAST_ENABLED=1 -> TxBroadcaster (muuten None = yhden endpointin lähetys).
+    Endpointit: rpc_pool + TX_BROADCAST_RPC_URLS (pilkuilla) + fallback_endpoints.
+    """
+    if os.getenv("TX_BROADCAST_ENABLED", "0").strip().lower() not in ("1", "true", "yes", "on"):
+        return None
+    extra = [u.strip() for u in os.getenv("TX_BROADCAST_RPC_URLS", "").split(",") if u.strip()]
+    return TxBroadcaster(
+        extra_endpoints=[*extra, *fallback_endpoints],
+        rebroadcast_interval_sec=_env_float("TX_REBROADCAST_INTERVAL_MS", 500.0) / 1000.0,
+        max_wait_sec=_env_float("TX_BROADCAST_MAX_WAIT_SEC", 75.0),
+        send_timeout_sec=_env_float("TX_BROADCAST_SEND_TIMEOUT_SEC", 2.0),
+    )
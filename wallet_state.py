@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Wallet State - lompakon saldot yhdellä RPC-kierroksella, jaettu Traderille, BalanceManagerille,
+ReconcileWorkerille ja ExitWorkerille
+
+- yksi JSON-RPC batch: getBalance + getTokenAccountsByOwner (jsonParsed) molemmille token-ohjelmille
+  (SPL Token + Token-2022) -> kaikki token-tilit ja niiden saldot ilman per-tili getTokenAccountBalance -kutsuja
+- snapshot välimuistissa lyhyen TTL:n; samanaikaiset kyselyt jakavat saman haun (single-flight)
+- invalidate() omien kauppojen jälkeen: käynnissä olevaa (kauppaa edeltävää) hakua ei enää jaeta eikä tallenneta
+- reititys rpc_router.RPCRouterin kautta jos annettu, muuten http_pool -> rpc_url
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from prometheus_client import Counter, Histogram
+
+from http_pool import get_http_client
+
+log = logging.getLogger(__name__)
+
+TOKEN_PROGRAM_ID = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
+TOKEN_2022_PROGRAM_ID = "TokenzQdBNbLqP5VEhdkAS6EPFLC1PHnBqCXEpPxuEb"
+
+wallet_snapshot_requests_metric = Counter(
+    "wallet_snapshot_requests_total",
+    "Wallet snapshot lookups by result (hit/fetch/joined)",
+    ["result"],
+)
+wallet_snapshot_fetch_duration_metric = Histogram(
+    "wallet_snapshot_fetch_duration_seconds",
+    "Duration of the batched wallet snapshot RPC round-trip",
+    buckets=(0.05, 0.1, 0.2, 0.35, 0.5, 1, 2, 5),
+)
+wallet_snapshot_invalidations_metric = Counter(
+    "wallet_snapshot_invalidations_total",
+    "Wallet snapshot invalidations after own trades",
+)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+@dataclass
+class TokenAccount:
+    """Yksi omistajan token-tili (jsonParsed)"""
+    pubkey: str
+    mint: str
+    amount: int
+    decimals: int
+    program: str
+
+
+@dataclass
+class WalletSnapshot:
+    """Lompakon tila yhdellä hetkellä"""
+    owner: str
+    lamports: int
+    accounts: List[TokenAccount] = field(default_factory=list)
+    slot: Optional[int] = None
+    fetched_at: float = 0.0  # time.monotonic()
+
+    @property
+    def sol(self) -> float:
+        return self.lamports / 1e9
+
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+    def atoms(self, mint: str) -> int:
+        """Mintin saldo kaikilta tileiltä yhteensä"""
+        return sum(a.amount for a in self.accounts if a.mint == mint)
+
+    def largest_atoms(self, mint: str) -> int:
+        """Suurimman tilin saldo (Traderin myyntikoko: yksi lähdetili)"""
+        return max((a.amount for a in self.accounts if a.mint == mint), default=0)
+
+    def decimals(self, mint: str) -> Optional[int]:
+        return next((a.decimals for a in self.accounts if a.mint == mint), None)
+
+    def tokens(self) -> Dict[str, int]:
+        """mint -> saldo yhteensä (nollasaldoiset tilit mukana nollana)"""
+        out: Dict[str, int] = {}
+        for a in self.accounts:
+            out[a.mint] = out.get(a.mint, 0) + a.amount
+        return out
+
+
+class WalletStateService:
+    """Lompakon snapshot yhdellä batch-kierroksella + lyhyt TTL-välimuisti"""
+
+    def __init__(
+        self,
+        owner: str,
+        *,
+        rpc_url: Optional[str] = None,
+        router: Any = None,
+        ttl_sec: float = 2.0,
+        commitment: str = "confirmed",
+        timeout_sec: float = 5.0,
+    ):
+        if not owner:
+            raise ValueError("wallet owner puuttuu")
+        if rpc_url is None and router is None:
+            raise ValueError("rpc_url tai router vaaditaan")
+        self.owner = owner
+        self.rpc_url = rpc_url
+        self.router = router
+        self.ttl_sec = float(ttl_sec)
+        self.commitment = commitment
+        self.timeout_sec = float(timeout_sec)
+        self._snapshot: Optional[WalletSnapshot] = None
+        self._inflight: Optional[asyncio.Future] = None
+        self._generation = 0
+        self._stats = {"hits": 0, "fetches": 0, "joined": 0, "errors": 0, "invalidations": 0}
+
+    # --- Public API ---
+    async def snapshot(self, *, max_age: Optional[float] = None) -> WalletSnapshot:
+        """
+        Tuore snapshot (ikä <= max_age, oletus ttl_sec); max_age=0 pakottaa haun.
+        Samanaikaiset kutsujat odottavat samaa hakua.
+        """
+        limit = self.ttl_sec if max_age is None else max_age
+        snap = self._snapshot
+        if snap is not None and limit > 0 and snap.age() <= limit:
+            self._count("hits", "hit")
+            return snap
+        if self._inflight is not None and not self._inflight.done():
+            self._count("joined", "joined")
+            return await asyncio.shield(self._inflight)
+        self._count("fetches", "fetch")
+        fetch = self._inflight = asyncio.ensure_future(self._fetch(self._generation))
+        fetch.add_done_callback(lambda f: f.cancelled() or f.exception())  # invalidoitu haku: virhe kuitataan
+        return await asyncio.shield(fetch)
+
+    async def lamports(self, **kwargs: Any) -> int:
+        return (await self.snapshot(**kwargs)).lamports
+
+    async def sol_balance(self, **kwargs: Any) -> float:
+        return (await self.snapshot(**kwargs)).sol
+
+    async def token_atoms(self, mint: str, *, largest: bool = False, **kwargs: Any) -> int:
+        snap = await self.snapshot(**kwargs)
+        return snap.largest_atoms(mint) if largest else snap.atoms(mint)
+
+    def invalidate(self) -> None:
+        """Oma kauppa muutti saldoja: seuraava kysely hakee uuden snapshotin"""
+        self._generation += 1
+        self._snapshot = None
+        self._inflight = None  # käynnissä oleva haku voi olla kauppaa edeltävä -> ei jaeta
+        self._stats["invalidations"] += 1
+        wallet_snapshot_invalidations_metric.inc()
+
+    def get_stats(self) -> Dict[str, Any]:
+        snap = self._snapshot
+        return {
+            **self._stats,
+            "age_sec": round(snap.age(), 3) if snap else None,
+            "token_accounts": len(snap.accounts) if snap else None,
+            "slot": snap.slot if snap else None,
+        }
+
+    # --- Internal ---
+    def _count(self, key: str, result: str) -> None:
+        self._stats[key] += 1
+        wallet_snapshot_requests_metric.labels(result=result).inc()
+
+    def _payload(self) -> List[Dict[str, Any]]:
+        opts = {"commitment": self.commitment}
+        parsed = {"encoding": "jsonParsed", "commitment": self.commitment}
+        return [
+            {"jsonrpc": "2.0", "id": 1, "method": "getBalance", "params": [self.owner, opts]},
+            {"jsonrpc": "2.0", "id": 2, "method": "getTokenAccountsByOwner",
+             "params": [self.owner, {"programId": TOKEN_PROGRAM_ID}, parsed]},
+            {"jsonrpc": "2.0", "id": 3, "method": "getTokenAccountsByOwner",
+             "params": [self.owner, {"programId": TOKEN_2022_PROGRAM_ID}, parsed]},
+        ]
+
+    async def _post(self, payload: Any) -> Any:
+        if self.router is not None:
+            return await self.router.post(payload)
+        return await get_http_client().post_json(self.rpc_url, json=payload, timeout=self.timeout_sec)
+
+    async def _fetch(self, generation: int) -> WalletSnapshot:
+        started = time.perf_counter()
+        try:
+            responses = await self._post(self._payload())
+            by_id = {r.get("id"): r for r in responses or [] if isinstance(r, dict)}
+            for rid in (1, 2, 3):
+                item = by_id.get(rid)
+                if item is None or item.get("error"):
+                    raise RuntimeError(f"wallet snapshot: RPC-virhe (id={rid}): {item and item.get('error')}")
+            slots = [r["result"].get("context", {}).get("slot") for r in by_id.values()]
+            accounts = [
+                acc
+                for rid, program in ((2, TOKEN_PROGRAM_ID), (3, TOKEN_2022_PROGRAM_ID))
+                for acc in self._parse_accounts(by_id[rid]["result"].get("value") or [], program)
+            ]
+            snap = WalletSnapshot(
+                owner=self.owner,
+                lamports=int(by_id[1]["result"].get("value") or 0),
+                accounts=accounts,
+                slot=min((s for s in slots if s is not None), default=None),
+                fetched_at=time.monotonic(),
+            )
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+        finally:
+            wallet_snapshot_fetch_duration_metric.observe(time.perf_counter() - started)
+        if generation == self._generation:
+            self._snapshot = snap
+        return snap
+
+    @staticmethod
+    def _parse_accounts(values: List[Dict[str, Any]], program: str) -> List[TokenAccount]:
+        out = []
+        for v in values:
+            try:
+                info = v["account"]["data"]["parsed"]["info"]
+                amount = info["tokenAmount"]
+                out.append(TokenAccount(
+                    pubkey=v["pubkey"],
+                    mint=info["mint"],
+                    amount=int(amount["amount"]),
+                    decimals=int(amount.get("decimals", 0)),
+                    program=program,
+                ))
+            except (KeyError, TypeError, ValueError):
+                log.debug(f"wallet snapshot: ohitetaan jäsentymätön tili {v.get('pubkey') if isinstance(v, dict) else v}")
+        return out
+
+
+# Jaetut instanssit omistajittain
+_services: Dict[str, WalletStateService] = {}
+
+
+def get_wallet_state(owner: str, rpc_url: Optional[str] = None, router: Any = None) -> WalletStateService:
+    """
+    Palauta omistajan jaettu WalletStateService (luodaan ensimmäisellä kutsulla).
+    TTL: WALLET_SNAPSHOT_TTL_SEC (oletus 2.0 s).
+    """
+    service = _services.get(owner)
+    if service is None:
+        service = _services[owner] = WalletStateService(
+            owner,
+            rpc_url=rpc_url,
+            router=router,
+            ttl_sec=_env_float("WALLET_SNAPSHOT_TTL_SEC", 2.0),
+        )
+    elif service.router is None and router is not None:
+        service.router = router
+    return service
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Windowed Stats - aikaikkunoidut (5/15/30/60 min) laskurit ja kvantiilit rengaspuskureissa
+Korvaa kiinteän mittaiset dequet, joiden "15 min" riippui tapahtumatahdista eikä ajasta
+"""
+
+import math
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, Iterable, List, Optional, Tuple
+
+# Vakioikkunat sekunteina
+WINDOW_5M = 300
+WINDOW_15M = 900
+WINDOW_30M = 1800
+WINDOW_60M = 3600
+
+
+class _BucketRing:
+    """
+    Aikabuketit renkaana: bucket_id = floor(ts / bucket_sec)
+
+    Vanhat buketit poistetaan lisäyksen/kyselyn yhteydessä ja niiden sisältö
+    vähennetään ajossa pidettävästä koko ikkunan aggregaatista -> O(1) päivitys.
+    """
+
+    def __init__(self, window_sec: float, bucket_sec: float, new_payload: Callable[[], Any],
+                 on_expire: Callable[[Any], None], clock: Callable[[], float]):
+        self.bucket_sec = float(bucket_sec)
+        self.n_buckets = max(1, int(math.ceil(float(window_sec) / self.bucket_sec)))
+        self.window_sec = self.n_buckets * self.bucket_sec
+        self._new_payload = new_payload
+        self._on_expire = on_expire
+        self.clock = clock
+        self._buckets: Deque[Tuple[int, Any]] = deque()
+
+    def _current_id(self) -> int:
+        return int(self.clock() // self.bucket_sec)
+
+    def advance(self) -> int:
+        """Poista ikkunasta pudonneet buketit; palauta nykyinen bucket_id"""
+        cur = self._current_id()
+        oldest_allowed = cur - self.n_buckets + 1
+        while self._buckets and self._buckets[0][0] < oldest_allowed:
+            _, payload = self._buckets.popleft()
+            self._on_expire(payload)
+        return cur
+
+    def current(self) -> Any:
+        cur = self.advance()
+        if not self._buckets or self._buckets[-1][0] != cur:
+            self._buckets.append((cur, self._new_payload()))
+        return self._buckets[-1][1]
+
+    def recent(self, window_sec: float) -> Iterable[Any]:
+        """Buketit viimeisen window_sec sekunnin ajalta (bucket-tarkkuudella)"""
+        cur = self.advance()
+        n = max(1, int(math.ceil(float(window_sec) / self.bucket_sec)))
+        oldest = cur - n + 1
+        return [payload for bid, payload in self._buckets if bid >= oldest]
+
+    def covers_all(self, window_sec: Optional[float]) -> bool:
+        return window_sec is None or window_sec >= self.window_sec
+
+
+class WindowedCounter:
+    """
+    Avainkohtaiset laskurit aikaikkunassa (esim. hylkäyssyyt)
+
+    - add(): O(1)
+    - count()/ratio() koko ikkunalle: O(1) ajossa pidetystä summasta
+    - lyhyemmälle ikkunalle: summa viimeisistä buketeista
+    """
+
+    def __init__(self, window_sec: float = WINDOW_60M, bucket_sec: float = 30.0, clock: Callable[[], float] = time.time):
+        self._totals: Dict[Hashable, int] = {}
+        self._total = 0
+        self._ring = _BucketRing(window_sec, bucket_sec, dict, self._expire, clock)
+
+    def _expire(self, bucket: Dict[Hashable, int]) -> None:
+        for key, n in bucket.items():
+            left = self._totals.get(key, 0) - n
+            if left > 0:
+                self._totals[key] = left
+            else:
+                self._totals.pop(key, None)
+            self._total -= n
+
+    def add(self, key: Hashable, n: int = 1) -> None:
+        bucket = self._ring.current()
+        bucket[key] = bucket.get(key, 0) + n
+        self._totals[key] = self._totals.get(key, 0) + n
+        self._total += n
+
+    def counts(self, window_sec: Optional[float] = None) -> Dict[Hashable, int]:
+        if self._ring.covers_all(window_sec):
+            self._ring.advance()
+            return dict(self._totals)
+        out: Dict[Hashable, int] = {}
+        for bucket in self._ring.recent(window_sec):
+            for key, n in bucket.items():
+                out[key] = out.get(key, 0) + n
+        return out
+
+    def count(self, key: Optional[Hashable] = None, window_sec: Optional[float] = None) -> int:
+        """Avaimen (tai kaikkien, key=None) määrä ikkunassa"""
+        if self._ring.covers_all(window_sec):
+            self._ring.advance()
+            return self._total if key is None else self._totals.get(key, 0)
+        counts = self.counts(window_sec)
+        return sum(counts.values()) if key is None else counts.get(key, 0)
+
+    def ratio(self, key: Hashable, window_sec: Optional[float] = None) -> float:
+        counts = self.counts(window_sec)
+        total = sum(counts.values())
+        return (counts.get(key, 0) / total) if total else 0.0
+
+
+class _Sketch:
+    """
+    DDSketch-tyylinen logaritminen histogrammi (suhteellinen virhe <= relative_accuracy)
+
+    Arvo v > 0 -> bin ceil(log(v) / log(gamma)); nollat ja negatiiviset erillisiin laskureihin.
+    """
+
+    __slots__ = ("bins", "zeros", "neg_bins", "count")
+
+    def __init__(self):
+        self.bins: Dict[int, int] = {}
+        self.neg_bins: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+
+    def merge(self, other: "_Sketch", sign: int = 1) -> None:
+        for src, dst in ((other.bins, self.bins), (other.neg_bins, self.neg_bins)):
+            for idx, n in src.items():
+                left = dst.get(idx, 0) + sign * n
+                if left > 0:
+                    dst[idx] = left
+                else:
+                    dst.pop(idx, None)
+        self.zeros += sign * other.zeros
+        self.count += sign * other.count
+
+
+class WindowedQuantiles:
+    """
+    Aikaikkunoitu kvantiiliskissi (esim. scoret, syklien kestot)
+
+    - add(): O(1)
+    - quantile(q): kulkee vain ei-tyhjät binit (satoja, ei tapahtumia)
+    """
+
+    def __init__(self, window_sec: float = WINDOW_60M, bucket_sec: float = 30.0,
+                 relative_accuracy: float = 0.01, min_value: float = 1e-9,
+                 clock: Callable[[], float] = time.time):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.min_value = float(min_value)
+        self._agg = _Sketch()
+        self._ring = _BucketRing(window_sec, bucket_sec, _Sketch, lambda b: self._agg.merge(b, -1), clock)
+
+    def _index(self, v: float) -> int:
+        return int(math.ceil(math.log(v) / self._log_gamma))
+
+    def _value(self, idx: int) -> float:
+        # bin-keskipiste: suhteellinen virhe <= relative_accuracy
+        return 2.0 * self.gamma ** idx / (1.0 + self.gamma)
+
+    def add(self, value: float) -> None:
+        bucket = self._ring.current()
+        v = float(value)
+        for sk in (bucket, self._agg):
+            if abs(v) < self.min_value:
+                sk.zeros += 1
+            elif v > 0:
+                idx = self._index(v)
+                sk.bins[idx] = sk.bins.get(idx, 0) + 1
+            else:
+                idx = self._index(-v)
+                sk.neg_bins[idx] = sk.neg_bins.get(idx, 0) + 1
+            sk.count += 1
+
+    def _sketch(self, window_sec: Optional[float]) -> _Sketch:
+        if self._ring.covers_all(window_sec):
+            self._ring.advance()
+            return self._agg
+        merged = _Sketch()
+        for bucket in self._ring.recent(window_sec):
+            merged.merge(bucket)
+        return merged
+
+    def count(self, window_sec: Optional[float] = None) -> int:
+        return self._sketch(window_sec).count
+
+    def quantiles(self, qs: Iterable[float], window_sec: Optional[float] = None) -> Dict[float, Optional[float]]:
+        """Useampi kvantiili yhdellä läpikäynnillä (q80-indeksointi kuten sorted[int(q*n)])"""
+        sk = self._sketch(window_sec)
+        qs = list(qs)
+        if sk.count <= 0:
+            return {q: None for q in qs}
+
+        # Järjestys: negatiiviset (suurin itseisarvo ensin), nollat, positiiviset
+        ordered: List[Tuple[float, int]] = []
+        for idx in sorted(sk.neg_bins, reverse=True):
+            ordered.append((-self._value(idx), sk.neg_bins[idx]))
+        if sk.zeros:
+            ordered.append((0.0, sk.zeros))
+        for idx in sorted(sk.bins):
+            ordered.append((self._value(idx), sk.bins[idx]))
+
+        out: Dict[float, Optional[float]] = {}
+        for q in qs:
+            rank = min(sk.count - 1, int(max(0.0, min(1.0, q)) * sk.count))
+            seen = 0
+            for value, n in ordered:
+                seen += n
+                if seen > rank:
+                    out[q] = value
+                    break
+        return out
+
+    def quantile(self, q: float, window_sec: Optional[float] = None) -> Optional[float]:
+        return self.quantiles([q], window_sec)[q]
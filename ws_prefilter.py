@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+WS Prefilter - halpa tavutason esisuodatin WebSocket-kehyksille ennen JSON-dekoodausta
+logsSubscribe-firehosen kehyksistä valtaosa on turhia siirtoja: ne hylätään merkkijonotarkistuksella,
+ja hyväksytyistä dekoodataan vain params.result.value
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Union
+
+from prometheus_client import Counter
+
+log = logging.getLogger(__name__)
+
+ws_frames_metric = Counter(
+    "ws_prefilter_frames_total",
+    "WebSocket frames seen by a prefilter per outcome",
+    ["source", "outcome"],
+)
+
+Frame = Union[str, bytes, bytearray]
+
+# Tokenin luonti: Token-ohjelman lokissa "Instruction: InitializeMint" / "InitializeMint2"
+TOKEN_MINT_MARKERS = ("InitializeMint",)
+# Raydium-poolin luonti / ensimmäinen LP (case-insensitive, vrt. RaydiumPoolWatcher._handle_logs_notif)
+RAYDIUM_POOL_MARKERS = (
+    "initializepool", "initialize_pool", "createpool", "create_pool",
+    "addliquidity", "add_liquidity", "deposit",
+)
+
+_VALUE_RE = re.compile(r'"value"\s*:\s*')
+
+
+@dataclass
+class DecodedFrame:
+    """Esisuodattimen läpäissyt kehys"""
+    notification: bool
+    value: Optional[Dict[str, Any]] = None     # params.result.value (notifikaatiot)
+    message: Optional[Dict[str, Any]] = None   # koko viesti (ohjausviestit: tilausvahvistukset, virheet)
+
+
+class FramePrefilter:
+    """
+    Kehysten esisuodatin yhdelle WS-lähteelle
+
+    - notifikaatiokehys (sisältää notification_markerin) hyväksytään vain jos siinä on jokin markers-merkkijonoista
+    - muut kehykset (tilausvahvistukset, virheet) ovat harvinaisia ja menevät aina läpi täytenä dekoodauksena
+    - notifikaatiosta dekoodataan vain "value"-olio (raw_decode kohdasta), kirjekuori ohitetaan
+    - case_insensitive=True vertaa pienaakkosiksi muunnettuun kehykseen (markerit annetaan pienillä)
+    """
+
+    def __init__(
+        self,
+        source: str,
+        markers: Iterable[str],
+        *,
+        notification_marker: str = "logsNotification",
+        case_insensitive: bool = False,
+    ):
+        self.source = source
+        self.case_insensitive = case_insensitive
+        self.markers = tuple(m.lower() if case_insensitive else m for m in markers)
+        self._markers_b = tuple(m.encode("utf-8") for m in self.markers)
+        self.notification_marker = notification_marker
+        self._notification_b = notification_marker.encode("utf-8")
+        self._decoder = json.JSONDecoder()
+        self.stats = {"accepted": 0, "rejected": 0, "control": 0, "decode_error": 0}
+        self._counters = {k: ws_frames_metric.labels(source=source, outcome=k) for k in self.stats}
+
+    def accept(self, frame: Frame) -> bool:
+        """True jos kehys kannattaa dekoodata (ei päivitä laskureita)"""
+        if isinstance(frame, (bytes, bytearray)):
+            if self._notification_b not in frame:
+                return True
+            hay = frame.lower() if self.case_insensitive else frame
+            return any(m in hay for m in self._markers_b)
+        if self.notification_marker not in frame:
+            return True
+        hay = frame.lower() if self.case_insensitive else frame
+        return any(m in hay for m in self.markers)
+
+    def admit(self, frame: Frame) -> bool:
+        """Kuten accept(), mutta kirjaa tuloksen laskureihin (kutsuja dekoodaa kehyksen itse, esim. HeliusWsHub)"""
+        ok = self.accept(frame)
+        self._count("accepted" if ok else "rejected")
+        return ok
+
+    def decode(self, frame: Frame) -> Optional[DecodedFrame]:
+        """Suodata ja dekoodaa kehys; None jos hylätty tai rikkinäinen"""
+        if isinstance(frame, (bytes, bytearray)):
+            notification = self._notification_b in frame
+            markers = self._markers_b
+        else:
+            notification = self.notification_marker in frame
+            markers = self.markers
+        if notification:
+            hay = frame.lower() if self.case_insensitive else frame
+            if not any(m in hay for m in markers):
+                self._count("rejected")
+                return None
+        if isinstance(frame, (bytes, bytearray)):
+            frame = bytes(frame).decode("utf-8", errors="replace")
+        try:
+            if notification:
+                value = self._decode_value(frame)
+                if not isinstance(value, dict):
+                    self._count("decode_error")
+                    return None
+                self._count("accepted")
+                return DecodedFrame(notification=True, value=value)
+            message = json.loads(frame)
+        except ValueError:
+            self._count("decode_error")
+            return None
+        if not isinstance(message, dict):
+            self._count("decode_error")
+            return None
+        self._count("control")
+        return DecodedFrame(notification=False, message=message)
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats)
+
+    def _decode_value(self, frame: str) -> Any:
+        m = _VALUE_RE.search(frame)
+        if m is not None:
+            try:
+                value, _ = self._decoder.raw_decode(frame, m.end())
+                if isinstance(value, dict):
+                    return value
+            except ValueError:
+                pass
+        # poikkeava muoto -> täysi dekoodaus
+        data = json.loads(frame)
+        params = data.get("params") if isinstance(data, dict) else None
+        result = params.get("result") if isinstance(params, dict) else None
+        return result.get("value") if isinstance(result, dict) else None
+
+    def _count(self, outcome: str) -> None:
+        self.stats[outcome] += 1
+        self._counters[outcome].inc()